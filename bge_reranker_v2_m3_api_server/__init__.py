@@ -9,12 +9,45 @@ __author__ = "yarnovo"
 __email__ = "yarnb@qq.com"
 __description__ = "FastAPI server for BGE Reranker v2-m3 model"
 
-from .models import RerankRequest, RerankResponse, ScoreItem
-from .service import RerankerService
+import importlib
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .client import RerankerClient
+    from .library import Reranker
+    from .models import RerankRequest, RerankResponse, ScoreItem
+    from .service import RerankerService
+
+# Public names are imported from their submodule on first access, so the CLI,
+# the dev scripts and server workers do not pay for httpx, pydantic and numpy
+# before they need them
+_EXPORTS = {
+    "RerankRequest": ".models",
+    "RerankResponse": ".models",
+    "Reranker": ".library",
+    "RerankerClient": ".client",
+    "RerankerService": ".service",
+    "ScoreItem": ".models",
+}
 
 __all__ = [
     "RerankRequest",
     "RerankResponse",
+    "Reranker",
+    "RerankerClient",
     "RerankerService",
     "ScoreItem",
 ]
+
+
+def __getattr__(name: str) -> Any:
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted({*globals(), *_EXPORTS})
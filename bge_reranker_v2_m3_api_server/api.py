@@ -1,44 +1,214 @@
 """FastAPI application for BGE Reranker v2-m3 service."""
 
+import asyncio
 import logging
 import os
-from contextlib import asynccontextmanager
+import secrets
+import signal
+import time
+from contextlib import asynccontextmanager, nullcontext, suppress
+from typing import Annotated
 
-from fastapi import FastAPI, HTTPException, status
+from fastapi import FastAPI, HTTPException, Query, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
 
 from . import __version__
+from .batching import AdaptiveBatchController
+from .capture import TrafficRecorder, worker_capture_path
+from .codec import JSON_MEDIA_TYPE, RankedResult, encode, negotiate
+from .compiled import DEFAULT_BATCH_BUCKETS, DEFAULT_SEQ_BUCKETS, CompiledForward
+from .compression import CompressionMiddleware, input_limits
+from .degradation import NO_DEGRADATION, Degradation, DegradationPolicy
+from .docstore import DocumentStore, UnknownDocumentError
+from .memory import (
+    memory_tracker,
+    start_tracemalloc,
+    tracemalloc_snapshot,
+    tracemalloc_top,
+)
+from .metrics import metrics
+from .model_manager import ModelManager, ReloadInProgressError
 from .models import (
+    BatchRerankRequest,
+    BatchRerankResponse,
+    CorpusLoadRequest,
+    DocumentStoreResponse,
+    DocumentUploadRequest,
     ErrorResponse,
     HealthResponse,
+    ModelStatusResponse,
+    ReloadRequest,
     RerankRequest,
     RerankResponse,
     ScoreItem,
+    SessionAppendRequest,
+    SessionOpenRequest,
+    SessionResponse,
+    ShadowRequest,
+)
+from .pipeline import PipelinedForward
+from .prerank import EmbeddingPreranker
+from .profiling import PROFILE_FORMATS, ProfilerBusyError, StageTimings, profiler
+from .scheduler import (
+    FairScheduler,
+    QueueFullError,
+    parse_mapping,
+    resolve_priority,
+    resolve_tenant,
+)
+from .service import RerankerService, ScoringStats
+from .sessions import (
+    RerankSession,
+    SessionFullError,
+    SessionStore,
+    StaleSessionError,
+    UnknownSessionError,
 )
-from .service import RerankerService
+from .singleflight import SingleFlight, request_fingerprint
+from .topology import configure_worker_from_env
+from .tracing import format_traceparent, load_exporter, tracer
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Global reranker service instance
-reranker_service: RerankerService | None = None
+# Global model manager holding the active reranker service
+model_manager: ModelManager | None = None
+fallback_service: RerankerService | None = None
+degradation_policy: DegradationPolicy | None = None
+document_store: DocumentStore | None = None
+session_store: SessionStore | None = None
+admin_token: str | None = None
+
+# Identical requests waiting in the scheduler or running share one result
+request_flights: SingleFlight | None = None
+# Records sampled /rerank requests for replay, if BGE_CAPTURE_PATH is set
+traffic_recorder: TrafficRecorder | None = None
+
+# Fair scheduler in front of the service and its tenant configuration
+scheduler: FairScheduler | None = None
+tenant_api_keys: dict[str, str] = {}
+known_tenants: set[str] | None = None
+tenant_header = "x-tenant-id"
+interactive_max_pairs = 100
+
+
+def create_service(
+    model_name: str | None = None, use_fp16: bool | None = None
+) -> RerankerService:
+    """Build an unloaded reranker service from the environment settings."""
+    model_name = model_name or os.getenv("BGE_MODEL_NAME", "BAAI/bge-reranker-v2-m3")
+    if use_fp16 is None:
+        use_fp16 = os.getenv("BGE_USE_FP16", "true").lower() == "true"
+    dedup_mode = os.getenv("BGE_DEDUP_MODE", "normalized").lower()
+    score_cache_size = int(os.getenv("BGE_SCORE_CACHE_SIZE", "10000"))
+
+    # Optional bi-encoder pre-ranking stage
+    prerank_top_n = int(os.getenv("BGE_PRERANK_TOP_N", "0"))
+    preranker = None
+    if prerank_top_n > 0:
+        preranker = EmbeddingPreranker(
+            model_name=os.getenv("BGE_PRERANK_MODEL", "BAAI/bge-m3"),
+            use_fp16=use_fp16,
+            top_n=prerank_top_n,
+            cache_size=int(os.getenv("BGE_VECTOR_CACHE_SIZE", "100000")),
+        )
+
+    # Optional latency/memory driven batch sizing
+    batch_controller = None
+    if os.getenv("BGE_ADAPTIVE_BATCHING", "false").lower() == "true":
+        batch_controller = AdaptiveBatchController(
+            target_latency_ms=float(os.getenv("BGE_TARGET_BATCH_LATENCY_MS", "200")),
+            max_batch_size=int(os.getenv("BGE_MAX_BATCH_SIZE", "256")),
+            memory_high_watermark=float(os.getenv("BGE_MEMORY_HIGH_WATERMARK", "0.85")),
+        )
+
+    # Optional compiled forward pass with fixed shape buckets
+    compiled_forward = None
+    if os.getenv("BGE_COMPILE", "false").lower() == "true":
+        compiled_forward = CompiledForward(
+            batch_buckets=_int_list(
+                os.getenv("BGE_COMPILE_BATCH_BUCKETS"), DEFAULT_BATCH_BUCKETS
+            ),
+            seq_buckets=_int_list(
+                os.getenv("BGE_COMPILE_SEQ_BUCKETS"), DEFAULT_SEQ_BUCKETS
+            ),
+            backend=os.getenv("BGE_COMPILE_BACKEND", "inductor"),
+            mode=os.getenv("BGE_COMPILE_MODE") or None,
+        )
+
+    # Optional tokenization overlapped with forward passes
+    pipeline = None
+    if os.getenv("BGE_PIPELINE_TOKENIZATION", "false").lower() == "true":
+        pipeline = PipelinedForward(
+            batch_size=int(os.getenv("BGE_PIPELINE_BATCH_SIZE", "32")),
+            workers=int(os.getenv("BGE_TOKENIZER_WORKERS", "2")),
+            depth=int(os.getenv("BGE_PIPELINE_DEPTH", "2")),
+        )
+
+    return RerankerService(
+        model_name=model_name,
+        use_fp16=use_fp16,
+        dedup_mode=dedup_mode,
+        score_cache_size=score_cache_size,
+        preranker=preranker,
+        batch_controller=batch_controller,
+        compiled_forward=compiled_forward,
+        single_flight=os.getenv("BGE_SINGLE_FLIGHT", "true").lower() == "true",
+        pipeline=pipeline,
+    )
+
+
+def _int_list(value: str | None, default: tuple[int, ...]) -> tuple[int, ...]:
+    """Parse a comma-separated list of integers."""
+    if not value:
+        return default
+    return tuple(int(item) for item in value.split(",") if item.strip())
 
 
 @asynccontextmanager
 async def lifespan(_app: FastAPI):
     """Manage application lifespan events."""
-    global reranker_service
+    global model_manager, admin_token, scheduler, tenant_api_keys, tenant_header
+    global known_tenants
+    global document_store, fallback_service, degradation_policy, session_store
+    global interactive_max_pairs, request_flights, traffic_recorder
 
     # Startup
     logger.info("Starting BGE Reranker v2-m3 API Server")
 
-    # Initialize reranker service
-    model_name = os.getenv("BGE_MODEL_NAME", "BAAI/bge-reranker-v2-m3")
-    use_fp16 = os.getenv("BGE_USE_FP16", "true").lower() == "true"
+    # Pin this worker and size torch thread pools before the model loads
+    configure_worker_from_env()
+
+    # Trace Python allocations from before the model loads
+    start_tracemalloc(int(os.getenv("BGE_TRACEMALLOC_FRAMES", "0")))
+    memory_tracker.measure_batches = (
+        os.getenv("BGE_MEASURE_BATCH_MEMORY", "false").lower() == "true"
+    )
+
+    # Request size caps (0 disables a cap)
+    input_limits.max_request_bytes = int(
+        os.getenv("BGE_MAX_REQUEST_BYTES", str(64 * 1024 * 1024))
+    )
+    input_limits.max_request_chars = int(os.getenv("BGE_MAX_REQUEST_CHARS", "16000000"))
+    input_limits.max_document_chars = int(os.getenv("BGE_MAX_DOCUMENT_CHARS", "100000"))
+    input_limits.max_document_bytes = int(os.getenv("BGE_MAX_DOCUMENT_BYTES", "0"))
+
+    # Request tracing
+    tracer.configure(
+        load_exporter(os.getenv("BGE_TRACE_EXPORTER")),
+        sample_rate=float(os.getenv("BGE_TRACE_SAMPLE_RATE", "1.0")),
+    )
 
-    reranker_service = RerankerService(model_name=model_name, use_fp16=use_fp16)
+    # Initialize reranker service
+    reranker_service = create_service()
+    model_manager = ModelManager(
+        reranker_service,
+        create_service,
+        on_switch=_attach_tokenizer,
+    )
+    admin_token = os.getenv("BGE_ADMIN_TOKEN") or None
 
     # Load model
     try:
@@ -49,10 +219,159 @@ async def lifespan(_app: FastAPI):
         # Continue startup even if model fails to load
         # This allows the health endpoint to report the error
 
+    # Documents referenced by ID, truncated with the reranker's tokenizer; a
+    # reload attaches the new model's tokenizer
+    document_store = DocumentStore(
+        max_documents=int(os.getenv("BGE_DOCSTORE_MAX_DOCUMENTS", "100000")),
+        max_bytes=int(os.getenv("BGE_DOCSTORE_MAX_BYTES", str(256 * 1024 * 1024))),
+    )
+    _attach_tokenizer(reranker_service)
+    corpus_path = os.getenv("BGE_DOCSTORE_CORPUS")
+    if corpus_path:
+        try:
+            document_store.load_corpus(corpus_path)
+        except Exception as e:
+            logger.error(f"Failed to load document corpus: {e}")
+
+    # Incremental reranking sessions for paginated retrieval
+    session_store = SessionStore(
+        ttl=float(os.getenv("BGE_SESSION_TTL", "300")),
+        max_sessions=int(os.getenv("BGE_SESSION_MAX_SESSIONS", "1000")),
+        max_documents=int(os.getenv("BGE_SESSION_MAX_DOCUMENTS", "10000")),
+    )
+
+    # Degrade new requests when latency or queue wait exceed the SLO
+    fallback_model = os.getenv("BGE_FALLBACK_MODEL")
+    fallback_service = None
+    if fallback_model:
+        try:
+            fallback_service = create_service(model_name=fallback_model)
+            fallback_service.load_model()
+        except Exception as e:
+            logger.error(f"Failed to load fallback model: {e}")
+            fallback_service = None
+    degradation_policy = None
+    latency_slo_ms = float(os.getenv("BGE_SLO_LATENCY_MS", "0"))
+    if latency_slo_ms > 0:
+        thresholds = {
+            mode: float(threshold)
+            for mode, threshold in parse_mapping(
+                os.getenv(
+                    "BGE_DEGRADATION_THRESHOLDS",
+                    "max_length=1,max_documents=1.5,fallback_model=2,cache_only=3",
+                )
+            ).items()
+        }
+        if fallback_service is None:
+            thresholds.pop("fallback_model", None)
+        if int(os.getenv("BGE_SCORE_CACHE_SIZE", "10000")) <= 0:
+            # Without a score cache every document would go unscored
+            thresholds.pop("cache_only", None)
+        degradation_policy = DegradationPolicy(
+            latency_slo_ms,
+            queue_wait_slo_ms=float(os.getenv("BGE_SLO_QUEUE_WAIT_MS", "0")) or None,
+            thresholds=thresholds,
+            max_length=int(os.getenv("BGE_DEGRADED_MAX_LENGTH", "256")),
+            max_documents=int(os.getenv("BGE_DEGRADED_MAX_DOCUMENTS", "100")),
+        )
+
+    # Initialize the per-tenant scheduler
+    tenant_api_keys = parse_mapping(os.getenv("BGE_API_KEYS"))
+    tenant_header = os.getenv("BGE_TENANT_HEADER", "X-Tenant-ID").lower()
+    interactive_max_pairs = int(os.getenv("BGE_INTERACTIVE_MAX_DOCUMENTS", "100"))
+    tenant_weights = {
+        tenant: float(weight)
+        for tenant, weight in parse_mapping(os.getenv("BGE_TENANT_WEIGHTS")).items()
+    }
+    tenant_quotas = {
+        tenant: float(quota)
+        for tenant, quota in parse_mapping(os.getenv("BGE_TENANT_QUOTAS")).items()
+    }
+    # Unconfigured tenant names share "default" unless BGE_TENANTS is "*"
+    listed_tenants = {
+        tenant.strip()
+        for tenant in os.getenv("BGE_TENANTS", "").split(",")
+        if tenant.strip()
+    }
+    known_tenants = (
+        None
+        if "*" in listed_tenants
+        else listed_tenants
+        | set(tenant_api_keys.values())
+        | set(tenant_weights)
+        | set(tenant_quotas)
+    )
+    scheduler = FairScheduler(
+        weights=tenant_weights,
+        quotas=tenant_quotas,
+        default_quota=float(os.getenv("BGE_DEFAULT_TENANT_QUOTA", "0")) or None,
+        concurrency=int(os.getenv("BGE_SCHEDULER_CONCURRENCY", "1")),
+        max_queue_per_tenant=int(os.getenv("BGE_TENANT_MAX_QUEUE", "0")),
+        observer=degradation_policy.record if degradation_policy else None,
+    )
+    await scheduler.start()
+    request_flights = (
+        SingleFlight("api")
+        if os.getenv("BGE_SINGLE_FLIGHT", "true").lower() == "true"
+        else None
+    )
+    capture_path = os.getenv("BGE_CAPTURE_PATH")
+    traffic_recorder = (
+        TrafficRecorder(
+            worker_capture_path(
+                capture_path, int(os.getenv("BGE_WORKERS", "1")), os.getpid()
+            ),
+            sample_rate=float(os.getenv("BGE_CAPTURE_SAMPLE_RATE", "1.0")),
+            text_mode=os.getenv("BGE_CAPTURE_TEXT", "raw").lower(),
+            max_requests=int(os.getenv("BGE_CAPTURE_MAX_REQUESTS", "0")),
+        )
+        if capture_path
+        else None
+    )
+
+    # SIGHUP reloads the model (e.g. after weights were replaced on disk)
+    loop = asyncio.get_running_loop()
+    with suppress(NotImplementedError, RuntimeError, ValueError):
+        loop.add_signal_handler(
+            signal.SIGHUP, lambda: loop.create_task(_reload_on_signal())
+        )
+
     yield
 
     # Shutdown
     logger.info("Shutting down BGE Reranker v2-m3 API Server")
+    await scheduler.stop()
+    model_manager.shutdown()
+    if fallback_service is not None:
+        fallback_service.unload()
+    document_store.close()
+    session_store.clear()
+    if traffic_recorder is not None:
+        traffic_recorder.close()
+    tracer.configure(None)
+
+
+def _resolve_tenant(http_request: Request) -> str:
+    """Identify the tenant of a request from its API key or tenant header."""
+    return resolve_tenant(
+        http_request.headers, tenant_api_keys, tenant_header, known_tenants
+    )
+
+
+def _attach_tokenizer(service: RerankerService) -> None:
+    """Truncate document uploads with a loaded service's tokenizer."""
+    if document_store is not None:
+        document_store.attach_tokenizer(service.tokenizer, service.max_length)
+
+
+async def _reload_on_signal() -> None:
+    """Reload the active model in the background after SIGHUP."""
+    if model_manager is None:
+        return
+    try:
+        await asyncio.to_thread(model_manager.reload)
+    except Exception as e:
+        logger.error(f"Model reload failed: {e}")
 
 
 # Create FastAPI app
@@ -72,6 +391,48 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compressed bodies and request byte caps
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=int(os.getenv("BGE_COMPRESSION_MIN_SIZE", "1024")),
+)
+
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Open a root span per request, continuing the caller's trace if any.
+
+    With ?profile=true the request is always traced and its stage timings
+    are returned in a Server-Timing header.
+    """
+    request.state.received_ns = time.time_ns()
+    profile = (
+        StageTimings()
+        if request.query_params.get("profile", "").lower() in ("1", "true")
+        else None
+    )
+    request.state.profile = profile
+    with tracer.start_trace(
+        f"{request.method} {request.url.path}",
+        traceparent=request.headers.get("traceparent"),
+        listener=profile,
+        http_method=request.method,
+        http_target=request.url.path,
+    ) as span:
+        size = int(request.headers.get("content-length") or 0)
+        with memory_tracker.track_request(size):
+            response = await call_next(request)
+        if profile is not None:
+            total_ms = (time.time_ns() - request.state.received_ns) / 1e6
+            response.headers["Server-Timing"] = profile.server_timing(total_ms)
+        degradation = getattr(request.state, "degradation", None)
+        if degradation:
+            response.headers["X-Degradation"] = ", ".join(degradation.labels())
+        if span is not None:
+            span.set_attribute("http_status_code", response.status_code)
+            response.headers["traceparent"] = format_traceparent(span)
+        return response
+
 
 @app.exception_handler(Exception)
 async def general_exception_handler(_request, exc):
@@ -88,7 +449,7 @@ async def general_exception_handler(_request, exc):
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
     """Health check endpoint."""
-    global reranker_service
+    reranker_service = model_manager.active if model_manager else None
 
     model_loaded = False
     if reranker_service:
@@ -102,50 +463,243 @@ async def health_check():
     )
 
 
-@app.post("/rerank", response_model=RerankResponse)
-async def rerank_documents(request: RerankRequest):
-    """Rerank documents based on relevance to query."""
-    global reranker_service
-
-    if not reranker_service:
+def _require_service() -> tuple[ModelManager, FairScheduler]:
+    """Return the model manager and scheduler, or raise 503 if unavailable."""
+    if not model_manager or not scheduler:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="Reranker service not initialized",
         )
 
-    if not reranker_service.is_model_loaded():
+    if not model_manager.active.is_model_loaded():
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Model not loaded"
         )
 
+    return model_manager, scheduler
+
+
+def _resolve_documents(request: RerankRequest, http_request: Request) -> RerankRequest:
+    """Replace document_ids with the stored texts, or raise 404."""
+    if request.document_ids is None:
+        return request
+    documents = _stored_documents(request.document_ids, http_request)
+    return request.model_copy(update={"documents": documents})
+
+
+def _stored_documents(ids: list[str], http_request: Request) -> list[str]:
+    """Return the texts of stored documents, or raise 404."""
+    if document_store is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Document store not initialized",
+        )
+    tenant = _resolve_tenant(http_request)
     try:
-        # Perform reranking
-        results, processing_time = reranker_service.rerank(
-            query=request.query,
-            documents=request.documents,
-            top_k=request.top_k,
-            normalize=request.normalize,
-        )
-
-        # Format results
-        score_items: list[ScoreItem] = []
-        for index, score, document in results:
-            score_items.append(
-                ScoreItem(
-                    index=index,
-                    score=score,
-                    document=document if request.return_documents else "",
-                )
+        return document_store.get_many(ids, namespace=tenant)
+    except UnknownDocumentError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=str(e.args[0])
+        ) from e
+
+
+def _decide_degradation(http_request: Request) -> Degradation:
+    """Pick the degradation for a request and remember it for the response."""
+    if degradation_policy is None:
+        return NO_DEGRADATION
+    degradation = degradation_policy.decide()
+    if degradation:
+        http_request.state.degradation = degradation
+        for label in degradation.labels():
+            metrics.inc("degraded_requests_total", mode=label.partition("=")[0])
+    return degradation
+
+
+def _degrade(
+    request: RerankRequest, degradation: Degradation
+) -> tuple[RerankRequest, int]:
+    """Drop the documents beyond the degraded per-request limit.
+
+    Returns:
+        The request to score and the number of documents dropped from it
+    """
+    limit = degradation.max_documents
+    if limit is None or len(request.documents) <= limit:
+        return request, 0
+    dropped = len(request.documents) - limit
+    return request.model_copy(update={"documents": request.documents[:limit]}), dropped
+
+
+def _unscored_documents(
+    degradation: Degradation, dropped: int, stats: ScoringStats
+) -> int | None:
+    """Count the documents a degradation left out of a request's results."""
+    if not degradation.cache_only and not dropped:
+        return None
+    return dropped + (stats.unscored if degradation.cache_only else 0)
+
+
+def _use_fallback(degradation: Degradation) -> bool:
+    """Check if a request should be scored by the fallback model."""
+    return (
+        degradation.fallback_model
+        and fallback_service is not None
+        and fallback_service.is_model_loaded()
+    )
+
+
+def _build_response(
+    request: RerankRequest,
+    results: list[tuple[int, float, str]],
+    processing_time: float,
+    stats: ScoringStats | None = None,
+    dropped: int = 0,
+) -> RerankResponse:
+    """Build the JSON response of one rerank request.
+
+    dropped counts documents a degradation removed before scoring; they
+    still count towards total_documents.
+    """
+    # Format results
+    score_items: list[ScoreItem] = []
+    for index, score, document in results:
+        score_items.append(
+            ScoreItem(
+                index=index,
+                score=score,
+                document=document if request.return_documents else "",
             )
+        )
 
-        return RerankResponse(
-            results=score_items,
-            query=request.query,
-            total_documents=len(request.documents),
-            returned_results=len(score_items),
-            processing_time_ms=processing_time,
+    return RerankResponse(
+        results=score_items,
+        query=request.query,
+        total_documents=len(request.documents) + dropped,
+        returned_results=len(score_items),
+        processing_time_ms=processing_time,
+        unique_documents=stats.unique_documents if stats else None,
+        dedup_ratio=stats.dedup_ratio if stats else 0.0,
+    )
+
+
+def _ranked_result(
+    request: RerankRequest,
+    results: list[tuple[int, float, str]],
+    processing_time: float,
+    stats: ScoringStats | None = None,
+    dropped: int = 0,
+) -> RankedResult:
+    """Build the compact/binary representation of one rerank request."""
+    return RankedResult(
+        indices=[index for index, _, _ in results],
+        scores=[score for _, score, _ in results],
+        total_documents=len(request.documents) + dropped,
+        processing_time_ms=processing_time,
+        unique_documents=stats.unique_documents if stats else None,
+    )
+
+
+@app.post("/rerank", response_model=RerankResponse)
+async def rerank_documents(request: RerankRequest, http_request: Request):
+    """Rerank documents based on relevance to query."""
+    manager, scheduler = _require_service()
+    request = _resolve_documents(request, http_request)
+    if traffic_recorder is not None:
+        traffic_recorder.record(
+            request.model_dump(exclude={"document_ids"}, exclude_none=True),
+            arrival=getattr(http_request.state, "received_ns", time.time_ns()) / 1e9,
         )
+    degradation = _decide_degradation(http_request)
+    request, dropped = _degrade(request, degradation)
 
+    # Body parsing and validation happened before this handler was called
+    tracer.record_span(
+        "rerank.validate",
+        getattr(http_request.state, "received_ns", time.time_ns()),
+        time.time_ns(),
+        documents=len(request.documents),
+    )
+
+    tenant = _resolve_tenant(http_request)
+    priority = resolve_priority(
+        http_request.headers, len(request.documents), interactive_max_pairs
+    )
+    root_span = tracer.current_span()
+    if root_span is not None:
+        root_span.set_attribute("tenant", tenant)
+        root_span.set_attribute("lane", priority)
+        root_span.set_attribute("documents", len(request.documents))
+
+    try:
+        # Perform reranking through the fair scheduler
+        use_fallback = _use_fallback(degradation)
+        scorer = fallback_service.rerank if use_fallback else manager.rerank
+
+        def score() -> tuple[list[tuple[int, float, str]], float, ScoringStats]:
+            stats = ScoringStats()
+            results, processing_time = scorer(
+                query=request.query,
+                documents=request.documents,
+                top_k=request.top_k,
+                normalize=request.normalize,
+                stats=stats,
+                max_length=degradation.max_length,
+                cache_only=degradation.cache_only,
+            )
+            return results, processing_time, stats
+
+        def submit():
+            return scheduler.submit(
+                score, tenant=tenant, priority=priority, cost=len(request.documents)
+            )
+
+        if request_flights is None:
+            results, processing_time, stats = await submit()
+        else:
+            # Followers join the leader's admission, so they must share its
+            # tenant and lane; across tenants the service-level flight inside
+            # score() still shares the computation after each is admitted
+            service = fallback_service if use_fallback else manager.active
+            key = request_fingerprint(
+                service.model_name,  # type: ignore
+                request.query,
+                request.documents,
+                request.normalize,
+                top_k=request.top_k,
+                max_length=degradation.max_length,
+                cache_only=degradation.cache_only,
+                tenant=tenant,
+                priority=priority,
+            )
+            (results, processing_time, stats), _ = await request_flights.do_async(
+                key, submit
+            )
+
+        media_type = negotiate(http_request.headers.get("accept"))
+        with tracer.span("rerank.response", results=len(results)):
+            if media_type != JSON_MEDIA_TYPE:
+                ranked = _ranked_result(
+                    request, results, processing_time, stats, dropped
+                )
+                return Response(encode([ranked], media_type), media_type=media_type)
+            response = _build_response(
+                request, results, processing_time, stats, dropped
+            )
+
+        profile: StageTimings | None = getattr(http_request.state, "profile", None)
+        if profile is not None:
+            response.timings = profile.timings()
+        if degradation:
+            response.degradation = degradation.labels()
+            response.unscored_documents = _unscored_documents(
+                degradation, dropped, stats
+            )
+        return response
+
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=str(e)
+        ) from e
     except Exception as e:
         logger.error(f"Error during reranking: {e}")
         raise HTTPException(
@@ -154,6 +708,508 @@ async def rerank_documents(request: RerankRequest):
         ) from e
 
 
+@app.post("/rerank/batch", response_model=BatchRerankResponse)
+async def rerank_batch(batch: BatchRerankRequest, http_request: Request):
+    """Rerank several requests in one call, sharing model batches."""
+    manager, scheduler = _require_service()
+
+    degradation = _decide_degradation(http_request)
+    degraded = [
+        _degrade(_resolve_documents(request, http_request), degradation)
+        for request in batch.requests
+    ]
+    requests = [request for request, _ in degraded]
+    dropped = [count for _, count in degraded]
+    total_documents = sum(len(request.documents) for request in requests)
+    tenant = _resolve_tenant(http_request)
+    # The lane follows the largest request, so a batch of coalesced small
+    # requests is as interactive as each of them sent alone
+    priority = resolve_priority(
+        http_request.headers,
+        max(len(request.documents) for request in requests),
+        interactive_max_pairs,
+    )
+
+    # One model pass per normalize setting
+    groups: dict[bool, list[int]] = {}
+    for i, request in enumerate(requests):
+        groups.setdefault(request.normalize, []).append(i)
+
+    request_stats = [ScoringStats() for _ in requests]
+
+    def run() -> tuple[list, list[float]]:
+        ranked: list = [None] * len(requests)
+        times = [0.0] * len(requests)
+        lease = (
+            nullcontext((fallback_service, manager.generation))
+            if _use_fallback(degradation)
+            else manager.lease()
+        )
+        with lease as (service, _):
+            for normalize, indices in groups.items():
+                results, processing_time = service.rerank_many(
+                    [
+                        (requests[i].query, requests[i].documents, requests[i].top_k)
+                        for i in indices
+                    ],
+                    normalize=normalize,
+                    max_length=degradation.max_length,
+                    cache_only=degradation.cache_only,
+                    request_stats=[request_stats[i] for i in indices],
+                )
+                for i, result in zip(indices, results, strict=True):
+                    ranked[i] = result
+                    times[i] = processing_time
+        return ranked, times
+
+    try:
+        ranked, times = await scheduler.submit(
+            run, tenant=tenant, priority=priority, cost=total_documents
+        )
+
+        media_type = negotiate(http_request.headers.get("accept"))
+        with tracer.span("rerank.response", results=len(ranked)):
+            items = list(
+                zip(requests, ranked, times, request_stats, dropped, strict=True)
+            )
+            if media_type != JSON_MEDIA_TYPE:
+                encoded = encode([_ranked_result(*item) for item in items], media_type)
+                return Response(encoded, media_type=media_type)
+            responses = [_build_response(*item) for item in items]
+            if degradation:
+                for response, (*_, stats, count) in zip(responses, items, strict=True):
+                    response.degradation = degradation.labels()
+                    response.unscored_documents = _unscored_documents(
+                        degradation, count, stats
+                    )
+            return BatchRerankResponse(results=responses)
+
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=str(e)
+        ) from e
+    except Exception as e:
+        logger.error(f"Error during batch reranking: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Reranking failed: {e!s}",
+        ) from e
+
+
+def _require_session(session_id: str, http_request: Request) -> RerankSession:
+    """Return a live session of the caller's tenant, or raise 404."""
+    if session_store is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Session store not initialized",
+        )
+    tenant = _resolve_tenant(http_request)
+    try:
+        return session_store.get(session_id, namespace=tenant)
+    except UnknownSessionError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=str(e.args[0])
+        ) from e
+
+
+def _session_response(
+    session: RerankSession,
+    top_k: int | None,
+    return_documents: bool,
+    scored: int = 0,
+    processing_time: float = 0.0,
+) -> SessionResponse:
+    """Build the response with a session's current top_k."""
+    with session.lock:
+        results = session.results(top_k)
+        total = len(session)
+    return SessionResponse(
+        session_id=session.session_id,
+        query=session.query,
+        results=[
+            ScoreItem(
+                index=index,
+                score=score,
+                document=document if return_documents else "",
+            )
+            for index, score, document in results
+        ],
+        total_documents=total,
+        scored_documents=scored,
+        returned_results=len(results),
+        processing_time_ms=processing_time,
+        expires_in_seconds=session_store.ttl if session_store else 0.0,
+    )
+
+
+async def _append_to_session(
+    session: RerankSession, documents: list[str], http_request: Request
+) -> float:
+    """Score only the new documents and merge them into the session's ranking.
+
+    Appends to one session are applied in order. Degradation does not apply:
+    a shorter max_length or another model would make the new scores
+    incomparable with the ones already ranked.
+
+    Returns:
+        Processing time in milliseconds
+    """
+    manager, scheduler = _require_service()
+    tenant = _resolve_tenant(http_request)
+    priority = resolve_priority(
+        http_request.headers, len(documents), interactive_max_pairs
+    )
+
+    def score() -> float:
+        start_time = time.time()
+        with session.lock, manager.lease() as (service, generation):
+            # The generation of the leased service, not of a model that a
+            # concurrent reload has just switched to
+            session_store.check_append(  # type: ignore
+                session, len(documents), generation
+            )
+            scores = service.score_pairs(
+                [(session.query, doc) for doc in documents], session.normalize
+            )
+            session.merge(documents, scores)
+        metrics.inc("session_documents_total", len(documents))
+        return (time.time() - start_time) * 1000
+
+    try:
+        return await scheduler.submit(
+            score, tenant=tenant, priority=priority, cost=len(documents)
+        )
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=str(e)
+        ) from e
+    except SessionFullError as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e)
+        ) from e
+    except StaleSessionError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e)) from e
+    except Exception as e:
+        logger.error(f"Error during session reranking: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Reranking failed: {e!s}",
+        ) from e
+
+
+@app.post("/sessions", response_model=SessionResponse)
+async def open_session(request: SessionOpenRequest, http_request: Request):
+    """Open an incremental reranking session, optionally with a first batch."""
+    manager, _ = _require_service()
+    documents = request.documents
+    if request.document_ids is not None:
+        documents = _stored_documents(request.document_ids, http_request)
+    tenant = _resolve_tenant(http_request)
+    session = session_store.open(  # type: ignore
+        request.query,
+        normalize=request.normalize,
+        namespace=tenant,
+        generation=manager.generation,
+    )
+    processing_time = 0.0
+    if documents:
+        try:
+            processing_time = await _append_to_session(session, documents, http_request)
+        except HTTPException:
+            session_store.close(session.session_id, namespace=tenant)  # type: ignore
+            raise
+    return _session_response(
+        session,
+        request.top_k,
+        request.return_documents,
+        len(documents),
+        processing_time,
+    )
+
+
+@app.post("/sessions/{session_id}/documents", response_model=SessionResponse)
+async def append_session_documents(
+    session_id: str, request: SessionAppendRequest, http_request: Request
+):
+    """Score a batch of new documents and return the session's top_k."""
+    session = _require_session(session_id, http_request)
+    documents = request.documents
+    if request.document_ids is not None:
+        documents = _stored_documents(request.document_ids, http_request)
+    processing_time = await _append_to_session(session, documents, http_request)
+    return _session_response(
+        session,
+        request.top_k,
+        request.return_documents,
+        len(documents),
+        processing_time,
+    )
+
+
+@app.get("/sessions/{session_id}", response_model=SessionResponse)
+async def get_session(
+    session_id: str,
+    http_request: Request,
+    top_k: Annotated[int | None, Query(ge=1)] = None,
+    return_documents: bool = True,
+):
+    """Return a session's current ranking without scoring anything."""
+    session = _require_session(session_id, http_request)
+    return _session_response(session, top_k, return_documents)
+
+
+@app.delete("/sessions/{session_id}")
+async def close_session(session_id: str, http_request: Request):
+    """Drop a session before its TTL runs out."""
+    session = _require_session(session_id, http_request)
+    session_store.close(session.session_id, namespace=session.namespace)  # type: ignore
+    return {"session_id": session_id, "closed": True}
+
+
+def _check_admin_token(http_request: Request) -> None:
+    """Reject requests without the admin token."""
+    if not admin_token:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin endpoints are disabled (set BGE_ADMIN_TOKEN)",
+        )
+    token = http_request.headers.get("x-admin-token", "")
+    if not secrets.compare_digest(token, admin_token):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid admin token"
+        )
+
+
+def _require_admin(http_request: Request) -> ModelManager:
+    """Check the admin token and return the model manager."""
+    _check_admin_token(http_request)
+    if not model_manager:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Reranker service not initialized",
+        )
+    return model_manager
+
+
+def _require_document_store() -> DocumentStore:
+    """Return the document store, or raise 503 if unavailable."""
+    if document_store is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Document store not initialized",
+        )
+    return document_store
+
+
+@app.get("/documents", response_model=DocumentStoreResponse)
+async def document_store_status():
+    """Show the size of the document store."""
+    return DocumentStoreResponse(**_require_document_store().stats())
+
+
+@app.post("/documents", response_model=DocumentStoreResponse)
+async def upload_documents(request: DocumentUploadRequest, http_request: Request):
+    """Store documents so rerank requests can reference them by ID."""
+    store = _require_document_store()
+    tenant = _resolve_tenant(http_request)
+    stored = await asyncio.to_thread(
+        store.put_many,
+        [(document.id, document.text) for document in request.documents],
+        tenant,
+    )
+    return DocumentStoreResponse(stored=stored, **store.stats())
+
+
+@app.delete("/documents/{document_id}", response_model=DocumentStoreResponse)
+async def delete_document(document_id: str, http_request: Request):
+    """Remove an uploaded document."""
+    store = _require_document_store()
+    tenant = _resolve_tenant(http_request)
+    deleted = store.delete([document_id], namespace=tenant)
+    if not deleted:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Unknown document ID: {document_id}",
+        )
+    return DocumentStoreResponse(deleted=deleted, **store.stats())
+
+
+@app.post("/admin/documents/corpus", response_model=DocumentStoreResponse)
+async def load_corpus(request: CorpusLoadRequest, http_request: Request):
+    """Memory-map a JSON lines corpus file from the server's filesystem."""
+    _check_admin_token(http_request)
+    store = _require_document_store()
+    try:
+        stored = await asyncio.to_thread(
+            store.load_corpus, request.path, request.id_field, request.text_field
+        )
+    except (OSError, ValueError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Loading corpus failed: {e!s}",
+        ) from e
+    return DocumentStoreResponse(stored=stored, **store.stats())
+
+
+@app.get("/admin/models", response_model=ModelStatusResponse)
+async def model_status(http_request: Request):
+    """Show the active and shadow models."""
+    manager = _require_admin(http_request)
+    return ModelStatusResponse(**manager.status())
+
+
+@app.post("/admin/reload", response_model=ModelStatusResponse)
+async def reload_model(request: ReloadRequest, http_request: Request):
+    """Load a model in the background and switch traffic to it."""
+    manager = _require_admin(http_request)
+    overrides = {} if request.use_fp16 is None else {"use_fp16": request.use_fp16}
+    try:
+        load_time = await asyncio.to_thread(
+            manager.reload, request.model_name, **overrides
+        )
+    except ReloadInProgressError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e)) from e
+    except Exception as e:
+        logger.error(f"Model reload failed: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Model reload failed: {e!s}",
+        ) from e
+    return ModelStatusResponse(**manager.status(), load_time_ms=load_time)
+
+
+@app.put("/admin/shadow", response_model=ModelStatusResponse)
+async def start_shadow(request: ShadowRequest, http_request: Request):
+    """Score a fraction of requests on a candidate model as well."""
+    manager = _require_admin(http_request)
+    overrides = {} if request.use_fp16 is None else {"use_fp16": request.use_fp16}
+    try:
+        load_time = await asyncio.to_thread(
+            manager.start_shadow, request.model_name, request.fraction, **overrides
+        )
+    except Exception as e:
+        logger.error(f"Loading shadow model failed: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Loading shadow model failed: {e!s}",
+        ) from e
+    return ModelStatusResponse(**manager.status(), load_time_ms=load_time)
+
+
+@app.delete("/admin/shadow", response_model=ModelStatusResponse)
+async def stop_shadow(http_request: Request):
+    """Stop shadow scoring and free the shadow model."""
+    manager = _require_admin(http_request)
+    await asyncio.to_thread(manager.stop_shadow)
+    return ModelStatusResponse(**manager.status())
+
+
+@app.get("/admin/profile")
+async def capture_profile(
+    http_request: Request,
+    seconds: Annotated[float, Query(gt=0, le=300)] = 10.0,
+    profile_format: Annotated[str, Query(alias="format")] = "collapsed",
+    interval_ms: Annotated[float, Query(ge=1, le=1000)] = 5.0,
+    idle: bool = False,
+):
+    """Sample the worker's Python stacks and return a profile file.
+
+    format=collapsed returns collapsed stacks for flamegraph tools;
+    format=pstats returns a file for pstats or snakeviz.
+    """
+    _check_admin_token(http_request)
+    if profile_format not in PROFILE_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"format must be one of {', '.join(PROFILE_FORMATS)}",
+        )
+    try:
+        profile = await asyncio.to_thread(
+            profiler.run, seconds, interval_ms / 1000, include_idle=idle
+        )
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e)) from e
+
+    extension, media_type = (
+        ("folded", "text/plain")
+        if profile_format == "collapsed"
+        else ("pstats", "application/octet-stream")
+    )
+    return Response(
+        profile.render(profile_format),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="profile-{os.getpid()}'
+            f'-{int(time.time())}.{extension}"'
+        },
+    )
+
+
+def _memory_report() -> dict:
+    """Collect process, allocator and cache memory and publish it as gauges."""
+    report = memory_tracker.report()
+    report["service"] = model_manager.active.memory_usage() if model_manager else {}
+    if document_store is not None:
+        report["service"].update(
+            {
+                f"docstore_{name}": value
+                for name, value in document_store.stats().items()
+            }
+        )
+
+    metrics.set_gauge("process_rss_bytes", report["process_rss_bytes"])
+    if report["memory_limit_bytes"]:
+        metrics.set_gauge("memory_limit_bytes", report["memory_limit_bytes"])
+    for name, value in (report["torch"] or {}).items():
+        metrics.set_gauge(f"torch_{name}", value)
+    for name, value in report["service"].items():
+        metrics.set_gauge(name, value)
+    for name, value in report["requests"].items():
+        metrics.set_gauge(f"requests_{name}", value)
+    return report
+
+
+@app.get("/debug/memory")
+async def debug_memory(http_request: Request, top: int = 0):
+    """Report how memory splits between weights, caches and requests.
+
+    With tracemalloc enabled, top > 0 adds the largest allocation sites.
+    """
+    _check_admin_token(http_request)
+    report = await asyncio.to_thread(_memory_report)
+    if top > 0:
+        report["tracemalloc"] = await asyncio.to_thread(tracemalloc_top, top)
+    return report
+
+
+@app.get("/debug/memory/snapshot")
+async def debug_memory_snapshot(http_request: Request):
+    """Download a tracemalloc snapshot for offline analysis."""
+    _check_admin_token(http_request)
+    snapshot = await asyncio.to_thread(tracemalloc_snapshot)
+    if snapshot is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="tracemalloc is not enabled (set BGE_TRACEMALLOC_FRAMES)",
+        )
+    return Response(
+        snapshot,
+        media_type="application/octet-stream",
+        headers={
+            "Content-Disposition": f'attachment; filename="memory-{os.getpid()}'
+            f'-{int(time.time())}.tracemalloc"'
+        },
+    )
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Expose service metrics in the Prometheus text format."""
+    # Reads /proc and cgroup files, so keep it off the event loop
+    await asyncio.to_thread(_memory_report)
+    return PlainTextResponse(metrics.render_prometheus())
+
+
 @app.get("/")
 async def root():
     """Root endpoint with basic information."""
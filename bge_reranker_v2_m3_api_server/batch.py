@@ -0,0 +1,503 @@
+"""Offline bulk reranking over JSONL or Parquet files.
+
+Rows are streamed from the input file, packed into model calls that span
+several rows, scored directly through RerankerService (no HTTP round-trip)
+and appended to a JSONL output file. A small checkpoint file is rewritten
+after every chunk so an interrupted run can pick up where it stopped.
+"""
+
+import argparse
+import json
+import logging
+import time
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any
+
+from .postprocess import rank_scores
+from .service import RerankerService
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+# A chunk is a list of (row_number, row_id, query, documents) tuples
+Row = tuple[int, Any, str, list[str]]
+
+# Per-process service used by pool workers, created in _init_worker
+_worker_service: RerankerService | None = None
+
+
+def detect_format(path: str | Path) -> str:
+    """Guess the input format from the file extension."""
+    suffix = Path(path).suffix.lower()
+    if suffix in (".parquet", ".pq"):
+        return "parquet"
+    return "jsonl"
+
+
+def _make_row(
+    row_number: int,
+    record: dict[str, Any],
+    query_field: str,
+    documents_field: str,
+    id_field: str,
+) -> Row:
+    """Validate a decoded record and turn it into a Row tuple."""
+    query = record.get(query_field)
+    documents = record.get(documents_field)
+    if not isinstance(query, str) or not query:
+        raise ValueError(f"Row {row_number}: missing or empty '{query_field}' field")
+    if not isinstance(documents, list) or not documents:
+        raise ValueError(
+            f"Row {row_number}: '{documents_field}' must be a non-empty list"
+        )
+    return row_number, record.get(id_field), query, [str(doc) for doc in documents]
+
+
+def iter_rows(
+    path: str | Path,
+    input_format: str = "auto",
+    query_field: str = "query",
+    documents_field: str = "documents",
+    id_field: str = "id",
+    skip: int = 0,
+) -> Iterator[Row]:
+    """Lazily yield rows from a JSONL or Parquet file.
+
+    Only one line (JSONL) or one record batch (Parquet) is held in memory at a
+    time, so inputs far larger than RAM can be processed.
+
+    Args:
+        path: Input file path
+        input_format: "jsonl", "parquet" or "auto" to use the file extension
+        query_field: Name of the query field
+        documents_field: Name of the documents list field
+        id_field: Name of an optional identifier field copied to the output
+        skip: Number of leading rows to skip (used when resuming)
+
+    Yields:
+        (row_number, row_id, query, documents) tuples
+    """
+    if input_format == "auto":
+        input_format = detect_format(path)
+
+    if input_format == "jsonl":
+        yield from _iter_jsonl(path, query_field, documents_field, id_field, skip)
+    elif input_format == "parquet":
+        yield from _iter_parquet(path, query_field, documents_field, id_field, skip)
+    else:
+        raise ValueError(f"Unsupported input format: {input_format}")
+
+
+def _iter_jsonl(
+    path: str | Path,
+    query_field: str,
+    documents_field: str,
+    id_field: str,
+    skip: int,
+) -> Iterator[Row]:
+    row_number = 0
+    with Path(path).open(encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            if row_number >= skip:
+                record = json.loads(line)
+                yield _make_row(
+                    row_number, record, query_field, documents_field, id_field
+                )
+            row_number += 1
+
+
+def _iter_parquet(
+    path: str | Path,
+    query_field: str,
+    documents_field: str,
+    id_field: str,
+    skip: int,
+) -> Iterator[Row]:
+    if pq is None:
+        raise ImportError(
+            "pyarrow is not installed. Please install it with: pip install pyarrow"
+        )
+
+    parquet_file = pq.ParquetFile(path)
+    columns = [query_field, documents_field]
+    if id_field in parquet_file.schema_arrow.names:
+        columns.append(id_field)
+
+    # Skip whole row groups that were already processed without decoding them
+    row_number = 0
+    row_groups: list[int] = []
+    for i in range(parquet_file.num_row_groups):
+        num_rows = parquet_file.metadata.row_group(i).num_rows
+        if row_number + num_rows <= skip:
+            row_number += num_rows
+        else:
+            row_groups.append(i)
+
+    if not row_groups:
+        return
+
+    for record_batch in parquet_file.iter_batches(
+        batch_size=1024, row_groups=row_groups, columns=columns
+    ):
+        for record in record_batch.to_pylist():
+            if row_number >= skip:
+                yield _make_row(
+                    row_number, record, query_field, documents_field, id_field
+                )
+            row_number += 1
+
+
+def iter_chunks(rows: Iterable[Row], batch_pairs: int) -> Iterator[list[Row]]:
+    """Group consecutive rows so each chunk holds about batch_pairs pairs.
+
+    A row with more documents than batch_pairs forms a chunk on its own.
+    """
+    chunk: list[Row] = []
+    pairs = 0
+    for row in rows:
+        chunk.append(row)
+        pairs += len(row[3])
+        if pairs >= batch_pairs:
+            yield chunk
+            chunk = []
+            pairs = 0
+    if chunk:
+        yield chunk
+
+
+def score_chunk(
+    service: RerankerService,
+    chunk: list[Row],
+    normalize: bool = True,
+    top_k: int | None = None,
+) -> list[dict[str, Any]]:
+    """Score all rows of a chunk with a single model call.
+
+    Returns:
+        One output record per row, with results sorted by score (descending)
+    """
+    pairs = [(query, doc) for _, _, query, documents in chunk for doc in documents]
+    scores = service.score_pairs(pairs, normalize=normalize)
+
+    records: list[dict[str, Any]] = []
+    offset = 0
+    for row_number, row_id, _, documents in chunk:
+        row_scores = scores[offset : offset + len(documents)]
+        offset += len(documents)
+
+        order = rank_scores(row_scores, top_k)
+
+        record: dict[str, Any] = {"row": row_number}
+        if row_id is not None:
+            record["id"] = row_id
+        record["results"] = [
+            {"index": index, "score": score}
+            for index, score in zip(
+                order.tolist(), row_scores[order].tolist(), strict=True
+            )
+        ]
+        records.append(record)
+
+    return records
+
+
+def _init_worker(model_name: str, use_fp16: bool) -> None:
+    """Load one model per worker process."""
+    global _worker_service
+    _worker_service = RerankerService(model_name=model_name, use_fp16=use_fp16)
+    _worker_service.load_model()
+
+
+def _score_chunk_in_worker(
+    chunk: list[Row], normalize: bool, top_k: int | None
+) -> list[dict[str, Any]]:
+    if _worker_service is None:
+        raise RuntimeError("Worker service is not initialized")
+    return score_chunk(_worker_service, chunk, normalize, top_k)
+
+
+def load_checkpoint(path: str | Path) -> dict[str, Any] | None:
+    """Load a checkpoint file, returning None if it does not exist."""
+    try:
+        with Path(path).open(encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_checkpoint(path: str | Path, state: dict[str, Any]) -> None:
+    """Atomically write a checkpoint file."""
+    tmp_path = Path(f"{path}.tmp")
+    with tmp_path.open("w", encoding="utf-8") as f:
+        json.dump(state, f)
+    tmp_path.replace(path)
+
+
+def run_batch(
+    input_path: str | Path,
+    output_path: str | Path,
+    *,
+    service: RerankerService | None = None,
+    model_name: str = "BAAI/bge-reranker-v2-m3",
+    use_fp16: bool = True,
+    workers: int = 1,
+    batch_pairs: int = 256,
+    normalize: bool = True,
+    top_k: int | None = None,
+    input_format: str = "auto",
+    query_field: str = "query",
+    documents_field: str = "documents",
+    id_field: str = "id",
+    checkpoint_path: str | Path | None = None,
+    resume: bool = True,
+) -> int:
+    """Rerank every row of an input file and write results as JSONL.
+
+    Args:
+        input_path: JSONL or Parquet input file
+        output_path: JSONL output file, appended to incrementally
+        service: Preloaded service to use in-process (only with workers=1)
+        model_name: Model to load when no service is given
+        use_fp16: Whether to use FP16 when loading the model
+        workers: Number of worker processes, each with its own model copy
+        batch_pairs: Target number of query-document pairs per model call
+        normalize: Whether to normalize scores using sigmoid
+        top_k: Number of top results to keep per row (None for all)
+        input_format: "jsonl", "parquet" or "auto"
+        query_field: Name of the query field
+        documents_field: Name of the documents list field
+        id_field: Name of an optional identifier field
+        checkpoint_path: Checkpoint file (default: <output_path>.ckpt)
+        resume: Continue from an existing checkpoint instead of starting over
+
+    Returns:
+        Number of rows processed in this run
+    """
+    if workers < 1:
+        raise ValueError("workers must be at least 1")
+    if batch_pairs < 1:
+        raise ValueError("batch_pairs must be at least 1")
+    if top_k is not None and top_k < 1:
+        raise ValueError("top_k must be at least 1")
+
+    input_path = Path(input_path)
+    output_path = Path(output_path)
+    checkpoint_path = Path(checkpoint_path or f"{output_path}.ckpt")
+
+    rows_done = 0
+    output_bytes = 0
+    checkpoint = load_checkpoint(checkpoint_path) if resume else None
+    if checkpoint is not None:
+        if checkpoint.get("input") != str(input_path.resolve()):
+            raise ValueError(
+                f"Checkpoint {checkpoint_path} belongs to a different input: "
+                f"{checkpoint.get('input')}"
+            )
+        if not output_path.exists():
+            raise ValueError(
+                f"Checkpoint {checkpoint_path} exists but output {output_path} is "
+                "missing; use --restart to start over"
+            )
+        rows_done = checkpoint["rows_done"]
+        output_bytes = checkpoint["output_bytes"]
+        logger.info(f"Resuming from checkpoint at row {rows_done}")
+
+    rows = iter_rows(
+        input_path,
+        input_format=input_format,
+        query_field=query_field,
+        documents_field=documents_field,
+        id_field=id_field,
+        skip=rows_done,
+    )
+    chunks = iter_chunks(rows, batch_pairs)
+
+    # Drop anything written after the last checkpoint (e.g. a partial line)
+    mode = "r+b" if checkpoint is not None else "wb"
+    processed = 0
+    start_time = time.time()
+
+    with output_path.open(mode) as out:
+        out.truncate(output_bytes)
+        out.seek(output_bytes)
+
+        def write_records(records: list[dict[str, Any]]) -> None:
+            nonlocal rows_done, output_bytes, processed
+            for record in records:
+                out.write(json.dumps(record, ensure_ascii=False).encode("utf-8"))
+                out.write(b"\n")
+            out.flush()
+            rows_done += len(records)
+            processed += len(records)
+            output_bytes = out.tell()
+            save_checkpoint(
+                checkpoint_path,
+                {
+                    "input": str(input_path.resolve()),
+                    "rows_done": rows_done,
+                    "output_bytes": output_bytes,
+                },
+            )
+            elapsed = time.time() - start_time
+            logger.info(
+                f"Processed {rows_done} rows ({processed / max(elapsed, 1e-9):.1f} rows/s)"
+            )
+
+        if workers == 1:
+            if service is None:
+                service = RerankerService(model_name=model_name, use_fp16=use_fp16)
+                service.load_model()
+            for chunk in chunks:
+                write_records(score_chunk(service, chunk, normalize, top_k))
+        else:
+            if service is not None:
+                raise ValueError("A preloaded service can only be used with workers=1")
+            # Keep a bounded window of chunks in flight so the input is
+            # consumed lazily, and collect results in submission order so the
+            # output and checkpoint stay consistent.
+            max_in_flight = workers * 2
+            pending: deque[Future[list[dict[str, Any]]]] = deque()
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(model_name, use_fp16),
+            ) as executor:
+                for chunk in chunks:
+                    pending.append(
+                        executor.submit(_score_chunk_in_worker, chunk, normalize, top_k)
+                    )
+                    if len(pending) >= max_in_flight:
+                        write_records(pending.popleft().result())
+                while pending:
+                    write_records(pending.popleft().result())
+
+    return processed
+
+
+def main() -> None:
+    """Command line entry point for offline batch reranking."""
+    parser = argparse.ArgumentParser(
+        description="Offline bulk reranking of JSONL/Parquet files"
+    )
+
+    parser.add_argument("input", help="Input file (.jsonl or .parquet)")
+    parser.add_argument("output", help="Output JSONL file")
+
+    parser.add_argument(
+        "--format",
+        choices=["auto", "jsonl", "parquet"],
+        default="auto",
+        help="Input format (default: auto, from file extension)",
+    )
+
+    parser.add_argument(
+        "--model-name",
+        default="BAAI/bge-reranker-v2-m3",
+        help="BGE model name or path (default: BAAI/bge-reranker-v2-m3)",
+    )
+
+    parser.add_argument(
+        "--use-fp16",
+        action="store_true",
+        default=True,
+        help="Use FP16 for faster inference (default: True)",
+    )
+
+    parser.add_argument(
+        "--no-fp16", action="store_false", dest="use_fp16", help="Disable FP16"
+    )
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of worker processes, each loads its own model (default: 1)",
+    )
+
+    parser.add_argument(
+        "--batch-pairs",
+        type=int,
+        default=256,
+        help="Query-document pairs per model call, across rows (default: 256)",
+    )
+
+    parser.add_argument(
+        "--top-k",
+        type=int,
+        default=None,
+        help="Number of top results to keep per row (default: all)",
+    )
+
+    parser.add_argument(
+        "--no-normalize",
+        action="store_false",
+        dest="normalize",
+        help="Return raw scores instead of sigmoid-normalized scores",
+    )
+
+    parser.add_argument("--query-field", default="query", help="Query field name")
+    parser.add_argument(
+        "--documents-field", default="documents", help="Documents field name"
+    )
+    parser.add_argument("--id-field", default="id", help="Row identifier field name")
+
+    parser.add_argument(
+        "--checkpoint",
+        default=None,
+        help="Checkpoint file (default: <output>.ckpt)",
+    )
+
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="Ignore any existing checkpoint and start from the first row",
+    )
+
+    parser.add_argument(
+        "--log-level",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        default="INFO",
+        help="Log level (default: INFO)",
+    )
+
+    args = parser.parse_args()
+    if args.top_k is not None and args.top_k < 1:
+        parser.error("--top-k must be at least 1")
+
+    logging.basicConfig(
+        level=getattr(logging, args.log_level),
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    processed = run_batch(
+        args.input,
+        args.output,
+        model_name=args.model_name,
+        use_fp16=args.use_fp16,
+        workers=args.workers,
+        batch_pairs=args.batch_pairs,
+        normalize=args.normalize,
+        top_k=args.top_k,
+        input_format=args.format,
+        query_field=args.query_field,
+        documents_field=args.documents_field,
+        id_field=args.id_field,
+        checkpoint_path=args.checkpoint,
+        resume=not args.restart,
+    )
+    logger.info(f"Done: {processed} rows written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Adaptive batch sizing for cross-encoder forward passes.
+
+A single static batch size is either too large for long pairs (slow batches,
+out-of-memory under a container limit) or too small for short ones. The
+controller instead keeps a budget of padded tokens per forward pass:
+
+* the budget follows a target forward latency, using a smoothed estimate of
+  the time per padded token
+* it shrinks while the process RSS is above a fraction of the memory limit
+* it halves after an out-of-memory error, and the failed batch is split and
+  retried instead of failing the request
+
+Pairs are planned longest first, so pairs of similar length share a batch
+and little padding is wasted.
+"""
+
+import logging
+import threading
+
+from .memory import memory_limit_bytes, process_rss_bytes
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_tokens(query: str, document: str, max_length: int = 512) -> int:
+    """Cheaply estimate the model input length of a pair.
+
+    The controller learns time per estimated token, so a constant bias in
+    the estimate does not matter; only its cap at max_length does.
+    """
+    return min(max_length, (len(query) + len(document)) // 3 + 3)
+
+
+def is_out_of_memory(error: BaseException) -> bool:
+    """Check if an exception is an out-of-memory error (CPU or GPU)."""
+    if isinstance(error, MemoryError):
+        return True
+    return "out of memory" in str(error).lower()
+
+
+class AdaptiveBatchController:
+    """Tune the tokens and pairs per forward pass from observed behaviour."""
+
+    def __init__(
+        self,
+        target_latency_ms: float = 200.0,
+        max_batch_size: int = 256,
+        initial_tokens: int = 8192,
+        min_tokens: int = 512,
+        max_tokens: int = 262144,
+        memory_high_watermark: float = 0.85,
+        memory_limit: int | None = None,
+        smoothing: float = 0.2,
+    ):
+        """Initialize the controller.
+
+        Args:
+            target_latency_ms: Forward pass latency to aim for
+            max_batch_size: Upper bound on pairs per forward pass
+            initial_tokens: Padded-token budget before any measurement
+            min_tokens: Lower bound of the token budget
+            max_tokens: Upper bound of the token budget
+            memory_high_watermark: Fraction of the memory limit above which
+                the budget shrinks
+            memory_limit: Memory limit in bytes (default: container limit)
+            smoothing: Weight of the newest measurement in the latency average
+        """
+        self.target_latency_ms = target_latency_ms
+        self.max_batch_size = max_batch_size
+        self.min_tokens = min_tokens
+        self.max_tokens = max_tokens
+        self.memory_high_watermark = memory_high_watermark
+        self.memory_limit = (
+            memory_limit if memory_limit is not None else memory_limit_bytes()
+        )
+        self.smoothing = smoothing
+        self.token_budget = float(initial_tokens)
+        self.ms_per_token: float | None = None
+        self._lock = threading.Lock()
+
+    def plan(self, token_counts: list[int]) -> list[list[int]]:
+        """Split pairs into forward passes within the current budget.
+
+        Args:
+            token_counts: Estimated tokens of each pair
+
+        Returns:
+            Lists of pair indices, one per forward pass
+        """
+        budget = self.token_budget
+        order = sorted(range(len(token_counts)), key=lambda i: -token_counts[i])
+        chunks: list[list[int]] = []
+        current: list[int] = []
+        for i in order:
+            # Longest first: every pair of a chunk pads to its first pair
+            padded = (len(current) + 1) * token_counts[current[0] if current else i]
+            if current and (padded > budget or len(current) >= self.max_batch_size):
+                chunks.append(current)
+                current = []
+            current.append(i)
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def record(self, padded_tokens: int, seconds: float) -> None:
+        """Update the budget after a successful forward pass."""
+        if padded_tokens <= 0:
+            return
+        with self._lock:
+            sample = seconds * 1000 / padded_tokens
+            if self.ms_per_token is None:
+                self.ms_per_token = sample
+            else:
+                self.ms_per_token += self.smoothing * (sample - self.ms_per_token)
+
+            target = self.target_latency_ms / max(self.ms_per_token, 1e-9)
+            # Grow gradually, shrink at once
+            budget = min(target, self.token_budget * 1.25)
+
+            if self.memory_limit:
+                rss = process_rss_bytes()
+                metrics.set_gauge("process_rss_bytes", rss)
+                if rss > self.memory_high_watermark * self.memory_limit:
+                    budget = min(budget, self.token_budget * 0.75)
+
+            self.token_budget = min(max(budget, self.min_tokens), self.max_tokens)
+            metrics.set_gauge("batch_token_budget", self.token_budget)
+        metrics.observe("forward_latency_seconds", seconds)
+
+    def record_oom(self) -> None:
+        """Halve the budget after an out-of-memory error."""
+        with self._lock:
+            self.token_budget = max(self.min_tokens, self.token_budget / 2)
+            metrics.set_gauge("batch_token_budget", self.token_budget)
+        metrics.inc("oom_backoffs_total")
+        logger.warning(
+            f"Out of memory, reducing batch budget to {self.token_budget:.0f} tokens"
+        )
@@ -0,0 +1,845 @@
+"""Benchmark suite for tuning and regression-checking the reranker.
+
+Run ``bge-reranker-bench --help`` to list the available benchmarks.
+"""
+
+import argparse
+import json
+import logging
+import random
+import statistics
+import subprocess
+import sys
+import time
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any
+
+from .topology import (
+    ThreadSettings,
+    apply_thread_settings,
+    available_cpus,
+    format_cpu_list,
+    resolve_thread_settings,
+)
+
+logger = logging.getLogger(__name__)
+
+_WORDS = [
+    "model",
+    "data",
+    "search",
+    "query",
+    "rerank",
+    "document",
+    "vector",
+    "index",
+    "retrieval",
+    "score",
+    "language",
+    "passage",
+    "answer",
+    "context",
+    "neural",
+    "network",
+    "training",
+    "inference",
+    "token",
+    "batch",
+    "latency",
+    "throughput",
+    "memory",
+    "cache",
+    "cluster",
+    "server",
+    "request",
+    "response",
+]
+
+
+def synthetic_pairs(
+    count: int, query_words: int = 8, doc_words: int = 64, seed: int = 0
+) -> list[tuple[str, str]]:
+    """Build deterministic (query, document) pairs of the given sizes."""
+    rng = random.Random(seed)
+    queries = [
+        " ".join(rng.choices(_WORDS, k=query_words)) for _ in range(max(1, count // 10))
+    ]
+    return [
+        (queries[i % len(queries)], " ".join(rng.choices(_WORDS, k=doc_words)))
+        for i in range(count)
+    ]
+
+
+def _thread_sweep_worker(
+    settings: ThreadSettings,
+    model_name: str,
+    use_fp16: bool,
+    pairs: list[tuple[str, str]],
+    batch_pairs: int,
+    repeats: int,
+    barrier: Any,
+    results: Any,
+) -> None:
+    """Load a model under the given settings and time scoring of pairs."""
+    from .service import RerankerService
+
+    apply_thread_settings(settings)
+    service = RerankerService(
+        model_name=model_name, use_fp16=use_fp16, dedup_mode="off"
+    )
+    service.load_model()
+    service.compute_pair_scores(pairs[:batch_pairs])  # warm-up
+
+    # Start measuring in all workers at the same time
+    barrier.wait()
+    start_time = time.perf_counter()
+    for _ in range(repeats):
+        for i in range(0, len(pairs), batch_pairs):
+            service.compute_pair_scores(pairs[i : i + batch_pairs])
+    results.put((time.perf_counter() - start_time, len(pairs) * repeats))
+
+
+def run_thread_sweep(
+    model_name: str,
+    use_fp16: bool,
+    workers_list: list[int],
+    intra_list: list[str],
+    inter_list: list[str],
+    num_pairs: int = 256,
+    batch_pairs: int = 32,
+    repeats: int = 3,
+    allow_oversubscribe: bool = False,
+) -> list[dict[str, Any]]:
+    """Measure aggregate pairs/second for each worker/thread configuration.
+
+    Every configuration runs in fresh processes (torch thread pools can only
+    be sized once per process). All workers of a configuration run at the
+    same time, each pinned to its share of the cores, like uvicorn workers
+    started with --cpu-affinity auto.
+    """
+    ctx = get_context("spawn")
+    cores = len(available_cpus())
+    pairs = synthetic_pairs(num_pairs)
+    report: list[dict[str, Any]] = []
+
+    for workers in workers_list:
+        for intra in intra_list:
+            for inter in inter_list:
+                settings = [
+                    resolve_thread_settings(i, workers, intra, inter, "auto")
+                    for i in range(workers)
+                ]
+                threads = settings[0].intra_op_threads or 1
+                if workers * threads > cores and not allow_oversubscribe:
+                    logger.info(
+                        f"Skipping workers={workers} intra={threads}: "
+                        f"needs more than {cores} cores"
+                    )
+                    continue
+
+                barrier = ctx.Barrier(workers)
+                results = ctx.Queue()
+                processes = [
+                    ctx.Process(
+                        target=_thread_sweep_worker,
+                        args=(
+                            s,
+                            model_name,
+                            use_fp16,
+                            pairs,
+                            batch_pairs,
+                            repeats,
+                            barrier,
+                            results,
+                        ),
+                    )
+                    for s in settings
+                ]
+                for process in processes:
+                    process.start()
+                measurements = [results.get() for _ in processes]
+                for process in processes:
+                    process.join()
+
+                elapsed = max(seconds for seconds, _ in measurements)
+                total_pairs = sum(count for _, count in measurements)
+                entry = {
+                    "workers": workers,
+                    "intra_op_threads": threads,
+                    "inter_op_threads": settings[0].inter_op_threads,
+                    "cpus": [format_cpu_list(s.cpus or []) for s in settings],
+                    "pairs_per_second": total_pairs / elapsed,
+                }
+                logger.info(
+                    f"workers={workers} intra={threads} "
+                    f"inter={entry['inter_op_threads']}: "
+                    f"{entry['pairs_per_second']:.1f} pairs/s"
+                )
+                report.append(entry)
+
+    return report
+
+
+def _print_thread_report(report: list[dict[str, Any]]) -> None:
+    print(f"{'workers':>8} {'intra':>6} {'inter':>6} {'pairs/s':>12}")
+    for entry in report:
+        print(
+            f"{entry['workers']:>8} {entry['intra_op_threads']:>6} "
+            f"{entry['inter_op_threads'] or '-':>6} {entry['pairs_per_second']:>12.1f}"
+        )
+    if report:
+        best = max(report, key=lambda entry: entry["pairs_per_second"])
+        print(
+            f"\nBest: --workers {best['workers']} "
+            f"--intra-op-threads {best['intra_op_threads']} "
+            f"--inter-op-threads {best['inter_op_threads'] or 'auto'} "
+            f"--cpu-affinity auto ({best['pairs_per_second']:.1f} pairs/s)"
+        )
+
+
+def run_compile_benchmark(
+    model_name: str,
+    use_fp16: bool,
+    batch_buckets: tuple[int, ...],
+    seq_buckets: tuple[int, ...],
+    backend: str = "inductor",
+    num_pairs: int = 256,
+    batch_pairs: int = 32,
+    repeats: int = 3,
+) -> list[dict[str, Any]]:
+    """Compare pairs/second of the eager and the compiled forward pass.
+
+    Scores of the compiled run are checked against the eager ones, since
+    padding to shape buckets must not change them.
+    """
+    from .compiled import CompiledForward
+    from .service import RerankerService
+
+    pairs = synthetic_pairs(num_pairs)
+    report: list[dict[str, Any]] = []
+    eager_scores: list[float] = []
+
+    for mode in ("eager", "compiled"):
+        compiled_forward = (
+            CompiledForward(batch_buckets, seq_buckets, backend=backend)
+            if mode == "compiled"
+            else None
+        )
+        service = RerankerService(
+            model_name,
+            use_fp16=use_fp16,
+            dedup_mode="off",
+            compiled_forward=compiled_forward,
+        )
+        load_start = time.perf_counter()
+        service.load_model()
+        load_seconds = time.perf_counter() - load_start
+        if compiled_forward is not None and not compiled_forward.ready:
+            logger.error("Compilation failed, see the warning above")
+            service.unload()
+            break
+
+        # One untimed pass warms allocator and kernel caches
+        scores = service.compute_pair_scores(pairs[:batch_pairs])
+        start_time = time.perf_counter()
+        for _ in range(repeats):
+            scores = []
+            for i in range(0, len(pairs), batch_pairs):
+                scores.extend(service.compute_pair_scores(pairs[i : i + batch_pairs]))
+        elapsed = time.perf_counter() - start_time
+        service.unload()
+
+        entry: dict[str, Any] = {
+            "mode": mode,
+            "load_seconds": load_seconds,
+            "pairs_per_second": len(pairs) * repeats / elapsed,
+        }
+        if mode == "eager":
+            eager_scores = scores
+        else:
+            entry["max_score_delta"] = max(
+                abs(a - b) for a, b in zip(eager_scores, scores, strict=True)
+            )
+        logger.info(f"{mode}: {entry['pairs_per_second']:.1f} pairs/s")
+        report.append(entry)
+
+    return report
+
+
+def _print_compile_report(report: list[dict[str, Any]]) -> None:
+    print(f"{'mode':>10} {'load s':>8} {'pairs/s':>12} {'max delta':>10}")
+    for entry in report:
+        delta = entry.get("max_score_delta")
+        print(
+            f"{entry['mode']:>10} {entry['load_seconds']:>8.1f} "
+            f"{entry['pairs_per_second']:>12.1f} "
+            f"{'-' if delta is None else f'{delta:.2e}':>10}"
+        )
+    if len(report) == 2:
+        speedup = report[1]["pairs_per_second"] / report[0]["pairs_per_second"]
+        print(f"\nCompiled speedup: {speedup:.2f}x")
+
+
+DEFAULT_IMPORT_MODULES = (
+    "bge_reranker_v2_m3_api_server",
+    "bge_reranker_v2_m3_api_server.cli",
+    "bge_reranker_v2_m3_api_server.client",
+    "bge_reranker_v2_m3_api_server.service",
+    "bge_reranker_v2_m3_api_server.api",
+)
+
+# Dependencies that should only be imported once a model is loaded
+HEAVY_MODULES = ("torch", "transformers", "FlagEmbedding")
+
+_IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{"seconds": elapsed, "heavy": heavy}}))
+"""
+
+
+def run_import_benchmark(
+    modules: tuple[str, ...] = DEFAULT_IMPORT_MODULES, repeats: int = 5
+) -> list[dict[str, Any]]:
+    """Measure the import time of each module in fresh interpreters.
+
+    Every repeat starts a new Python process, so nothing is already in
+    sys.modules; the median is reported to damp filesystem cache noise.
+    """
+    report: list[dict[str, Any]] = []
+    for module in modules:
+        timings: list[float] = []
+        heavy: list[str] = []
+        error = None
+        for _ in range(repeats):
+            result = subprocess.run(
+                [
+                    sys.executable,
+                    "-c",
+                    _IMPORT_PROBE.format(module=module, heavy=HEAVY_MODULES),
+                ],
+                capture_output=True,
+                text=True,
+                check=False,
+            )
+            if result.returncode != 0:
+                lines = result.stderr.strip().splitlines()
+                error = lines[-1] if lines else f"exit code {result.returncode}"
+                break
+            probe = json.loads(result.stdout)
+            timings.append(probe["seconds"] * 1000)
+            heavy = probe["heavy"]
+
+        entry: dict[str, Any] = {"module": module}
+        if error is not None:
+            entry["error"] = error
+            logger.warning(f"Importing {module} failed: {error}")
+        else:
+            entry.update(
+                median_ms=statistics.median(timings),
+                min_ms=min(timings),
+                heavy_modules=heavy,
+            )
+            logger.info(f"{module}: {entry['median_ms']:.1f} ms")
+        report.append(entry)
+    return report
+
+
+def check_import_budget(
+    report: list[dict[str, Any]], max_ms: float | None = None
+) -> list[str]:
+    """Return the regressions in an import report.
+
+    A module regresses if it fails to import, pulls in one of HEAVY_MODULES,
+    or takes longer than max_ms (median).
+    """
+    failures = []
+    for entry in report:
+        module = entry["module"]
+        if "error" in entry:
+            failures.append(f"{module}: {entry['error']}")
+            continue
+        if entry["heavy_modules"]:
+            failures.append(f"{module} imports {', '.join(entry['heavy_modules'])}")
+        if max_ms is not None and entry["median_ms"] > max_ms:
+            failures.append(
+                f"{module} takes {entry['median_ms']:.1f} ms (budget {max_ms:g} ms)"
+            )
+    return failures
+
+
+def _print_import_report(report: list[dict[str, Any]]) -> None:
+    print(f"{'module':<42} {'median ms':>10} {'min ms':>8}  heavy")
+    for entry in report:
+        if "error" in entry:
+            print(f"{entry['module']:<42} {'error':>10} {'-':>8}  {entry['error']}")
+            continue
+        print(
+            f"{entry['module']:<42} {entry['median_ms']:>10.1f} "
+            f"{entry['min_ms']:>8.1f}  {', '.join(entry['heavy_modules']) or '-'}"
+        )
+
+
+_TRANSPORT_PAYLOADS: dict[str, tuple[str, str, dict[str, Any] | None]] = {
+    "health": ("GET", "/health", None),
+    "rerank": (
+        "POST",
+        "/rerank",
+        {"query": "what is ai?", "documents": ["ai is", "a cat"], "top_k": 1},
+    ),
+}
+
+
+def _transport_client(target: dict[str, Any]) -> Any:
+    import httpx
+
+    transport = (
+        httpx.HTTPTransport(
+            uds=target["uds"], http1=not target["h2c"], http2=target["h2c"]
+        )
+        if target.get("uds")
+        else None
+    )
+    return httpx.Client(
+        base_url=target["url"],
+        http1=not target["h2c"],
+        http2=target["h2c"],
+        transport=transport,
+        timeout=30.0,
+    )
+
+
+def run_transport_benchmark(
+    targets: list[dict[str, Any]],
+    endpoint: str = "health",
+    num_requests: int = 1000,
+    warmup: int = 50,
+) -> list[dict[str, Any]]:
+    """Compare per-request latency of running servers across transports.
+
+    Each target is a dict with "name", "url", "uds" (socket path or None)
+    and "h2c" (HTTP/2 by prior knowledge). Requests are sent one at a time,
+    first over one kept-alive connection, then with a new connection per
+    request, so the report separates request overhead from connection setup.
+    """
+    method, path, payload = _TRANSPORT_PAYLOADS[endpoint]
+    report: list[dict[str, Any]] = []
+
+    for target in targets:
+        modes = ("keep-alive",) if target["h2c"] else ("keep-alive", "reconnect")
+        for mode in modes:
+            # HTTP/2 has no per-request Connection: close
+            headers = {"connection": "close"} if mode == "reconnect" else {}
+            latencies: list[float] = []
+            with _transport_client(target) as client:
+                for i in range(warmup + num_requests):
+                    start = time.perf_counter()
+                    response = client.request(
+                        method, path, json=payload, headers=headers
+                    )
+                    elapsed = time.perf_counter() - start
+                    response.raise_for_status()
+                    if i >= warmup:
+                        latencies.append(elapsed * 1000)
+
+            latencies.sort()
+            entry = {
+                "transport": target["name"],
+                "mode": mode,
+                "requests": num_requests,
+                "median_ms": statistics.median(latencies),
+                "p99_ms": latencies[
+                    min(len(latencies) - 1, int(len(latencies) * 0.99))
+                ],
+                "requests_per_second": num_requests / (sum(latencies) / 1000),
+            }
+            logger.info(f"{target['name']} {mode}: {entry['median_ms']:.3f} ms median")
+            report.append(entry)
+
+    return report
+
+
+def _print_transport_report(report: list[dict[str, Any]]) -> None:
+    print(
+        f"{'transport':>10} {'mode':>11} {'median ms':>10} {'p99 ms':>8} {'req/s':>9}"
+    )
+    for entry in report:
+        print(
+            f"{entry['transport']:>10} {entry['mode']:>11} "
+            f"{entry['median_ms']:>10.3f} {entry['p99_ms']:>8.3f} "
+            f"{entry['requests_per_second']:>9.0f}"
+        )
+
+
+def run_replay(
+    paths: list[str],
+    url: str | None = None,
+    uds: str | None = None,
+    model_name: str | None = None,
+    use_fp16: bool = False,
+    speed: float = 1.0,
+    concurrency: int = 64,
+    limit: int = 0,
+) -> dict[str, Any]:
+    """Replay captured traffic against a server or an in-process Reranker.
+
+    Exactly one of url (with uds for a Unix socket server) and model_name
+    selects the target.
+    """
+    import asyncio
+
+    from .capture import read_capture, replay
+
+    requests = read_capture(paths)
+    if limit:
+        requests = requests[:limit]
+    logger.info(f"Replaying {len(requests)} requests at speed {speed:g}")
+
+    async def run_http() -> dict[str, Any]:
+        import httpx
+
+        transport = httpx.AsyncHTTPTransport(uds=uds) if uds else None
+        async with httpx.AsyncClient(
+            base_url=url or "http://localhost",
+            transport=transport,
+            timeout=120.0,
+            limits=httpx.Limits(max_connections=concurrency),
+        ) as client:
+
+            async def send(payload: dict[str, Any]) -> None:
+                response = await client.post("/rerank", json=payload)
+                response.raise_for_status()
+
+            return await replay(requests, send, speed, concurrency)
+
+    async def run_in_process() -> dict[str, Any]:
+        from .library import Reranker
+
+        async with Reranker(model_name, use_fp16=use_fp16) as reranker:
+
+            async def send(payload: dict[str, Any]) -> None:
+                await reranker.arerank(
+                    payload["query"],
+                    payload["documents"],
+                    top_k=payload.get("top_k"),
+                    normalize=payload.get("normalize", True),
+                )
+
+            return await replay(requests, send, speed, concurrency)
+
+    report = asyncio.run(run_in_process() if model_name else run_http())
+    report["target"] = model_name or uds or url
+    return report
+
+
+def _print_replay_report(
+    report: dict[str, Any], changes: dict[str, float] | None = None
+) -> None:
+    print(
+        f"{report['requests']} requests, {report['errors']} errors in "
+        f"{report['wall_seconds']:.1f} s ({report['requests_per_second']:.1f} req/s)"
+    )
+    for key in ("mean_ms", "p50_ms", "p90_ms", "p95_ms", "p99_ms", "max_ms"):
+        if key not in report:
+            continue
+        change = changes.get(key) if changes else None
+        delta = "" if change is None else f"  {change:+.1%} vs baseline"
+        print(f"{key.removesuffix('_ms'):>6} {report[key]:>10.2f} ms{delta}")
+    if changes and "requests_per_second" in changes:
+        print(f"req/s {changes['requests_per_second']:+.1%} vs baseline")
+
+
+def _split_list(value: str) -> list[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def main() -> None:
+    """Command line entry point for the benchmark suite."""
+    parser = argparse.ArgumentParser(description="BGE Reranker benchmark suite")
+    parser.add_argument(
+        "--log-level",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        default="INFO",
+        help="Log level (default: INFO)",
+    )
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    threads = subparsers.add_parser(
+        "threads", help="Sweep worker count and torch thread settings"
+    )
+    threads.add_argument(
+        "--model-name",
+        default="BAAI/bge-reranker-v2-m3",
+        help="BGE model name or path (default: BAAI/bge-reranker-v2-m3)",
+    )
+    threads.add_argument(
+        "--use-fp16", action="store_true", help="Use FP16 (default: off)"
+    )
+    threads.add_argument(
+        "--workers", default="1,2,4", help="Worker counts to try (default: 1,2,4)"
+    )
+    threads.add_argument(
+        "--intra-op-threads",
+        default="auto",
+        help="Intra-op thread counts to try, 'auto' = cores / workers (default: auto)",
+    )
+    threads.add_argument(
+        "--inter-op-threads",
+        default="1",
+        help="Inter-op thread counts to try (default: 1)",
+    )
+    threads.add_argument(
+        "--pairs", type=int, default=256, help="Pairs scored per repeat (default: 256)"
+    )
+    threads.add_argument(
+        "--batch-pairs", type=int, default=32, help="Pairs per call (default: 32)"
+    )
+    threads.add_argument(
+        "--repeats", type=int, default=3, help="Timed repeats (default: 3)"
+    )
+    threads.add_argument(
+        "--allow-oversubscribe",
+        action="store_true",
+        help="Also run configurations needing more threads than cores",
+    )
+
+    compile_parser = subparsers.add_parser(
+        "compile", help="Compare eager and compiled forward pass throughput"
+    )
+    compile_parser.add_argument(
+        "--model-name",
+        default="BAAI/bge-reranker-v2-m3",
+        help="BGE model name or path (default: BAAI/bge-reranker-v2-m3)",
+    )
+    compile_parser.add_argument(
+        "--use-fp16", action="store_true", help="Use FP16 (default: off)"
+    )
+    compile_parser.add_argument(
+        "--batch-buckets",
+        default="1,4,16,32",
+        help="Batch sizes compiled (default: 1,4,16,32)",
+    )
+    compile_parser.add_argument(
+        "--seq-buckets",
+        default="128,256,512",
+        help="Padded sequence lengths compiled (default: 128,256,512)",
+    )
+    compile_parser.add_argument(
+        "--backend",
+        default="inductor",
+        help="torch.compile backend (default: inductor)",
+    )
+    compile_parser.add_argument(
+        "--pairs", type=int, default=256, help="Pairs scored per repeat (default: 256)"
+    )
+    compile_parser.add_argument(
+        "--batch-pairs", type=int, default=32, help="Pairs per call (default: 32)"
+    )
+    compile_parser.add_argument(
+        "--repeats", type=int, default=3, help="Timed repeats (default: 3)"
+    )
+
+    imports = subparsers.add_parser(
+        "imports", help="Measure module import time in fresh interpreters"
+    )
+    imports.add_argument(
+        "--modules",
+        default=",".join(DEFAULT_IMPORT_MODULES),
+        help="Modules to import (default: the package, cli, client, service, api)",
+    )
+    imports.add_argument(
+        "--repeats", type=int, default=5, help="Fresh imports per module (default: 5)"
+    )
+    imports.add_argument(
+        "--max-ms",
+        type=float,
+        default=None,
+        help="Fail if a module's median import time exceeds this budget",
+    )
+
+    transport = subparsers.add_parser(
+        "transport",
+        help="Compare per-request overhead of TCP, Unix socket and h2c listeners",
+    )
+    transport.add_argument(
+        "--url",
+        default=None,
+        help="HTTP/1.1 over TCP, e.g. http://127.0.0.1:8000",
+    )
+    transport.add_argument(
+        "--uds",
+        default=None,
+        help="Socket of a server started with --uds",
+    )
+    transport.add_argument(
+        "--h2c-url",
+        default=None,
+        help="Server started with --http2, e.g. http://127.0.0.1:8001",
+    )
+    transport.add_argument(
+        "--endpoint",
+        choices=sorted(_TRANSPORT_PAYLOADS),
+        default="health",
+        help="health measures the transport alone, rerank adds a top_k=1 "
+        "call with two documents (default: health)",
+    )
+    transport.add_argument(
+        "--requests", type=int, default=1000, help="Timed requests (default: 1000)"
+    )
+    transport.add_argument(
+        "--warmup", type=int, default=50, help="Untimed requests (default: 50)"
+    )
+
+    replay_parser = subparsers.add_parser(
+        "replay", help="Replay captured traffic and report latencies"
+    )
+    replay_parser.add_argument(
+        "captures", nargs="+", help="Capture files written with --capture"
+    )
+    replay_parser.add_argument("--url", default=None, help="Server to replay against")
+    replay_parser.add_argument(
+        "--uds", default=None, help="Unix socket of the server to replay against"
+    )
+    replay_parser.add_argument(
+        "--in-process",
+        metavar="MODEL_NAME",
+        default=None,
+        help="Replay against an in-process Reranker loading this model",
+    )
+    replay_parser.add_argument(
+        "--use-fp16", action="store_true", help="Use FP16 in-process (default: off)"
+    )
+    replay_parser.add_argument(
+        "--speed",
+        type=float,
+        default=1.0,
+        help="Pace relative to the capture, 0 for as fast as possible (default: 1)",
+    )
+    replay_parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=64,
+        help="Requests in flight at most (default: 64)",
+    )
+    replay_parser.add_argument(
+        "--limit", type=int, default=0, help="Replay only the first N requests"
+    )
+    replay_parser.add_argument(
+        "--baseline",
+        default=None,
+        help="JSON report of an earlier replay (--json) to compare with",
+    )
+
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=getattr(logging, args.log_level),
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    if args.benchmark == "threads":
+        report = run_thread_sweep(
+            model_name=args.model_name,
+            use_fp16=args.use_fp16,
+            workers_list=[int(w) for w in _split_list(args.workers)],
+            intra_list=_split_list(args.intra_op_threads),
+            inter_list=_split_list(args.inter_op_threads),
+            num_pairs=args.pairs,
+            batch_pairs=args.batch_pairs,
+            repeats=args.repeats,
+            allow_oversubscribe=args.allow_oversubscribe,
+        )
+        if args.json:
+            print(json.dumps(report, indent=2))
+        else:
+            _print_thread_report(report)
+    elif args.benchmark == "compile":
+        report = run_compile_benchmark(
+            model_name=args.model_name,
+            use_fp16=args.use_fp16,
+            batch_buckets=tuple(int(b) for b in _split_list(args.batch_buckets)),
+            seq_buckets=tuple(int(s) for s in _split_list(args.seq_buckets)),
+            backend=args.backend,
+            num_pairs=args.pairs,
+            batch_pairs=args.batch_pairs,
+            repeats=args.repeats,
+        )
+        if args.json:
+            print(json.dumps(report, indent=2))
+        else:
+            _print_compile_report(report)
+    elif args.benchmark == "imports":
+        report = run_import_benchmark(
+            modules=tuple(_split_list(args.modules)), repeats=args.repeats
+        )
+        if args.json:
+            print(json.dumps(report, indent=2))
+        else:
+            _print_import_report(report)
+        failures = check_import_budget(report, args.max_ms)
+        for failure in failures:
+            logger.error(f"Import regression: {failure}")
+        if failures:
+            sys.exit(1)
+    elif args.benchmark == "replay":
+        if bool(args.in_process) == bool(args.url or args.uds):
+            parser.error("give either --url/--uds or --in-process")
+        report = run_replay(
+            args.captures,
+            url=args.url,
+            uds=args.uds,
+            model_name=args.in_process,
+            use_fp16=args.use_fp16,
+            speed=args.speed,
+            concurrency=args.concurrency,
+            limit=args.limit,
+        )
+        changes = None
+        if args.baseline:
+            from .capture import compare_reports
+
+            baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+            changes = compare_reports(report, baseline)
+            report["baseline_changes"] = changes
+        if args.json:
+            print(json.dumps(report, indent=2))
+        else:
+            _print_replay_report(report, changes)
+    elif args.benchmark == "transport":
+        targets = []
+        if args.url:
+            targets.append({"name": "tcp", "url": args.url, "uds": None, "h2c": False})
+        if args.uds:
+            targets.append(
+                {
+                    "name": "uds",
+                    "url": "http://localhost",
+                    "uds": args.uds,
+                    "h2c": False,
+                }
+            )
+        if args.h2c_url:
+            targets.append(
+                {"name": "h2c", "url": args.h2c_url, "uds": None, "h2c": True}
+            )
+        if not targets:
+            parser.error("give at least one of --url, --uds and --h2c-url")
+        report = run_transport_benchmark(
+            targets,
+            endpoint=args.endpoint,
+            num_requests=args.requests,
+            warmup=args.warmup,
+        )
+        if args.json:
+            print(json.dumps(report, indent=2))
+        else:
+            _print_transport_report(report)
+
+
+if __name__ == "__main__":
+    main()
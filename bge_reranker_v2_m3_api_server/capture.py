@@ -0,0 +1,296 @@
+"""Capture of live rerank traffic and deterministic replay.
+
+Synthetic benchmarks miss the real mix of document lengths and repetition.
+With capture enabled the server appends a sample of /rerank requests, with
+their arrival time, to a JSON lines file (gzip-compressed if the name ends
+in ``.gz``). Replay sends the same requests, in the same order and at the
+original or an accelerated pace, to a server or to an in-process Reranker
+and reports the latency distribution, so two builds can be compared on an
+identical workload.
+
+Texts can be kept as is, hashed or redacted:
+
+* ``raw`` records the texts unchanged
+* ``hash`` replaces every text by its digest, repeated to the original
+  length: lengths and repetition (dedup and cache hits) are preserved, the
+  content is not
+* ``redact`` replaces every text by filler of the same length: lengths are
+  preserved, repetition is not
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+from collections.abc import Awaitable, Callable, Iterable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, Any
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+CAPTURE_FORMAT = "bge-reranker-capture"
+TEXT_MODES = ("raw", "hash", "redact")
+
+
+def _hashed(text: str) -> str:
+    digest = hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+    return ((digest + " ") * (len(text) // 17 + 1))[: len(text)]
+
+
+def _redacted(text: str) -> str:
+    return ("x " * (len(text) // 2 + 1))[: len(text)]
+
+
+_TEXT_TRANSFORMS: dict[str, Callable[[str], str]] = {
+    "raw": str,
+    "hash": _hashed,
+    "redact": _redacted,
+}
+
+
+def _open(path: Path, mode: str) -> IO[str]:
+    if path.suffix == ".gz":
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return path.open(mode, encoding="utf-8")
+
+
+class TrafficRecorder:
+    """Thread-safe writer of sampled rerank requests."""
+
+    def __init__(
+        self,
+        path: str | Path,
+        sample_rate: float = 1.0,
+        text_mode: str = "raw",
+        max_requests: int = 0,
+        seed: int | None = None,
+    ):
+        """Open the capture file.
+
+        Args:
+            path: File to write; ``.gz`` files are gzip-compressed
+            sample_rate: Fraction of requests recorded
+            text_mode: "raw", "hash" or "redact"
+            max_requests: Stop recording after this many requests (0 for no
+                limit)
+            seed: Seed of the sampling decisions
+        """
+        if text_mode not in TEXT_MODES:
+            raise ValueError(f"Unknown capture text mode: {text_mode}")
+        if not 0.0 < sample_rate <= 1.0:
+            raise ValueError("sample_rate must be in (0, 1]")
+
+        self.path = Path(path)
+        self.sample_rate = sample_rate
+        self.text_mode = text_mode
+        self.max_requests = max_requests
+        self.recorded = 0
+        self._transform = _TEXT_TRANSFORMS[text_mode]
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._file: IO[str] | None = _open(self.path, "w")
+        self._write(
+            {
+                "format": CAPTURE_FORMAT,
+                "version": 1,
+                "text_mode": text_mode,
+                "sample_rate": sample_rate,
+                "started_at": time.time(),
+            }
+        )
+        logger.info(f"Capturing rerank traffic to {self.path}")
+
+    def record(self, payload: dict[str, Any], arrival: float | None = None) -> bool:
+        """Record one request if it is sampled.
+
+        Args:
+            payload: RerankRequest fields, with documents resolved to texts
+            arrival: Arrival time as a Unix timestamp (default: now)
+
+        Returns:
+            Whether the request was written
+        """
+        with self._lock:
+            if self._file is None:
+                return False
+            if self.max_requests and self.recorded >= self.max_requests:
+                return False
+            if self.sample_rate < 1.0 and self._random.random() >= self.sample_rate:
+                return False
+            request = dict(payload)
+            request["query"] = self._transform(request["query"])
+            request["documents"] = [self._transform(d) for d in request["documents"]]
+            self._write({"ts": round(arrival or time.time(), 6), "request": request})
+            self.recorded += 1
+        metrics.inc("capture_requests_total")
+        return True
+
+    def close(self) -> None:
+        """Flush and close the capture file."""
+        with self._lock:
+            file, self._file = self._file, None
+        if file is not None:
+            file.close()
+            logger.info(f"Captured {self.recorded} requests to {self.path}")
+
+    def _write(self, entry: dict[str, Any]) -> None:
+        assert self._file is not None
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+@dataclass
+class CapturedRequest:
+    """A recorded request and when it arrived, relative to the first one."""
+
+    offset: float
+    payload: dict[str, Any]
+
+
+def read_capture(paths: str | Path | Iterable[str | Path]) -> list[CapturedRequest]:
+    """Load one or more capture files (e.g. one per worker) in arrival order.
+
+    A file cut short by a crash is read up to its last complete line.
+    """
+    if isinstance(paths, str | Path):
+        paths = [paths]
+    entries: list[tuple[float, dict[str, Any]]] = []
+    for path in paths:
+        path = Path(path)
+        with _open(path, "r") as file:
+            try:
+                for number, line in enumerate(file):
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        logger.warning(f"{path}:{number + 1}: incomplete entry")
+                        break
+                    if number == 0:
+                        if entry.get("format") != CAPTURE_FORMAT:
+                            raise ValueError(f"{path} is not a capture file")
+                        continue
+                    entries.append((entry["ts"], entry["request"]))
+            except EOFError:
+                logger.warning(f"{path}: truncated, using the complete entries")
+
+    entries.sort(key=lambda entry: entry[0])
+    start = entries[0][0] if entries else 0.0
+    return [CapturedRequest(ts - start, payload) for ts, payload in entries]
+
+
+async def replay(
+    requests: list[CapturedRequest],
+    send: Callable[[dict[str, Any]], Awaitable[Any]],
+    speed: float = 1.0,
+    concurrency: int = 64,
+) -> dict[str, Any]:
+    """Send captured requests and report their latency distribution.
+
+    Args:
+        requests: Requests from read_capture()
+        send: Coroutine function sending one payload; raising counts as an
+            error
+        speed: Pace relative to the capture (2.0 is twice as fast, 0 sends
+            each request as soon as a concurrency slot is free)
+        concurrency: Requests in flight at most
+
+    Returns:
+        The report from summarize()
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    errors: list[str] = []
+    lags: list[float] = []
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+
+    async def run_one(request: CapturedRequest) -> None:
+        async with semaphore:
+            if speed > 0:
+                lags.append(max(0.0, loop.time() - start - request.offset / speed))
+            sent = time.perf_counter()
+            try:
+                await send(request.payload)
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+                return
+            latencies.append(time.perf_counter() - sent)
+
+    tasks = []
+    for request in requests:
+        if speed > 0:
+            delay = start + request.offset / speed - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(run_one(request)))
+        # Yield so requests due at the same time do not wait for the loop
+        await asyncio.sleep(0)
+    await asyncio.gather(*tasks)
+
+    report = summarize(latencies, loop.time() - start)
+    report["errors"] = len(errors)
+    report["speed"] = speed
+    if lags:
+        report["max_send_lag_ms"] = max(lags) * 1000
+    for error in sorted(set(errors))[:5]:
+        logger.warning(f"Replay error: {error}")
+    return report
+
+
+def _percentile(ordered: list[float], fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def summarize(latencies: list[float], wall_seconds: float) -> dict[str, Any]:
+    """Latency distribution in milliseconds and the achieved request rate."""
+    ordered = sorted(latencies)
+    report: dict[str, Any] = {
+        "requests": len(ordered),
+        "wall_seconds": wall_seconds,
+        "requests_per_second": len(ordered) / wall_seconds if wall_seconds else 0.0,
+    }
+    if ordered:
+        report.update(
+            mean_ms=sum(ordered) / len(ordered) * 1000,
+            p50_ms=_percentile(ordered, 0.50) * 1000,
+            p90_ms=_percentile(ordered, 0.90) * 1000,
+            p95_ms=_percentile(ordered, 0.95) * 1000,
+            p99_ms=_percentile(ordered, 0.99) * 1000,
+            max_ms=ordered[-1] * 1000,
+        )
+    return report
+
+
+def compare_reports(
+    current: dict[str, Any], baseline: dict[str, Any]
+) -> dict[str, float]:
+    """Relative change of each latency and throughput figure (0.1 = +10%)."""
+    return {
+        key: current[key] / baseline[key] - 1
+        for key in (
+            "mean_ms",
+            "p50_ms",
+            "p90_ms",
+            "p95_ms",
+            "p99_ms",
+            "max_ms",
+            "requests_per_second",
+        )
+        if baseline.get(key) and key in current
+    }
+
+
+def worker_capture_path(path: str | Path, workers: int, pid: int) -> Path:
+    """Give each worker process its own file when several share one path."""
+    path = Path(path)
+    if workers <= 1:
+        return path
+    suffixes = "".join(path.suffixes)
+    stem = path.name.removesuffix(suffixes) if suffixes else path.name
+    return path.with_name(f"{stem}.{pid}{suffixes}")
@@ -4,7 +4,8 @@ import argparse
 import logging
 import os
 
-import uvicorn
+from .serving import APP, ROUTER_APP, ListenerConfig, run
+from .topology import available_cpus
 
 
 def main():
@@ -19,6 +20,39 @@ def main():
         "--port", type=int, default=8000, help="Port to bind to (default: 8000)"
     )
 
+    parser.add_argument(
+        "--uds",
+        default=None,
+        help="Listen on this Unix domain socket instead of --host/--port",
+    )
+
+    parser.add_argument(
+        "--http2",
+        action="store_true",
+        help="Also serve HTTP/2 over cleartext (h2c); needs hypercorn",
+    )
+
+    parser.add_argument(
+        "--keep-alive-timeout",
+        type=float,
+        default=30.0,
+        help="Seconds an idle keep-alive connection stays open (default: 30)",
+    )
+
+    parser.add_argument(
+        "--backlog",
+        type=int,
+        default=2048,
+        help="Pending connections queued by the kernel (default: 2048)",
+    )
+
+    parser.add_argument(
+        "--h2-max-concurrent-streams",
+        type=int,
+        default=100,
+        help="Concurrent requests per HTTP/2 connection (default: 100)",
+    )
+
     parser.add_argument(
         "--workers", type=int, default=1, help="Number of worker processes (default: 1)"
     )
@@ -40,6 +74,283 @@ def main():
         "--no-fp16", action="store_false", dest="use_fp16", help="Disable FP16"
     )
 
+    parser.add_argument(
+        "--dedup-mode",
+        choices=["off", "exact", "normalized"],
+        default="normalized",
+        help="Collapse duplicate documents before inference (default: normalized)",
+    )
+
+    parser.add_argument(
+        "--score-cache-size",
+        type=int,
+        default=10000,
+        help="Pair scores cached across requests, 0 to disable (default: 10000)",
+    )
+
+    parser.add_argument(
+        "--prerank-top-n",
+        type=int,
+        default=0,
+        help="Pre-rank documents with a bi-encoder and cross-encode only the "
+        "top N, 0 to disable (default: 0)",
+    )
+
+    parser.add_argument(
+        "--prerank-model",
+        default="BAAI/bge-m3",
+        help="Bi-encoder model for pre-ranking (default: BAAI/bge-m3)",
+    )
+
+    parser.add_argument(
+        "--vector-cache-size",
+        type=int,
+        default=100000,
+        help="Document vectors cached for pre-ranking (default: 100000)",
+    )
+
+    parser.add_argument(
+        "--adaptive-batching",
+        action="store_true",
+        help="Size forward passes from observed latency and memory "
+        "(default: one static batch size)",
+    )
+
+    parser.add_argument(
+        "--target-batch-latency-ms",
+        type=float,
+        default=200.0,
+        help="Forward pass latency targeted by adaptive batching (default: 200)",
+    )
+
+    parser.add_argument(
+        "--max-batch-size",
+        type=int,
+        default=256,
+        help="Maximum pairs per forward pass with adaptive batching (default: 256)",
+    )
+
+    parser.add_argument(
+        "--no-single-flight",
+        action="store_false",
+        dest="single_flight",
+        help="Score concurrent identical requests separately instead of "
+        "sharing one computation",
+    )
+
+    parser.add_argument(
+        "--pipeline-tokenization",
+        action="store_true",
+        help="Tokenize upcoming batches on worker threads while the model runs "
+        "(default: off)",
+    )
+
+    parser.add_argument(
+        "--tokenizer-workers",
+        type=int,
+        default=2,
+        help="Tokenizer threads with --pipeline-tokenization (default: 2)",
+    )
+
+    parser.add_argument(
+        "--pipeline-batch-size",
+        type=int,
+        default=32,
+        help="Pairs per forward pass with --pipeline-tokenization and without "
+        "adaptive batching (default: 32)",
+    )
+
+    parser.add_argument(
+        "--compile",
+        action="store_true",
+        help="Compile the forward pass for fixed shape buckets at startup, "
+        "falling back to eager mode if compilation fails (default: off)",
+    )
+
+    parser.add_argument(
+        "--compile-batch-buckets",
+        default="1,4,16,32",
+        help="Batch sizes compiled with --compile (default: 1,4,16,32)",
+    )
+
+    parser.add_argument(
+        "--compile-seq-buckets",
+        default="128,256,512",
+        help="Padded sequence lengths compiled with --compile (default: 128,256,512)",
+    )
+
+    parser.add_argument(
+        "--compile-backend",
+        default="inductor",
+        help="torch.compile backend used with --compile (default: inductor)",
+    )
+
+    parser.add_argument(
+        "--max-request-bytes",
+        type=int,
+        default=64 * 1024 * 1024,
+        help="Maximum request body size in bytes, compressed or decoded "
+        "(default: 64 MiB, 0 for no limit)",
+    )
+
+    parser.add_argument(
+        "--max-document-chars",
+        type=int,
+        default=100000,
+        help="Maximum characters per document (default: 100000, 0 for no limit)",
+    )
+
+    parser.add_argument(
+        "--slo-latency-ms",
+        type=float,
+        default=0.0,
+        help="p95 latency target; past it new requests are degraded "
+        "(default: 0, never degrade)",
+    )
+
+    parser.add_argument(
+        "--fallback-model",
+        default=None,
+        help="Cheaper model used for degraded requests under overload",
+    )
+
+    parser.add_argument(
+        "--document-corpus",
+        default=None,
+        help='JSON lines file of documents ({"id": ..., "text": ...}) that '
+        "rerank requests can reference by ID; memory-mapped at startup",
+    )
+
+    parser.add_argument(
+        "--router-backends",
+        default=None,
+        help="Run as a cache-affinity router in front of these comma-separated "
+        "server URLs (unix:/path for a Unix domain socket) instead of loading "
+        "a model",
+    )
+
+    parser.add_argument(
+        "--router-affinity",
+        choices=["query", "documents"],
+        default="query",
+        help="Route requests with the same query or the same document set to "
+        "the same backend (default: query)",
+    )
+
+    parser.add_argument(
+        "--router-health-interval",
+        type=float,
+        default=5.0,
+        help="Seconds between router health checks of the backends (default: 5)",
+    )
+
+    parser.add_argument(
+        "--session-ttl",
+        type=float,
+        default=300.0,
+        help="Seconds an incremental reranking session is kept after its last "
+        "use (default: 300)",
+    )
+
+    parser.add_argument(
+        "--session-max-documents",
+        type=int,
+        default=10000,
+        help="Documents per incremental reranking session at most (default: 10000)",
+    )
+
+    parser.add_argument(
+        "--admin-token",
+        default=None,
+        help="Token enabling the /admin endpoints for model reloads "
+        "(default: admin endpoints disabled)",
+    )
+
+    parser.add_argument(
+        "--tracemalloc-frames",
+        type=int,
+        default=0,
+        help="Trace Python allocations with this many frames per traceback, "
+        "for /debug/memory snapshots (default: 0, disabled)",
+    )
+
+    parser.add_argument(
+        "--measure-batch-memory",
+        action="store_true",
+        help="Record the memory peak of every forward pass per batch shape; "
+        "measured passes run one at a time (default: off)",
+    )
+
+    parser.add_argument(
+        "--intra-op-threads",
+        default=None,
+        help="torch intra-op threads per worker, or 'auto' to divide the cores "
+        "between workers (default: torch default)",
+    )
+
+    parser.add_argument(
+        "--inter-op-threads",
+        default=None,
+        help="torch inter-op threads per worker, or 'auto' (default: torch default)",
+    )
+
+    parser.add_argument(
+        "--cpu-affinity",
+        default=None,
+        help="Pin workers to CPUs: 'auto' to split available cores between "
+        "workers, a cpulist such as '0-15', or per-worker lists separated by "
+        "';' such as '0-15;16-31'",
+    )
+
+    parser.add_argument(
+        "--numa-node",
+        default=None,
+        help="Pin workers to NUMA nodes: 'auto' to spread them over all nodes, "
+        "or a comma-separated node list assigned round-robin",
+    )
+
+    parser.add_argument(
+        "--trace-exporter",
+        default=None,
+        help="Export request traces: 'console', 'file:<path>' or "
+        "'<module>:<factory>' (default: tracing off)",
+    )
+
+    parser.add_argument(
+        "--trace-sample-rate",
+        type=float,
+        default=1.0,
+        help="Fraction of new traces to record (default: 1.0)",
+    )
+
+    parser.add_argument(
+        "--capture",
+        default=None,
+        help="Record sampled /rerank requests to this file for replay "
+        "(.gz to compress, one file per worker)",
+    )
+
+    parser.add_argument(
+        "--capture-sample-rate",
+        type=float,
+        default=1.0,
+        help="Fraction of requests captured (default: 1.0)",
+    )
+
+    parser.add_argument(
+        "--capture-text",
+        choices=["raw", "hash", "redact"],
+        default="raw",
+        help="How captured texts are stored (default: raw)",
+    )
+
+    parser.add_argument(
+        "--capture-max-requests",
+        type=int,
+        default=0,
+        help="Stop capturing after this many requests, 0 for no limit (default: 0)",
+    )
+
     parser.add_argument(
         "--log-level",
         choices=["DEBUG", "INFO", "WARNING", "ERROR"],
@@ -62,15 +373,85 @@ def main():
     # Set environment variables for the service
     os.environ["BGE_MODEL_NAME"] = args.model_name
     os.environ["BGE_USE_FP16"] = str(args.use_fp16).lower()
+    os.environ["BGE_DEDUP_MODE"] = args.dedup_mode
+    os.environ["BGE_SCORE_CACHE_SIZE"] = str(args.score_cache_size)
+    os.environ["BGE_PRERANK_TOP_N"] = str(args.prerank_top_n)
+    os.environ["BGE_PRERANK_MODEL"] = args.prerank_model
+    os.environ["BGE_VECTOR_CACHE_SIZE"] = str(args.vector_cache_size)
+    os.environ["BGE_ADAPTIVE_BATCHING"] = str(args.adaptive_batching).lower()
+    os.environ["BGE_TARGET_BATCH_LATENCY_MS"] = str(args.target_batch_latency_ms)
+    os.environ["BGE_MAX_BATCH_SIZE"] = str(args.max_batch_size)
+    os.environ["BGE_SINGLE_FLIGHT"] = str(args.single_flight).lower()
+    os.environ["BGE_PIPELINE_TOKENIZATION"] = str(args.pipeline_tokenization).lower()
+    os.environ["BGE_TOKENIZER_WORKERS"] = str(args.tokenizer_workers)
+    os.environ["BGE_PIPELINE_BATCH_SIZE"] = str(args.pipeline_batch_size)
+    os.environ["BGE_COMPILE"] = str(args.compile).lower()
+    os.environ["BGE_COMPILE_BATCH_BUCKETS"] = args.compile_batch_buckets
+    os.environ["BGE_COMPILE_SEQ_BUCKETS"] = args.compile_seq_buckets
+    os.environ["BGE_COMPILE_BACKEND"] = args.compile_backend
+    os.environ["BGE_MAX_REQUEST_BYTES"] = str(args.max_request_bytes)
+    os.environ["BGE_MAX_DOCUMENT_CHARS"] = str(args.max_document_chars)
+    os.environ["BGE_SLO_LATENCY_MS"] = str(args.slo_latency_ms)
+    if args.fallback_model:
+        os.environ["BGE_FALLBACK_MODEL"] = args.fallback_model
+    if args.document_corpus:
+        os.environ["BGE_DOCSTORE_CORPUS"] = args.document_corpus
+    if args.router_backends:
+        os.environ["BGE_ROUTER_BACKENDS"] = args.router_backends
+        os.environ["BGE_ROUTER_AFFINITY"] = args.router_affinity
+        os.environ["BGE_ROUTER_HEALTH_INTERVAL"] = str(args.router_health_interval)
+    os.environ["BGE_SESSION_TTL"] = str(args.session_ttl)
+    os.environ["BGE_SESSION_MAX_DOCUMENTS"] = str(args.session_max_documents)
+    if args.admin_token:
+        os.environ["BGE_ADMIN_TOKEN"] = args.admin_token
+    os.environ["BGE_TRACEMALLOC_FRAMES"] = str(args.tracemalloc_frames)
+    os.environ["BGE_MEASURE_BATCH_MEMORY"] = str(args.measure_batch_memory).lower()
+    if args.capture:
+        os.environ["BGE_CAPTURE_PATH"] = args.capture
+        os.environ["BGE_CAPTURE_SAMPLE_RATE"] = str(args.capture_sample_rate)
+        os.environ["BGE_CAPTURE_TEXT"] = args.capture_text
+        os.environ["BGE_CAPTURE_MAX_REQUESTS"] = str(args.capture_max_requests)
+    if args.trace_exporter:
+        os.environ["BGE_TRACE_EXPORTER"] = args.trace_exporter
+        os.environ["BGE_TRACE_SAMPLE_RATE"] = str(args.trace_sample_rate)
+
+    # Thread and CPU placement, applied by each worker at startup; the router
+    # keeps session pins in memory, so it runs as one process
+    workers = args.workers if not (args.reload or args.router_backends) else 1
+    os.environ["BGE_WORKERS"] = str(workers)
+    for option, env_name in (
+        (args.intra_op_threads, "BGE_INTRA_OP_THREADS"),
+        (args.inter_op_threads, "BGE_INTER_OP_THREADS"),
+        (args.cpu_affinity, "BGE_CPU_AFFINITY"),
+        (args.numa_node, "BGE_NUMA_NODE"),
+    ):
+        if option:
+            os.environ[env_name] = option
+    if args.intra_op_threads:
+        # OpenMP/MKL read these when torch is imported in the worker
+        threads = (
+            str(max(1, len(available_cpus()) // workers))
+            if args.intra_op_threads == "auto"
+            else args.intra_op_threads
+        )
+        os.environ.setdefault("OMP_NUM_THREADS", threads)
+        os.environ.setdefault("MKL_NUM_THREADS", threads)
 
     # Run the server
-    uvicorn.run(
-        "bge_reranker_v2_m3_api_server.api:app",
-        host=args.host,
-        port=args.port,
-        workers=args.workers if not args.reload else 1,
-        reload=args.reload,
-        log_level=args.log_level.lower(),
+    run(
+        ListenerConfig(
+            host=args.host,
+            port=args.port,
+            uds=args.uds,
+            http2=args.http2,
+            workers=workers,
+            reload=args.reload,
+            log_level=args.log_level.lower(),
+            keep_alive_timeout=args.keep_alive_timeout,
+            backlog=args.backlog,
+            h2_max_concurrent_streams=args.h2_max_concurrent_streams,
+            app=ROUTER_APP if args.router_backends else APP,
+        )
     )
 
 
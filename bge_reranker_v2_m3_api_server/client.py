@@ -0,0 +1,470 @@
+"""Async Python client for the BGE Reranker API.
+
+Features:
+
+* keep-alive connection pools (HTTP/2 when the ``h2`` package is installed),
+  over TCP or a Unix domain socket
+* concurrent small ``rerank()`` calls are coalesced into ``/rerank/batch``
+* timeouts adapt to the latency observed per replica
+* hedged requests: a slow request is duplicated on a second replica and the
+  first answer wins
+* retries with jittered exponential backoff on connection errors, timeouts
+  and 502/503/504 responses; a 429 enforces the tenant's quota, so it is
+  never sent to another replica and only retried on the same one after its
+  Retry-After
+* compact or binary response formats, so document texts are never sent back;
+  degradations the server applied under overload are kept on the response
+
+Example:
+    async with RerankerClient(["http://r1:8000", "http://r2:8000"]) as client:
+        response = await client.rerank("what is ai?", ["doc a", "doc b"])
+"""
+
+import asyncio
+import importlib.util
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, Self
+
+import httpx
+
+from .codec import (
+    BINARY_MEDIA_TYPE,
+    COMPACT_MEDIA_TYPE,
+    JSON_MEDIA_TYPE,
+    RankedResult,
+    decode,
+)
+from .models import HealthResponse, RerankResponse, ScoreItem
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_FORMATS = {
+    "json": JSON_MEDIA_TYPE,
+    "compact": COMPACT_MEDIA_TYPE,
+    "binary": BINARY_MEDIA_TYPE,
+}
+RETRY_STATUS_CODES = frozenset({502, 503, 504})
+
+
+class RetryableError(Exception):
+    """A request failed in a way that may succeed on retry."""
+
+
+class RateLimitedError(Exception):
+    """A replica answered 429 with a Retry-After the client may wait out."""
+
+    def __init__(self, replica: "_Replica", retry_after: float, response: Any):
+        super().__init__(f"{replica.url}: HTTP 429, retry after {retry_after:g}s")
+        self.replica = replica
+        self.retry_after = retry_after
+        self.response = response
+
+
+def _retry_after(response: httpx.Response) -> float | None:
+    """Seconds from a Retry-After header, or None if absent or a date."""
+    try:
+        return max(0.0, float(response.headers["retry-after"]))
+    except (KeyError, ValueError):
+        return None
+
+
+class LatencyEstimator:
+    """Smoothed latency and deviation of a replica, as in TCP's RTO (RFC 6298)."""
+
+    def __init__(self, min_timeout: float = 0.5, max_timeout: float = 30.0):
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.srtt: float | None = None
+        self.rttvar = 0.0
+        self._backoff = 1.0
+
+    def observe(self, seconds: float) -> None:
+        """Record the latency of a successful request."""
+        if self.srtt is None:
+            self.srtt = seconds
+            self.rttvar = seconds / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - seconds)
+            self.srtt = 0.875 * self.srtt + 0.125 * seconds
+        self._backoff = 1.0
+
+    def backoff(self) -> None:
+        """Double the timeout after a request timed out."""
+        self._backoff = min(self._backoff * 2, 64.0)
+
+    @property
+    def timeout(self) -> float:
+        """Request timeout in seconds."""
+        if self.srtt is None:
+            return self.max_timeout
+        timeout = (self.srtt + 4 * self.rttvar) * self._backoff
+        return min(max(timeout, self.min_timeout), self.max_timeout)
+
+    @property
+    def hedge_delay(self) -> float | None:
+        """Time after which a request is hedged, or None before any sample."""
+        if self.srtt is None:
+            return None
+        return self.srtt + 2 * self.rttvar
+
+
+@dataclass
+class _Replica:
+    url: str
+    latency: LatencyEstimator
+    failures: int = 0
+
+
+@dataclass
+class _Pending:
+    payload: dict[str, Any]
+    future: asyncio.Future = field(repr=False)
+
+
+class RerankerClient:
+    """Async client for one or more BGE Reranker API replicas."""
+
+    def __init__(
+        self,
+        base_urls: str | list[str] = "http://localhost:8000",
+        *,
+        response_format: str = "binary",
+        http2: bool = True,
+        h2c: bool = False,
+        uds: str | None = None,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        max_retries: int = 2,
+        retry_backoff: float = 0.05,
+        max_retry_after: float = 5.0,
+        hedge: bool = True,
+        coalesce_window_ms: float = 2.0,
+        coalesce_max_documents: int = 64,
+        coalesce_max_requests: int = 32,
+        min_timeout: float = 0.5,
+        max_timeout: float = 30.0,
+        headers: dict[str, str] | None = None,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        """Initialize the client.
+
+        Args:
+            base_urls: Server URL, or URLs of several replicas
+            response_format: "binary", "compact" or "json"
+            http2: Use HTTP/2 when the h2 package is installed
+            h2c: Speak HTTP/2 to http:// URLs by prior knowledge (needs a
+                server started with --http2)
+            uds: Connect to a server's Unix domain socket instead of TCP;
+                base URLs then only set the Host header
+            max_connections: Connection pool size
+            max_keepalive_connections: Idle connections kept open
+            keepalive_expiry: Seconds an idle connection is kept open
+            max_retries: Retries after a retryable failure
+            retry_backoff: Base delay of the exponential retry backoff
+            max_retry_after: Longest Retry-After of a 429 that is waited
+                out; a 429 with a longer or no Retry-After is raised
+            hedge: Send a second copy of slow requests to another replica
+            coalesce_window_ms: How long small calls wait to be batched
+                (0 disables coalescing)
+            coalesce_max_documents: Calls with more documents are sent alone
+            coalesce_max_requests: Flush a batch once it has this many calls
+            min_timeout: Lower bound of the adaptive timeout in seconds
+            max_timeout: Upper bound of the adaptive timeout in seconds
+            headers: Extra headers sent with every request (e.g. X-API-Key)
+            transport: Custom httpx transport
+        """
+        if response_format not in RESPONSE_FORMATS:
+            raise ValueError(f"Unknown response format: {response_format}")
+        if isinstance(base_urls, str):
+            base_urls = [base_urls]
+        if not base_urls:
+            raise ValueError("At least one base URL is required")
+
+        self.media_type = RESPONSE_FORMATS[response_format]
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.max_retry_after = max_retry_after
+        self.hedge = hedge
+        self.coalesce_window = coalesce_window_ms / 1000
+        self.coalesce_max_documents = coalesce_max_documents
+        self.coalesce_max_requests = coalesce_max_requests
+        self._replicas = [
+            _Replica(url.rstrip("/"), LatencyEstimator(min_timeout, max_timeout))
+            for url in base_urls
+        ]
+
+        if (http2 or h2c) and importlib.util.find_spec("h2") is None:
+            logger.info("h2 is not installed, using HTTP/1.1 keep-alive connections")
+            http2 = h2c = False
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        if transport is None and uds is not None:
+            transport = httpx.AsyncHTTPTransport(
+                uds=uds, http1=not h2c, http2=http2 or h2c, limits=limits
+            )
+        self._client = httpx.AsyncClient(
+            http1=not h2c,
+            http2=http2 or h2c,
+            limits=limits,
+            headers={"accept": self.media_type, **(headers or {})},
+            transport=transport,
+        )
+
+        self._pending: list[_Pending] = []
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._batch_tasks: set[asyncio.Task] = set()
+
+    async def __aenter__(self) -> Self:
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Flush coalesced calls and close all connections."""
+        self._flush()
+        if self._batch_tasks:
+            await asyncio.gather(*self._batch_tasks, return_exceptions=True)
+        await self._client.aclose()
+
+    async def health(self) -> HealthResponse:
+        """Return the health of the first replica that answers."""
+        response = await self._request(
+            lambda replica: self._client.get(
+                f"{replica.url}/health", timeout=replica.latency.timeout
+            )
+        )
+        return HealthResponse.model_validate_json(response.content)
+
+    async def rerank(
+        self,
+        query: str,
+        documents: list[str],
+        top_k: int | None = None,
+        normalize: bool = True,
+        return_documents: bool = True,
+    ) -> RerankResponse:
+        """Rerank documents based on relevance to query.
+
+        Args:
+            query: The search query
+            documents: List of documents to rerank
+            top_k: Number of top results to return (None for all)
+            normalize: Whether to normalize scores using sigmoid
+            return_documents: Whether to include document texts in results
+
+        Returns:
+            RerankResponse, as returned by the server's JSON format
+        """
+        payload = {
+            "query": query,
+            "documents": documents,
+            "top_k": top_k,
+            "normalize": normalize,
+            # Texts are filled in locally, never sent back
+            "return_documents": False,
+        }
+        if self.coalesce_window <= 0 or len(documents) > self.coalesce_max_documents:
+            [result] = await self._post("/rerank", payload)
+        else:
+            result = await self._enqueue(payload)
+        return _to_response(query, documents, result, return_documents)
+
+    async def rerank_many(self, requests: list[dict[str, Any]]) -> list[RerankResponse]:
+        """Rerank several requests with one /rerank/batch call.
+
+        Args:
+            requests: Keyword arguments of rerank() for each request
+
+        Returns:
+            One RerankResponse per request
+        """
+        payloads = [
+            {
+                "query": request["query"],
+                "documents": request["documents"],
+                "top_k": request.get("top_k"),
+                "normalize": request.get("normalize", True),
+                "return_documents": False,
+            }
+            for request in requests
+        ]
+        results = await self._post("/rerank/batch", {"requests": payloads})
+        return [
+            _to_response(
+                request["query"],
+                request["documents"],
+                result,
+                request.get("return_documents", True),
+            )
+            for request, result in zip(requests, results, strict=True)
+        ]
+
+    async def _enqueue(self, payload: dict[str, Any]) -> RankedResult:
+        """Add a call to the current coalescing window."""
+        loop = asyncio.get_running_loop()
+        pending = _Pending(payload, loop.create_future())
+        self._pending.append(pending)
+        if len(self._pending) >= self.coalesce_max_requests:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.coalesce_window, self._flush)
+        return await pending.future
+
+    def _flush(self) -> None:
+        """Send the calls of the current coalescing window."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        task = asyncio.get_running_loop().create_task(self._send_batch(batch))
+        self._batch_tasks.add(task)
+        task.add_done_callback(self._batch_tasks.discard)
+
+    async def _send_batch(self, batch: list[_Pending]) -> None:
+        try:
+            if len(batch) == 1:
+                results = await self._post("/rerank", batch[0].payload)
+            else:
+                results = await self._post(
+                    "/rerank/batch", {"requests": [p.payload for p in batch]}
+                )
+        except Exception as e:
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_exception(e)
+            return
+        for pending, result in zip(batch, results, strict=True):
+            if not pending.future.done():
+                pending.future.set_result(result)
+
+    async def _post(self, path: str, payload: dict[str, Any]) -> list[RankedResult]:
+        response = await self._request(
+            lambda replica: self._client.post(
+                f"{replica.url}{path}", json=payload, timeout=replica.latency.timeout
+            )
+        )
+        results = decode(response.headers.get("content-type"), response.content)
+        degradation = response.headers.get("x-degradation")
+        if degradation:
+            labels = [label.strip() for label in degradation.split(",")]
+            for result in results:
+                if result.degradation is None:
+                    result.degradation = labels
+        return results
+
+    async def _request(self, send: Any) -> httpx.Response:
+        """Send a request with hedging and retries."""
+        last_error: Exception | None = None
+        for attempt in range(self.max_retries + 1):
+            if isinstance(last_error, RateLimitedError):
+                # Only the replica that enforces the quota is asked again
+                await asyncio.sleep(last_error.retry_after)
+            elif attempt:
+                delay = self.retry_backoff * 2 ** (attempt - 1)
+                await asyncio.sleep(delay * (0.5 + random.random()))
+            try:
+                if isinstance(last_error, RateLimitedError):
+                    return await self._attempt(last_error.replica, send)
+                return await self._hedged(send)
+            except (RetryableError, RateLimitedError) as e:
+                last_error = e
+                logger.debug(f"Request attempt {attempt + 1} failed: {e}")
+        if isinstance(last_error, RateLimitedError):
+            last_error.response.raise_for_status()
+        assert last_error is not None
+        raise last_error
+
+    def _ranked_replicas(self) -> list[_Replica]:
+        """Order replicas by recent failures, then by smoothed latency."""
+        replicas = self._replicas.copy()
+        random.shuffle(replicas)
+        return sorted(
+            replicas,
+            key=lambda r: (min(r.failures, 3), r.latency.srtt or 0.0),
+        )
+
+    async def _hedged(self, send: Any) -> httpx.Response:
+        replicas = self._ranked_replicas()
+        primary = replicas[0]
+        tasks = {asyncio.create_task(self._attempt(primary, send))}
+
+        hedge_delay = primary.latency.hedge_delay
+        if self.hedge and len(replicas) > 1 and hedge_delay is not None:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+            if not done:
+                tasks.add(asyncio.create_task(self._attempt(replicas[1], send)))
+
+        error: BaseException | None = None
+        while tasks:
+            done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None or isinstance(
+                    task.exception(), RateLimitedError
+                ):
+                    # A 429 ends the request rather than waiting for a hedge
+                    for other in tasks:
+                        other.cancel()
+                    return task.result()
+                error = task.exception()
+        assert error is not None
+        raise error
+
+    async def _attempt(self, replica: _Replica, send: Any) -> httpx.Response:
+        start_time = time.monotonic()
+        try:
+            response = await send(replica)
+        except httpx.TimeoutException as e:
+            replica.failures += 1
+            replica.latency.backoff()
+            raise RetryableError(f"{replica.url}: timed out") from e
+        except httpx.TransportError as e:
+            replica.failures += 1
+            raise RetryableError(f"{replica.url}: {e}") from e
+
+        if response.status_code in RETRY_STATUS_CODES:
+            replica.failures += 1
+            raise RetryableError(f"{replica.url}: HTTP {response.status_code}")
+        if response.status_code == 429:
+            retry_after = _retry_after(response)
+            if retry_after is not None and retry_after <= self.max_retry_after:
+                raise RateLimitedError(replica, retry_after, response)
+        response.raise_for_status()
+
+        replica.failures = 0
+        replica.latency.observe(time.monotonic() - start_time)
+        return response
+
+
+def _to_response(
+    query: str, documents: list[str], result: RankedResult, return_documents: bool
+) -> RerankResponse:
+    """Rebuild the JSON response model from a compact result."""
+    items = [
+        ScoreItem(
+            index=index,
+            score=score,
+            document=documents[index] if return_documents else "",
+        )
+        for index, score in zip(result.indices, result.scores, strict=True)
+    ]
+    unique = result.unique_documents
+    return RerankResponse(
+        results=items,
+        query=query,
+        total_documents=result.total_documents,
+        returned_results=len(items),
+        processing_time_ms=result.processing_time_ms,
+        unique_documents=unique,
+        dedup_ratio=1.0 - unique / len(documents) if unique and documents else 0.0,
+        degradation=result.degradation,
+    )
@@ -0,0 +1,162 @@
+"""Response encodings negotiated with the Accept header.
+
+Besides the default JSON response, ``/rerank`` and ``/rerank/batch`` can
+answer in two smaller formats that leave out the document texts (the client
+already has them) and the query:
+
+* compact JSON (``application/vnd.bge-reranker.compact+json``)::
+
+      {"results": [{"i": [2, 0], "s": [0.98, 0.12], "n": 3, "u": 3, "t": 4.2}]}
+
+* binary (``application/vnd.bge-reranker.binary``), little-endian: the magic
+  ``b"BGR1"`` and a uint32 result count, then per result a uint32 document
+  count, a uint32 returned count, an int32 unique document count (-1 when
+  unknown), a float64 processing time in ms, the returned indices as uint32
+  and their scores as float32.
+
+Neither format carries the applied degradations; they are sent in the
+``X-Degradation`` header, which applies to every result of the response.
+"""
+
+import json
+import struct
+from dataclasses import dataclass
+from typing import Any
+
+JSON_MEDIA_TYPE = "application/json"
+COMPACT_MEDIA_TYPE = "application/vnd.bge-reranker.compact+json"
+BINARY_MEDIA_TYPE = "application/vnd.bge-reranker.binary"
+
+_MAGIC = b"BGR1"
+_HEADER = struct.Struct("<4sI")
+_RESULT_HEADER = struct.Struct("<IIid")
+
+
+@dataclass
+class RankedResult:
+    """Ranking of one request without document texts."""
+
+    indices: list[int]
+    scores: list[float]
+    total_documents: int
+    processing_time_ms: float
+    unique_documents: int | None = None
+    # Not encoded, see the X-Degradation header
+    degradation: list[str] | None = None
+
+
+def negotiate(accept: str | None) -> str:
+    """Pick the response media type for an Accept header."""
+    if accept:
+        if BINARY_MEDIA_TYPE in accept:
+            return BINARY_MEDIA_TYPE
+        if COMPACT_MEDIA_TYPE in accept:
+            return COMPACT_MEDIA_TYPE
+    return JSON_MEDIA_TYPE
+
+
+def encode_compact(results: list[RankedResult]) -> bytes:
+    """Encode results as compact JSON."""
+    return json.dumps(
+        {
+            "results": [
+                {
+                    "i": result.indices,
+                    "s": result.scores,
+                    "n": result.total_documents,
+                    "u": result.unique_documents,
+                    "t": result.processing_time_ms,
+                }
+                for result in results
+            ]
+        },
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def decode_compact(body: bytes) -> list[RankedResult]:
+    """Decode compact JSON results."""
+    return [
+        RankedResult(
+            indices=item["i"],
+            scores=item["s"],
+            total_documents=item["n"],
+            processing_time_ms=item["t"],
+            unique_documents=item.get("u"),
+        )
+        for item in json.loads(body)["results"]
+    ]
+
+
+def encode_binary(results: list[RankedResult]) -> bytes:
+    """Encode results in the binary format."""
+    parts = [_HEADER.pack(_MAGIC, len(results))]
+    for result in results:
+        count = len(result.indices)
+        parts.append(
+            _RESULT_HEADER.pack(
+                result.total_documents,
+                count,
+                -1 if result.unique_documents is None else result.unique_documents,
+                result.processing_time_ms,
+            )
+        )
+        parts.append(struct.pack(f"<{count}I{count}f", *result.indices, *result.scores))
+    return b"".join(parts)
+
+
+def decode_binary(body: bytes) -> list[RankedResult]:
+    """Decode results in the binary format."""
+    magic, num_results = _HEADER.unpack_from(body, 0)
+    if magic != _MAGIC:
+        raise ValueError("Not a binary rerank response")
+    offset = _HEADER.size
+    results: list[RankedResult] = []
+    for _ in range(num_results):
+        total, count, unique, processing_time = _RESULT_HEADER.unpack_from(body, offset)
+        offset += _RESULT_HEADER.size
+        values = struct.unpack_from(f"<{count}I{count}f", body, offset)
+        offset += 8 * count
+        results.append(
+            RankedResult(
+                indices=list(values[:count]),
+                scores=list(values[count:]),
+                total_documents=total,
+                processing_time_ms=processing_time,
+                unique_documents=None if unique < 0 else unique,
+            )
+        )
+    return results
+
+
+def _from_json_response(data: dict[str, Any]) -> RankedResult:
+    return RankedResult(
+        indices=[item["index"] for item in data["results"]],
+        scores=[item["score"] for item in data["results"]],
+        total_documents=data["total_documents"],
+        processing_time_ms=data["processing_time_ms"],
+        unique_documents=data.get("unique_documents"),
+        degradation=data.get("degradation"),
+    )
+
+
+def decode(content_type: str | None, body: bytes) -> list[RankedResult]:
+    """Decode a /rerank or /rerank/batch response body of any format."""
+    content_type = content_type or JSON_MEDIA_TYPE
+    if content_type.startswith(BINARY_MEDIA_TYPE):
+        return decode_binary(body)
+    if content_type.startswith(COMPACT_MEDIA_TYPE):
+        return decode_compact(body)
+    data = json.loads(body)
+    if "query" in data:
+        return [_from_json_response(data)]
+    return [_from_json_response(item) for item in data["results"]]
+
+
+def encode(results: list[RankedResult], media_type: str) -> bytes:
+    """Encode results in a non-JSON media type returned by negotiate()."""
+    if media_type == BINARY_MEDIA_TYPE:
+        return encode_binary(results)
+    if media_type == COMPACT_MEDIA_TYPE:
+        return encode_compact(results)
+    raise ValueError(f"Unsupported media type: {media_type}")
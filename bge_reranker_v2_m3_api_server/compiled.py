@@ -0,0 +1,228 @@
+"""Compiled cross-encoder forward pass with fixed shape buckets.
+
+FlagReranker runs the model eagerly and pads every batch to its longest
+pair, so batch and sequence shapes change from call to call. Compiling
+such a model with torch.compile would recompile on nearly every new shape.
+Instead, pairs are tokenized once, grouped by a sequence-length bucket and
+padded to a (batch, seq_len) bucket, and every bucket is compiled during
+warm-up, so requests only ever run shapes that are already compiled.
+
+If compilation or warm-up fails, the service keeps using FlagReranker's
+eager compute_score.
+
+Requests run on several threads at once. A fast tokenizer must not be
+called concurrently with different truncation or padding settings ("Already
+borrowed"), so every thread encodes with its own copy.
+"""
+
+import copy
+import logging
+import threading
+import time
+from typing import Any
+
+import numpy as np
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_BUCKETS = (1, 4, 16, 32)
+DEFAULT_SEQ_BUCKETS = (128, 256, 512)
+
+
+def select_bucket(value: int, buckets: tuple[int, ...]) -> int | None:
+    """Return the smallest bucket holding value, or None if none does."""
+    for bucket in buckets:
+        if bucket >= value:
+            return bucket
+    return None
+
+
+def _import_torch() -> Any:
+    import torch
+
+    return torch
+
+
+class CompiledForward:
+    """Run the reranker's model compiled for a fixed set of input shapes."""
+
+    def __init__(
+        self,
+        batch_buckets: tuple[int, ...] = DEFAULT_BATCH_BUCKETS,
+        seq_buckets: tuple[int, ...] = DEFAULT_SEQ_BUCKETS,
+        backend: str = "inductor",
+        mode: str | None = None,
+    ):
+        """Initialize the compiled forward pass.
+
+        Args:
+            batch_buckets: Batch sizes compiled at warm-up; larger batches
+                are split at the largest one
+            seq_buckets: Padded sequence lengths compiled at warm-up; the
+                model's max_length is always added
+            backend: torch.compile backend
+            mode: torch.compile mode (e.g. "max-autotune")
+        """
+        if not batch_buckets or not seq_buckets:
+            raise ValueError("At least one batch and one sequence bucket is needed")
+        if min(batch_buckets) < 1 or min(seq_buckets) < 1:
+            raise ValueError("Shape buckets must be positive")
+
+        self.batch_buckets = tuple(sorted(set(batch_buckets)))
+        self.seq_buckets = tuple(sorted(set(seq_buckets)))
+        self.backend = backend
+        self.mode = mode
+        self.max_length = self.seq_buckets[-1]
+        self._torch: Any = None
+        self._model: Any = None
+        self._tokenizer: Any = None
+        self._local = threading.local()
+        self._device: Any = None
+
+    @property
+    def ready(self) -> bool:
+        """Whether the compiled model is warmed up and usable."""
+        return self._model is not None
+
+    def shapes(self) -> list[tuple[int, int]]:
+        """Return the (batch, seq_len) shapes compiled at warm-up."""
+        return [
+            (batch, seq_len)
+            for seq_len in self.seq_buckets
+            for batch in self.batch_buckets
+        ]
+
+    def load(self, model: Any, tokenizer: Any, max_length: int) -> bool:
+        """Compile model and run every shape bucket once.
+
+        Returns:
+            True if the compiled model is ready, False if the caller should
+            stay in eager mode
+        """
+        self.unload()
+        self.max_length = max_length
+        self.seq_buckets = tuple(
+            sorted({seq for seq in self.seq_buckets if seq < max_length} | {max_length})
+        )
+        start_time = time.perf_counter()
+        try:
+            torch = _import_torch()
+            # One graph per shape; the default limit of 8 would fall back to
+            # eager for the remaining buckets
+            dynamo_config = torch._dynamo.config
+            dynamo_config.cache_size_limit = max(
+                dynamo_config.cache_size_limit, len(self.shapes()) + 8
+            )
+            compiled = torch.compile(
+                model, backend=self.backend, mode=self.mode, dynamic=False
+            )
+            device = next(model.parameters()).device
+            pad_id = tokenizer.pad_token_id or 0
+            with torch.inference_mode():
+                for batch, seq_len in self.shapes():
+                    compiled(
+                        input_ids=torch.full(
+                            (batch, seq_len), pad_id, dtype=torch.long, device=device
+                        ),
+                        attention_mask=torch.ones(
+                            (batch, seq_len), dtype=torch.long, device=device
+                        ),
+                        return_dict=True,
+                    )
+        except Exception as e:
+            logger.warning(f"Compiling the forward pass failed, using eager mode: {e}")
+            metrics.inc("compile_fallbacks_total", reason="compile")
+            return False
+
+        self._torch = torch
+        self._model = compiled
+        self._tokenizer = tokenizer
+        self._device = device
+        elapsed = time.perf_counter() - start_time
+        metrics.set_gauge("compiled_shapes", len(self.shapes()))
+        logger.info(
+            f"Compiled forward pass for {len(self.shapes())} shapes in {elapsed:.1f}s"
+        )
+        return True
+
+    def unload(self) -> None:
+        """Drop the compiled model."""
+        self._model = None
+        self._tokenizer = None
+        self._local = threading.local()
+        self._device = None
+
+    def _thread_tokenizer(self) -> Any:
+        """Return the calling thread's own copy of the tokenizer."""
+        tokenizer = getattr(self._local, "tokenizer", None)
+        if tokenizer is None:
+            tokenizer = copy.deepcopy(self._tokenizer)
+            self._local.tokenizer = tokenizer
+        return tokenizer
+
+    def __call__(
+        self,
+        pairs: list[tuple[str, str]],
+        normalize: bool,
+        max_length: int | None = None,
+    ) -> np.ndarray:
+        """Score pairs with the compiled model.
+
+        Args:
+            pairs: List of (query, document) tuples
+            normalize: Whether to normalize scores using sigmoid
+            max_length: Shorter model input length for this call
+        """
+        if not self.ready:
+            raise RuntimeError("The compiled forward pass is not loaded")
+        max_length = min(max_length or self.max_length, self.max_length)
+        tokenizer = self._thread_tokenizer()
+        encoded = tokenizer(
+            [query for query, _ in pairs],
+            [doc for _, doc in pairs],
+            truncation=True,
+            max_length=max_length,
+        )
+        input_ids = encoded["input_ids"]
+
+        groups: dict[int, list[int]] = {}
+        for i, ids in enumerate(input_ids):
+            seq_len = select_bucket(len(ids), self.seq_buckets) or self.max_length
+            groups.setdefault(seq_len, []).append(i)
+
+        scores = np.zeros(len(pairs))
+        largest = self.batch_buckets[-1]
+        for seq_len, indices in groups.items():
+            for start in range(0, len(indices), largest):
+                chunk = indices[start : start + largest]
+                scores[chunk] = self._run(
+                    tokenizer, [input_ids[i] for i in chunk], seq_len, normalize
+                )
+        return scores
+
+    def _run(
+        self, tokenizer: Any, rows: list[list[int]], seq_len: int, normalize: bool
+    ) -> np.ndarray:
+        """Pad rows to a compiled shape and run the model."""
+        torch = self._torch
+        batch = select_bucket(len(rows), self.batch_buckets) or len(rows)
+        # Filler rows repeat a real row; all-padding rows can produce NaNs
+        padded = rows + [rows[0]] * (batch - len(rows))
+        features = tokenizer.pad(
+            {"input_ids": padded},
+            padding="max_length",
+            max_length=seq_len,
+            return_tensors="pt",
+        )
+        with torch.inference_mode():
+            logits = self._model(
+                input_ids=features["input_ids"].to(self._device),
+                attention_mask=features["attention_mask"].to(self._device),
+                return_dict=True,
+            ).logits
+            scores = logits.view(-1).float()[: len(rows)]
+            if normalize:
+                scores = torch.sigmoid(scores)
+        return scores.cpu().numpy()
@@ -0,0 +1,297 @@
+"""Request and response compression with input size limits.
+
+Large candidate sets make request bodies megabytes of JSON. The middleware
+accepts gzip, deflate and zstd request bodies (``Content-Encoding``) and
+compresses responses according to ``Accept-Encoding``. While a body is read
+it enforces a byte cap on both the compressed and the decoded size, so a
+giant or maliciously compressed request is rejected with 413 before any
+JSON parsing. Character caps per document and per request are checked by
+the request models right after parsing.
+
+zstd needs the optional ``zstandard`` package.
+"""
+
+import io
+import json
+import logging
+import zlib
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .metrics import metrics
+
+if TYPE_CHECKING:
+    import zstandard
+else:
+    try:
+        import zstandard
+    except ImportError:
+        zstandard = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+
+class PayloadTooLargeError(Exception):
+    """Raised when a request body exceeds the configured byte cap."""
+
+
+@dataclass
+class InputLimits:
+    """Size caps on request inputs; 0 disables a cap."""
+
+    max_request_bytes: int = 64 * 1024 * 1024
+    max_request_chars: int = 16_000_000
+    max_document_chars: int = 100_000
+    max_document_bytes: int = 0
+
+    def check_texts(self, query: str, documents: list[str]) -> None:
+        """Raise ValueError if the query or documents exceed a character cap."""
+        total = len(query)
+        for index, document in enumerate(documents):
+            length = len(document)
+            total += length
+            if self.max_document_chars and length > self.max_document_chars:
+                raise ValueError(
+                    f"Document {index} has {length} characters "
+                    f"(limit {self.max_document_chars})"
+                )
+            # UTF-8 needs at most 4 bytes per character, so most documents
+            # are never encoded
+            if (
+                self.max_document_bytes
+                and length * 4 > self.max_document_bytes
+                and len(document.encode("utf-8")) > self.max_document_bytes
+            ):
+                raise ValueError(
+                    f"Document {index} exceeds {self.max_document_bytes} bytes"
+                )
+        if self.max_request_chars and total > self.max_request_chars:
+            raise ValueError(
+                f"Request has {total} characters (limit {self.max_request_chars})"
+            )
+
+
+# Process-wide limits, configured at startup and used by the request models
+input_limits = InputLimits()
+
+
+def supported_encodings() -> list[str]:
+    """Return the content codings this server can decode and produce."""
+    return ["zstd", "gzip", "deflate"] if zstandard is not None else ["gzip", "deflate"]
+
+
+def negotiate_encoding(accept_encoding: str | None) -> str | None:
+    """Pick a response coding from an Accept-Encoding header, or None."""
+    if not accept_encoding:
+        return None
+    accepted: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    for coding in supported_encodings():
+        if accepted.get(coding, accepted.get("*", 0.0)) > 0:
+            return coding
+    return None
+
+
+def decompress(body: bytes, encoding: str, limit: int = 0) -> bytes:
+    """Decode a request body, failing once more than limit bytes come out.
+
+    Raises:
+        PayloadTooLargeError: If the decoded body exceeds limit
+        ValueError: If the coding is unsupported or the body is corrupt
+    """
+    max_length = limit + 1 if limit else -1
+    if encoding in ("gzip", "x-gzip", "deflate"):
+        # wbits=47 detects gzip and zlib headers; raw deflate is the fallback
+        try:
+            decoder = zlib.decompressobj(47)
+            decoded = decoder.decompress(body, max(max_length, 0))
+        except zlib.error:
+            try:
+                decoder = zlib.decompressobj(-zlib.MAX_WBITS)
+                decoded = decoder.decompress(body, max(max_length, 0))
+            except zlib.error as e:
+                raise ValueError(f"Invalid {encoding} body: {e}") from e
+        if not limit:
+            decoded += decoder.flush()
+    elif encoding == "zstd" and zstandard is not None:
+        try:
+            reader = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(body))
+            decoded = reader.read(max_length)
+        except zstandard.ZstdError as e:
+            raise ValueError(f"Invalid zstd body: {e}") from e
+    else:
+        raise ValueError(f"Unsupported content encoding: {encoding}")
+
+    if limit and len(decoded) > limit:
+        raise PayloadTooLargeError(f"Decoded request body exceeds {limit} bytes")
+    return decoded
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Encode a response body with a coding from supported_encodings()."""
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(body)
+    if encoding == "gzip":
+        compressor = zlib.compressobj(5, zlib.DEFLATED, 31)
+    elif encoding == "deflate":
+        compressor = zlib.compressobj(5)
+    else:
+        raise ValueError(f"Unsupported content encoding: {encoding}")
+    return compressor.compress(body) + compressor.flush()
+
+
+class CompressionMiddleware:
+    """Decode compressed request bodies and compress responses."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        limits: InputLimits = input_limits,
+    ):
+        """Initialize the middleware.
+
+        Args:
+            app: Wrapped ASGI application
+            minimum_size: Smallest response body that is compressed
+            limits: Byte cap on request bodies (read at request time)
+        """
+        self.app = app
+        self.minimum_size = minimum_size
+        self.limits = limits
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        response_encoding = negotiate_encoding(headers.get("accept-encoding"))
+        if response_encoding is not None:
+            send = self._compressing_send(send, response_encoding)
+
+        request_encoding = headers.get("content-encoding", "identity").lower()
+        if request_encoding not in ("identity", "x-gzip", *supported_encodings()):
+            metrics.inc("payload_rejected_total", reason="unsupported_encoding")
+            await self._error(
+                send, 415, f"Unsupported content encoding: {request_encoding}"
+            )
+            return
+
+        limit = self.limits.max_request_bytes
+        content_length = headers.get("content-length")
+        if request_encoding == "identity" and not limit:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            if limit and content_length and int(content_length) > limit:
+                raise PayloadTooLargeError(f"Request body exceeds {limit} bytes")
+            body = await self._read_body(receive, limit)
+            if request_encoding != "identity":
+                body = decompress(body, request_encoding, limit)
+        except PayloadTooLargeError as e:
+            metrics.inc("payload_rejected_total", reason="too_large")
+            await self._error(send, 413, str(e))
+            return
+        except ValueError as e:
+            metrics.inc("payload_rejected_total", reason="bad_encoding")
+            await self._error(send, 400, str(e))
+            return
+
+        if request_encoding != "identity":
+            scope = dict(scope)
+            scope["headers"] = [
+                (name, value)
+                for name, value in scope["headers"]
+                if name not in (b"content-encoding", b"content-length")
+            ] + [(b"content-length", str(len(body)).encode())]
+
+        delivered = False
+
+        async def replay() -> Message:
+            nonlocal delivered
+            if delivered:
+                return await receive()
+            delivered = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        await self.app(scope, replay, send)
+
+    @staticmethod
+    async def _read_body(receive: Receive, limit: int) -> bytes:
+        chunks = []
+        size = 0
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                break
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if limit and size > limit:
+                raise PayloadTooLargeError(f"Request body exceeds {limit} bytes")
+            chunks.append(chunk)
+            if not message.get("more_body", False):
+                break
+        return b"".join(chunks)
+
+    @staticmethod
+    async def _error(send: Send, status_code: int, detail: str) -> None:
+        body = json.dumps({"detail": detail}).encode("utf-8")
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status_code,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+    def _compressing_send(self, send: Send, encoding: str) -> Send:
+        start: Message | None = None
+        chunks: list[bytes] = []
+
+        async def compressing_send(message: Message) -> None:
+            nonlocal start
+            if message["type"] == "http.response.start":
+                if "content-encoding" in Headers(raw=message["headers"]):
+                    start = None
+                    await send(message)
+                else:
+                    start = message
+                return
+            if start is None or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+
+            body = b"".join(chunks)
+            headers = MutableHeaders(raw=list(start["headers"]))
+            if len(body) >= self.minimum_size:
+                body = compress(body, encoding)
+                headers["content-encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                metrics.inc("compressed_responses_total", encoding=encoding)
+            headers["content-length"] = str(len(body))
+            await send({**start, "headers": headers.raw})
+            await send({"type": "http.response.body", "body": body})
+
+        return compressing_send
@@ -0,0 +1,132 @@
+"""Document deduplication and cross-request score caching."""
+
+import hashlib
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+
+DEDUP_MODES = ("off", "exact", "normalized")
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Normalize a document for duplicate detection.
+
+    Applies NFKC normalization (the same normalization the XLM-RoBERTa
+    tokenizer of bge-reranker-v2-m3 applies) and collapses runs of whitespace,
+    so documents that only differ in formatting map to the same key.
+    """
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+
+def dedup_key(text: str, mode: str) -> str:
+    """Return the key used to compare documents under a dedup mode."""
+    if mode == "normalized":
+        return normalize_text(text)
+    return text
+
+
+def _collapse(items: list, keys: list) -> tuple[list, list[int]]:
+    positions: dict = {}
+    unique: list = []
+    inverse: list[int] = []
+    for item, key in zip(items, keys, strict=True):
+        position = positions.get(key)
+        if position is None:
+            position = len(unique)
+            positions[key] = position
+            unique.append(item)
+        inverse.append(position)
+    return unique, inverse
+
+
+def deduplicate(
+    documents: list[str], mode: str = "normalized"
+) -> tuple[list[str], list[int]]:
+    """Collapse duplicate documents.
+
+    Args:
+        documents: Documents in their original order
+        mode: "off", "exact" or "normalized"
+
+    Returns:
+        Tuple of (unique_documents, inverse) where unique_documents keeps the
+        first occurrence of every distinct document and inverse[i] is the
+        position of documents[i] in unique_documents
+    """
+    if mode not in DEDUP_MODES:
+        raise ValueError(f"Unknown dedup mode: {mode}")
+    if mode == "off":
+        return list(documents), list(range(len(documents)))
+    return _collapse(documents, [dedup_key(doc, mode) for doc in documents])
+
+
+def deduplicate_pairs(
+    pairs: list[tuple[str, str]], mode: str = "normalized"
+) -> tuple[list[tuple[str, str]], list[int]]:
+    """Collapse duplicate (query, document) pairs, see deduplicate."""
+    if mode not in DEDUP_MODES:
+        raise ValueError(f"Unknown dedup mode: {mode}")
+    if mode == "off":
+        return list(pairs), list(range(len(pairs)))
+    return _collapse(pairs, [(query, dedup_key(doc, mode)) for query, doc in pairs])
+
+
+def pair_fingerprint(query: str, document: str, normalize: bool, mode: str) -> bytes:
+    """Hash a (query, document, normalize) triple into a compact cache key."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(b"1" if normalize else b"0")
+    digest.update(query.encode("utf-8"))
+    digest.update(b"\x00")
+    digest.update(dedup_key(document, mode).encode("utf-8"))
+    return digest.digest()
+
+
+class ScoreCache:
+    """Thread-safe LRU cache of pair scores shared across requests.
+
+    Keys are 16-byte fingerprints, so memory use does not grow with document
+    length.
+    """
+
+    def __init__(self, max_size: int = 10000):
+        """Initialize the cache.
+
+        Args:
+            max_size: Maximum number of cached pair scores
+        """
+        self.max_size = max_size
+        self._entries: OrderedDict[bytes, float] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_many(self, keys: list[bytes]) -> list[float | None]:
+        """Look up several keys, refreshing the recency of hits."""
+        results: list[float | None] = []
+        with self._lock:
+            for key in keys:
+                score = self._entries.get(key)
+                if score is not None:
+                    self._entries.move_to_end(key)
+                results.append(score)
+        return results
+
+    def put_many(self, items: list[tuple[bytes, float]]) -> None:
+        """Store several scores, evicting the least recently used entries."""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            for key, score in items:
+                self._entries[key] = score
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
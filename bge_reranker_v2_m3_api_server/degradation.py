@@ -0,0 +1,169 @@
+"""Latency-SLO-aware degradation under overload.
+
+When the queue grows, every request slows down equally until all of them
+miss the SLO. The policy instead watches the p95 queue wait and p95 latency
+of recent requests and, as they exceed the SLO, degrades new requests in
+steps that trade ranking quality for time:
+
+* max_length: score pairs with a shorter model input length
+* max_documents: only rerank the first N documents of a request
+* fallback_model: score with a cheaper model
+* cache_only: answer from the score cache without running a model
+
+Each mode switches on when the pressure (observed p95 / SLO, the larger of
+latency and queue wait) reaches its threshold and off again once pressure
+falls below a fraction of it, so modes do not flap around a threshold.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+MODES = ("max_length", "max_documents", "fallback_model", "cache_only")
+
+DEFAULT_THRESHOLDS = {"max_length": 1.0, "max_documents": 1.5, "cache_only": 3.0}
+
+
+@dataclass(frozen=True)
+class Degradation:
+    """Degradations applied to one request."""
+
+    max_length: int | None = None
+    max_documents: int | None = None
+    fallback_model: bool = False
+    cache_only: bool = False
+
+    def __bool__(self) -> bool:
+        return bool(self.labels())
+
+    def labels(self) -> list[str]:
+        """Describe the applied modes, e.g. ["max_length=256", "cache_only"]."""
+        labels = []
+        if self.max_length is not None:
+            labels.append(f"max_length={self.max_length}")
+        if self.max_documents is not None:
+            labels.append(f"max_documents={self.max_documents}")
+        if self.fallback_model:
+            labels.append("fallback_model")
+        if self.cache_only:
+            labels.append("cache_only")
+        return labels
+
+
+NO_DEGRADATION = Degradation()
+
+
+def _p95(values: list[float]) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+
+class DegradationPolicy:
+    """Choose degradation modes from recent queue wait and latency."""
+
+    def __init__(
+        self,
+        latency_slo_ms: float,
+        queue_wait_slo_ms: float | None = None,
+        thresholds: dict[str, float] | None = None,
+        max_length: int = 256,
+        max_documents: int = 100,
+        window_seconds: float = 30.0,
+        min_samples: int = 20,
+        hysteresis: float = 0.8,
+        evaluate_interval: float = 0.5,
+    ):
+        """Initialize the policy.
+
+        Args:
+            latency_slo_ms: Target p95 request latency
+            queue_wait_slo_ms: Target p95 queue wait (default: half the
+                latency SLO)
+            thresholds: Pressure at which each mode switches on; modes not
+                listed are never used
+            max_length: Model input length in max_length mode
+            max_documents: Documents per request in max_documents mode
+            window_seconds: Age of the oldest sample considered
+            min_samples: Samples needed before any mode switches on
+            hysteresis: A mode switches off below this fraction of its
+                threshold
+            evaluate_interval: Seconds between re-evaluations
+        """
+        if latency_slo_ms <= 0:
+            raise ValueError("latency_slo_ms must be positive")
+        unknown = set(thresholds or {}) - set(MODES)
+        if unknown:
+            raise ValueError(f"Unknown degradation modes: {', '.join(sorted(unknown))}")
+
+        self.latency_slo = latency_slo_ms / 1000
+        self.queue_wait_slo = (
+            queue_wait_slo_ms / 1000 if queue_wait_slo_ms else self.latency_slo / 2
+        )
+        self.thresholds = dict(DEFAULT_THRESHOLDS if thresholds is None else thresholds)
+        self.max_length = max_length
+        self.max_documents = max_documents
+        self.window_seconds = window_seconds
+        self.min_samples = min_samples
+        self.hysteresis = hysteresis
+        self.evaluate_interval = evaluate_interval
+
+        self._samples: deque[tuple[float, float, float]] = deque(maxlen=10000)
+        self._active: set[str] = set()
+        self._decision = NO_DEGRADATION
+        self._evaluated_at = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, queue_wait: float, latency: float) -> None:
+        """Record the queue wait and latency of a finished request in seconds."""
+        self._samples.append((time.monotonic(), queue_wait, latency))
+
+    def pressure(self, now: float | None = None) -> float:
+        """Return the larger of p95 latency and p95 queue wait relative to the SLO."""
+        now = time.monotonic() if now is None else now
+        horizon = now - self.window_seconds
+        samples = [sample for sample in list(self._samples) if sample[0] >= horizon]
+        if len(samples) < self.min_samples:
+            return 0.0
+        return max(
+            _p95([latency for _, _, latency in samples]) / self.latency_slo,
+            _p95([wait for _, wait, _ in samples]) / self.queue_wait_slo,
+        )
+
+    def decide(self) -> Degradation:
+        """Return the degradation for a new request."""
+        now = time.monotonic()
+        if now - self._evaluated_at < self.evaluate_interval:
+            return self._decision
+        with self._lock:
+            if now - self._evaluated_at < self.evaluate_interval:
+                return self._decision
+            self._evaluated_at = now
+            pressure = self.pressure(now)
+            for mode, threshold in self.thresholds.items():
+                if pressure >= threshold and mode not in self._active:
+                    logger.warning(f"SLO pressure {pressure:.2f}: enabling {mode}")
+                    self._active.add(mode)
+                elif pressure < threshold * self.hysteresis and mode in self._active:
+                    logger.info(f"SLO pressure {pressure:.2f}: disabling {mode}")
+                    self._active.discard(mode)
+
+            metrics.set_gauge("slo_pressure", pressure)
+            for mode in self.thresholds:
+                metrics.set_gauge(
+                    "degradation_active", float(mode in self._active), mode=mode
+                )
+            self._decision = Degradation(
+                max_length=self.max_length if "max_length" in self._active else None,
+                max_documents=self.max_documents
+                if "max_documents" in self._active
+                else None,
+                fallback_model="fallback_model" in self._active,
+                cache_only="cache_only" in self._active,
+            )
+            return self._decision
@@ -0,0 +1,250 @@
+"""Documents registered once and referenced by ID in rerank requests.
+
+Uploaded documents are kept as UTF-8 bytes in an LRU bounded by count and
+size, in a namespace per tenant. A corpus file (JSON lines with an id and a
+text field) is memory-mapped instead: only an offset index is kept in memory
+and texts are decoded from the page cache when used, so a large corpus costs
+little RSS and is never evicted.
+
+With the reranker's tokenizer attached, uploaded documents are truncated
+once: text beyond max_length tokens can never reach the model, so it is cut
+off at upload and long documents are not tokenized in full again. The store
+keeps the truncated text, not token IDs; the model still tokenizes it on
+every request.
+"""
+
+import copy
+import json
+import logging
+import mmap
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class UnknownDocumentError(KeyError):
+    """Raised when a request references document IDs that are not stored."""
+
+    def __init__(self, ids: list[str]):
+        super().__init__(f"Unknown document IDs: {', '.join(ids[:10])}")
+        self.ids = ids
+
+
+class DocumentStore:
+    """LRU store of uploaded documents plus an optional memory-mapped corpus."""
+
+    def __init__(
+        self,
+        max_documents: int = 100000,
+        max_bytes: int = 256 * 1024 * 1024,
+        tokenizer: Any = None,
+        max_length: int = 512,
+    ):
+        """Initialize the store.
+
+        Args:
+            max_documents: Maximum number of uploaded documents kept
+            max_bytes: Maximum UTF-8 bytes of uploaded documents kept
+            tokenizer: Hugging Face tokenizer used to cut documents to
+                max_length tokens on upload (None keeps texts unchanged)
+            max_length: Model input length in tokens
+        """
+        self.max_documents = max_documents
+        self.max_bytes = max_bytes
+        self.attach_tokenizer(tokenizer, max_length)
+        self._documents: OrderedDict[tuple[str, str], bytes] = OrderedDict()
+        self._bytes = 0
+        self._corpus: dict[str, tuple[int, int]] = {}
+        self._corpus_map: mmap.mmap | None = None
+        self._corpus_field = "text"
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._documents) + len(self._corpus)
+
+    def attach_tokenizer(self, tokenizer: Any, max_length: int) -> None:
+        """Truncate future uploads with a (re)loaded reranker's tokenizer.
+
+        The store keeps its own copy: a fast tokenizer changes its padding
+        and truncation settings on calls with other settings, which fails
+        while the model tokenizes with it in another thread.
+        """
+        self.tokenizer = None if tokenizer is None else copy.deepcopy(tokenizer)
+        self.max_length = max_length
+
+    def _truncate(self, texts: list[str]) -> list[str]:
+        """Cut texts after their first max_length tokens."""
+        if self.tokenizer is None or not texts:
+            return texts
+        try:
+            encoded = self.tokenizer(
+                texts,
+                add_special_tokens=False,
+                truncation=True,
+                max_length=self.max_length,
+                return_offsets_mapping=True,
+            )
+        except Exception as e:
+            # Slow tokenizers have no offset mapping
+            logger.debug(f"Could not pre-tokenize documents: {e}")
+            return texts
+        truncated = []
+        for text, offsets in zip(texts, encoded["offset_mapping"], strict=True):
+            if len(offsets) < self.max_length:
+                truncated.append(text)
+            else:
+                truncated.append(text[: offsets[-1][1]])
+        return truncated
+
+    def put_many(self, items: list[tuple[str, str]], namespace: str = "") -> int:
+        """Store (id, text) pairs, replacing documents with the same ID.
+
+        Returns:
+            Number of documents stored
+        """
+        if self.max_documents <= 0 or self.max_bytes <= 0:
+            return 0
+        texts = self._truncate([text for _, text in items])
+        encoded = [
+            ((namespace, doc_id), text.encode("utf-8"))
+            for (doc_id, _), text in zip(items, texts, strict=True)
+        ]
+        evicted = 0
+        with self._lock:
+            for key, data in encoded:
+                old = self._documents.pop(key, None)
+                if old is not None:
+                    self._bytes -= len(old)
+                self._documents[key] = data
+                self._bytes += len(data)
+            while self._documents and (
+                len(self._documents) > self.max_documents
+                or self._bytes > self.max_bytes
+            ):
+                _, data = self._documents.popitem(last=False)
+                self._bytes -= len(data)
+                evicted += 1
+            size = self._bytes
+        if evicted:
+            metrics.inc("docstore_evictions_total", evicted)
+        metrics.set_gauge("docstore_bytes", size)
+        return len(encoded)
+
+    def delete(self, ids: list[str], namespace: str = "") -> int:
+        """Remove uploaded documents; returns how many existed."""
+        removed = 0
+        with self._lock:
+            for doc_id in ids:
+                data = self._documents.pop((namespace, doc_id), None)
+                if data is not None:
+                    self._bytes -= len(data)
+                    removed += 1
+        return removed
+
+    def load_corpus(
+        self, path: str | Path, id_field: str = "id", text_field: str = "text"
+    ) -> int:
+        """Memory-map a JSON lines corpus, replacing a previously loaded one.
+
+        Corpus documents are visible to every namespace.
+
+        Returns:
+            Number of indexed documents
+        """
+        with Path(path).open("rb") as file:
+            if not Path(path).stat().st_size:
+                raise ValueError(f"Corpus file is empty: {path}")
+            corpus_map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            index = self._index_corpus(corpus_map, id_field, text_field)
+        except Exception:
+            corpus_map.close()
+            raise
+
+        with self._lock:
+            old_map = self._corpus_map
+            self._corpus_map = corpus_map
+            self._corpus = index
+            self._corpus_field = text_field
+        if old_map is not None:
+            old_map.close()
+        logger.info(f"Indexed {len(index)} corpus documents from {path}")
+        return len(index)
+
+    @staticmethod
+    def _index_corpus(
+        corpus_map: mmap.mmap, id_field: str, text_field: str
+    ) -> dict[str, tuple[int, int]]:
+        """Map document IDs to the (offset, length) of their line."""
+        index: dict[str, tuple[int, int]] = {}
+        offset = 0
+        size = len(corpus_map)
+        while offset < size:
+            end = corpus_map.find(b"\n", offset)
+            if end < 0:
+                end = size
+            line = corpus_map[offset:end].strip()
+            if line:
+                record = json.loads(line)
+                if id_field not in record or text_field not in record:
+                    raise ValueError(
+                        f"Corpus line without '{id_field}' or '{text_field}': "
+                        f"{line[:80]!r}"
+                    )
+                index[str(record[id_field])] = (offset, end - offset)
+            offset = end + 1
+        return index
+
+    def get_many(self, ids: list[str], namespace: str = "") -> list[str]:
+        """Return the texts of documents by ID.
+
+        Raises:
+            UnknownDocumentError: If any ID is neither uploaded nor in the corpus
+        """
+        texts: list[str] = []
+        missing: list[str] = []
+        with self._lock:
+            for doc_id in ids:
+                data = self._documents.get((namespace, doc_id))
+                if data is not None:
+                    self._documents.move_to_end((namespace, doc_id))
+                    texts.append(data.decode("utf-8"))
+                    continue
+                location = self._corpus.get(doc_id)
+                if location is None or self._corpus_map is None:
+                    missing.append(doc_id)
+                    continue
+                offset, length = location
+                record = json.loads(self._corpus_map[offset : offset + length])
+                texts.append(record[self._corpus_field])
+        if missing:
+            metrics.inc("docstore_misses_total", len(missing))
+            raise UnknownDocumentError(missing)
+        metrics.inc("docstore_hits_total", len(ids))
+        return texts
+
+    def stats(self) -> dict[str, int]:
+        """Return document counts and uploaded bytes."""
+        with self._lock:
+            return {
+                "uploaded_documents": len(self._documents),
+                "uploaded_bytes": self._bytes,
+                "corpus_documents": len(self._corpus),
+                "corpus_mapped_bytes": len(self._corpus_map) if self._corpus_map else 0,
+            }
+
+    def close(self) -> None:
+        """Drop all documents and unmap the corpus."""
+        with self._lock:
+            self._documents.clear()
+            self._bytes = 0
+            self._corpus = {}
+            corpus_map, self._corpus_map = self._corpus_map, None
+        if corpus_map is not None:
+            corpus_map.close()
@@ -0,0 +1,40 @@
+"""Deferred imports of heavy optional dependencies.
+
+FlagEmbedding imports torch and transformers, which takes seconds. Modules
+that need it keep a module-level placeholder instead of importing it at the
+top, and resolve it when a model is actually loaded. The placeholder stays
+a plain module attribute, so tests can still patch it.
+"""
+
+import importlib
+from typing import Any
+
+
+class _NotImported:
+    def __repr__(self) -> str:
+        return "<not imported>"
+
+
+NOT_IMPORTED: Any = _NotImported()
+
+
+def resolve(namespace: dict[str, Any], name: str, module: str) -> Any:
+    """Import ``name`` from ``module`` on first use and cache it.
+
+    Args:
+        namespace: globals() of the module holding the placeholder
+        name: Attribute to import, also the global it is stored under
+        module: Module to import it from
+
+    Returns:
+        The imported object, the value the global was patched to, or None if
+        the module is not installed
+    """
+    value = namespace[name]
+    if value is NOT_IMPORTED:
+        try:
+            value = getattr(importlib.import_module(module), name)
+        except ImportError:
+            value = None
+        namespace[name] = value
+    return value
@@ -0,0 +1,231 @@
+"""In-process reranking without the HTTP layer.
+
+Reranker wraps the same RerankerService the server uses behind a single
+engine thread that owns the model. Any number of threads and coroutines can
+call it at the same time:
+
+* ``rerank()`` blocks the calling thread, ``arerank()`` is awaitable and
+  never blocks the event loop
+* calls queued while the model is busy are scored together in one
+  ``rerank_many`` pass, so concurrent small calls share batches
+* dedup, the score cache, single-flight and metrics are the server's own
+
+Example:
+    with Reranker("BAAI/bge-reranker-v2-m3") as reranker:
+        response = reranker.rerank("what is ai?", ["doc a", "doc b"])
+
+    async with Reranker() as reranker:
+        response = await reranker.arerank("what is ai?", ["doc a", "doc b"])
+"""
+
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Self
+
+from .metrics import metrics
+from .models import RerankResponse, ScoreItem
+from .service import RerankerService, ScoringStats
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Job:
+    query: str
+    documents: list[str]
+    top_k: int | None
+    normalize: bool
+    future: Future = field(default_factory=Future, repr=False)
+
+
+class Reranker:
+    """Thread-safe, asyncio-friendly in-process reranker."""
+
+    def __init__(
+        self,
+        model_name: str = "BAAI/bge-reranker-v2-m3",
+        *,
+        service: RerankerService | None = None,
+        max_batch_documents: int = 256,
+        batch_window_ms: float = 0.0,
+        **service_options: Any,
+    ):
+        """Load the model and start the engine thread.
+
+        Args:
+            model_name: Name or path of the BGE reranker model
+            service: Existing service to use instead of loading model_name;
+                it is loaded if needed and must not be called directly
+                afterwards
+            max_batch_documents: Queued calls are combined into one model
+                pass up to this many documents
+            batch_window_ms: How long the engine waits for more calls before
+                scoring a batch (0 only combines calls that are already
+                queued, adding no latency)
+            **service_options: Further RerankerService arguments such as
+                use_fp16, score_cache_size or batch_controller
+        """
+        self.service = service or RerankerService(model_name, **service_options)
+        if not self.service.is_model_loaded():
+            self.service.load_model()
+        self.max_batch_documents = max_batch_documents
+        self.batch_window = batch_window_ms / 1000
+        self._queue: queue.SimpleQueue[_Job | None] = queue.SimpleQueue()
+        self._closed = False
+        self._engine = threading.Thread(
+            target=self._run, name="reranker-engine", daemon=True
+        )
+        self._engine.start()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    async def __aenter__(self) -> Self:
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        await asyncio.to_thread(self.close)
+
+    def close(self) -> None:
+        """Finish queued calls, stop the engine thread and unload the model."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._engine.join()
+        self.service.unload()
+
+    def rerank(
+        self,
+        query: str,
+        documents: list[str],
+        top_k: int | None = None,
+        normalize: bool = True,
+        return_documents: bool = True,
+    ) -> RerankResponse:
+        """Rerank documents based on relevance to query.
+
+        Args:
+            query: The search query
+            documents: List of documents to rerank
+            top_k: Number of top results to return (None for all)
+            normalize: Whether to normalize scores using sigmoid
+            return_documents: Whether to include document texts in results
+
+        Returns:
+            RerankResponse, as returned by the server's JSON format
+        """
+        job = self._submit(query, documents, top_k, normalize)
+        return self._response(job, *job.future.result(), return_documents)
+
+    async def arerank(
+        self,
+        query: str,
+        documents: list[str],
+        top_k: int | None = None,
+        normalize: bool = True,
+        return_documents: bool = True,
+    ) -> RerankResponse:
+        """Awaitable rerank(); the event loop keeps running while scoring."""
+        job = self._submit(query, documents, top_k, normalize)
+        results = await asyncio.wrap_future(job.future)
+        return self._response(job, *results, return_documents)
+
+    def _submit(
+        self, query: str, documents: list[str], top_k: int | None, normalize: bool
+    ) -> _Job:
+        if self._closed:
+            raise RuntimeError("Reranker is closed")
+        job = _Job(query, list(documents), top_k, normalize)
+        self._queue.put(job)
+        metrics.inc("library_requests_total")
+        return job
+
+    @staticmethod
+    def _response(
+        job: _Job,
+        results: list[tuple[int, float, str]],
+        processing_time: float,
+        stats: ScoringStats | None,
+        return_documents: bool,
+    ) -> RerankResponse:
+        items = [
+            ScoreItem(
+                index=index,
+                score=score,
+                document=document if return_documents else "",
+            )
+            for index, score, document in results
+        ]
+        return RerankResponse(
+            results=items,
+            query=job.query,
+            total_documents=len(job.documents),
+            returned_results=len(items),
+            processing_time_ms=processing_time,
+            unique_documents=stats.unique_documents if stats else None,
+            dedup_ratio=stats.dedup_ratio if stats else 0.0,
+        )
+
+    def _run(self) -> None:
+        """Engine loop: collect queued calls and score them together."""
+        stopping = False
+        while not stopping:
+            job = self._queue.get()
+            if job is None:
+                break
+            batch = [job]
+            documents = len(job.documents)
+            deadline = time.monotonic() + self.batch_window
+            while documents < self.max_batch_documents:
+                try:
+                    timeout = deadline - time.monotonic()
+                    job = (
+                        self._queue.get(timeout=timeout)
+                        if timeout > 0
+                        else self._queue.get_nowait()
+                    )
+                except queue.Empty:
+                    break
+                if job is None:
+                    stopping = True
+                    break
+                batch.append(job)
+                documents += len(job.documents)
+
+            for normalize in {job.normalize for job in batch}:
+                self._score([job for job in batch if job.normalize == normalize])
+
+    def _score(self, batch: list[_Job]) -> None:
+        """Score calls sharing a normalize setting and resolve their futures."""
+        metrics.observe("library_batch_requests", len(batch))
+        try:
+            if len(batch) == 1:
+                job = batch[0]
+                stats = ScoringStats()
+                results, processing_time = self.service.rerank(
+                    job.query, job.documents, job.top_k, job.normalize, stats=stats
+                )
+                job.future.set_result((results, processing_time, stats))
+                return
+
+            ranked, processing_time = self.service.rerank_many(
+                [(job.query, job.documents, job.top_k) for job in batch],
+                normalize=batch[0].normalize,
+            )
+        except Exception as e:
+            logger.error(f"Error during reranking: {e}")
+            for job in batch:
+                if not job.future.done():
+                    job.future.set_exception(e)
+            return
+        for job, results in zip(batch, ranked, strict=True):
+            job.future.set_result((results, processing_time, None))
@@ -0,0 +1,246 @@
+"""Process memory measurements.
+
+Readers for the resident set size of the current process and the memory
+limit of its container (cgroup v2 or v1), used to keep inference batches
+below the limit instead of being OOM-killed, plus the accounting behind
+/debug/memory: allocator statistics, activation peaks per batch shape,
+in-flight request sizes and optional tracemalloc snapshots.
+
+Per-batch measurement is opt-in (MemoryTracker.measure_batches). The CUDA
+peak counter is process-wide, so measured forward passes run one at a time;
+on CPU only the growth of the resident set size can be recorded.
+"""
+
+import contextlib
+import itertools
+import os
+import resource
+import sys
+import tempfile
+import threading
+import tracemalloc
+from collections.abc import Iterator
+from pathlib import Path
+
+from .metrics import metrics
+
+CGROUP_V2_LIMIT = Path("/sys/fs/cgroup/memory.max")
+CGROUP_V1_LIMIT = Path("/sys/fs/cgroup/memory/memory.limit_in_bytes")
+
+# cgroup v1 reports "no limit" as a huge page-aligned number
+_UNLIMITED_THRESHOLD = 1 << 60
+
+
+def process_rss_bytes() -> int:
+    """Return the current resident set size of this process in bytes."""
+    try:
+        fields = Path("/proc/self/statm").read_text().split()
+        return int(fields[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, IndexError, ValueError):
+        # Peak rather than current RSS; kilobytes on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def memory_limit_bytes(
+    v2_path: Path = CGROUP_V2_LIMIT, v1_path: Path = CGROUP_V1_LIMIT
+) -> int | None:
+    """Return the container memory limit in bytes, or None when unlimited."""
+    for path in (v2_path, v1_path):
+        try:
+            value = path.read_text().strip()
+        except OSError:
+            continue
+        if value == "max":
+            return None
+        try:
+            limit = int(value)
+        except ValueError:
+            continue
+        return None if limit >= _UNLIMITED_THRESHOLD else limit
+    return None
+
+
+def torch_memory_stats() -> dict[str, int] | None:
+    """Return CUDA caching-allocator statistics, or None without a GPU.
+
+    torch is only inspected if something else already imported it.
+    """
+    torch = sys.modules.get("torch")
+    if torch is None or not torch.cuda.is_available():
+        return None
+    return {
+        "allocated_bytes": torch.cuda.memory_allocated(),
+        "reserved_bytes": torch.cuda.memory_reserved(),
+        "peak_allocated_bytes": torch.cuda.max_memory_allocated(),
+    }
+
+
+def module_bytes(module: object) -> int:
+    """Return the bytes held by the parameters and buffers of a torch module."""
+    total = 0
+    for attribute in ("parameters", "buffers"):
+        tensors = getattr(module, attribute, None)
+        if callable(tensors):
+            total += sum(t.numel() * t.element_size() for t in tensors())
+    return total
+
+
+def _bucket(tokens: int) -> int:
+    """Round a sequence length up to a power of two."""
+    return 1 << max(tokens - 1, 0).bit_length()
+
+
+class MemoryTracker:
+    """Track activation memory per batch shape and in-flight request sizes."""
+
+    def __init__(self, max_shapes: int = 64, measure_batches: bool = False):
+        """Initialize the tracker.
+
+        Args:
+            max_shapes: Number of batch shapes whose peak is remembered
+            measure_batches: Measure every forward pass; this serializes
+                them, so enable it while sizing workers only
+        """
+        self.max_shapes = max_shapes
+        self.measure_batches = measure_batches
+        self._batch_peaks: dict[tuple[int, int], tuple[int, str]] = {}
+        self._measure_lock = threading.Lock()
+        self._requests: dict[int, int] = {}
+        self._request_ids = itertools.count()
+        self._largest_request = 0
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def measure_batch(self, batch_size: int, tokens: int) -> Iterator[None]:
+        """Record the memory used by one forward pass, if measuring.
+
+        On GPU this is the exact allocator peak above the memory allocated
+        before the pass. On CPU it is the growth of the resident set size,
+        which misses memory that was freed again within the pass and is
+        often 0 once the allocator has warmed up.
+
+        Args:
+            batch_size: Pairs in the forward pass
+            tokens: Padded tokens per pair
+        """
+        if not self.measure_batches:
+            yield
+            return
+        torch = sys.modules.get("torch")
+        cuda = torch is not None and torch.cuda.is_available()
+        # Another pass would reset the peak counter or inflate the delta
+        with self._measure_lock:
+            if cuda:
+                before = torch.cuda.memory_allocated()
+                torch.cuda.reset_peak_memory_stats()
+            else:
+                before = process_rss_bytes()
+            yield
+            after = torch.cuda.max_memory_allocated() if cuda else process_rss_bytes()
+
+        size, bucket = shape = (batch_size, _bucket(tokens))
+        source = "cuda_peak" if cuda else "rss_delta"
+        with self._lock:
+            previous, _ = self._batch_peaks.pop(shape, (0, source))
+            peak = max(after - before, previous)
+            self._batch_peaks[shape] = (peak, source)
+            evicted = None
+            if len(self._batch_peaks) > self.max_shapes:
+                evicted = next(iter(self._batch_peaks))
+                del self._batch_peaks[evicted]
+        metrics.set_gauge(
+            "batch_activation_peak_bytes", peak, batch_size=size, tokens=bucket
+        )
+        if evicted is not None:
+            metrics.remove_gauge(
+                "batch_activation_peak_bytes",
+                batch_size=evicted[0],
+                tokens=evicted[1],
+            )
+
+    @contextlib.contextmanager
+    def track_request(self, size: int) -> Iterator[None]:
+        """Count a request payload of size bytes as in flight."""
+        with self._lock:
+            key = next(self._request_ids)
+            self._requests[key] = size
+            self._largest_request = max(self._largest_request, size)
+        try:
+            yield
+        finally:
+            with self._lock:
+                del self._requests[key]
+
+    def report(self) -> dict:
+        """Return the process, allocator, batch and request measurements."""
+        with self._lock:
+            batch_peaks = sorted(self._batch_peaks.items())
+            in_flight = list(self._requests.values())
+            largest_request = self._largest_request
+        return {
+            "process_rss_bytes": process_rss_bytes(),
+            "memory_limit_bytes": memory_limit_bytes(),
+            "torch": torch_memory_stats(),
+            "measure_batches": self.measure_batches,
+            # cuda_peak is the allocator peak of the pass; rss_delta is only
+            # the growth of the process RSS it caused
+            "batch_peaks": [
+                {
+                    "batch_size": size,
+                    "tokens": tokens,
+                    "peak_bytes": peak,
+                    "source": source,
+                }
+                for (size, tokens), (peak, source) in batch_peaks
+            ],
+            "requests": {
+                "in_flight": len(in_flight),
+                "in_flight_bytes": sum(in_flight),
+                "largest_in_flight_bytes": max(in_flight, default=0),
+                "largest_seen_bytes": largest_request,
+            },
+        }
+
+    def reset(self) -> None:
+        """Forget recorded peaks."""
+        with self._lock:
+            self._batch_peaks.clear()
+            self._largest_request = max(self._requests.values(), default=0)
+
+
+def start_tracemalloc(frames: int) -> None:
+    """Start tracing Python allocations, keeping frames per traceback."""
+    if frames > 0 and not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+
+
+def tracemalloc_top(limit: int = 20) -> list[dict] | None:
+    """Return the largest allocation sites, or None when not tracing."""
+    if not tracemalloc.is_tracing():
+        return None
+    snapshot = tracemalloc.take_snapshot()
+    return [
+        {
+            "location": str(stat.traceback[0]),
+            "size_bytes": stat.size,
+            "count": stat.count,
+        }
+        for stat in snapshot.statistics("lineno")[:limit]
+    ]
+
+
+def tracemalloc_snapshot() -> bytes | None:
+    """Return a tracemalloc snapshot in its dump format, or None when not tracing.
+
+    Load it with tracemalloc.Snapshot.load() to compare snapshots offline.
+    """
+    if not tracemalloc.is_tracing():
+        return None
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "snapshot.tracemalloc"
+        tracemalloc.take_snapshot().dump(str(path))
+        return path.read_bytes()
+
+
+memory_tracker = MemoryTracker()
@@ -0,0 +1,136 @@
+"""In-process metrics registry with Prometheus text exposition."""
+
+import threading
+from collections import defaultdict
+
+LabelKey = tuple[tuple[str, str], ...]
+
+METRIC_PREFIX = "bge_reranker_"
+
+
+def _label_key(labels: dict[str, object]) -> LabelKey:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key: LabelKey) -> str:
+    if not key:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in key) + "}"
+
+
+class MetricsRegistry:
+    """Thread-safe registry of counters, gauges and summaries.
+
+    Counters only go up, gauges hold the last value set, and summaries keep
+    a count, sum and max of observed values. Every metric may carry labels.
+    """
+
+    def __init__(self, prefix: str = METRIC_PREFIX):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._counters: dict[str, dict[LabelKey, float]] = defaultdict(dict)
+        self._gauges: dict[str, dict[LabelKey, float]] = defaultdict(dict)
+        self._summaries: dict[str, dict[LabelKey, tuple[float, float, float]]] = (
+            defaultdict(dict)
+        )
+
+    def inc(self, name: str, value: float = 1.0, **labels: object) -> None:
+        """Increment a counter."""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters[name]
+            series[key] = series.get(key, 0.0) + value
+
+    def set_gauge(self, name: str, value: float, **labels: object) -> None:
+        """Set a gauge to the given value."""
+        key = _label_key(labels)
+        with self._lock:
+            self._gauges[name][key] = value
+
+    def remove_gauge(self, name: str, **labels: object) -> None:
+        """Drop one labelled series of a gauge."""
+        key = _label_key(labels)
+        with self._lock:
+            self._gauges.get(name, {}).pop(key, None)
+
+    def observe(self, name: str, value: float, **labels: object) -> None:
+        """Record one observation in a summary."""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._summaries[name]
+            count, total, peak = series.get(key, (0.0, 0.0, value))
+            series[key] = (count + 1, total + value, max(peak, value))
+
+    def get(self, name: str, **labels: object) -> float:
+        """Return the current value of a counter or gauge (0.0 if unset)."""
+        key = _label_key(labels)
+        with self._lock:
+            if key in self._counters.get(name, {}):
+                return self._counters[name][key]
+            return self._gauges.get(name, {}).get(key, 0.0)
+
+    def reset(self) -> None:
+        """Drop every recorded value."""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._summaries.clear()
+
+    def snapshot(self) -> dict[str, dict[str, object]]:
+        """Return a JSON-serializable copy of all metrics."""
+        with self._lock:
+            return {
+                "counters": {
+                    name: {_format_labels(k): v for k, v in series.items()}
+                    for name, series in self._counters.items()
+                },
+                "gauges": {
+                    name: {_format_labels(k): v for k, v in series.items()}
+                    for name, series in self._gauges.items()
+                },
+                "summaries": {
+                    name: {
+                        _format_labels(k): {"count": c, "sum": s, "max": m}
+                        for k, (c, s, m) in series.items()
+                    }
+                    for name, series in self._summaries.items()
+                },
+            }
+
+    def render_prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines: list[str] = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                full_name = f"{self.prefix}{name}"
+                lines.append(f"# TYPE {full_name} counter")
+                lines.extend(
+                    f"{full_name}{_format_labels(k)} {v}" for k, v in series.items()
+                )
+            for name, series in sorted(self._gauges.items()):
+                full_name = f"{self.prefix}{name}"
+                lines.append(f"# TYPE {full_name} gauge")
+                lines.extend(
+                    f"{full_name}{_format_labels(k)} {v}" for k, v in series.items()
+                )
+            for name, series in sorted(self._summaries.items()):
+                full_name = f"{self.prefix}{name}"
+                lines.append(f"# TYPE {full_name} summary")
+                for k, (count, total, _) in series.items():
+                    labels = _format_labels(k)
+                    lines.append(f"{full_name}_count{labels} {count}")
+                    lines.append(f"{full_name}_sum{labels} {total}")
+                lines.append(f"# TYPE {full_name}_max gauge")
+                lines.extend(
+                    f"{full_name}_max{_format_labels(k)} {peak}"
+                    for k, (_, _, peak) in series.items()
+                )
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry shared by the service and the API
+metrics = MetricsRegistry()
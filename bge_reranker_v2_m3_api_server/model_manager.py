@@ -0,0 +1,314 @@
+"""Zero-downtime model reloads and shadow scoring.
+
+ModelManager owns the active RerankerService. A reload builds and warms up a
+new service next to the old one and switches traffic to it atomically. The
+old service is freed as soon as no request is using it: at once if it is
+idle, otherwise when the last request holding it returns, however long that
+takes, so a slow request is never left with an unloaded model.
+
+In shadow mode a second model scores a sample of live requests in the
+background, and its latency and ranking agreement with the active model are
+published as metrics, so a candidate model can be evaluated before it is
+promoted with a reload.
+"""
+
+import contextlib
+import logging
+import random
+import threading
+import time
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from .metrics import metrics
+from .service import RerankerService, ScoringStats
+from .warmup import warmup_pairs
+
+logger = logging.getLogger(__name__)
+
+
+class ReloadInProgressError(Exception):
+    """Raised when a reload is requested while another one is running."""
+
+
+def compare_rankings(primary: list[int], shadow: list[int], k: int = 10) -> dict:
+    """Compare two rankings given as lists of document indices, best first.
+
+    Returns:
+        top1_agreement (0 or 1), overlap_at_k (fraction of shared documents
+        among the first k) and spearman (rank correlation over documents
+        ranked by both)
+    """
+    k = min(k, len(primary), len(shadow))
+    overlap = len(set(primary[:k]) & set(shadow[:k])) / k if k else 1.0
+
+    shadow_rank = {index: rank for rank, index in enumerate(shadow)}
+    common = [index for index in primary if index in shadow_rank]
+    n = len(common)
+    if n > 1:
+        # Ranks among the common documents only
+        shadow_order = sorted(common, key=shadow_rank.__getitem__)
+        shadow_pos = {index: rank for rank, index in enumerate(shadow_order)}
+        d2 = sum((rank - shadow_pos[index]) ** 2 for rank, index in enumerate(common))
+        spearman = 1 - 6 * d2 / (n * (n * n - 1))
+    else:
+        spearman = 1.0
+
+    return {
+        "top1_agreement": float(bool(primary and shadow and primary[0] == shadow[0])),
+        "overlap_at_k": overlap,
+        "spearman": spearman,
+    }
+
+
+class ModelManager:
+    """Hold the active service and swap it without dropping requests."""
+
+    def __init__(
+        self,
+        service: RerankerService,
+        factory: Callable[..., RerankerService],
+        warmup_pairs: int = 16,
+        on_switch: Callable[[RerankerService], None] | None = None,
+    ):
+        """Initialize the manager.
+
+        Args:
+            service: Initially active service
+            factory: Builds an unloaded service; receives model_name and
+                optionally use_fp16 as keyword arguments
+            warmup_pairs: Pairs scored by a new service before it takes
+                traffic (0 to skip warm-up)
+            on_switch: Called with a reloaded service once it takes traffic
+        """
+        self.factory = factory
+        self.warmup_pairs = warmup_pairs
+        self.on_switch = on_switch
+        self.generation = 1
+        self._active = service
+        self._leases: dict[int, int] = {}
+        # Replaced services still leased, freed by their last lease
+        self._retired: dict[int, RerankerService] = {}
+        self._condition = threading.Condition()
+        self._reload_lock = threading.Lock()
+
+        self._shadow: RerankerService | None = None
+        self._shadow_fraction = 0.0
+        self._shadow_pending = 0
+        self._shadow_lock = threading.Lock()
+        self._shadow_stats: dict[str, float] = {}
+        self._shadow_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="bge-shadow"
+        )
+
+    @property
+    def active(self) -> RerankerService:
+        """The service currently receiving traffic."""
+        return self._active
+
+    @contextlib.contextmanager
+    def lease(self) -> Iterator[tuple[RerankerService, int]]:
+        """Use the active service; a replaced one is freed by its last lease.
+
+        Yields:
+            The service and its generation, read together so that a reload
+            during the lease cannot pair the service with a newer generation
+        """
+        with self._condition:
+            service, generation = self._active, self.generation
+            self._leases[id(service)] = self._leases.get(id(service), 0) + 1
+        try:
+            yield service, generation
+        finally:
+            retired = None
+            with self._condition:
+                self._leases[id(service)] -= 1
+                if not self._leases[id(service)]:
+                    del self._leases[id(service)]
+                    retired = self._retired.pop(id(service), None)
+            if retired is not None:
+                logger.info(f"Freeing replaced model {retired.model_name}")
+                retired.unload()
+
+    def rerank(
+        self,
+        query: str,
+        documents: list[str],
+        top_k: int | None = None,
+        normalize: bool = True,
+        stats: ScoringStats | None = None,
+        **options: Any,
+    ) -> tuple[list[tuple[int, float, str]], float]:
+        """Rerank with the active service and sample the request for shadowing.
+
+        Extra options such as max_length are passed to RerankerService.rerank;
+        degraded requests are not shadowed.
+        """
+        with self.lease() as (service, _):
+            results, processing_time = service.rerank(
+                query,
+                documents,
+                top_k=top_k,
+                normalize=normalize,
+                stats=stats,
+                **options,
+            )
+        if not any(options.values()):
+            self._maybe_shadow(query, documents, normalize, results, processing_time)
+        return results, processing_time
+
+    def _load(self, model_name: str, **overrides: Any) -> RerankerService:
+        service = self.factory(model_name=model_name, **overrides)
+        service.load_model()
+        if self.warmup_pairs:
+            service.compute_pair_scores(warmup_pairs(self.warmup_pairs))
+            if service.score_cache is not None:
+                service.score_cache.clear()
+        return service
+
+    def reload(self, model_name: str | None = None, **overrides: Any) -> float:
+        """Load a model in the background and switch traffic to it.
+
+        Args:
+            model_name: Model to load (default: reload the active model,
+                e.g. to pick up new weights at the same path)
+            **overrides: Other factory arguments such as use_fp16
+
+        Returns:
+            Load and warm-up time in milliseconds
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            raise ReloadInProgressError("A model reload is already in progress")
+        try:
+            model_name = model_name or self._active.model_name
+            logger.info(f"Reloading model: {model_name}")
+            start_time = time.time()
+            new_service = self._load(model_name, **overrides)
+            load_time = (time.time() - start_time) * 1000
+
+            with self._condition:
+                old_service = self._active
+                self._active = new_service
+                self.generation += 1
+                in_use = id(old_service) in self._leases
+                if in_use:
+                    self._retired[id(old_service)] = old_service
+            metrics.inc("model_reloads_total")
+            logger.info(
+                f"Switched to {model_name} (generation {self.generation}) "
+                f"after {load_time:.0f} ms"
+            )
+            if self.on_switch is not None:
+                try:
+                    self.on_switch(new_service)
+                except Exception as e:
+                    logger.warning(f"Model switch callback failed: {e}")
+
+            if not in_use:
+                old_service.unload()
+            return load_time
+        finally:
+            self._reload_lock.release()
+
+    def start_shadow(self, model_name: str, fraction: float, **overrides: Any) -> float:
+        """Load a shadow model that scores a fraction of requests.
+
+        Returns:
+            Load and warm-up time in milliseconds
+        """
+        if not 0 < fraction <= 1:
+            raise ValueError("fraction must be in (0, 1]")
+        start_time = time.time()
+        shadow = self._load(model_name, **overrides)
+        self.stop_shadow()
+        self._shadow = shadow
+        self._shadow_fraction = fraction
+        self._shadow_stats = {}
+        logger.info(f"Shadowing {fraction:.0%} of requests on {model_name}")
+        return (time.time() - start_time) * 1000
+
+    def stop_shadow(self) -> None:
+        """Stop shadow scoring and free the shadow model."""
+        shadow, self._shadow = self._shadow, None
+        self._shadow_fraction = 0.0
+        if shadow is not None:
+            # Let a running comparison finish before freeing the model
+            self._shadow_executor.submit(shadow.unload).result()
+
+    def _maybe_shadow(
+        self,
+        query: str,
+        documents: list[str],
+        normalize: bool,
+        results: list[tuple[int, float, str]],
+        processing_time: float,
+    ) -> None:
+        shadow = self._shadow
+        if shadow is None or random.random() >= self._shadow_fraction:
+            return
+        # Never let shadow work queue up behind live traffic
+        with self._shadow_lock:
+            if self._shadow_pending >= 2:
+                metrics.inc("shadow_skipped_total")
+                return
+            self._shadow_pending += 1
+        primary = [index for index, _, _ in results]
+        self._shadow_executor.submit(
+            self._compare, shadow, query, documents, normalize, primary, processing_time
+        )
+
+    def _compare(
+        self,
+        shadow: RerankerService,
+        query: str,
+        documents: list[str],
+        normalize: bool,
+        primary: list[int],
+        primary_time: float,
+    ) -> None:
+        try:
+            if not shadow.is_model_loaded():
+                return
+            results, shadow_time = shadow.rerank(query, documents, normalize=normalize)
+            comparison = compare_rankings(
+                primary, [index for index, _, _ in results][: len(primary)]
+            )
+            comparison["latency_ratio"] = shadow_time / max(primary_time, 1e-6)
+            metrics.inc("shadow_requests_total")
+            metrics.observe("shadow_latency_seconds", shadow_time / 1000)
+            for name, value in comparison.items():
+                metrics.observe(f"shadow_{name}", value)
+            count = self._shadow_stats.get("requests", 0) + 1
+            self._shadow_stats["requests"] = count
+            for name, value in comparison.items():
+                mean = self._shadow_stats.get(name, 0.0)
+                self._shadow_stats[name] = mean + (value - mean) / count
+        except Exception as e:
+            logger.warning(f"Shadow scoring failed: {e}")
+        finally:
+            with self._shadow_lock:
+                self._shadow_pending -= 1
+
+    def status(self) -> dict[str, Any]:
+        """Describe the active and shadow models."""
+        shadow = self._shadow
+        return {
+            "model_name": self._active.model_name,
+            "model_loaded": self._active.is_model_loaded(),
+            "generation": self.generation,
+            "reloading": self._reload_lock.locked(),
+            "retired_models": len(self._retired),
+            "shadow": None
+            if shadow is None
+            else {
+                "model_name": shadow.model_name,
+                "fraction": self._shadow_fraction,
+                **self._shadow_stats,
+            },
+        }
+
+    def shutdown(self) -> None:
+        """Stop background shadow work."""
+        self.stop_shadow()
+        self._shadow_executor.shutdown(wait=False, cancel_futures=True)
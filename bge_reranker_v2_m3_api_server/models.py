@@ -1,8 +1,10 @@
 """Data models for the BGE Reranker API."""
 
-from typing import Any
+from typing import Any, Self
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
+
+from .compression import input_limits
 
 
 class ScoreItem(BaseModel):
@@ -18,7 +20,15 @@ class RerankRequest(BaseModel):
 
     query: str = Field(..., description="The search query", min_length=1)
     documents: list[str] = Field(
-        ..., description="List of documents to rerank", min_length=1, max_length=1000
+        default_factory=list,
+        description="List of documents to rerank",
+        max_length=1000,
+    )
+    document_ids: list[str] | None = Field(
+        None,
+        description="IDs of stored documents to rerank instead of documents",
+        min_length=1,
+        max_length=1000,
     )
     top_k: int | None = Field(
         None, description="Number of top results to return (default: return all)", ge=1
@@ -30,6 +40,17 @@ class RerankRequest(BaseModel):
         True, description="Whether to return document text in results"
     )
 
+    @model_validator(mode="after")
+    def check_documents(self) -> Self:
+        """Require one document source and apply the configured size caps."""
+        if self.document_ids is None:
+            if not self.documents:
+                raise ValueError("documents must contain at least one document")
+        elif self.documents:
+            raise ValueError("Pass either documents or document_ids, not both")
+        input_limits.check_texts(self.query, self.documents)
+        return self
+
 
 class RerankResponse(BaseModel):
     """Response model for reranking API."""
@@ -41,6 +62,43 @@ class RerankResponse(BaseModel):
     processing_time_ms: float = Field(
         ..., description="Processing time in milliseconds"
     )
+    unique_documents: int | None = Field(
+        None, description="Number of distinct documents actually scored"
+    )
+    dedup_ratio: float = Field(
+        0.0, description="Fraction of input documents collapsed as duplicates"
+    )
+    timings: dict[str, float] | None = Field(
+        None, description="Milliseconds per processing stage (with ?profile=true)"
+    )
+    degradation: list[str] | None = Field(
+        None, description="Degradations applied under overload, e.g. max_length=256"
+    )
+    unscored_documents: int | None = Field(
+        None,
+        description="Documents left out of the results under degradation: "
+        "those beyond max_documents and, with cache_only, those without a "
+        "cached score",
+    )
+
+
+class BatchRerankRequest(BaseModel):
+    """Request model for reranking several queries in one call."""
+
+    requests: list[RerankRequest] = Field(
+        ...,
+        description="Rerank requests to process together",
+        min_length=1,
+        max_length=64,
+    )
+
+
+class BatchRerankResponse(BaseModel):
+    """Response model for batch reranking API."""
+
+    results: list[RerankResponse] = Field(
+        ..., description="One response per request, in request order"
+    )
 
 
 class HealthResponse(BaseModel):
@@ -52,6 +110,175 @@ class HealthResponse(BaseModel):
     model_name: str = Field(..., description="Name of the loaded model")
 
 
+class ReloadRequest(BaseModel):
+    """Request model for the model reload endpoint."""
+
+    model_name: str | None = Field(
+        None, description="Model to load (default: reload the active model)"
+    )
+    use_fp16: bool | None = Field(
+        None, description="Whether to use FP16 (default: server setting)"
+    )
+
+
+class ShadowRequest(BaseModel):
+    """Request model for starting shadow scoring."""
+
+    model_name: str = Field(..., description="Candidate model to shadow", min_length=1)
+    fraction: float = Field(
+        0.1, description="Fraction of requests also scored by the shadow", gt=0, le=1
+    )
+    use_fp16: bool | None = Field(
+        None, description="Whether to use FP16 (default: server setting)"
+    )
+
+
+class ModelStatusResponse(BaseModel):
+    """Active and shadow model status."""
+
+    model_name: str = Field(..., description="Name of the active model")
+    model_loaded: bool = Field(..., description="Whether the active model is loaded")
+    generation: int = Field(..., description="Incremented by every reload")
+    reloading: bool = Field(..., description="Whether a reload is running")
+    retired_models: int = Field(
+        0, description="Replaced models still serving in-flight requests"
+    )
+    shadow: dict[str, Any] | None = Field(
+        None, description="Shadow model and its mean comparison metrics"
+    )
+    load_time_ms: float | None = Field(
+        None, description="Load and warm-up time of the model just loaded"
+    )
+
+
+class StoredDocument(BaseModel):
+    """A document registered in the document store."""
+
+    id: str = Field(..., description="Document ID used in document_ids", min_length=1)
+    text: str = Field(..., description="The document text")
+
+
+class DocumentUploadRequest(BaseModel):
+    """Request model for registering documents."""
+
+    documents: list[StoredDocument] = Field(
+        ..., description="Documents to store", min_length=1, max_length=10000
+    )
+
+    @model_validator(mode="after")
+    def check_sizes(self) -> Self:
+        """Apply the configured document size caps."""
+        input_limits.check_texts("", [document.text for document in self.documents])
+        return self
+
+
+class CorpusLoadRequest(BaseModel):
+    """Request model for memory-mapping a corpus file on the server."""
+
+    path: str = Field(..., description="Path of a JSON lines corpus file")
+    id_field: str = Field("id", description="Field holding the document ID")
+    text_field: str = Field("text", description="Field holding the document text")
+
+
+class DocumentStoreResponse(BaseModel):
+    """Response model for document store operations."""
+
+    stored: int = Field(0, description="Documents stored or indexed by this call")
+    deleted: int = Field(0, description="Documents deleted by this call")
+    uploaded_documents: int = Field(..., description="Uploaded documents kept")
+    uploaded_bytes: int = Field(..., description="Bytes of uploaded documents kept")
+    corpus_documents: int = Field(..., description="Documents in the mapped corpus")
+    corpus_mapped_bytes: int = Field(..., description="Size of the mapped corpus")
+
+
+class SessionOpenRequest(BaseModel):
+    """Request model for opening an incremental reranking session."""
+
+    query: str = Field(..., description="The search query", min_length=1)
+    documents: list[str] = Field(
+        default_factory=list,
+        description="First batch of documents (may be empty)",
+        max_length=1000,
+    )
+    document_ids: list[str] | None = Field(
+        None,
+        description="IDs of stored documents to use as the first batch",
+        min_length=1,
+        max_length=1000,
+    )
+    top_k: int | None = Field(
+        None, description="Number of top results to return (default: return all)", ge=1
+    )
+    normalize: bool = Field(
+        True, description="Whether to normalize scores using sigmoid function"
+    )
+    return_documents: bool = Field(
+        True, description="Whether to return document text in results"
+    )
+
+    @model_validator(mode="after")
+    def check_documents(self) -> Self:
+        """Allow one document source and apply the configured size caps."""
+        if self.document_ids is not None and self.documents:
+            raise ValueError("Pass either documents or document_ids, not both")
+        input_limits.check_texts(self.query, self.documents)
+        return self
+
+
+class SessionAppendRequest(BaseModel):
+    """Request model for appending documents to a session."""
+
+    documents: list[str] = Field(
+        default_factory=list,
+        description="Documents to score and merge into the ranking",
+        max_length=1000,
+    )
+    document_ids: list[str] | None = Field(
+        None,
+        description="IDs of stored documents to append instead of documents",
+        min_length=1,
+        max_length=1000,
+    )
+    top_k: int | None = Field(
+        None, description="Number of top results to return (default: return all)", ge=1
+    )
+    return_documents: bool = Field(
+        True, description="Whether to return document text in results"
+    )
+
+    @model_validator(mode="after")
+    def check_documents(self) -> Self:
+        """Require one document source and apply the configured size caps."""
+        if self.document_ids is None:
+            if not self.documents:
+                raise ValueError("documents must contain at least one document")
+        elif self.documents:
+            raise ValueError("Pass either documents or document_ids, not both")
+        input_limits.check_texts("", self.documents)
+        return self
+
+
+class SessionResponse(BaseModel):
+    """Current ranking of an incremental reranking session."""
+
+    session_id: str = Field(..., description="ID to append documents with")
+    query: str = Field(..., description="The session's query")
+    results: list[ScoreItem] = Field(
+        ..., description="Ranked results over all documents appended so far"
+    )
+    total_documents: int = Field(..., description="Documents in the session")
+    scored_documents: int = Field(
+        0, description="Documents appended and scored by this call"
+    )
+    returned_results: int = Field(..., description="Number of results returned")
+    processing_time_ms: float = Field(
+        0.0, description="Processing time of this call in milliseconds"
+    )
+    expires_in_seconds: float = Field(
+        ..., description="Seconds the session is kept without further use"
+    )
+
+
 class ErrorResponse(BaseModel):
     """Error response model."""
 
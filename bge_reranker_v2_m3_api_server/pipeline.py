@@ -0,0 +1,184 @@
+"""Tokenization pipelined with model forward passes.
+
+FlagReranker.compute_score tokenizes a batch and then runs the model on it,
+one batch after the other, so the tokenizer idles while the model runs and
+the model idles while the next batch is tokenized. The pipeline instead
+tokenizes upcoming batches on a small thread pool (the fast Rust tokenizer
+releases the GIL while encoding) while the calling thread runs the model on
+the current one. At most ``depth`` tokenized batches wait ahead of the
+model, which bounds the memory held by padded tensors.
+
+Each tokenizer thread encodes with its own copy of the tokenizer. A fast
+tokenizer keeps its padding and truncation settings in the Rust object and
+changes them on calls with other settings, so threads sharing one tokenizer
+fail with "Already borrowed" under concurrent traffic.
+"""
+
+import copy
+import logging
+import sys
+import threading
+import time
+from collections import deque
+from collections.abc import Sequence
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any
+
+import numpy as np
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class PipelinedForward:
+    """Score pairs with tokenization of batch N+1 overlapping batch N."""
+
+    def __init__(self, batch_size: int = 32, workers: int = 2, depth: int = 2):
+        """Initialize the pipeline.
+
+        Args:
+            batch_size: Pairs per forward pass when no batch plan is given
+            workers: Tokenizer threads
+            depth: Tokenized batches allowed to wait for the model
+        """
+        if batch_size < 1 or workers < 1 or depth < 1:
+            raise ValueError("batch_size, workers and depth must be at least 1")
+
+        self.batch_size = batch_size
+        self.workers = workers
+        self.depth = depth
+        self.max_length = 512
+        self._torch: Any = None
+        self._model: Any = None
+        self._tokenizer: Any = None
+        self._device: Any = None
+        self._executor: ThreadPoolExecutor | None = None
+        self._local = threading.local()
+
+    @property
+    def ready(self) -> bool:
+        """Whether a model is attached and the pipeline is usable."""
+        return self._model is not None
+
+    def load(self, model: Any, tokenizer: Any, max_length: int) -> bool:
+        """Attach the reranker's model and tokenizer.
+
+        Returns:
+            True if the pipeline is ready, False if the caller should keep
+            using compute_score
+        """
+        self.unload()
+        torch = sys.modules.get("torch")
+        if torch is None or not getattr(tokenizer, "is_fast", False):
+            logger.warning(
+                "Pipelined tokenization needs torch and a fast tokenizer, "
+                "using compute_score"
+            )
+            return False
+
+        self._torch = torch
+        self._model = model
+        self._tokenizer = tokenizer
+        self._device = next(model.parameters()).device
+        self.max_length = max_length
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="tokenizer"
+        )
+        return True
+
+    def unload(self) -> None:
+        """Detach the model and stop the tokenizer threads."""
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        self._model = None
+        self._tokenizer = None
+        self._device = None
+        # Drops the tokenizer copies of the stopped threads
+        self._local = threading.local()
+
+    def __call__(
+        self,
+        pairs: list[tuple[str, str]],
+        normalize: bool,
+        max_length: int | None = None,
+        batches: Sequence[list[int]] | None = None,
+    ) -> np.ndarray:
+        """Score pairs batch by batch.
+
+        Args:
+            pairs: List of (query, document) tuples
+            normalize: Whether to normalize scores using sigmoid
+            max_length: Shorter model input length for this call
+            batches: Indices of pairs per forward pass (default: consecutive
+                batches of batch_size)
+        """
+        executor = self._executor
+        if executor is None or not self.ready:
+            raise RuntimeError("The tokenization pipeline is not loaded")
+        max_length = min(max_length or self.max_length, self.max_length)
+        if batches is None:
+            batches = [
+                list(range(start, min(start + self.batch_size, len(pairs))))
+                for start in range(0, len(pairs), self.batch_size)
+            ]
+
+        scores = np.zeros(len(pairs))
+        upcoming = iter(batches)
+        pending: deque[tuple[list[int], Future]] = deque()
+
+        def submit_next() -> None:
+            batch = next(upcoming, None)
+            if batch is not None:
+                future = executor.submit(
+                    self._tokenize, [pairs[i] for i in batch], max_length
+                )
+                pending.append((batch, future))
+
+        try:
+            for _ in range(self.depth):
+                submit_next()
+            while pending:
+                batch, future = pending.popleft()
+                wait_start = time.perf_counter()
+                features = future.result()
+                metrics.observe(
+                    "tokenize_wait_seconds", time.perf_counter() - wait_start
+                )
+                # Keep the tokenizer busy while the model runs this batch
+                submit_next()
+                scores[batch] = self._forward(features, normalize)
+        finally:
+            for _, future in pending:
+                future.cancel()
+        return scores
+
+    def _worker_tokenizer(self) -> Any:
+        """Return the calling tokenizer thread's own copy of the tokenizer."""
+        tokenizer = getattr(self._local, "tokenizer", None)
+        if tokenizer is None:
+            tokenizer = copy.deepcopy(self._tokenizer)
+            self._local.tokenizer = tokenizer
+        return tokenizer
+
+    def _tokenize(self, pairs: list[tuple[str, str]], max_length: int) -> Any:
+        """Encode and pad one batch, ready for the model's device."""
+        features = self._worker_tokenizer()(
+            [query for query, _ in pairs],
+            [doc for _, doc in pairs],
+            padding=True,
+            truncation=True,
+            max_length=max_length,
+            return_tensors="pt",
+        )
+        return {name: tensor.to(self._device) for name, tensor in features.items()}
+
+    def _forward(self, features: Any, normalize: bool) -> np.ndarray:
+        """Run the model on one tokenized batch."""
+        torch = self._torch
+        with torch.inference_mode():
+            scores = self._model(**features, return_dict=True).logits.view(-1).float()
+            if normalize:
+                scores = torch.sigmoid(scores)
+        return scores.cpu().numpy()
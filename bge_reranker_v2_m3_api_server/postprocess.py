@@ -0,0 +1,55 @@
+"""Score post-processing on NumPy arrays.
+
+Once batching makes the model fast, per-score Python work (float
+conversion, building and sorting tuples) starts to dominate large requests.
+These helpers keep scores in float64 arrays from the model output to the
+final order; Python objects are only built when a response is serialized.
+"""
+
+from collections.abc import Sequence
+
+import numpy as np
+
+
+def to_scores(values: Sequence[float | None] | np.ndarray | float) -> np.ndarray:
+    """Convert model output to a flat float64 array; missing scores become 0."""
+    scores = np.array(values, dtype=np.float64).reshape(-1)
+    return np.nan_to_num(scores, nan=0.0, copy=False)
+
+
+def top_k_indices(scores: np.ndarray, top_k: int | None = None) -> np.ndarray:
+    """Return the indices of the top_k scores, best first.
+
+    Equal scores keep their input order, like a stable sort, so the result
+    matches sorting all scores and cutting the list. For top_k much smaller
+    than the number of scores only the selected scores are sorted.
+    """
+    count = len(scores)
+    if top_k is None or top_k >= count:
+        return np.argsort(-scores, kind="stable")
+    if top_k <= 0:
+        return np.empty(0, dtype=np.intp)
+
+    kth = np.partition(scores, count - top_k)[count - top_k]
+    above = np.flatnonzero(scores > kth)
+    ties = np.flatnonzero(scores == kth)[: top_k - len(above)]
+    selected = np.sort(np.concatenate([above, ties]))
+    return selected[np.argsort(-scores[selected], kind="stable")]
+
+
+def rank_scores(
+    scores: np.ndarray,
+    top_k: int | None = None,
+    min_score: float | None = None,
+) -> np.ndarray:
+    """Return the indices of scores in ranking order.
+
+    Args:
+        scores: Score per document
+        top_k: Number of indices to return (None for all)
+        min_score: Drop documents scoring below this value
+    """
+    if min_score is None:
+        return top_k_indices(scores, top_k)
+    kept = np.flatnonzero(scores >= min_score)
+    return kept[top_k_indices(scores[kept], top_k)]
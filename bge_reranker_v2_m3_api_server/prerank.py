@@ -0,0 +1,195 @@
+"""Embedding-based pre-ranking ahead of the cross-encoder.
+
+Cross-encoding every candidate is the main cost of a rerank request. With
+pre-ranking enabled, the query and documents are embedded with a bi-encoder
+(bge-m3 dense vectors by default) and only the top N documents by cosine
+similarity are passed to the cross-encoder. Document vectors are cached, so a
+document seen before costs one cache lookup instead of a forward pass.
+"""
+
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from .lazy import NOT_IMPORTED, resolve
+from .metrics import metrics
+from .tracing import tracer
+
+if TYPE_CHECKING:
+    from FlagEmbedding import BGEM3FlagModel
+else:
+    # Imported by load_model(), see RerankerService
+    BGEM3FlagModel = NOT_IMPORTED
+
+logger = logging.getLogger(__name__)
+
+
+class VectorCache:
+    """Thread-safe LRU cache of embedding vectors keyed by text digest."""
+
+    def __init__(self, max_size: int = 100000):
+        """Initialize the cache.
+
+        Args:
+            max_size: Maximum number of cached vectors
+        """
+        self.max_size = max_size
+        self._entries: OrderedDict[bytes, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def key(text: str) -> bytes:
+        """Return the cache key of a text."""
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+    def get_many(self, keys: list[bytes]) -> list[np.ndarray | None]:
+        """Look up several keys, refreshing the recency of hits."""
+        results: list[np.ndarray | None] = []
+        with self._lock:
+            for key in keys:
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                results.append(vector)
+        return results
+
+    def put_many(self, items: list[tuple[bytes, np.ndarray]]) -> None:
+        """Store several vectors, evicting the least recently used entries."""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            for key, vector in items:
+                self._entries[key] = vector
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
+
+    def nbytes(self) -> int:
+        """Return the bytes held by the cached vectors."""
+        with self._lock:
+            return sum(vector.nbytes for vector in self._entries.values())
+
+
+class EmbeddingPreranker:
+    """Select the documents worth cross-encoding with a bi-encoder."""
+
+    def __init__(
+        self,
+        model_name: str = "BAAI/bge-m3",
+        use_fp16: bool = True,
+        top_n: int = 100,
+        cache_size: int = 100000,
+        batch_size: int = 32,
+        max_length: int = 512,
+        encoder: Callable[[list[str]], np.ndarray] | None = None,
+    ):
+        """Initialize the pre-ranker.
+
+        Args:
+            model_name: Name or path of the bi-encoder model
+            use_fp16: Whether to use FP16 for the bi-encoder
+            top_n: Number of documents passed on to the cross-encoder
+            cache_size: Number of document vectors kept across requests
+            batch_size: Texts embedded per forward pass
+            max_length: Maximum tokens per embedded text
+            encoder: Custom function mapping texts to a (n, dim) array, used
+                instead of loading model_name
+        """
+        if top_n < 1:
+            raise ValueError("top_n must be at least 1")
+
+        self.model_name = model_name
+        self.use_fp16 = use_fp16
+        self.top_n = top_n
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.cache = VectorCache(cache_size)
+        self._encoder = encoder
+
+    def load_model(self) -> None:
+        """Load the bi-encoder model."""
+        if self._encoder is not None:
+            return
+        flag_model = resolve(globals(), "BGEM3FlagModel", "FlagEmbedding")
+        if flag_model is None:
+            raise ImportError(
+                "FlagEmbedding is not installed. Please install it with: "
+                "pip install FlagEmbedding"
+            )
+
+        logger.info(f"Loading pre-ranking model: {self.model_name}")
+        model = flag_model(self.model_name, use_fp16=self.use_fp16)
+
+        def encode(texts: list[str]) -> np.ndarray:
+            return model.encode(
+                texts,
+                batch_size=self.batch_size,
+                max_length=self.max_length,
+                return_dense=True,
+                return_sparse=False,
+                return_colbert_vecs=False,
+            )["dense_vecs"]
+
+        self._encoder = encode
+
+    def is_model_loaded(self) -> bool:
+        """Check if the bi-encoder is ready."""
+        return self._encoder is not None
+
+    def unload(self) -> None:
+        """Drop the bi-encoder and cached vectors."""
+        self._encoder = None
+        self.cache.clear()
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        """Return L2-normalized float32 vectors, using the cache where possible."""
+        if self._encoder is None:
+            raise RuntimeError("Model is not loaded. Call load_model() first.")
+
+        keys = [VectorCache.key(text) for text in texts]
+        cached = self.cache.get_many(keys)
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        metrics.inc("vector_cache_hits_total", len(texts) - len(missing))
+
+        if missing:
+            computed = np.asarray(
+                self._encoder([texts[i] for i in missing]), dtype=np.float32
+            )
+            norms = np.linalg.norm(computed, axis=1, keepdims=True)
+            computed /= np.maximum(norms, 1e-12)
+            # Copy rows so cached vectors do not pin the whole batch array
+            rows = [computed[row].copy() for row in range(len(missing))]
+            for i, vector in zip(missing, rows, strict=True):
+                cached[i] = vector
+            self.cache.put_many(
+                [(keys[i], v) for i, v in zip(missing, rows, strict=True)]
+            )
+
+        return np.stack(cached)  # type: ignore[arg-type]
+
+    def select(self, query: str, documents: list[str]) -> list[int]:
+        """Return the indices of the top_n documents, in their original order."""
+        if len(documents) <= self.top_n:
+            return list(range(len(documents)))
+
+        with tracer.span("rerank.prerank", documents=len(documents), top_n=self.top_n):
+            query_vector = self.embed([query])[0]
+            similarities = self.embed(documents) @ query_vector
+            top = np.argpartition(-similarities, self.top_n - 1)[: self.top_n]
+
+        metrics.inc("prerank_documents_total", len(documents))
+        metrics.inc("prerank_dropped_total", len(documents) - self.top_n)
+        return sorted(top.tolist())
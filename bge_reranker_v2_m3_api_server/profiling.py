@@ -0,0 +1,191 @@
+"""Opt-in profiling of a live worker.
+
+Two tools, both free when unused:
+
+* StageTimings collects the spans of one request (``?profile=true``) into a
+  per-stage breakdown, returned in the response body and as a
+  ``Server-Timing`` header.
+* SamplingProfiler samples the Python stacks of all threads for a bounded
+  time and renders them as collapsed stacks (flamegraph.pl, speedscope,
+  inferno) or as a pstats file (``python -m pstats``, snakeviz).
+"""
+
+import itertools
+import marshal
+import sys
+import threading
+import time
+from collections import Counter
+from types import CodeType, FrameType
+
+from .tracing import Span
+
+PROFILE_FORMATS = ("collapsed", "pstats")
+
+# Leaf frames of threads that are blocked waiting for work
+_IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("selectors.py", "select"),
+    ("thread.py", "_worker"),
+}
+
+FunctionKey = tuple[str, int, str]
+Sample = tuple[str, tuple[FunctionKey, ...]]
+
+
+class ProfilerBusyError(Exception):
+    """Raised when a profile is requested while another one is running."""
+
+
+class StageTimings:
+    """Span listener that sums the duration of each stage of one request."""
+
+    def __init__(self):
+        self._durations: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self._durations[span.name] = (
+                self._durations.get(span.name, 0.0) + span.duration_ms
+            )
+
+    def shutdown(self) -> None:
+        pass
+
+    def timings(self) -> dict[str, float]:
+        """Return milliseconds per finished stage, in completion order."""
+        with self._lock:
+            return {name: round(ms, 3) for name, ms in self._durations.items()}
+
+    def server_timing(self, total_ms: float | None = None) -> str:
+        """Format the stages as a Server-Timing header value."""
+        timings = self.timings()
+        if total_ms is not None:
+            timings["total"] = round(total_ms, 3)
+        return ", ".join(f"{name};dur={ms}" for name, ms in timings.items())
+
+
+def _function_key(code: CodeType) -> FunctionKey:
+    return code.co_filename, code.co_firstlineno, code.co_name
+
+
+def _is_idle(frame: FrameType) -> bool:
+    code = frame.f_code
+    filename = code.co_filename.replace("\\", "/").rsplit("/", 1)[-1]
+    return (filename, code.co_name) in _IDLE_FRAMES
+
+
+class Profile:
+    """Stack samples collected by SamplingProfiler."""
+
+    def __init__(self, samples: Counter[Sample], interval: float):
+        """Initialize the profile.
+
+        Args:
+            samples: Number of samples per (thread name, stack), outermost
+                frame first
+            interval: Time between samples in seconds
+        """
+        self.samples = samples
+        self.interval = interval
+
+    def collapsed(self) -> str:
+        """Render samples as collapsed stacks, one "frames count" per line."""
+        lines = []
+        for (thread, stack), count in sorted(self.samples.items()):
+            frames = [f"thread {thread}"]
+            frames.extend(
+                f"{name} ({filename}:{line})" for filename, line, name in stack
+            )
+            lines.append(f"{';'.join(frames)} {count}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def pstats(self) -> bytes:
+        """Render samples in the marshal format read by pstats.Stats.
+
+        Call counts are sample counts and times are estimated from the
+        sampling interval.
+        """
+        own: Counter[FunctionKey] = Counter()
+        total: Counter[FunctionKey] = Counter()
+        callers: dict[FunctionKey, Counter[FunctionKey]] = {}
+        for (_, stack), count in self.samples.items():
+            if not stack:
+                continue
+            own[stack[-1]] += count
+            for function in set(stack):
+                total[function] += count
+            for caller, callee in set(itertools.pairwise(stack)):
+                callers.setdefault(callee, Counter())[caller] += count
+
+        interval = self.interval
+        stats = {
+            function: (
+                count,
+                count,
+                own[function] * interval,
+                count * interval,
+                {
+                    caller: (n, n, 0.0, n * interval)
+                    for caller, n in callers.get(function, {}).items()
+                },
+            )
+            for function, count in total.items()
+        }
+        return marshal.dumps(stats)
+
+    def render(self, profile_format: str) -> bytes:
+        """Render samples in one of PROFILE_FORMATS."""
+        if profile_format == "collapsed":
+            return self.collapsed().encode("utf-8")
+        if profile_format == "pstats":
+            return self.pstats()
+        raise ValueError(f"Unknown profile format: {profile_format}")
+
+
+class SamplingProfiler:
+    """Sample the stacks of all threads at a fixed interval."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def run(
+        self, seconds: float, interval: float = 0.005, include_idle: bool = False
+    ) -> Profile:
+        """Sample the stacks of all other threads for the given time.
+
+        Args:
+            seconds: Profiling duration
+            interval: Time between samples
+            include_idle: Keep samples of threads blocked waiting for work
+
+        Returns:
+            The collected samples
+        """
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusyError("A profile is already being captured")
+        try:
+            samples: Counter[Sample] = Counter()
+            own_thread = threading.get_ident()
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                for ident, frame in sys._current_frames().items():
+                    if ident == own_thread or (not include_idle and _is_idle(frame)):
+                        continue
+                    stack = []
+                    current: FrameType | None = frame
+                    while current is not None:
+                        stack.append(_function_key(current.f_code))
+                        current = current.f_back
+                    stack.reverse()
+                    samples[names.get(ident, str(ident)), tuple(stack)] += 1
+                time.sleep(interval)
+            return Profile(samples, interval)
+        finally:
+            self._lock.release()
+
+
+# Process-wide profiler used by the admin endpoint
+profiler = SamplingProfiler()
@@ -0,0 +1,599 @@
+"""Cache-affinity router in front of several API servers.
+
+Behind a plain load balancer every replica's score cache, single-flight
+table and tokenizer caches see a random slice of the traffic, so hit rates
+fall as replicas are added. The router sends requests with the same
+affinity key to the same replica instead: keys are placed on a consistent
+hash ring with virtual nodes, so adding or losing a replica only moves the
+keys of that replica.
+
+Affinity keys:
+
+* ``query`` (default): the normalized query, so repeated and paginated
+  queries find their (query, document) scores cached
+* ``documents``: the set of documents (or document IDs) regardless of
+  order, so candidate sets reranked for several phrasings stay together
+
+A replica that fails to connect, times out or answers 502/503/504 is
+skipped and the request goes to the next replica on the ring; active health
+checks take replicas out of and back into rotation. A 429 is passed back to
+the caller: it enforces the tenant's quota, which trying the other replicas
+would multiply. Sessions stay on the replica that opened them, document
+uploads and admin calls go to every replica, and per-backend request counts,
+failovers and latencies are exported on the router's /metrics.
+
+A document upload or deletion that does not get the same answer from every
+replica fails with 502 and the status of each replica. The replicas' stores
+then differ until the caller retries; uploads replace documents with the
+same ID, so retrying is safe.
+
+Run it with ``bge-reranker-server --router-backends URL,URL,...``.
+"""
+
+import asyncio
+import bisect
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from contextlib import asynccontextmanager, suppress
+from dataclasses import dataclass
+from typing import Any
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+
+from . import __version__
+from .client import LatencyEstimator
+from .compression import decompress
+from .dedup import normalize_text
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+AFFINITY_MODES = ("query", "documents")
+
+# Answers that move a request to the next replica; 429 is not among them
+FAILOVER_STATUS_CODES = frozenset({502, 503, 504})
+
+# Not forwarded in either direction; httpx and the ASGI server set their own
+_HOP_BY_HOP = frozenset(
+    {
+        "connection",
+        "content-length",
+        "host",
+        "keep-alive",
+        "proxy-connection",
+        "te",
+        "trailer",
+        "transfer-encoding",
+        "upgrade",
+    }
+)
+
+
+def _hash(data: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+
+
+def affinity_key(payload: Any, mode: str = "query") -> bytes:
+    """Key deciding which replica serves a request.
+
+    Batch requests are keyed by their first request. Requests without
+    documents fall back to the query.
+    """
+    if mode not in AFFINITY_MODES:
+        raise ValueError(f"Unknown affinity mode: {mode}")
+    if isinstance(payload, dict) and payload.get("requests"):
+        payload = payload["requests"][0]
+    if not isinstance(payload, dict):
+        return b""
+
+    texts = payload.get("document_ids") or payload.get("documents")
+    if mode == "query" or not isinstance(texts, list) or not texts:
+        return normalize_text(str(payload.get("query", ""))).encode("utf-8")
+    digest = hashlib.blake2b(digest_size=16)
+    for text in sorted({normalize_text(str(text)) for text in texts}):
+        data = text.encode("utf-8")
+        digest.update(len(data).to_bytes(8, "little"))
+        digest.update(data)
+    return digest.digest()
+
+
+class HashRing:
+    """Consistent hash ring with virtual nodes."""
+
+    def __init__(self, nodes: list[str], vnodes: int = 128):
+        """Place vnodes points per node on the ring.
+
+        Args:
+            nodes: Node names (backend URLs)
+            vnodes: Points per node; more points spread keys more evenly
+        """
+        self.nodes = list(dict.fromkeys(nodes))
+        points = sorted(
+            (_hash(f"{node}#{i}".encode()), node)
+            for node in self.nodes
+            for i in range(vnodes)
+        )
+        self._hashes = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    def preference(self, key: bytes) -> list[str]:
+        """Return every node, starting with the owner of key, in ring order.
+
+        The first node serves the key; the following ones take over, in
+        order, when the nodes before them are down.
+        """
+        if not self._owners:
+            return []
+        start = bisect.bisect(self._hashes, _hash(key))
+        order: dict[str, None] = {}
+        for i in range(len(self._owners)):
+            order.setdefault(self._owners[(start + i) % len(self._owners)])
+            if len(order) == len(self.nodes):
+                break
+        return list(order)
+
+
+@dataclass
+class BackendReply:
+    """Status, headers and undecoded body of a backend response."""
+
+    status_code: int
+    headers: httpx.Headers
+    content: bytes
+
+
+class Backend:
+    """One API server behind the router."""
+
+    def __init__(
+        self,
+        url: str,
+        timeout: float = 60.0,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        """Create the backend's connection pool.
+
+        Args:
+            url: Base URL, or ``unix:/path/to.sock`` for a Unix domain socket
+            timeout: Seconds to wait for a response
+            transport: Custom httpx transport (e.g. for tests)
+        """
+        self.url = url.rstrip("/")
+        self.healthy = True
+        self.latency = LatencyEstimator()
+        base_url = self.url
+        if self.url.startswith("unix:"):
+            base_url = "http://localhost"
+            if transport is None:
+                transport = httpx.AsyncHTTPTransport(uds=self.url.removeprefix("unix:"))
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=timeout,
+            # Responses are passed through as they are; only compress them
+            # when the caller asked for it
+            headers={"accept-encoding": "identity"},
+            transport=transport,
+        )
+
+    async def send(
+        self,
+        method: str,
+        path: str,
+        params: str = "",
+        content: bytes = b"",
+        headers: dict[str, str] | None = None,
+        record: bool = True,
+    ) -> BackendReply:
+        """Send a request and read the body without decoding it.
+
+        With record, the latency and status are added to the backend's
+        metrics (health checks are not).
+        """
+        request = self.client.build_request(
+            method, path, params=params, content=content, headers=headers
+        )
+        start_time = time.monotonic()
+        response = await self.client.send(request, stream=True)
+        try:
+            body = b"".join([chunk async for chunk in response.aiter_raw()])
+        finally:
+            await response.aclose()
+        if record:
+            elapsed = time.monotonic() - start_time
+            self.latency.observe(elapsed)
+            metrics.observe("router_backend_latency_seconds", elapsed, backend=self.url)
+            metrics.inc(
+                "router_backend_requests_total",
+                backend=self.url,
+                status=response.status_code,
+            )
+        return BackendReply(response.status_code, response.headers, body)
+
+    def set_healthy(self, healthy: bool) -> None:
+        """Take the backend out of or back into rotation."""
+        if healthy != self.healthy:
+            logger.info(f"Backend {self.url} is {'up' if healthy else 'down'}")
+        self.healthy = healthy
+        metrics.set_gauge("router_backend_healthy", float(healthy), backend=self.url)
+
+    def status(self) -> dict[str, Any]:
+        """Health and smoothed latency of the backend."""
+        srtt = self.latency.srtt
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "latency_ms": srtt * 1000 if srtt is not None else None,
+        }
+
+
+class NoBackendError(Exception):
+    """Raised when no backend could serve a request."""
+
+
+class Router:
+    """Consistent-hash routing with failover over a set of backends."""
+
+    def __init__(
+        self,
+        backends: list[str],
+        affinity: str = "query",
+        vnodes: int = 128,
+        health_interval: float = 5.0,
+        timeout: float = 60.0,
+        max_sessions: int = 100000,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        """Initialize the router.
+
+        Args:
+            backends: Backend URLs
+            affinity: "query" or "documents", see affinity_key
+            vnodes: Virtual nodes per backend on the hash ring
+            health_interval: Seconds between active health checks (0
+                disables them; failing requests still take a backend out)
+            timeout: Seconds to wait for a backend response
+            max_sessions: Session-to-backend assignments remembered
+            transport: Custom httpx transport for every backend
+        """
+        if not backends:
+            raise ValueError("At least one backend is required")
+        if affinity not in AFFINITY_MODES:
+            raise ValueError(f"Unknown affinity mode: {affinity}")
+        self.affinity = affinity
+        self.health_interval = health_interval
+        self.max_sessions = max_sessions
+        self.backends = {
+            url.rstrip("/"): Backend(url, timeout, transport) for url in backends
+        }
+        self.ring = HashRing(list(self.backends), vnodes)
+        self._sessions: OrderedDict[str, Backend] = OrderedDict()
+        self._health_task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        """Check backend health now and then every health_interval."""
+        await self.check_health()
+        if self.health_interval > 0:
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    async def stop(self) -> None:
+        """Stop health checks and close the connection pools."""
+        if self._health_task is not None:
+            self._health_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._health_task
+            self._health_task = None
+        for backend in self.backends.values():
+            await backend.client.aclose()
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_interval)
+            await self.check_health()
+
+    async def check_health(self) -> None:
+        """Mark each backend healthy if its /health reports a loaded model."""
+
+        async def check(backend: Backend) -> None:
+            try:
+                reply = await backend.send("GET", "/health", record=False)
+                healthy = (
+                    reply.status_code == 200
+                    and json.loads(reply.content).get("status") == "healthy"
+                )
+            except (httpx.HTTPError, ValueError) as e:
+                logger.debug(f"Health check of {backend.url} failed: {e}")
+                healthy = False
+            backend.set_healthy(healthy)
+
+        await asyncio.gather(*(check(backend) for backend in self.backends.values()))
+
+    def candidates(self, key: bytes) -> list[Backend]:
+        """Backends to try for a key: healthy ones in ring order, then the rest."""
+        ordered = [self.backends[url] for url in self.ring.preference(key)]
+        return [b for b in ordered if b.healthy] + [b for b in ordered if not b.healthy]
+
+    async def forward(
+        self, key: bytes, method: str, path: str, **kwargs: Any
+    ) -> tuple[Backend, BackendReply]:
+        """Send a request to the key's backend, failing over along the ring.
+
+        Raises:
+            NoBackendError: If every backend failed to connect
+        """
+        candidates = self.candidates(key)
+        errors: list[str] = []
+        for position, backend in enumerate(candidates):
+            try:
+                reply = await backend.send(method, path, **kwargs)
+            except httpx.TransportError as e:
+                backend.set_healthy(False)
+                errors.append(f"{backend.url}: {type(e).__name__}")
+                metrics.inc("router_failovers_total", backend=backend.url)
+                continue
+            if reply.status_code == 503:
+                backend.set_healthy(False)
+            if (
+                reply.status_code in FAILOVER_STATUS_CODES
+                and position < len(candidates) - 1
+            ):
+                metrics.inc("router_failovers_total", backend=backend.url)
+                continue
+            if position:
+                metrics.inc("router_rerouted_requests_total", backend=backend.url)
+            return backend, reply
+        raise NoBackendError(f"No backend available ({', '.join(errors)})")
+
+    async def broadcast(
+        self, method: str, path: str, **kwargs: Any
+    ) -> list[tuple[Backend, BackendReply | httpx.TransportError]]:
+        """Send a request to every backend, down ones included.
+
+        Returns:
+            Each backend with its reply, or the error that kept the request
+            from reaching it
+        """
+        backends = list(self.backends.values())
+        replies = await asyncio.gather(
+            *(backend.send(method, path, **kwargs) for backend in backends),
+            return_exceptions=True,
+        )
+        results: list[tuple[Backend, BackendReply | httpx.TransportError]] = []
+        for backend, reply in zip(backends, replies, strict=True):
+            if isinstance(reply, httpx.TransportError):
+                backend.set_healthy(False)
+                metrics.inc("router_broadcast_failures_total", backend=backend.url)
+            elif isinstance(reply, BaseException):
+                raise reply
+            results.append((backend, reply))
+        return results
+
+    def remember_session(self, session_id: str, backend: Backend) -> None:
+        """Pin a session to the backend holding it."""
+        self._sessions[session_id] = backend
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    def session_backend(self, session_id: str) -> Backend | None:
+        """Return the backend holding a session, if known."""
+        return self._sessions.get(session_id)
+
+    def forget_session(self, session_id: str) -> None:
+        """Drop a session's pin after it was closed or expired."""
+        self._sessions.pop(session_id, None)
+
+    def status(self) -> dict[str, Any]:
+        """Health of the router and its backends."""
+        backends = [backend.status() for backend in self.backends.values()]
+        healthy = sum(backend["healthy"] for backend in backends)
+        return {
+            "status": "healthy" if healthy else "unavailable",
+            "version": __version__,
+            "affinity": self.affinity,
+            "healthy_backends": healthy,
+            "backends": backends,
+        }
+
+
+def router_from_env() -> Router:
+    """Build a router from the BGE_ROUTER_* settings."""
+    backends = [
+        url.strip()
+        for url in os.getenv("BGE_ROUTER_BACKENDS", "").split(",")
+        if url.strip()
+    ]
+    return Router(
+        backends,
+        affinity=os.getenv("BGE_ROUTER_AFFINITY", "query").lower(),
+        vnodes=int(os.getenv("BGE_ROUTER_VNODES", "128")),
+        health_interval=float(os.getenv("BGE_ROUTER_HEALTH_INTERVAL", "5")),
+        timeout=float(os.getenv("BGE_ROUTER_TIMEOUT", "60")),
+    )
+
+
+def _request_headers(request: Request) -> dict[str, str]:
+    return {
+        name: value
+        for name, value in request.headers.items()
+        if name not in _HOP_BY_HOP
+    }
+
+
+def _response(backend: Backend, reply: BackendReply) -> Response:
+    headers = {
+        name: value
+        for name, value in reply.headers.items()
+        if name.lower() not in _HOP_BY_HOP
+    }
+    headers["x-routed-to"] = backend.url
+    return Response(reply.content, status_code=reply.status_code, headers=headers)
+
+
+def _json_body(body: bytes, headers: httpx.Headers | Any) -> Any:
+    """Parse a possibly compressed JSON body; None if it is not JSON."""
+    encoding = headers.get("content-encoding")
+    try:
+        if encoding and encoding != "identity":
+            body = decompress(body, encoding.lower())
+        return json.loads(body)
+    except ValueError:
+        return None
+
+
+def _unavailable(error: NoBackendError) -> JSONResponse:
+    return JSONResponse({"detail": str(error)}, status_code=502)
+
+
+def create_app(router_factory: Callable[[], Router] = router_from_env) -> FastAPI:
+    """Build the router application around the router router_factory returns."""
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        router = router_factory()
+        app.state.router = router
+        logger.info(
+            f"Routing to {len(router.backends)} backends by {router.affinity}: "
+            f"{', '.join(router.backends)}"
+        )
+        await router.start()
+        yield
+        await router.stop()
+
+    app = FastAPI(
+        title="BGE Reranker v2-m3 Router",
+        description="Cache-affinity router in front of BGE Reranker API servers",
+        version=__version__,
+        lifespan=lifespan,
+    )
+
+    async def forward(request: Request, key: bytes) -> Response:
+        router: Router = request.app.state.router
+        try:
+            backend, reply = await router.forward(
+                key,
+                request.method,
+                request.url.path,
+                params=request.url.query,
+                content=await request.body(),
+                headers=_request_headers(request),
+            )
+        except NoBackendError as e:
+            return _unavailable(e)
+        return _response(backend, reply)
+
+    async def broadcast(request: Request) -> Response:
+        router: Router = request.app.state.router
+        results = await router.broadcast(
+            request.method,
+            request.url.path,
+            params=request.url.query,
+            content=await request.body(),
+            headers=_request_headers(request),
+        )
+        statuses = {
+            reply.status_code if isinstance(reply, BackendReply) else None
+            for _, reply in results
+        }
+        backend, reply = results[0]
+        if len(statuses) == 1 and isinstance(reply, BackendReply):
+            return _response(backend, reply)
+        return JSONResponse(
+            {
+                "detail": "The request did not get the same answer from every "
+                "backend; retry it",
+                "backends": [
+                    {"url": backend.url, "status_code": reply.status_code}
+                    if isinstance(reply, BackendReply)
+                    else {"url": backend.url, "error": type(reply).__name__}
+                    for backend, reply in results
+                ],
+            },
+            status_code=502,
+        )
+
+    @app.get("/health")
+    async def health(request: Request):
+        """Router and backend health; healthy while any backend is."""
+        status = request.app.state.router.status()
+        code = 200 if status["healthy_backends"] else 503
+        return JSONResponse(status, status_code=code)
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    async def get_metrics():
+        """Router metrics, including per-backend latency, in Prometheus format."""
+        return PlainTextResponse(metrics.render_prometheus())
+
+    @app.post("/rerank")
+    @app.post("/rerank/batch")
+    async def rerank(request: Request):
+        """Route a rerank request to the replica owning its affinity key."""
+        router: Router = request.app.state.router
+        payload = _json_body(await request.body(), request.headers)
+        return await forward(request, affinity_key(payload, router.affinity))
+
+    @app.post("/sessions")
+    async def open_session(request: Request):
+        """Open a session on the query's replica and pin it there."""
+        router: Router = request.app.state.router
+        payload = _json_body(await request.body(), request.headers)
+        # Appends carry no query, so sessions are always placed by query
+        response = await forward(request, affinity_key(payload, "query"))
+        if response.status_code == 200:
+            body = _json_body(response.body, response.headers)
+            if isinstance(body, dict) and "session_id" in body:
+                backend = router.backends[response.headers["x-routed-to"]]
+                router.remember_session(body["session_id"], backend)
+        return response
+
+    @app.api_route("/sessions/{session_id}", methods=["GET", "DELETE"])
+    @app.post("/sessions/{session_id}/documents")
+    async def session_request(session_id: str, request: Request):
+        """Send a session request to the replica holding the session."""
+        router: Router = request.app.state.router
+        backend = router.session_backend(session_id)
+        if backend is None:
+            return JSONResponse(
+                {"detail": f"Unknown or expired session: {session_id}"},
+                status_code=404,
+            )
+        try:
+            reply = await backend.send(
+                request.method,
+                request.url.path,
+                params=request.url.query,
+                content=await request.body(),
+                headers=_request_headers(request),
+            )
+        except httpx.TransportError as e:
+            backend.set_healthy(False)
+            return _unavailable(NoBackendError(f"{backend.url}: {type(e).__name__}"))
+        if reply.status_code == 404 or (
+            request.method == "DELETE" and reply.status_code == 200
+        ):
+            router.forget_session(session_id)
+        return _response(backend, reply)
+
+    @app.get("/documents")
+    async def document_store_status(request: Request):
+        """Document store status of one replica (all hold the same uploads)."""
+        return await forward(request, b"")
+
+    @app.post("/documents")
+    @app.delete("/documents/{document_id}")
+    @app.api_route("/admin/{path:path}", methods=["GET", "POST", "PUT", "DELETE"])
+    async def to_every_backend(request: Request):
+        """Apply document uploads and admin calls on every replica."""
+        return await broadcast(request)
+
+    return app
+
+
+# Application served by bge-reranker-server --router-backends
+app = create_app()
@@ -0,0 +1,437 @@
+"""Per-tenant fair scheduling in front of the inference service.
+
+Requests are queued per tenant and dispatched with start-time fair queuing
+(SFQ): each job gets a virtual start tag, and the job with the smallest tag
+among all tenants runs next. A tenant's tags advance by cost / weight, so a
+tenant sending 1000-document requests gets the same share of pairs as one
+sending 10-document requests, scaled by its weight.
+
+On top of that:
+
+* an "interactive" lane is always served before the "batch" lane
+* optional per-tenant token buckets cap the pairs per second a tenant can use
+* per-tenant queue depth, wait time and latency are published as metrics
+
+Tenant names may come from an untrusted header, so the state kept per tenant
+is bounded: empty queues and finish tags the lane's virtual time has passed
+are dropped, and token buckets are kept for at most max_buckets tenants.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import hashlib
+import itertools
+import logging
+import time
+from collections import OrderedDict, deque
+from collections.abc import Callable, Collection, Mapping
+from dataclasses import dataclass, field
+from typing import Any
+
+from .metrics import metrics
+from .tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+LANES = (INTERACTIVE, BATCH)
+
+
+class QueueFullError(Exception):
+    """Raised when a tenant already has too many queued requests."""
+
+
+def parse_mapping(value: str | None) -> dict[str, str]:
+    """Parse a "key=value,key=value" configuration string."""
+    mapping: dict[str, str] = {}
+    if not value:
+        return mapping
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        key, sep, val = item.partition("=")
+        if not sep:
+            raise ValueError(f"Invalid mapping entry (expected key=value): {item}")
+        mapping[key.strip()] = val.strip()
+    return mapping
+
+
+def resolve_tenant(
+    headers: Mapping[str, str],
+    api_keys: Mapping[str, str] | None = None,
+    tenant_header: str = "x-tenant-id",
+    known_tenants: Collection[str] | None = None,
+) -> str:
+    """Identify the tenant of a request.
+
+    An API key (X-API-Key or a bearer token) takes precedence over the tenant
+    header. Keys listed in api_keys map to their configured tenant name;
+    unknown keys map to a stable hash so the raw key never shows up in
+    metrics. With known_tenants given, any other tenant is "default", so
+    clients cannot create tenants by sending new names.
+    """
+    api_key = headers.get("x-api-key")
+    authorization = headers.get("authorization", "")
+    if not api_key and authorization.lower().startswith("bearer "):
+        api_key = authorization[7:].strip()
+    if api_key:
+        if api_keys and api_key in api_keys:
+            return api_keys[api_key]
+        tenant = "key-" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+    else:
+        tenant = headers.get(tenant_header) or "default"
+    if known_tenants is not None and tenant not in known_tenants:
+        return "default"
+    return tenant
+
+
+def resolve_priority(
+    headers: Mapping[str, str], num_pairs: int, interactive_max_pairs: int
+) -> str:
+    """Choose the lane of a request.
+
+    Requests may ask for a lane with the X-Priority header, but only requests
+    of at most interactive_max_pairs pairs are admitted to the interactive
+    lane; larger ones always go to the batch lane.
+    """
+    requested = headers.get("x-priority", "").lower()
+    if requested == BATCH or num_pairs > interactive_max_pairs:
+        return BATCH
+    return INTERACTIVE
+
+
+class TokenBucket:
+    """Token bucket limiting a tenant to a number of pairs per second."""
+
+    def __init__(self, rate: float, burst: float | None = None):
+        """Initialize the bucket.
+
+        Args:
+            rate: Tokens (pairs) added per second
+            burst: Bucket capacity (default: one second worth of tokens)
+        """
+        self.rate = rate
+        self.burst = burst if burst is not None else rate
+        self.tokens = self.burst
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def ready_at(self, cost: float, now: float) -> float:
+        """Return the monotonic time at which a job of this cost may start.
+
+        Jobs larger than the bucket only wait for a full bucket and then push
+        it into debt, which delays the tenant's following jobs instead.
+        """
+        self._refill(now)
+        needed = min(cost, self.burst)
+        if self.tokens >= needed:
+            return now
+        return now + (needed - self.tokens) / self.rate
+
+    def consume(self, cost: float, now: float) -> None:
+        """Take tokens for a job that is starting."""
+        self._refill(now)
+        self.tokens -= cost
+
+
+@dataclass
+class _Job:
+    fn: Callable[[], Any]
+    tenant: str
+    lane: str
+    cost: float
+    start_tag: float
+    future: asyncio.Future
+    batch_id: int = 0
+    enqueued_at: float = field(default_factory=time.monotonic)
+    enqueued_ns: int = field(default_factory=time.time_ns)
+    # Context of the submitter, so tracing spans nest under its request
+    context: contextvars.Context = field(default_factory=contextvars.copy_context)
+
+
+class FairScheduler:
+    """Weighted fair queue with quotas and a priority lane.
+
+    Jobs are synchronous callables executed in worker threads, so the event
+    loop stays responsive while the model runs.
+    """
+
+    def __init__(
+        self,
+        weights: dict[str, float] | None = None,
+        quotas: dict[str, float] | None = None,
+        default_weight: float = 1.0,
+        default_quota: float | None = None,
+        concurrency: int = 1,
+        max_queue_per_tenant: int = 0,
+        observer: Callable[[float, float], None] | None = None,
+        max_buckets: int = 10000,
+    ):
+        """Initialize the scheduler.
+
+        Args:
+            weights: Per-tenant share weights
+            quotas: Per-tenant limits in pairs per second
+            default_weight: Weight for tenants not listed in weights
+            default_quota: Pairs per second for tenants not listed in quotas
+                (None for unlimited)
+            concurrency: Number of jobs executed at the same time
+            max_queue_per_tenant: Reject requests beyond this many queued jobs
+                per tenant (0 for unlimited)
+            observer: Called with the queue wait and latency in seconds of
+                every finished job
+            max_buckets: Token buckets kept at most; the least recently used
+                one is dropped to make room
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+
+        self.weights = weights or {}
+        self.quotas = quotas or {}
+        self.default_weight = default_weight
+        self.default_quota = default_quota
+        self.concurrency = concurrency
+        self.max_queue_per_tenant = max_queue_per_tenant
+        self.observer = observer
+        self.max_buckets = max_buckets
+
+        self._queues: dict[str, dict[str, deque[_Job]]] = {lane: {} for lane in LANES}
+        self._virtual_time = dict.fromkeys(LANES, 0.0)
+        self._last_finish: dict[tuple[str, str], float] = {}
+        self._buckets: OrderedDict[str, TokenBucket] = OrderedDict()
+        self._condition: asyncio.Condition | None = None
+        self._workers: list[asyncio.Task] = []
+        self._batch_ids = itertools.count(1)
+
+    def _weight(self, tenant: str) -> float:
+        return max(self.weights.get(tenant, self.default_weight), 1e-6)
+
+    def _bucket(self, tenant: str) -> TokenBucket | None:
+        rate = self.quotas.get(tenant, self.default_quota)
+        if not rate:
+            return None
+        bucket = self._buckets.get(tenant)
+        if bucket is None:
+            bucket = self._buckets[tenant] = TokenBucket(rate)
+            while len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(tenant)
+        return bucket
+
+    def queue_depth(self, tenant: str | None = None) -> int:
+        """Return the number of queued jobs, for one tenant or in total."""
+        return sum(
+            len(queue)
+            for lane in LANES
+            for name, queue in self._queues[lane].items()
+            if tenant is None or name == tenant
+        )
+
+    def _publish_depth(self, tenant: str) -> None:
+        for lane in LANES:
+            queue = self._queues[lane].get(tenant)
+            metrics.set_gauge(
+                "queue_depth", len(queue) if queue else 0, tenant=tenant, lane=lane
+            )
+
+    async def start(self) -> None:
+        """Start the dispatch workers."""
+        if self._workers:
+            return
+        self._condition = asyncio.Condition()
+        self._workers = [
+            asyncio.create_task(self._worker_loop()) for _ in range(self.concurrency)
+        ]
+
+    async def stop(self) -> None:
+        """Stop the dispatch workers and fail any queued jobs."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        for lane in LANES:
+            for queue in self._queues[lane].values():
+                while queue:
+                    job = queue.popleft()
+                    if not job.future.done():
+                        job.future.set_exception(RuntimeError("Scheduler stopped"))
+            self._queues[lane].clear()
+
+    async def submit(
+        self,
+        fn: Callable[[], Any],
+        *,
+        tenant: str = "default",
+        priority: str = BATCH,
+        cost: float = 1.0,
+    ) -> Any:
+        """Queue a job and wait for its result.
+
+        Args:
+            fn: Synchronous callable to run in a worker thread
+            tenant: Tenant the job is accounted to
+            priority: "interactive" or "batch"
+            cost: Job size in query-document pairs
+
+        Returns:
+            Whatever fn returns
+        """
+        if self._condition is None:
+            raise RuntimeError("Scheduler is not started")
+        if priority not in LANES:
+            raise ValueError(f"Unknown priority: {priority}")
+        if self.max_queue_per_tenant and (
+            self.queue_depth(tenant) >= self.max_queue_per_tenant
+        ):
+            metrics.inc("rejected_requests_total", tenant=tenant)
+            raise QueueFullError(f"Too many queued requests for tenant {tenant}")
+
+        loop = asyncio.get_running_loop()
+        async with self._condition:
+            start_tag = max(
+                self._virtual_time[priority],
+                self._last_finish.get((priority, tenant), 0.0),
+            )
+            self._last_finish[(priority, tenant)] = start_tag + cost / self._weight(
+                tenant
+            )
+            job = _Job(
+                fn,
+                tenant,
+                priority,
+                cost,
+                start_tag,
+                loop.create_future(),
+                batch_id=next(self._batch_ids),
+            )
+            self._queues[priority].setdefault(tenant, deque()).append(job)
+            self._publish_depth(tenant)
+            self._condition.notify()
+
+        return await job.future
+
+    def _pick(self, now: float) -> tuple[_Job | None, float | None]:
+        """Select the next job, or the earliest time a quota-blocked job is ready."""
+        wake_at: float | None = None
+        for lane in LANES:
+            best: _Job | None = None
+            empty: list[str] = []
+            for tenant, queue in self._queues[lane].items():
+                # Drop jobs whose caller went away
+                while queue and queue[0].future.done():
+                    queue.popleft()
+                if not queue:
+                    empty.append(tenant)
+                    continue
+                head = queue[0]
+                bucket = self._bucket(tenant)
+                if bucket is not None:
+                    ready_at = bucket.ready_at(head.cost, now)
+                    if ready_at > now:
+                        wake_at = (
+                            ready_at if wake_at is None else min(wake_at, ready_at)
+                        )
+                        continue
+                if best is None or head.start_tag < best.start_tag:
+                    best = head
+            for tenant in empty:
+                del self._queues[lane][tenant]
+            if best is not None:
+                queue = self._queues[lane][best.tenant]
+                queue.popleft()
+                if not queue:
+                    del self._queues[lane][best.tenant]
+                self._advance(lane, best.start_tag)
+                bucket = self._bucket(best.tenant)
+                if bucket is not None:
+                    bucket.consume(best.cost, now)
+                return best, None
+        return None, wake_at
+
+    def _advance(self, lane: str, start_tag: float) -> None:
+        """Move a lane's virtual time forward and forget passed finish tags.
+
+        A finish tag at or behind the virtual time no longer delays its
+        tenant's next job, so it is the same as having none. Once no jobs
+        are left in the lane, virtual time jumps to the largest finish tag,
+        as in SFQ when the server idles, so every tag is forgotten.
+        """
+        finish_tags = [
+            finish for (name, _), finish in self._last_finish.items() if name == lane
+        ]
+        virtual_time = max(self._virtual_time[lane], start_tag)
+        if not self._queues[lane]:
+            virtual_time = max([virtual_time, *finish_tags])
+        self._virtual_time[lane] = virtual_time
+        if not finish_tags or min(finish_tags) > virtual_time:
+            return
+        passed = [
+            key
+            for key, finish in self._last_finish.items()
+            if key[0] == lane and finish <= virtual_time
+        ]
+        for key in passed:
+            del self._last_finish[key]
+
+    async def _next_job(self) -> _Job:
+        assert self._condition is not None
+        async with self._condition:
+            while True:
+                now = time.monotonic()
+                job, wake_at = self._pick(now)
+                if job is not None:
+                    self._publish_depth(job.tenant)
+                    return job
+                timeout = None if wake_at is None else max(wake_at - now, 0.0)
+                with contextlib.suppress(TimeoutError):
+                    await asyncio.wait_for(self._condition.wait(), timeout)
+
+    async def _worker_loop(self) -> None:
+        while True:
+            job = await self._next_job()
+            started_at = time.monotonic()
+            wait = started_at - job.enqueued_at
+            metrics.observe(
+                "queue_wait_seconds", wait, tenant=job.tenant, lane=job.lane
+            )
+            try:
+                result = await asyncio.to_thread(job.context.run, self._run_job, job)
+            except Exception as e:
+                if not job.future.done():
+                    job.future.set_exception(e)
+            else:
+                if not job.future.done():
+                    job.future.set_result(result)
+            finished_at = time.monotonic()
+            metrics.observe(
+                "request_latency_seconds",
+                finished_at - job.enqueued_at,
+                tenant=job.tenant,
+                lane=job.lane,
+            )
+            metrics.inc("scheduled_pairs_total", job.cost, tenant=job.tenant)
+            if self.observer is not None:
+                self.observer(wait, finished_at - job.enqueued_at)
+
+    @staticmethod
+    def _run_job(job: _Job) -> Any:
+        """Run a job inside its submitter's context."""
+        tracer.record_span(
+            "rerank.queue",
+            job.enqueued_ns,
+            time.time_ns(),
+            tenant=job.tenant,
+            lane=job.lane,
+            batch_id=job.batch_id,
+        )
+        span = tracer.current_span()
+        if span is not None:
+            span.set_attribute("batch_id", job.batch_id)
+        return job.fn()
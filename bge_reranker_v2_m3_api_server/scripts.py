@@ -1,11 +1,15 @@
 """Development scripts for BGE Reranker v2-m3 API Server."""
 
+import argparse
+import os
 import subprocess
 import sys
 from pathlib import Path
 
 
-def run_command(cmd: list[str], description: str) -> bool:
+def run_command(
+    cmd: list[str], description: str, env: dict[str, str] | None = None
+) -> bool:
     """运行命令并返回是否成功."""
     print(f"🔍 {description}...")
     print(f"执行命令: {' '.join(cmd)}")
@@ -19,6 +23,7 @@ def run_command(cmd: list[str], description: str) -> bool:
             encoding="utf-8",
             errors="replace",
             check=True,
+            env={**os.environ, **env} if env else None,
         )
         print(f"✅ {description} 成功")
         if result.stdout:
@@ -59,6 +64,18 @@ def run_tests() -> bool:
     )
 
 
+def run_perf_tests(update_baselines: bool = False) -> bool:
+    """运行性能回归测试 (tests/perf), 可选择重新记录基线."""
+    env = {"BGE_PERF_TESTS": "1"}
+    if update_baselines:
+        env["BGE_PERF_UPDATE_BASELINES"] = "1"
+    return run_command(
+        ["pytest", "tests/perf/", "-v", "-m", "perf"],
+        "更新性能基线" if update_baselines else "运行性能回归测试",
+        env=env,
+    )
+
+
 def install_pre_commit() -> None:
     """安装 pre-commit 钩子."""
     print("🪝 安装 pre-commit 钩子...")
@@ -137,7 +154,22 @@ def run_lint() -> None:
 
 def test_entry() -> None:
     """测试的入口函数，用于命令行调用."""
-    success = run_tests()
+    parser = argparse.ArgumentParser(prog="bge-reranker-test")
+    parser.add_argument(
+        "--perf",
+        action="store_true",
+        help="Run the performance regression tier instead of the unit tests",
+    )
+    parser.add_argument(
+        "--update-baselines",
+        action="store_true",
+        help="With --perf, record new baselines in tests/perf/baselines.json",
+    )
+    args = parser.parse_args()
+    if args.update_baselines and not args.perf:
+        parser.error("--update-baselines requires --perf")
+
+    success = run_perf_tests(args.update_baselines) if args.perf else run_tests()
     if not success:
         sys.exit(1)
     else:
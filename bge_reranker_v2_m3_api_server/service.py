@@ -1,19 +1,57 @@
 """BGE Reranker service implementation."""
 
+import gc
 import logging
+import sys
 import time
+from collections import deque
+from dataclasses import dataclass
 from typing import TYPE_CHECKING
 
+import numpy as np
+
+from .batching import AdaptiveBatchController, estimate_tokens, is_out_of_memory
+from .compiled import CompiledForward
+from .dedup import DEDUP_MODES, ScoreCache, deduplicate_pairs, pair_fingerprint
+from .lazy import NOT_IMPORTED, resolve
+from .memory import memory_tracker, module_bytes
+from .metrics import metrics
+from .pipeline import PipelinedForward
+from .postprocess import rank_scores, to_scores
+from .prerank import EmbeddingPreranker
+from .singleflight import SingleFlight, request_fingerprint
+from .tracing import tracer
+
 if TYPE_CHECKING:
     from FlagEmbedding import FlagReranker
 else:
-    try:
-        from FlagEmbedding import FlagReranker
-    except ImportError:
-        FlagReranker = None  # type: ignore
+    # Imported by load_model(), so importing the service stays fast
+    FlagReranker = NOT_IMPORTED
 
 logger = logging.getLogger(__name__)
 
+# Consecutive tokenization pipeline failures before it is disabled
+PIPELINE_MAX_FAILURES = 3
+# Consecutive compiled forward pass failures before it is disabled
+COMPILED_MAX_FAILURES = 3
+
+
+@dataclass
+class ScoringStats:
+    """Per-call statistics filled in by RerankerService when requested."""
+
+    total_documents: int = 0
+    unique_documents: int = 0
+    cache_hits: int = 0
+    unscored: int = 0
+
+    @property
+    def dedup_ratio(self) -> float:
+        """Fraction of input documents that did not need their own score."""
+        if self.total_documents == 0:
+            return 0.0
+        return 1.0 - self.unique_documents / self.total_documents
+
 
 class RerankerService:
     """Service class for BGE Reranker v2-m3 model."""
@@ -23,6 +61,13 @@ class RerankerService:
         model_name: str = "BAAI/bge-reranker-v2-m3",
         use_fp16: bool = True,
         device: str | None = None,
+        dedup_mode: str = "normalized",
+        score_cache_size: int = 0,
+        preranker: EmbeddingPreranker | None = None,
+        batch_controller: AdaptiveBatchController | None = None,
+        compiled_forward: CompiledForward | None = None,
+        single_flight: bool = True,
+        pipeline: PipelinedForward | None = None,
     ):
         """Initialize the reranker service.
 
@@ -30,16 +75,45 @@ class RerankerService:
             model_name: Name or path of the BGE reranker model
             use_fp16: Whether to use FP16 for faster inference
             device: Device to load the model on (cuda/cpu)
+            dedup_mode: How duplicate documents are detected before inference
+                ("off", "exact" or "normalized")
+            score_cache_size: Number of pair scores kept across requests
+                (0 disables the cache)
+            preranker: Optional bi-encoder stage that limits the documents
+                of rerank requests passed to the cross-encoder
+            batch_controller: Optional controller sizing forward passes from
+                observed latency and memory (default: one compute_score call)
+            compiled_forward: Optional compiled forward pass used instead of
+                compute_score when its compilation succeeds
+            single_flight: Whether concurrent identical rerank calls share
+                one computation
+            pipeline: Optional pipeline tokenizing upcoming batches while
+                the model runs, used instead of compute_score
         """
+        if dedup_mode not in DEDUP_MODES:
+            raise ValueError(f"Unknown dedup mode: {dedup_mode}")
+
         self.model_name = model_name
         self.use_fp16 = use_fp16
         self.device = device
+        self.dedup_mode = dedup_mode
+        self.score_cache = (
+            ScoreCache(score_cache_size) if score_cache_size > 0 else None
+        )
+        self.preranker = preranker
+        self.batch_controller = batch_controller
+        self.compiled_forward = compiled_forward
+        self._compiled_failures = 0
+        self.single_flight = SingleFlight() if single_flight else None
+        self.pipeline = pipeline
+        self._pipeline_failures = 0
         self._reranker: FlagReranker | None = None
         self._model_loaded = False
 
     def load_model(self) -> None:
         """Load the BGE reranker model."""
-        if FlagReranker is None:
+        flag_reranker = resolve(globals(), "FlagReranker", "FlagEmbedding")
+        if flag_reranker is None:
             raise ImportError(
                 "FlagEmbedding is not installed. Please install it with: "
                 "pip install FlagEmbedding"
@@ -47,7 +121,19 @@ class RerankerService:
 
         try:
             logger.info(f"Loading BGE reranker model: {self.model_name}")
-            self._reranker = FlagReranker(self.model_name, use_fp16=self.use_fp16)
+            self._reranker = flag_reranker(self.model_name, use_fp16=self.use_fp16)
+            if self.compiled_forward is not None:
+                self._compiled_failures = 0
+                self.compiled_forward.load(
+                    self._reranker.model, self._reranker.tokenizer, self.max_length
+                )
+            if self.pipeline is not None:
+                self._pipeline_failures = 0
+                self.pipeline.load(
+                    self._reranker.model, self._reranker.tokenizer, self.max_length
+                )
+            if self.preranker is not None:
+                self.preranker.load_model()
             self._model_loaded = True
             logger.info("Model loaded successfully")
         except Exception as e:
@@ -58,11 +144,314 @@ class RerankerService:
         """Check if the model is loaded."""
         return self._model_loaded and self._reranker is not None
 
+    def unload(self) -> None:
+        """Drop the model and cached scores so their memory can be reclaimed."""
+        self._model_loaded = False
+        self._reranker = None
+        if self.score_cache is not None:
+            self.score_cache.clear()
+        if self.preranker is not None:
+            self.preranker.unload()
+        if self.compiled_forward is not None:
+            self.compiled_forward.unload()
+        if self.pipeline is not None:
+            self.pipeline.unload()
+        gc.collect()
+        self._release_cached_memory()
+
+    def memory_usage(self) -> dict[str, int]:
+        """Estimate the memory held by the model weights and caches."""
+        model = getattr(self._reranker, "model", None)
+        usage = {
+            "model_weights_bytes": module_bytes(model) if model is not None else 0,
+            "score_cache_entries": len(self.score_cache)
+            if self.score_cache is not None
+            else 0,
+        }
+        if self.preranker is not None:
+            usage["vector_cache_entries"] = len(self.preranker.cache)
+            usage["vector_cache_bytes"] = self.preranker.cache.nbytes()
+        return usage
+
+    def compute_pair_scores(
+        self,
+        pairs: list[tuple[str, str]],
+        normalize: bool = True,
+        stats: ScoringStats | None = None,
+        max_length: int | None = None,
+        cache_only: bool = False,
+    ) -> list[float]:
+        """Compute relevance scores for arbitrary (query, document) pairs.
+
+        Same as score_pairs, with the scores as a list of floats.
+        """
+        return self.score_pairs(
+            pairs, normalize, stats, max_length=max_length, cache_only=cache_only
+        ).tolist()
+
+    def score_pairs(
+        self,
+        pairs: list[tuple[str, str]],
+        normalize: bool = True,
+        stats: ScoringStats | None = None,
+        max_length: int | None = None,
+        cache_only: bool = False,
+    ) -> np.ndarray:
+        """Compute relevance scores for arbitrary (query, document) pairs.
+
+        Unlike compute_scores, the pairs may mix several queries, which lets
+        callers such as the offline batch runner pack many rows into a single
+        model call. Duplicate pairs are scored once and pairs found in the
+        score cache are not scored at all.
+
+        Args:
+            pairs: List of (query, document) tuples
+            normalize: Whether to normalize scores using sigmoid
+            stats: Optional ScoringStats to fill in
+            max_length: Shorter model input length for this call; its
+                scores are not added to the score cache
+            cache_only: Only use cached scores; other pairs score NaN and
+                are left out of rankings
+
+        Returns:
+            float64 array of scores, one per pair
+        """
+        if not self.is_model_loaded():
+            raise RuntimeError("Model is not loaded. Call load_model() first.")
+
+        with tracer.span("rerank.dedup", documents=len(pairs)) as span:
+            unique_pairs, inverse = deduplicate_pairs(pairs, self.dedup_mode)
+            # NaN marks scores still to be computed
+            unique_scores = np.full(len(unique_pairs), np.nan)
+
+            fingerprints: list[bytes] = []
+            if self.score_cache is not None:
+                fingerprints = [
+                    pair_fingerprint(query, doc, normalize, self.dedup_mode)
+                    for query, doc in unique_pairs
+                ]
+                unique_scores = np.array(
+                    self.score_cache.get_many(fingerprints), dtype=np.float64
+                ).reshape(-1)
+
+            missing = np.flatnonzero(np.isnan(unique_scores))
+            if span is not None:
+                span.set_attribute("unique_documents", len(unique_pairs))
+                span.set_attribute("cache_hits", len(unique_pairs) - len(missing))
+
+        unscored = 0
+        if len(missing) and cache_only:
+            # Their NaN scores stay, so they cannot pass for real scores
+            unscored = len(missing)
+            missing = missing[:0]
+        if len(missing):
+            model_pairs = [unique_pairs[i] for i in missing]
+            # FlagReranker tokenizes inside compute_score, so tokenization and
+            # the forward pass share one span
+            with tracer.span("rerank.inference", pairs=len(model_pairs)) as span:
+                if span is not None:
+                    span.set_attribute(
+                        "total_tokens", self._count_tokens(model_pairs, max_length)
+                    )
+                computed = self._score_with_model(model_pairs, normalize, max_length)
+            unique_scores[missing] = computed
+            if self.score_cache is not None and max_length is None:
+                self.score_cache.put_many(
+                    list(
+                        zip(
+                            [fingerprints[i] for i in missing],
+                            computed.tolist(),
+                            strict=True,
+                        )
+                    )
+                )
+
+        cache_hits = len(unique_pairs) - len(missing) - unscored
+        metrics.inc("pairs_total", len(pairs))
+        metrics.inc("unique_pairs_total", len(unique_pairs))
+        metrics.inc("model_pairs_total", len(missing))
+        metrics.inc("score_cache_hits_total", cache_hits)
+        if pairs:
+            metrics.observe("dedup_ratio", 1.0 - len(unique_pairs) / len(pairs))
+
+        scores = unique_scores[np.asarray(inverse, dtype=np.intp)]
+        if stats is not None:
+            stats.total_documents = len(pairs)
+            stats.unique_documents = len(unique_pairs)
+            stats.cache_hits = cache_hits
+            stats.unscored = int(np.isnan(scores).sum()) if unscored else 0
+
+        return scores
+
+    def _score_with_model(
+        self,
+        pairs: list[tuple[str, str]],
+        normalize: bool,
+        max_length: int | None = None,
+    ) -> np.ndarray:
+        """Run the cross-encoder on pairs and return a float64 score array."""
+        if self._use_pipeline():
+            try:
+                scores = self._score_pipelined(pairs, normalize, max_length)
+                self._pipeline_failures = 0
+                return scores
+            except Exception as e:
+                if is_out_of_memory(e):
+                    # The eager path below retries in smaller batches
+                    if self.batch_controller is not None:
+                        self.batch_controller.record_oom()
+                    self._release_cached_memory()
+                else:
+                    # One failure falls back for this call only; the pipeline
+                    # is disabled once it keeps failing
+                    self._pipeline_failures += 1
+                    metrics.inc("pipeline_fallbacks_total")
+                    if self._pipeline_failures >= PIPELINE_MAX_FAILURES:
+                        logger.warning(
+                            f"Tokenization pipeline failed {self._pipeline_failures}"
+                            f" times in a row, disabling it: {e}"
+                        )
+                        self.pipeline.unload()  # type: ignore
+                    else:
+                        logger.warning(f"Tokenization pipeline failed: {e}")
+
+        kwargs = {} if max_length is None else {"max_length": max_length}
+        if self.batch_controller is None:
+            return self._compute_batch(pairs, normalize, **kwargs)
+
+        controller = self.batch_controller
+        max_length = min(max_length or self.max_length, self.max_length)
+        token_counts = [estimate_tokens(q, d, max_length) for q, d in pairs]
+        scores = np.zeros(len(pairs))
+
+        chunks = deque(controller.plan(token_counts))
+        while chunks:
+            chunk = chunks.popleft()
+            start_time = time.perf_counter()
+            try:
+                chunk_scores = self._compute_batch(
+                    [pairs[i] for i in chunk],
+                    normalize,
+                    batch_size=len(chunk),
+                    **kwargs,
+                )
+            except Exception as e:
+                if not is_out_of_memory(e) or len(chunk) == 1:
+                    raise
+                controller.record_oom()
+                self._release_cached_memory()
+                # Retry the failed batch in two halves
+                half = len(chunk) // 2
+                chunks.appendleft(chunk[half:])
+                chunks.appendleft(chunk[:half])
+                continue
+            controller.record(
+                len(chunk) * max(token_counts[i] for i in chunk),
+                time.perf_counter() - start_time,
+            )
+            scores[chunk] = chunk_scores
+        return scores
+
+    def _use_pipeline(self) -> bool:
+        """Check if the tokenization pipeline should score model pairs.
+
+        A ready compiled forward pass takes precedence, since it pads to its
+        own shape buckets.
+        """
+        if self.pipeline is None or not self.pipeline.ready:
+            return False
+        return self.compiled_forward is None or not self.compiled_forward.ready
+
+    def _score_pipelined(
+        self,
+        pairs: list[tuple[str, str]],
+        normalize: bool,
+        max_length: int | None,
+    ) -> np.ndarray:
+        """Score pairs through the pipeline, batched by the batch controller."""
+        batches = None
+        if self.batch_controller is not None:
+            length = min(max_length or self.max_length, self.max_length)
+            batches = self.batch_controller.plan(
+                [estimate_tokens(q, d, length) for q, d in pairs]
+            )
+        return to_scores(self.pipeline(pairs, normalize, max_length, batches))  # type: ignore
+
+    @property
+    def max_length(self) -> int:
+        """Maximum input tokens per pair of the loaded model."""
+        max_length = getattr(self._reranker, "max_length", None)
+        return max_length if isinstance(max_length, int) else 512
+
+    @property
+    def tokenizer(self):
+        """Tokenizer of the loaded model, or None."""
+        return getattr(self._reranker, "tokenizer", None)
+
+    @staticmethod
+    def _release_cached_memory() -> None:
+        """Return cached GPU memory after an out-of-memory error."""
+        torch = sys.modules.get("torch")
+        if torch is not None and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def _compute_batch(
+        self, pairs: list[tuple[str, str]], normalize: bool, **kwargs
+    ) -> np.ndarray:
+        """Call FlagReranker.compute_score and convert scores to an array."""
+        max_length = kwargs.get("max_length", self.max_length)
+        tokens = max((estimate_tokens(q, d, max_length) for q, d in pairs), default=0)
+        compiled = self.compiled_forward
+        if compiled is not None and compiled.ready:
+            try:
+                with memory_tracker.measure_batch(len(pairs), tokens):
+                    scores = to_scores(
+                        compiled(pairs, normalize, kwargs.get("max_length"))
+                    )
+                self._compiled_failures = 0
+                return scores
+            except Exception as e:
+                if is_out_of_memory(e):
+                    raise
+                # One failure falls back for this call only; compilation is
+                # disabled once it keeps failing
+                self._compiled_failures += 1
+                metrics.inc("compile_fallbacks_total", reason="runtime")
+                if self._compiled_failures >= COMPILED_MAX_FAILURES:
+                    logger.warning(
+                        f"Compiled forward pass failed {self._compiled_failures}"
+                        f" times in a row, using eager mode: {e}"
+                    )
+                    compiled.unload()
+                else:
+                    logger.warning(f"Compiled forward pass failed: {e}")
+
+        with memory_tracker.measure_batch(len(pairs), tokens):
+            scores = self._reranker.compute_score(  # type: ignore
+                pairs, normalize=normalize, **kwargs
+            )
+        # compute_score returns a bare float for a single pair
+        return to_scores(scores)
+
+    def _count_tokens(
+        self, pairs: list[tuple[str, str]], max_length: int | None = None
+    ) -> int:
+        """Estimate model input tokens of pairs, for tracing only.
+
+        Uses the same length estimate as batching, so tracing does not
+        tokenize every request a second time.
+        """
+        max_length = min(max_length or self.max_length, self.max_length)
+        return sum(estimate_tokens(q, d, max_length) for q, d in pairs)
+
     def compute_scores(
         self,
         query: str,
         documents: list[str],
         normalize: bool = True,
+        stats: ScoringStats | None = None,
+        max_length: int | None = None,
+        cache_only: bool = False,
     ) -> tuple[list[float], float]:
         """Compute relevance scores for query-document pairs.
 
@@ -70,6 +459,9 @@ class RerankerService:
             query: The search query
             documents: List of documents to score
             normalize: Whether to normalize scores using sigmoid
+            stats: Optional ScoringStats to fill in
+            max_length: Shorter model input length, see compute_pair_scores
+            cache_only: Only use cached scores, see compute_pair_scores
 
         Returns:
             Tuple of (scores, processing_time_ms)
@@ -84,13 +476,13 @@ class RerankerService:
             pairs = [(query, doc) for doc in documents]
 
             # Compute scores
-            scores = self._reranker.compute_score(pairs, normalize=normalize)  # type: ignore
-
-            # Ensure scores is a list and convert to float
-            if not isinstance(scores, list):
-                scores = [scores]
-            # Convert all scores to Python float, handling numpy types
-            scores = [float(score) if score is not None else 0.0 for score in scores]
+            scores = self.compute_pair_scores(
+                pairs,
+                normalize=normalize,
+                stats=stats,
+                max_length=max_length,
+                cache_only=cache_only,
+            )
 
             processing_time = (time.time() - start_time) * 1000  # Convert to ms
 
@@ -106,6 +498,9 @@ class RerankerService:
         documents: list[str],
         top_k: int | None = None,
         normalize: bool = True,
+        stats: ScoringStats | None = None,
+        max_length: int | None = None,
+        cache_only: bool = False,
     ) -> tuple[list[tuple[int, float, str]], float]:
         """Rerank documents based on relevance to query.
 
@@ -114,24 +509,213 @@ class RerankerService:
             documents: List of documents to rerank
             top_k: Number of top results to return (None for all)
             normalize: Whether to normalize scores
+            stats: Optional ScoringStats to fill in
+            max_length: Shorter model input length, see compute_pair_scores
+            cache_only: Only use cached scores, see compute_pair_scores
 
         Returns:
             Tuple of (ranked_results, processing_time_ms)
-            where ranked_results is list of (index, score, document) tuples
+            where ranked_results is list of (index, score, document) tuples;
+            concurrent identical calls share the same result list
+        """
+        if self.single_flight is None:
+            return self._rerank(
+                query, documents, top_k, normalize, stats, max_length, cache_only
+            )
+
+        def run() -> tuple[list[tuple[int, float, str]], float, ScoringStats]:
+            flight_stats = ScoringStats()
+            results, processing_time = self._rerank(
+                query, documents, top_k, normalize, flight_stats, max_length, cache_only
+            )
+            return results, processing_time, flight_stats
+
+        key = request_fingerprint(
+            self.model_name,
+            query,
+            documents,
+            normalize,
+            top_k=top_k,
+            max_length=max_length,
+            cache_only=cache_only,
+        )
+        (results, processing_time, flight_stats), _ = self.single_flight.do(key, run)
+        if stats is not None:
+            vars(stats).update(vars(flight_stats))
+        return results, processing_time
+
+    def _rerank(
+        self,
+        query: str,
+        documents: list[str],
+        top_k: int | None,
+        normalize: bool,
+        stats: ScoringStats | None,
+        max_length: int | None,
+        cache_only: bool,
+    ) -> tuple[list[tuple[int, float, str]], float]:
+        """Rerank without coalescing, see rerank."""
+        start_time = time.time()
+        indices, scores = self.rerank_arrays(
+            query,
+            documents,
+            top_k,
+            normalize,
+            stats=stats,
+            max_length=max_length,
+            cache_only=cache_only,
+        )
+        results = self._results(indices, scores, documents)
+        return results, (time.time() - start_time) * 1000
+
+    def rerank_arrays(
+        self,
+        query: str,
+        documents: list[str],
+        top_k: int | None = None,
+        normalize: bool = True,
+        min_score: float | None = None,
+        stats: ScoringStats | None = None,
+        max_length: int | None = None,
+        cache_only: bool = False,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Rerank documents and return the ranking as NumPy arrays.
+
+        No per-document Python objects are created, which keeps large
+        candidate sets cheap for library callers that post-process scores.
+
+        Args:
+            query: The search query
+            documents: List of documents to rerank
+            top_k: Number of top results to return (None for all)
+            normalize: Whether to normalize scores
+            min_score: Drop documents scoring below this value
+            stats: Optional ScoringStats to fill in
+            max_length: Shorter model input length, see compute_pair_scores
+            cache_only: Only use cached scores, see compute_pair_scores
+
+        Returns:
+            Tuple of (indices, scores): original document indices and their
+            float64 scores, best first
+        """
+        if not self.is_model_loaded():
+            raise RuntimeError("Model is not loaded. Call load_model() first.")
+
+        candidates, subset = self._prerank(query, documents)
+        scores = self.score_pairs(
+            [(query, doc) for doc in subset],
+            normalize,
+            stats,
+            max_length=max_length,
+            cache_only=cache_only,
+        )
+        return self._rank(scores, top_k, candidates, min_score)
+
+    def rerank_many(
+        self,
+        requests: list[tuple[str, list[str], int | None]],
+        normalize: bool = True,
+        stats: ScoringStats | None = None,
+        max_length: int | None = None,
+        cache_only: bool = False,
+        request_stats: list[ScoringStats] | None = None,
+    ) -> tuple[list[list[tuple[int, float, str]]], float]:
+        """Rerank several (query, documents, top_k) requests in one model pass.
+
+        The pairs of all requests are scored together, so coalesced small
+        requests share batches and duplicate pairs across requests.
+
+        Args:
+            requests: List of (query, documents, top_k) tuples
+            normalize: Whether to normalize scores
+            stats: Optional ScoringStats to fill in for the whole batch
+            max_length: Shorter model input length, see compute_pair_scores
+            cache_only: Only use cached scores, see compute_pair_scores
+            request_stats: Optional ScoringStats per request, filled in with
+                its document and unscored counts
+
+        Returns:
+            Tuple of (ranked_results per request, processing_time_ms)
         """
-        scores, processing_time = self.compute_scores(query, documents, normalize)
+        if not self.is_model_loaded():
+            raise RuntimeError("Model is not loaded. Call load_model() first.")
 
-        # Create (index, score, document) tuples
-        results = [
-            (i, score, doc)
-            for i, (score, doc) in enumerate(zip(scores, documents, strict=False))
+        start_time = time.time()
+        selected = [self._prerank(query, documents) for query, documents, _ in requests]
+        pairs = [
+            (query, doc)
+            for (query, _, _), (_, subset) in zip(requests, selected, strict=True)
+            for doc in subset
         ]
+        scores = self.score_pairs(
+            pairs,
+            normalize=normalize,
+            stats=stats,
+            max_length=max_length,
+            cache_only=cache_only,
+        )
 
-        # Sort by score (descending)
-        results.sort(key=lambda x: x[1], reverse=True)
+        ranked: list[list[tuple[int, float, str]]] = []
+        offset = 0
+        for i, ((_, documents, top_k), (candidates, subset)) in enumerate(
+            zip(requests, selected, strict=True)
+        ):
+            end = offset + len(subset)
+            if request_stats is not None:
+                request_stats[i].total_documents = len(documents)
+                request_stats[i].unscored = int(np.isnan(scores[offset:end]).sum())
+            indices, ranked_scores = self._rank(scores[offset:end], top_k, candidates)
+            ranked.append(self._results(indices, ranked_scores, documents))
+            offset = end
 
-        # Apply top_k limit if specified
-        if top_k is not None:
-            results = results[:top_k]
+        return ranked, (time.time() - start_time) * 1000
 
-        return results, processing_time
+    def _prerank(
+        self, query: str, documents: list[str]
+    ) -> tuple[list[int] | None, list[str]]:
+        """Pick the documents to cross-encode.
+
+        Returns:
+            Tuple of (original indices of the kept documents or None when all
+            are kept, kept documents)
+        """
+        if self.preranker is None or len(documents) <= self.preranker.top_n:
+            return None, documents
+        candidates = self.preranker.select(query, documents)
+        return candidates, [documents[i] for i in candidates]
+
+    @staticmethod
+    def _rank(
+        scores: np.ndarray,
+        top_k: int | None,
+        indices: list[int] | None = None,
+        min_score: float | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Sort scores, apply top_k and min_score.
+
+        indices maps positions in scores back to the caller's original
+        indices after pre-ranking. NaN scores of pairs that were not scored
+        are left out.
+
+        Returns:
+            Tuple of (original indices, scores), best first
+        """
+        with tracer.span("rerank.sort", documents=len(scores)):
+            unscored = np.isnan(scores)
+            if unscored.any():
+                kept = np.flatnonzero(~unscored)
+                order = kept[rank_scores(scores[kept], top_k, min_score)]
+            else:
+                order = rank_scores(scores, top_k, min_score)
+            ranked = order if indices is None else np.asarray(indices)[order]
+        return ranked, scores[order]
+
+    @staticmethod
+    def _results(
+        indices: np.ndarray, scores: np.ndarray, documents: list[str]
+    ) -> list[tuple[int, float, str]]:
+        """Build (index, score, document) tuples for the response."""
+        return [
+            (index, score, documents[index])
+            for index, score in zip(indices.tolist(), scores.tolist(), strict=True)
+        ]
@@ -0,0 +1,132 @@
+"""Listeners for the API server: TCP, Unix domain sockets and h2c.
+
+Callers on the same host can skip TCP entirely by connecting to a Unix
+domain socket, which saves the TCP handshake, loopback checksums and port
+allocation on every new connection. HTTP/1.1 is served by uvicorn. HTTP/2
+over cleartext (h2c, by prior knowledge or Upgrade) lets one connection carry
+many concurrent requests; uvicorn does not speak HTTP/2, so h2c listeners
+run under hypercorn (``pip install hypercorn``), which keeps HTTP/1.1
+working on the same listener.
+"""
+
+import logging
+import socket
+import stat
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+APP = "bge_reranker_v2_m3_api_server.api:app"
+ROUTER_APP = "bge_reranker_v2_m3_api_server.router:app"
+
+
+@dataclass
+class ListenerConfig:
+    """Where and how the server accepts connections."""
+
+    host: str = "0.0.0.0"
+    port: int = 8000
+    uds: str | None = None
+    http2: bool = False
+    workers: int = 1
+    reload: bool = False
+    log_level: str = "info"
+    # Co-located callers keep pooled connections across request bursts;
+    # uvicorn's default of 5 s closes them between bursts
+    keep_alive_timeout: float = 30.0
+    backlog: int = 2048
+    h2_max_concurrent_streams: int = 100
+    # Import string of the ASGI application, e.g. ROUTER_APP
+    app: str = APP
+
+    @property
+    def address(self) -> str:
+        """Human-readable listening address."""
+        return f"unix:{self.uds}" if self.uds else f"{self.host}:{self.port}"
+
+
+def uvicorn_options(config: ListenerConfig) -> dict[str, Any]:
+    """Keyword arguments for uvicorn.run()."""
+    options: dict[str, Any] = {
+        "workers": config.workers,
+        "reload": config.reload,
+        "log_level": config.log_level,
+        "timeout_keep_alive": int(config.keep_alive_timeout),
+        "backlog": config.backlog,
+    }
+    if config.uds:
+        options["uds"] = config.uds
+    else:
+        options.update(host=config.host, port=config.port)
+    return options
+
+
+def hypercorn_settings(config: ListenerConfig) -> dict[str, Any]:
+    """Attributes set on a hypercorn Config."""
+    return {
+        "application_path": config.app,
+        "bind": [config.address],
+        "workers": config.workers,
+        "use_reloader": config.reload,
+        "loglevel": config.log_level.upper(),
+        "keep_alive_timeout": config.keep_alive_timeout,
+        "backlog": config.backlog,
+        "h2_max_concurrent_streams": config.h2_max_concurrent_streams,
+    }
+
+
+def remove_stale_socket(path: str) -> None:
+    """Delete a socket file left behind by a server that is no longer running.
+
+    Raises:
+        OSError: If path exists and is not a socket, or a server still
+            accepts connections on it
+    """
+    socket_path = Path(path)
+    try:
+        mode = socket_path.stat().st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise OSError(f"{path} exists and is not a socket")
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            logger.info(f"Removing stale socket {path}")
+            socket_path.unlink(missing_ok=True)
+            return
+    raise OSError(f"Another server is listening on {path}")
+
+
+def run(config: ListenerConfig) -> None:
+    """Serve the API until interrupted."""
+    if config.uds:
+        remove_stale_socket(config.uds)
+    logger.info(
+        f"Serving {'HTTP/1.1 and h2c' if config.http2 else 'HTTP/1.1'} "
+        f"on {config.address}"
+    )
+
+    if not config.http2:
+        import uvicorn
+
+        uvicorn.run(config.app, **uvicorn_options(config))
+        return
+
+    try:
+        from hypercorn.config import Config
+        from hypercorn.run import run as run_hypercorn
+    except ImportError as e:
+        raise ImportError(
+            "hypercorn is required for HTTP/2. Please install it with: "
+            "pip install hypercorn"
+        ) from e
+
+    hypercorn_config = Config()
+    for name, value in hypercorn_settings(config).items():
+        setattr(hypercorn_config, name, value)
+    run_hypercorn(hypercorn_config)
@@ -0,0 +1,238 @@
+"""Incremental reranking sessions for paginated retrieval.
+
+A search UI that fetches candidates page by page would otherwise resend the
+whole growing list to /rerank and score earlier pages again, so the work
+grows quadratically with the number of pages. A session keeps one query's
+documents, scores and ranking on the server: each append scores only the
+new documents and merges them into the ranking, and the current top_k is
+returned after every append.
+
+Sessions expire after ttl seconds without use and the least recently used
+session is dropped when the store is full. Scores are only comparable
+within one model, so a session is bound to the model generation that
+scored its first documents.
+"""
+
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from .metrics import metrics
+from .postprocess import top_k_indices
+
+
+class UnknownSessionError(KeyError):
+    """Raised when a session ID is unknown or its session expired."""
+
+    def __init__(self, session_id: str):
+        super().__init__(f"Unknown or expired session: {session_id}")
+        self.session_id = session_id
+
+
+class SessionFullError(ValueError):
+    """Raised when an append would exceed a session's document limit."""
+
+
+class StaleSessionError(Exception):
+    """Raised when a session's model was replaced by a reload."""
+
+
+class RerankSession:
+    """Documents of one query and their merged ranking."""
+
+    def __init__(
+        self,
+        session_id: str,
+        query: str,
+        normalize: bool = True,
+        namespace: str = "",
+        generation: int = 0,
+    ):
+        self.session_id = session_id
+        self.query = query
+        self.normalize = normalize
+        self.namespace = namespace
+        self.generation = generation
+        self.documents: list[str] = []
+        self.scores = np.empty(0, dtype=np.float64)
+        # Document indices best first, and their negated scores (ascending)
+        self.order = np.empty(0, dtype=np.intp)
+        self._keys = np.empty(0, dtype=np.float64)
+        self.expires_at = 0.0
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def merge(self, documents: list[str], scores: np.ndarray) -> int:
+        """Append scored documents and merge them into the ranking.
+
+        The new documents are sorted among themselves and inserted with one
+        pass over the existing ranking, so an append costs O(n + m log m)
+        instead of a full sort. Equal scores keep append order, like the
+        stable sort of /rerank.
+
+        Returns:
+            Index of the first appended document
+        """
+        start = len(self.documents)
+        batch_order = top_k_indices(scores)
+        keys = -scores[batch_order]
+        positions = np.searchsorted(self._keys, keys, side="right")
+        self.order = np.insert(self.order, positions, batch_order + start)
+        self._keys = np.insert(self._keys, positions, keys)
+        self.scores = np.concatenate([self.scores, scores])
+        self.documents.extend(documents)
+        return start
+
+    def top(self, top_k: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """Return (indices, scores) of the current ranking, best first."""
+        order = self.order if top_k is None else self.order[:top_k]
+        return order, self.scores[order]
+
+    def results(self, top_k: int | None = None) -> list[tuple[int, float, str]]:
+        """Return (index, score, document) tuples of the current ranking."""
+        indices, scores = self.top(top_k)
+        return [
+            (index, score, self.documents[index])
+            for index, score in zip(indices.tolist(), scores.tolist(), strict=True)
+        ]
+
+
+class SessionStore:
+    """Sessions by ID with a sliding TTL, bounded in count and size."""
+
+    def __init__(
+        self,
+        ttl: float = 300.0,
+        max_sessions: int = 1000,
+        max_documents: int = 10000,
+    ):
+        """Initialize the store.
+
+        Args:
+            ttl: Seconds a session is kept after its last use
+            max_sessions: Sessions kept at most; the least recently used
+                one is dropped to make room
+            max_documents: Documents per session at most
+        """
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.max_documents = max_documents
+        self._sessions: OrderedDict[str, RerankSession] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def open(
+        self,
+        query: str,
+        normalize: bool = True,
+        namespace: str = "",
+        generation: int = 0,
+        now: float | None = None,
+    ) -> RerankSession:
+        """Create an empty session for a query."""
+        now = time.monotonic() if now is None else now
+        session = RerankSession(
+            secrets.token_urlsafe(16), query, normalize, namespace, generation
+        )
+        session.expires_at = now + self.ttl
+        evicted = 0
+        with self._lock:
+            evicted += self._expire(now)
+            while self._sessions and len(self._sessions) >= self.max_sessions:
+                self._sessions.popitem(last=False)
+                evicted += 1
+            self._sessions[session.session_id] = session
+            count = len(self._sessions)
+        metrics.inc("sessions_opened_total")
+        if evicted:
+            metrics.inc("sessions_evicted_total", evicted)
+        metrics.set_gauge("sessions_active", count)
+        return session
+
+    def get(
+        self, session_id: str, namespace: str = "", now: float | None = None
+    ) -> RerankSession:
+        """Return a live session and extend its TTL.
+
+        Raises:
+            UnknownSessionError: If the session does not exist, expired or
+                belongs to another namespace
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None or session.namespace != namespace:
+                raise UnknownSessionError(session_id)
+            if session.expires_at <= now:
+                del self._sessions[session_id]
+                metrics.inc("sessions_evicted_total")
+                raise UnknownSessionError(session_id)
+            session.expires_at = now + self.ttl
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def check_append(
+        self, session: RerankSession, count: int, generation: int = 0
+    ) -> None:
+        """Check that count more documents can be scored into a session.
+
+        Raises:
+            SessionFullError: If they would exceed max_documents
+            StaleSessionError: If generation is not the session's model
+                generation
+        """
+        if len(session) + count > self.max_documents:
+            raise SessionFullError(
+                f"Session {session.session_id} would hold {len(session) + count} "
+                f"documents, more than {self.max_documents}"
+            )
+        if generation != session.generation:
+            raise StaleSessionError(
+                "The model was reloaded since the session was opened; "
+                "open a new session"
+            )
+
+    def close(self, session_id: str, namespace: str = "") -> bool:
+        """Drop a session; returns whether it existed."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None or session.namespace != namespace:
+                return False
+            del self._sessions[session_id]
+            count = len(self._sessions)
+        metrics.set_gauge("sessions_active", count)
+        return True
+
+    def expire(self, now: float | None = None) -> int:
+        """Drop expired sessions; returns how many were dropped."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            expired = self._expire(now)
+            count = len(self._sessions)
+        if expired:
+            metrics.inc("sessions_evicted_total", expired)
+        metrics.set_gauge("sessions_active", count)
+        return expired
+
+    def _expire(self, now: float) -> int:
+        expired = [
+            session_id
+            for session_id, session in self._sessions.items()
+            if session.expires_at <= now
+        ]
+        for session_id in expired:
+            del self._sessions[session_id]
+        return len(expired)
+
+    def clear(self) -> None:
+        """Drop all sessions."""
+        with self._lock:
+            self._sessions.clear()
+        metrics.set_gauge("sessions_active", 0)
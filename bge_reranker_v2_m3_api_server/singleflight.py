@@ -0,0 +1,133 @@
+"""Single-flight coalescing of identical in-flight requests.
+
+During retrieval storms many callers send the same query and candidate set
+within milliseconds. A SingleFlight lets the first caller of a key run the
+computation while callers arriving before it finishes wait for, and share,
+its result. Unlike the score cache this needs no result to exist yet, and
+nothing is kept once the computation finishes.
+
+An async computation runs in its own task that callers await through
+asyncio.shield, so a leader that is cancelled (a timeout, a disconnected
+client) does not take its followers' result down with it.
+"""
+
+import asyncio
+import hashlib
+import threading
+from collections.abc import Awaitable, Callable, Sequence
+from concurrent.futures import Future
+from typing import Any, TypeVar
+
+from .metrics import metrics
+
+T = TypeVar("T")
+
+
+def request_fingerprint(
+    model_name: str,
+    query: str,
+    documents: Sequence[str],
+    normalize: bool,
+    **options: Any,
+) -> bytes:
+    """Hash everything that determines a rerank result into a compact key.
+
+    Documents are compared exactly, since results echo their text.
+
+    Args:
+        model_name: Model producing the scores
+        query: The search query
+        documents: Documents in request order
+        normalize: Whether scores are normalized
+        **options: Further result-changing options such as top_k
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(model_name.encode("utf-8"))
+    digest.update(b"\x00")
+    digest.update(repr((normalize, sorted(options.items()))).encode("utf-8"))
+    for text in (query, *documents):
+        data = text.encode("utf-8")
+        digest.update(len(data).to_bytes(8, "little"))
+        digest.update(data)
+    return digest.digest()
+
+
+class SingleFlight:
+    """Share one pending computation between callers with the same key."""
+
+    def __init__(self, scope: str = "service"):
+        """Initialize the group.
+
+        Args:
+            scope: Label of the single_flight_* metrics
+        """
+        self.scope = scope
+        self._calls: dict[bytes, Future] = {}
+        self._lock = threading.Lock()
+        # The event loop only keeps weak references to tasks
+        self._tasks: set[asyncio.Future] = set()
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def _join(self, key: bytes) -> tuple[Future, bool]:
+        """Return the pending call of key and whether the caller leads it."""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                metrics.inc("single_flight_shared_total", scope=self.scope)
+                return future, False
+            future = Future()
+            self._calls[key] = future
+        metrics.inc("single_flight_leaders_total", scope=self.scope)
+        return future, True
+
+    def _finish(self, key: bytes, future: Future) -> None:
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+    def do(self, key: bytes, fn: Callable[[], T]) -> tuple[T, bool]:
+        """Run fn, or wait for the call already running for key.
+
+        Returns:
+            Tuple of (result, shared) where shared is True if the result
+            came from another caller's computation
+        """
+        future, leader = self._join(key)
+        if not leader:
+            return future.result(), True
+        try:
+            result = fn()
+        except BaseException as e:
+            self._finish(key, future)
+            future.set_exception(e)
+            raise
+        self._finish(key, future)
+        future.set_result(result)
+        return result, False
+
+    async def do_async(
+        self, key: bytes, fn: Callable[[], Awaitable[T]]
+    ) -> tuple[T, bool]:
+        """Await fn, or the call already running for key; see do."""
+        future, leader = self._join(key)
+        if not leader:
+            return await asyncio.shield(asyncio.wrap_future(future)), True
+        task = asyncio.ensure_future(fn())
+        self._tasks.add(task)
+        task.add_done_callback(lambda task: self._settle(key, future, task))
+        return await asyncio.shield(task), False
+
+    def _settle(self, key: bytes, future: Future, task: asyncio.Future) -> None:
+        """Hand the outcome of an async call to its followers."""
+        self._tasks.discard(task)
+        self._finish(key, future)
+        if task.cancelled():
+            # Only loop shutdown cancels the task itself; followers get an
+            # error of their own rather than a cancellation
+            future.set_exception(RuntimeError("Shared computation was cancelled"))
+        elif task.exception() is not None:
+            future.set_exception(task.exception())
+        else:
+            future.set_result(task.result())
@@ -0,0 +1,296 @@
+"""CPU thread and NUMA topology controls for inference workers.
+
+By default every uvicorn worker lets torch use all cores, so several workers
+on one host oversubscribe the CPU. These helpers split the available cores
+between workers, pin each worker to its share and size torch's intra-op and
+inter-op thread pools to match.
+"""
+
+import contextlib
+import logging
+import os
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+NUMA_SYSFS_PATH = Path("/sys/devices/system/node")
+
+
+@dataclass
+class ThreadSettings:
+    """Thread and affinity settings for one worker process."""
+
+    intra_op_threads: int | None = None
+    inter_op_threads: int | None = None
+    cpus: list[int] | None = None
+
+
+def parse_cpu_list(spec: str) -> list[int]:
+    """Parse a Linux cpulist string such as "0-3,8,10-11"."""
+    cpus: list[int] = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        start, sep, end = part.partition("-")
+        if sep:
+            cpus.extend(range(int(start), int(end) + 1))
+        else:
+            cpus.append(int(start))
+    return sorted(set(cpus))
+
+
+def format_cpu_list(cpus: list[int]) -> str:
+    """Format CPUs as a compact cpulist string."""
+    ranges: list[list[int]] = []
+    for cpu in sorted(set(cpus)):
+        if ranges and ranges[-1][1] == cpu - 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ",".join(str(a) if a == b else f"{a}-{b}" for a, b in ranges)
+
+
+def available_cpus() -> list[int]:
+    """Return the CPUs this process is allowed to run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def numa_nodes(sysfs_path: Path = NUMA_SYSFS_PATH) -> dict[int, list[int]]:
+    """Return the CPUs of each NUMA node, or {} when unavailable."""
+    nodes: dict[int, list[int]] = {}
+    if not sysfs_path.is_dir():
+        return nodes
+    for node_dir in sysfs_path.glob("node[0-9]*"):
+        cpulist = node_dir / "cpulist"
+        if cpulist.is_file():
+            cpus = parse_cpu_list(cpulist.read_text())
+            if cpus:
+                nodes[int(node_dir.name[4:])] = cpus
+    return dict(sorted(nodes.items()))
+
+
+def partition_cpus(
+    cpus: list[int], workers: int, nodes: dict[int, list[int]] | None = None
+) -> list[list[int]]:
+    """Split CPUs between workers without crossing NUMA nodes where possible.
+
+    With several NUMA nodes, workers are spread round-robin over the nodes
+    and each node's CPUs are divided between the workers placed on it. With
+    one node (or fewer workers than nodes), CPUs are split into contiguous
+    blocks in node order.
+    """
+    if workers < 1:
+        raise ValueError("workers must be at least 1")
+
+    allowed = set(cpus)
+    node_cpus = [
+        [cpu for cpu in node if cpu in allowed] for node in (nodes or {}).values()
+    ]
+    node_cpus = [node for node in node_cpus if node]
+
+    if len(node_cpus) > 1 and workers >= len(node_cpus):
+        per_node: list[list[int]] = [[] for _ in node_cpus]
+        for worker in range(workers):
+            per_node[worker % len(node_cpus)].append(worker)
+        partitions: list[list[int]] = [[] for _ in range(workers)]
+        for node, node_workers in zip(node_cpus, per_node, strict=True):
+            for worker, block in zip(
+                node_workers, _split(node, len(node_workers)), strict=True
+            ):
+                partitions[worker] = block
+        return partitions
+
+    ordered = [cpu for node in node_cpus for cpu in node] or sorted(cpus)
+    return _split(ordered, workers)
+
+
+def _split(cpus: list[int], parts: int) -> list[list[int]]:
+    """Split a list into parts contiguous blocks of near-equal size."""
+    if parts > len(cpus):
+        # More workers than cores: share cores round-robin
+        return [[cpus[i % len(cpus)]] for i in range(parts)]
+    size, extra = divmod(len(cpus), parts)
+    blocks: list[list[int]] = []
+    start = 0
+    for i in range(parts):
+        end = start + size + (1 if i < extra else 0)
+        blocks.append(cpus[start:end])
+        start = end
+    return blocks
+
+
+def resolve_thread_settings(
+    worker_index: int,
+    workers: int,
+    intra_op_threads: str | None = None,
+    inter_op_threads: str | None = None,
+    cpu_affinity: str | None = None,
+    numa_node: str | None = None,
+) -> ThreadSettings:
+    """Work out the settings of one worker from CLI-style options.
+
+    Args:
+        worker_index: Index of this worker (0 <= worker_index < workers)
+        workers: Total number of workers on the host
+        intra_op_threads: Number of intra-op threads, or "auto" for the size
+            of this worker's CPU set
+        inter_op_threads: Number of inter-op threads, or "auto" (1)
+        cpu_affinity: "auto" to divide available cores between workers, a
+            cpulist shared by all workers, or per-worker cpulists separated by
+            ";" (e.g. "0-15;16-31")
+        numa_node: "auto" to spread workers over NUMA nodes, or a
+            comma-separated list of nodes assigned round-robin to workers
+
+    Returns:
+        ThreadSettings for the worker
+    """
+    cpus: list[int] | None = None
+
+    if numa_node:
+        nodes = numa_nodes()
+        if not nodes:
+            logger.warning("NUMA topology not available, ignoring --numa-node")
+        elif numa_node == "auto":
+            cpus = partition_cpus(available_cpus(), workers, nodes)[worker_index]
+        else:
+            node_ids = [int(node) for node in numa_node.split(",") if node.strip()]
+            node_id = node_ids[worker_index % len(node_ids)]
+            if node_id not in nodes:
+                raise ValueError(f"Unknown NUMA node: {node_id}")
+            siblings = [
+                i for i in range(workers) if node_ids[i % len(node_ids)] == node_id
+            ]
+            cpus = _split(nodes[node_id], len(siblings))[siblings.index(worker_index)]
+
+    if cpu_affinity:
+        if cpu_affinity == "auto":
+            # --numa-node already picked this worker's share
+            if cpus is None:
+                cpus = partition_cpus(available_cpus(), workers, numa_nodes())[
+                    worker_index
+                ]
+        else:
+            sets = [spec for spec in cpu_affinity.split(";") if spec.strip()]
+            cpus = parse_cpu_list(sets[worker_index % len(sets)])
+
+    intra: int | None = None
+    if intra_op_threads == "auto":
+        intra = len(cpus) if cpus else max(1, len(available_cpus()) // workers)
+    elif intra_op_threads:
+        intra = int(intra_op_threads)
+
+    inter: int | None = None
+    if inter_op_threads == "auto":
+        inter = 1
+    elif inter_op_threads:
+        inter = int(inter_op_threads)
+
+    return ThreadSettings(intra_op_threads=intra, inter_op_threads=inter, cpus=cpus)
+
+
+def apply_thread_settings(settings: ThreadSettings) -> None:
+    """Pin the current process and size torch's thread pools."""
+    if settings.cpus:
+        if hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, settings.cpus)
+        else:
+            logger.warning("CPU affinity is not supported on this platform")
+
+    if settings.intra_op_threads is None and settings.inter_op_threads is None:
+        return
+
+    try:
+        import torch
+    except ImportError:
+        logger.warning("torch is not installed, thread settings not applied")
+        return
+
+    if settings.intra_op_threads is not None:
+        torch.set_num_threads(settings.intra_op_threads)
+    if settings.inter_op_threads is not None:
+        try:
+            torch.set_num_interop_threads(settings.inter_op_threads)
+        except RuntimeError as e:
+            # Can only be set once, before any inter-op parallel work started
+            logger.warning(f"Could not set inter-op threads: {e}")
+
+
+def claim_worker_slot(workers: int, slot_dir: str | Path | None = None) -> int:
+    """Claim a unique worker index among sibling worker processes.
+
+    uvicorn does not tell workers their index, so siblings (processes with
+    the same parent) race to create slot files. Slots held by processes that
+    have exited are reclaimed, which covers workers restarted by uvicorn.
+    """
+    if workers <= 1:
+        return 0
+
+    slot_dir = Path(
+        slot_dir or Path(tempfile.gettempdir()) / f"bge-reranker-slots-{os.getppid()}"
+    )
+    slot_dir.mkdir(parents=True, exist_ok=True)
+
+    for _ in range(2):
+        for index in range(workers):
+            slot = slot_dir / f"slot-{index}"
+            try:
+                fd = os.open(slot, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if not _slot_owner_alive(slot):
+                    with contextlib.suppress(FileNotFoundError):
+                        slot.unlink()
+                continue
+            with os.fdopen(fd, "w") as f:
+                f.write(str(os.getpid()))
+            return index
+
+    logger.warning("No free worker slot, falling back to pid-based index")
+    return os.getpid() % workers
+
+
+def _slot_owner_alive(slot: Path) -> bool:
+    try:
+        pid = int(slot.read_text() or "0")
+    except (OSError, ValueError):
+        return False
+    if pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def configure_worker_from_env() -> ThreadSettings | None:
+    """Apply thread/affinity settings passed by the CLI via environment.
+
+    Returns:
+        The applied settings, or None when nothing was configured
+    """
+    intra = os.getenv("BGE_INTRA_OP_THREADS")
+    inter = os.getenv("BGE_INTER_OP_THREADS")
+    cpu_affinity = os.getenv("BGE_CPU_AFFINITY")
+    numa_node = os.getenv("BGE_NUMA_NODE")
+    if not any((intra, inter, cpu_affinity, numa_node)):
+        return None
+
+    workers = int(os.getenv("BGE_WORKERS", "1"))
+    index = claim_worker_slot(workers) if (cpu_affinity or numa_node) else 0
+    settings = resolve_thread_settings(
+        index, workers, intra, inter, cpu_affinity, numa_node
+    )
+    apply_thread_settings(settings)
+    logger.info(
+        f"Worker {index}/{workers}: intra-op threads={settings.intra_op_threads}, "
+        f"inter-op threads={settings.inter_op_threads}, "
+        f"cpus={format_cpu_list(settings.cpus) if settings.cpus else 'all'}"
+    )
+    return settings
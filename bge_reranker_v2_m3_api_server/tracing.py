@@ -0,0 +1,324 @@
+"""Lightweight request tracing with OpenTelemetry-compatible spans.
+
+Spans carry W3C trace context (32-hex trace id, 16-hex span id), so a
+``traceparent`` header sent by the caller makes reranker spans children of
+the caller's span, and exported spans use OTLP/JSON field names. No
+OpenTelemetry SDK is required: exporters are small pluggable objects and
+the console and file exporters work fully offline.
+
+When tracing is disabled, or a request is not sampled, ``tracer.span()``
+yields None and costs a context-variable lookup.
+"""
+
+import contextlib
+import contextvars
+import importlib
+import json
+import logging
+import random
+import re
+import secrets
+import sys
+import threading
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Protocol, TextIO
+
+logger = logging.getLogger(__name__)
+
+_TRACEPARENT_RE = re.compile(
+    r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$", re.IGNORECASE
+)
+
+
+@dataclass
+class Span:
+    """A timed operation within a trace."""
+
+    name: str
+    trace_id: str
+    span_id: str
+    parent_span_id: str | None = None
+    start_time_ns: int = field(default_factory=time.time_ns)
+    end_time_ns: int | None = None
+    attributes: dict[str, Any] = field(default_factory=dict)
+    status: str = "OK"
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        """Set one attribute."""
+        self.attributes[key] = value
+
+    @property
+    def duration_ms(self) -> float:
+        """Span duration in milliseconds (0 while the span is open)."""
+        if self.end_time_ns is None:
+            return 0.0
+        return (self.end_time_ns - self.start_time_ns) / 1e6
+
+    def to_dict(self) -> dict[str, Any]:
+        """Serialize using OTLP/JSON field names."""
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_span_id or "",
+            "name": self.name,
+            "startTimeUnixNano": self.start_time_ns,
+            "endTimeUnixNano": self.end_time_ns,
+            "attributes": self.attributes,
+            "status": self.status,
+        }
+
+
+class SpanExporter(Protocol):
+    """Interface implemented by span exporters."""
+
+    def export(self, span: Span) -> None:
+        """Export a finished span."""
+        ...
+
+    def shutdown(self) -> None:
+        """Flush and release resources."""
+        ...
+
+
+class ConsoleSpanExporter:
+    """Write finished spans as JSON lines to a stream (stderr by default)."""
+
+    def __init__(self, stream: TextIO | None = None):
+        self.stream = stream or sys.stderr
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), ensure_ascii=False, default=str)
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+    def shutdown(self) -> None:
+        pass
+
+
+class FileSpanExporter(ConsoleSpanExporter):
+    """Append finished spans as JSON lines to a local file."""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        super().__init__(self.path.open("a", encoding="utf-8"))
+
+    def shutdown(self) -> None:
+        self.stream.close()
+
+
+class InMemorySpanExporter:
+    """Keep finished spans in a list, mainly for tests."""
+
+    def __init__(self):
+        self.spans: list[Span] = []
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def shutdown(self) -> None:
+        pass
+
+
+def load_exporter(spec: str | None) -> SpanExporter | None:
+    """Create an exporter from a configuration string.
+
+    Supported values:
+        "none" or empty: tracing disabled
+        "console": JSON lines on stderr
+        "file:<path>": JSON lines appended to <path>
+        "<module>:<callable>": any factory returning an exporter, e.g. a
+            bridge to an OpenTelemetry SDK span processor
+    """
+    if not spec or spec == "none":
+        return None
+    if spec == "console":
+        return ConsoleSpanExporter()
+    if spec.startswith("file:"):
+        return FileSpanExporter(spec[len("file:") :])
+    module_name, sep, attr = spec.partition(":")
+    if not sep:
+        raise ValueError(f"Unknown trace exporter: {spec}")
+    factory = getattr(importlib.import_module(module_name), attr)
+    return factory()
+
+
+def parse_traceparent(header: str | None) -> tuple[str, str, bool] | None:
+    """Parse a W3C traceparent header into (trace_id, parent_span_id, sampled)."""
+    if not header:
+        return None
+    match = _TRACEPARENT_RE.match(header.strip())
+    if not match:
+        return None
+    trace_id, span_id, flags = match.groups()
+    if trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    return trace_id.lower(), span_id.lower(), bool(int(flags, 16) & 1)
+
+
+def format_traceparent(span: Span) -> str:
+    """Format a span as a W3C traceparent header value."""
+    return f"00-{span.trace_id}-{span.span_id}-01"
+
+
+_current_span: contextvars.ContextVar[Span | None] = contextvars.ContextVar(
+    "bge_reranker_current_span", default=None
+)
+
+
+class Tracer:
+    """Create spans and hand finished ones to the configured exporters."""
+
+    def __init__(self, exporter: SpanExporter | None = None, sample_rate: float = 1.0):
+        """Initialize the tracer.
+
+        Args:
+            exporter: Exporter for finished spans (None disables export)
+            sample_rate: Fraction of new traces that are recorded; traces
+                continued from a sampled traceparent are always recorded
+        """
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self._listeners: contextvars.ContextVar[tuple[SpanExporter, ...]] = (
+            contextvars.ContextVar("bge_reranker_span_listeners", default=())
+        )
+
+    def configure(
+        self, exporter: SpanExporter | None, sample_rate: float = 1.0
+    ) -> None:
+        """Replace the exporter and sample rate."""
+        if self.exporter is not None:
+            self.exporter.shutdown()
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+
+    def current_span(self) -> Span | None:
+        """Return the innermost recording span of the current context."""
+        return _current_span.get()
+
+    def _finish(self, span: Span) -> None:
+        span.end_time_ns = time.time_ns()
+        self._emit(span)
+
+    def _emit(self, span: Span) -> None:
+        if self.exporter is not None:
+            try:
+                self.exporter.export(span)
+            except Exception as e:
+                logger.warning(f"Failed to export span {span.name}: {e}")
+        for listener in self._listeners.get():
+            listener.export(span)
+
+    @contextlib.contextmanager
+    def start_trace(
+        self,
+        name: str,
+        traceparent: str | None = None,
+        listener: SpanExporter | None = None,
+        **attributes: Any,
+    ) -> Iterator[Span | None]:
+        """Open the root span of a request.
+
+        Args:
+            name: Span name
+            traceparent: Incoming W3C traceparent header, if any
+            listener: Extra exporter receiving only this trace's spans; it
+                forces the trace to be recorded
+            **attributes: Initial span attributes
+
+        Yields:
+            The root span, or None when the trace is not recorded
+        """
+        if listener is None and self.exporter is None:
+            yield None
+            return
+
+        parent = parse_traceparent(traceparent)
+        if parent is not None:
+            sampled = parent[2]
+        else:
+            sampled = self.sample_rate >= 1.0 or random.random() < self.sample_rate
+        if listener is None and not sampled:
+            yield None
+            return
+
+        span = Span(
+            name=name,
+            trace_id=parent[0] if parent else secrets.token_hex(16),
+            span_id=secrets.token_hex(8),
+            parent_span_id=parent[1] if parent else None,
+            attributes=dict(attributes),
+        )
+        span_token = _current_span.set(span)
+        listener_token = (
+            self._listeners.set((*self._listeners.get(), listener))
+            if listener is not None
+            else None
+        )
+        try:
+            yield span
+        except BaseException:
+            span.status = "ERROR"
+            raise
+        finally:
+            self._finish(span)
+            _current_span.reset(span_token)
+            if listener_token is not None:
+                self._listeners.reset(listener_token)
+
+    @contextlib.contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span | None]:
+        """Open a child span of the current span.
+
+        Yields None (and records nothing) outside of a recorded trace.
+        """
+        parent = _current_span.get()
+        if parent is None:
+            yield None
+            return
+
+        span = Span(
+            name=name,
+            trace_id=parent.trace_id,
+            span_id=secrets.token_hex(8),
+            parent_span_id=parent.span_id,
+            attributes=dict(attributes),
+        )
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException:
+            span.status = "ERROR"
+            raise
+        finally:
+            self._finish(span)
+            _current_span.reset(token)
+
+    def record_span(
+        self, name: str, start_time_ns: int, end_time_ns: int, **attributes: Any
+    ) -> Span | None:
+        """Record a child span for an interval that has already elapsed."""
+        parent = _current_span.get()
+        if parent is None:
+            return None
+        span = Span(
+            name=name,
+            trace_id=parent.trace_id,
+            span_id=secrets.token_hex(8),
+            parent_span_id=parent.span_id,
+            start_time_ns=start_time_ns,
+            end_time_ns=end_time_ns,
+            attributes=dict(attributes),
+        )
+        self._emit(span)
+        return span
+
+
+# Process-wide tracer shared by the service and the API
+tracer = Tracer()
@@ -0,0 +1,30 @@
+"""Warm-up inputs for freshly loaded models.
+
+A new model runs a few batches before it takes traffic so that weights are
+paged in and kernels are selected ahead of the first request. The pairs only
+need typical lengths, not meaningful text.
+"""
+
+_WORDS = (
+    "search",
+    "ranking",
+    "query",
+    "document",
+    "model",
+    "score",
+    "relevant",
+    "result",
+)
+
+
+def warmup_pairs(
+    count: int, query_words: int = 8, doc_words: int = 64
+) -> list[tuple[str, str]]:
+    """Build count deterministic (query, document) pairs of typical length."""
+    return [
+        (
+            " ".join(_WORDS[(i + j) % len(_WORDS)] for j in range(query_words)),
+            " ".join(_WORDS[(i * 3 + j) % len(_WORDS)] for j in range(doc_words)),
+        )
+        for i in range(count)
+    ]
@@ -0,0 +1 @@
+"""Performance regression tests for BGE Reranker v2-m3 API Server."""
@@ -0,0 +1,176 @@
+"""Fixtures of the performance regression tier.
+
+The tier is skipped unless BGE_PERF_TESTS=1, which ``bge-reranker-test
+--perf`` sets. Measurements are compared with baselines.json next to this
+file. Timings are scaled by the fastest of several CPU calibration runs
+spread over the session, so baselines recorded on one machine remain
+usable on another, and may be at most BGE_PERF_TOLERANCE (default 1.5)
+times worse. BGE_PERF_UPDATE_BASELINES=1 (``bge-reranker-test
+--perf --update-baselines``) records new baselines instead of comparing.
+"""
+
+import json
+import os
+import shutil
+import statistics
+import timeit
+import zlib
+from collections.abc import Callable
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+RUN_PERF = os.getenv("BGE_PERF_TESTS", "false").lower() in ("true", "1", "yes")
+UPDATE_BASELINES = os.getenv("BGE_PERF_UPDATE_BASELINES", "false").lower() in (
+    "true",
+    "1",
+    "yes",
+)
+TOLERANCE = float(os.getenv("BGE_PERF_TOLERANCE", "1.5"))
+BASELINES_PATH = Path(__file__).with_name("baselines.json")
+TINY_MODEL_DIR = Path(__file__).with_name("tiny_reranker")
+
+# How a metric regresses: "time" and "bytes" must not grow, "rate" must not
+# shrink; only "time" and "rate" depend on CPU speed
+METRIC_KINDS = ("time", "rate", "bytes")
+
+
+def calibrate() -> float:
+    """Seconds a fixed pure-Python workload takes on this machine."""
+
+    def workload() -> None:
+        data = [(i * 7919) % 10007 for i in range(200_000)]
+        data.sort()
+        json.dumps(data[:20_000])
+
+    return min(timeit.repeat(workload, number=1, repeat=10))
+
+
+class Baselines:
+    """Stored performance baselines and the regression check."""
+
+    def __init__(self, path: Path, tolerance: float, update: bool):
+        self.path = path
+        self.tolerance = tolerance
+        self.update = update
+        self.data = json.loads(path.read_text()) if path.exists() else {}
+        self.calibration = calibrate()
+        self.measured: dict[str, dict] = {}
+
+    def check(
+        self, name: str, measure: Callable[[], float], kind: str, attempts: int = 3
+    ) -> None:
+        """Compare a measurement with its baseline, or record it.
+
+        A measurement past the limit is repeated up to attempts times before
+        the check fails, so a noisy neighbour does not fail the tier. A new
+        baseline is the median of attempts measurements rather than the best,
+        so a lucky run does not set a bar later runs rarely reach.
+        """
+        assert kind in METRIC_KINDS
+        better = max if kind == "rate" else min
+        baseline = self.data.get("metrics", {}).get(name)
+        if baseline is None and not self.update:
+            # A new metric must not pass the gate without being compared
+            pytest.fail(f"No baseline for {name}, record one with --update-baselines")
+
+        if self.update:
+            value = statistics.median(measure() for _ in range(attempts))
+            self.calibration = min(self.calibration, calibrate())
+            self.measured[name] = {"value": float(f"{value:.4g}"), "kind": kind}
+            return
+
+        value = measure()
+        for attempt in range(1, attempts + 1):
+            if kind != "bytes":
+                # Noise only slows the workload down, so the fastest run is
+                # the best estimate of the machine's speed
+                self.calibration = min(self.calibration, calibrate())
+            if self._within(value, baseline["value"], kind):
+                break
+            if attempt < attempts:
+                value = better(value, measure())
+        limit = self._limit(baseline["value"], kind)
+        comparison = "<" if kind == "rate" else ">"
+        assert self._within(value, baseline["value"], kind), (
+            f"{name}: {value:.4g} {comparison} {limit:.4g} after {attempts} attempts"
+        )
+
+    def _limit(self, expected: float, kind: str) -> float:
+        # > 1 when this machine is slower than the one the baseline came from
+        speed = self.calibration / self.data["calibration_seconds"]
+        if kind == "time":
+            return expected * speed * self.tolerance
+        if kind == "rate":
+            return expected / speed / self.tolerance
+        return expected * self.tolerance
+
+    def _within(self, value: float, expected: float, kind: str) -> bool:
+        limit = self._limit(expected, kind)
+        return value >= limit if kind == "rate" else value <= limit
+
+    def save(self) -> None:
+        """Write the measured values over the stored baselines."""
+        metrics = {**self.data.get("metrics", {}), **self.measured}
+        data = {
+            "calibration_seconds": float(f"{self.calibration:.4g}"),
+            "metrics": dict(sorted(metrics.items())),
+        }
+        self.path.write_text(json.dumps(data, indent=2) + "\n")
+
+
+@pytest.fixture(scope="session")
+def baselines():
+    """Baselines shared by the tier, saved at the end with --update-baselines."""
+    store = Baselines(BASELINES_PATH, TOLERANCE, UPDATE_BASELINES)
+    yield store
+    if store.update and store.measured:
+        store.save()
+
+
+class StubReranker:
+    """Deterministic FlagReranker stand-in that costs (almost) nothing.
+
+    Scores are a hash of the pair, so everything measured with it is the
+    serving overhead around the model.
+    """
+
+    model = None
+    tokenizer = None
+
+    def __init__(self, model_name: str, use_fp16: bool = False):
+        self.model_name = model_name
+        self.use_fp16 = use_fp16
+
+    def compute_score(self, pairs, **_kwargs):
+        scores = [zlib.crc32(f"{q}\0{d}".encode()) / 2**32 for q, d in pairs]
+        return scores[0] if len(scores) == 1 else scores
+
+
+@pytest.fixture
+def stub_model():
+    """Load StubReranker wherever the service would load FlagReranker."""
+    with patch("bge_reranker_v2_m3_api_server.service.FlagReranker", StubReranker):
+        yield StubReranker
+
+
+@pytest.fixture(scope="session")
+def tiny_model(tmp_path_factory) -> str:
+    """Path of a tiny XLM-RoBERTa reranker with seeded random weights.
+
+    Only the config and a word-level tokenizer ship with the tests; the
+    weights are generated here, so no network access is needed.
+    """
+    torch = pytest.importorskip("torch")
+    transformers = pytest.importorskip("transformers")
+    pytest.importorskip("FlagEmbedding")
+
+    path = tmp_path_factory.mktemp("tiny_reranker")
+    for file in TINY_MODEL_DIR.iterdir():
+        shutil.copy(file, path)
+    torch.manual_seed(0)
+    config = transformers.AutoConfig.from_pretrained(path)
+    model = transformers.AutoModelForSequenceClassification.from_config(config)
+    model.save_pretrained(path)
+    return str(path)
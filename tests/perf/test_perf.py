@@ -0,0 +1,176 @@
+"""Performance regression tier: serving overhead, throughput and memory.
+
+Run with ``bge-reranker-test --perf``; see conftest.py for baselines and
+tolerance.
+"""
+
+import statistics
+import threading
+import time
+import timeit
+import tracemalloc
+
+import pytest
+from fastapi.testclient import TestClient
+
+from bge_reranker_v2_m3_api_server.api import _build_response, app
+from bge_reranker_v2_m3_api_server.benchmark import synthetic_pairs
+from bge_reranker_v2_m3_api_server.codec import (
+    BINARY_MEDIA_TYPE,
+    COMPACT_MEDIA_TYPE,
+    RankedResult,
+    encode,
+)
+from bge_reranker_v2_m3_api_server.library import Reranker
+from bge_reranker_v2_m3_api_server.models import RerankRequest
+from bge_reranker_v2_m3_api_server.service import RerankerService
+
+from .conftest import RUN_PERF
+
+pytestmark = [
+    pytest.mark.perf,
+    pytest.mark.skipif(
+        not RUN_PERF, reason="Performance tier, run with bge-reranker-test --perf"
+    ),
+]
+
+
+def _documents(count: int, words: int = 32, seed: int = 0) -> list[str]:
+    return [doc for _, doc in synthetic_pairs(count, doc_words=words, seed=seed)]
+
+
+class TestServingOverhead:
+    """Per-request cost of everything around the model."""
+
+    @pytest.mark.usefixtures("stub_model")
+    def test_request_overhead(self, baselines, monkeypatch):
+        """Test the median /rerank latency with a free model."""
+        monkeypatch.setenv("BGE_MODEL_NAME", "stub")
+        monkeypatch.setenv("BGE_SCORE_CACHE_SIZE", "0")
+        payloads = [
+            {"query": "what is ai?", "documents": _documents(10, seed=i), "top_k": 3}
+            for i in range(50)
+        ]
+
+        with TestClient(app) as client:
+
+            def measure() -> float:
+                latencies = []
+                for payload in payloads * 4:
+                    start = time.perf_counter()
+                    response = client.post("/rerank", json=payload)
+                    latencies.append(time.perf_counter() - start)
+                    assert response.status_code == 200
+                return statistics.median(latencies) * 1000
+
+            measure()
+            baselines.check("rerank_request_overhead_ms", measure, "time")
+
+    @pytest.mark.parametrize(
+        ("name", "media_type"),
+        [
+            ("json", "application/json"),
+            ("compact", COMPACT_MEDIA_TYPE),
+            ("binary", BINARY_MEDIA_TYPE),
+        ],
+    )
+    def test_serialization(self, baselines, name, media_type):
+        """Test the cost of encoding a 1000-result response."""
+        documents = _documents(1000)
+        results = [(i, 1.0 - i / 1000, doc) for i, doc in enumerate(documents)]
+        request = RerankRequest(query="what is ai?", documents=documents)
+        ranked = RankedResult(
+            indices=[i for i, _, _ in results],
+            scores=[score for _, score, _ in results],
+            total_documents=len(documents),
+            processing_time_ms=1.0,
+        )
+
+        def serialize() -> bytes:
+            if media_type == "application/json":
+                return _build_response(request, results, 1.0).model_dump_json().encode()
+            return encode([ranked], media_type)
+
+        def measure() -> float:
+            return min(timeit.repeat(serialize, number=5, repeat=5)) / 5 * 1000
+
+        baselines.check(f"serialize_1000_results_{name}_ms", measure, "time")
+
+
+class TestThroughput:
+    """Requests per second at a fixed concurrency."""
+
+    @pytest.mark.usefixtures("stub_model")
+    def test_library_concurrency(self, baselines):
+        """Test 8 threads sharing one in-process Reranker."""
+        threads, calls = 8, 50
+        service = RerankerService("stub", dedup_mode="off", score_cache_size=0)
+        documents = [_documents(20, seed=i) for i in range(calls)]
+
+        with Reranker(service=service) as reranker:
+
+            def worker(barrier: threading.Barrier) -> None:
+                barrier.wait()
+                for docs in documents:
+                    reranker.rerank("what is ai?", docs, top_k=5)
+
+            def measure() -> float:
+                barrier = threading.Barrier(threads + 1)
+                workers = [
+                    threading.Thread(target=worker, args=(barrier,))
+                    for _ in range(threads)
+                ]
+                for thread in workers:
+                    thread.start()
+                barrier.wait()
+                start = time.perf_counter()
+                for thread in workers:
+                    thread.join()
+                return threads * calls / (time.perf_counter() - start)
+
+            measure()
+            baselines.check("library_requests_per_second_8_threads", measure, "rate")
+
+
+class TestMemory:
+    """Peak Python memory of large requests."""
+
+    @pytest.mark.usefixtures("stub_model")
+    def test_peak_memory(self, baselines):
+        """Test traced peak allocation while ranking 5000 documents."""
+        service = RerankerService("stub", dedup_mode="normalized", score_cache_size=0)
+        service.load_model()
+        documents = _documents(5000, words=40)
+
+        def measure() -> float:
+            tracemalloc.start()
+            try:
+                service.rerank("what is ai?", documents, top_k=10)
+                return tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+
+        baselines.check("rerank_5000_documents_peak_bytes", measure, "bytes")
+
+
+class TestTinyModel:
+    """End-to-end scoring with a small real transformer."""
+
+    def test_throughput(self, tiny_model, baselines):
+        """Test pairs/second of the tiny model on CPU."""
+        service = RerankerService(
+            tiny_model, use_fp16=False, dedup_mode="off", score_cache_size=0
+        )
+        service.load_model()
+        pairs = synthetic_pairs(128, doc_words=32)
+
+        first = service.compute_pair_scores(pairs[:8])
+        assert service.compute_pair_scores(pairs[:8]) == first
+
+        def measure() -> float:
+            start = time.perf_counter()
+            service.compute_pair_scores(pairs)
+            return len(pairs) / (time.perf_counter() - start)
+
+        baselines.check("tiny_model_pairs_per_second", measure, "rate")
+        service.unload()
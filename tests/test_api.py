@@ -10,6 +10,7 @@ import pytest
 from fastapi.testclient import TestClient
 
 from bge_reranker_v2_m3_api_server.api import app
+from bge_reranker_v2_m3_api_server.codec import BINARY_MEDIA_TYPE, decode
 
 # 检测是否在CI环境中
 IS_CI = os.getenv("CI", "false").lower() in ("true", "1", "yes")
@@ -198,6 +199,67 @@ class TestAPIIntegration:
         assert data["returned_results"] == 10
         assert len(data["results"]) == 10
 
+    def test_rerank_batch_endpoint(self, client):
+        """测试批量重排序端点和二进制响应格式。"""
+        request_data = {
+            "requests": [
+                {
+                    "query": "编程语言",
+                    "documents": ["Python是一种编程语言。", "今天天气很好。"],
+                },
+                {"query": "天气", "documents": ["今天天气很好。"], "top_k": 1},
+            ]
+        }
+
+        response = client.post("/rerank/batch", json=request_data)
+
+        if response.status_code == 503:
+            pytest.skip("Model not loaded, skipping batch test")
+
+        assert response.status_code == 200
+
+        data = response.json()
+        assert [item["query"] for item in data["results"]] == ["编程语言", "天气"]
+        assert data["results"][1]["returned_results"] == 1
+
+        response = client.post(
+            "/rerank/batch", json=request_data, headers={"accept": BINARY_MEDIA_TYPE}
+        )
+        results = decode(response.headers["content-type"], response.content)
+        assert [result.total_documents for result in results] == [2, 1]
+
+    def test_session_endpoints(self, client):
+        """测试增量重排序会话：逐页追加文档，只对新文档打分。"""
+        response = client.post(
+            "/sessions",
+            json={"query": "编程语言", "documents": ["今天天气很好。"], "top_k": 2},
+        )
+
+        if response.status_code == 503:
+            pytest.skip("Model not loaded, skipping session test")
+
+        assert response.status_code == 200
+        session_id = response.json()["session_id"]
+
+        response = client.post(
+            f"/sessions/{session_id}/documents",
+            json={
+                "documents": ["Python是一种编程语言。", "我喜欢听音乐。"],
+                "top_k": 2,
+            },
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total_documents"] == 3
+        assert data["scored_documents"] == 2
+        assert data["results"][0]["index"] == 1
+
+        response = client.get(f"/sessions/{session_id}", params={"top_k": 1})
+        assert response.json()["returned_results"] == 1
+
+        assert client.delete(f"/sessions/{session_id}").status_code == 200
+        assert client.get(f"/sessions/{session_id}").status_code == 404
+
     @pytest.mark.slow
     def test_multilingual_reranking(self, client):
         """测试多语言重排序能力。"""
@@ -0,0 +1,157 @@
+"""Tests for the offline batch reranking runner."""
+
+import json
+from unittest.mock import Mock
+
+import pytest
+
+from bge_reranker_v2_m3_api_server.batch import iter_chunks, iter_rows, run_batch
+from bge_reranker_v2_m3_api_server.service import RerankerService
+
+
+def _write_jsonl(path, rows):
+    with path.open("w", encoding="utf-8") as f:
+        f.writelines(json.dumps(row) + "\n" for row in rows)
+
+
+def _read_jsonl(path):
+    with path.open(encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+@pytest.fixture
+def service():
+    """Service with a mocked model scoring each pair by document length."""
+    service = RerankerService()
+    reranker = Mock()
+    reranker.compute_score.side_effect = lambda pairs, **_: [
+        float(len(doc)) for _, doc in pairs
+    ]
+    service._reranker = reranker
+    service._model_loaded = True
+    return service
+
+
+class TestBatchInput:
+    """Test lazy input reading and chunking."""
+
+    def test_iter_rows_skips_blank_lines_and_resumes(self, tmp_path):
+        """Test JSONL rows are numbered consistently when skipping."""
+        path = tmp_path / "input.jsonl"
+        path.write_text(
+            '{"query": "q0", "documents": ["a"]}\n'
+            "\n"
+            '{"id": "x", "query": "q1", "documents": ["b", "c"]}\n',
+            encoding="utf-8",
+        )
+
+        rows = list(iter_rows(path))
+        assert rows == [(0, None, "q0", ["a"]), (1, "x", "q1", ["b", "c"])]
+
+        assert list(iter_rows(path, skip=1)) == [(1, "x", "q1", ["b", "c"])]
+
+    def test_iter_rows_rejects_invalid_row(self, tmp_path):
+        """Test rows without documents fail with the row number."""
+        path = tmp_path / "input.jsonl"
+        _write_jsonl(path, [{"query": "q", "documents": []}])
+
+        with pytest.raises(ValueError, match="Row 0"):
+            list(iter_rows(path))
+
+    def test_iter_chunks_packs_rows_by_pairs(self):
+        """Test rows are grouped until the pair budget is reached."""
+        rows = [(i, None, "q", ["d"] * n) for i, n in enumerate([2, 2, 5, 1])]
+
+        chunks = list(iter_chunks(rows, batch_pairs=4))
+
+        assert [[row[0] for row in chunk] for chunk in chunks] == [[0, 1], [2], [3]]
+
+
+class TestRunBatch:
+    """Test end-to-end batch runs with a mocked model."""
+
+    def test_run_batch_scores_across_rows(self, tmp_path, service):
+        """Test pairs from several rows go through a single model call."""
+        input_path = tmp_path / "input.jsonl"
+        output_path = tmp_path / "output.jsonl"
+        _write_jsonl(
+            input_path,
+            [
+                {"id": 1, "query": "q1", "documents": ["aa", "a", "aaa"]},
+                {"id": 2, "query": "q2", "documents": ["b", "bbbb"]},
+            ],
+        )
+
+        processed = run_batch(
+            input_path, output_path, service=service, batch_pairs=10, top_k=2
+        )
+
+        assert processed == 2
+        service._reranker.compute_score.assert_called_once()
+        assert _read_jsonl(output_path) == [
+            {
+                "row": 0,
+                "id": 1,
+                "results": [{"index": 2, "score": 3.0}, {"index": 0, "score": 2.0}],
+            },
+            {
+                "row": 1,
+                "id": 2,
+                "results": [{"index": 1, "score": 4.0}, {"index": 0, "score": 1.0}],
+            },
+        ]
+
+    def test_run_batch_resumes_from_checkpoint(self, tmp_path, service):
+        """Test an interrupted run continues after the last checkpoint."""
+        input_path = tmp_path / "input.jsonl"
+        output_path = tmp_path / "output.jsonl"
+        _write_jsonl(
+            input_path,
+            [{"query": f"q{i}", "documents": ["x" * (i + 1)]} for i in range(4)],
+        )
+
+        calls = 0
+
+        def flaky(pairs, **_):
+            nonlocal calls
+            calls += 1
+            if calls == 2:
+                raise RuntimeError("interrupted")
+            return [float(len(doc)) for _, doc in pairs]
+
+        service._reranker.compute_score.side_effect = flaky
+
+        with pytest.raises(RuntimeError, match="interrupted"):
+            run_batch(input_path, output_path, service=service, batch_pairs=2)
+
+        # Simulate a partially written line after the last checkpoint
+        with output_path.open("a", encoding="utf-8") as f:
+            f.write('{"row": 2, "resu')
+
+        processed = run_batch(input_path, output_path, service=service, batch_pairs=2)
+
+        assert processed == 2
+        assert [record["row"] for record in _read_jsonl(output_path)] == [0, 1, 2, 3]
+
+    def test_run_batch_rejects_mismatched_checkpoint(self, tmp_path, service):
+        """Test a checkpoint from another input is not reused."""
+        input_path = tmp_path / "input.jsonl"
+        output_path = tmp_path / "output.jsonl"
+        _write_jsonl(input_path, [{"query": "q", "documents": ["d"]}])
+        (tmp_path / "output.jsonl.ckpt").write_text(
+            json.dumps({"input": "/other.jsonl", "rows_done": 1, "output_bytes": 0})
+        )
+
+        with pytest.raises(ValueError, match="different input"):
+            run_batch(input_path, output_path, service=service)
+
+    @pytest.mark.parametrize("top_k", [0, -1])
+    def test_run_batch_rejects_invalid_top_k(self, tmp_path, service, top_k):
+        """Test top_k must keep at least one result per row."""
+        input_path = tmp_path / "input.jsonl"
+        _write_jsonl(input_path, [{"query": "q", "documents": ["d"]}])
+
+        with pytest.raises(ValueError, match="top_k"):
+            run_batch(
+                input_path, tmp_path / "output.jsonl", service=service, top_k=top_k
+            )
@@ -0,0 +1,115 @@
+"""Tests for adaptive batch sizing."""
+
+from unittest.mock import Mock
+
+import pytest
+
+from bge_reranker_v2_m3_api_server.batching import (
+    AdaptiveBatchController,
+    estimate_tokens,
+    is_out_of_memory,
+)
+from bge_reranker_v2_m3_api_server.service import RerankerService
+
+
+class TestAdaptiveBatchController:
+    """Test batch planning and budget updates."""
+
+    def test_plan_respects_padded_token_budget(self):
+        """Test chunks stay within budget with longest pairs first."""
+        controller = AdaptiveBatchController(initial_tokens=100, memory_limit=0)
+
+        chunks = controller.plan([10, 50, 20, 10, 40])
+
+        assert chunks == [[1, 4], [2, 0, 3]]
+
+    def test_plan_respects_max_batch_size(self):
+        """Test chunks never exceed max_batch_size pairs."""
+        controller = AdaptiveBatchController(
+            initial_tokens=10_000, max_batch_size=2, memory_limit=0
+        )
+
+        assert [len(chunk) for chunk in controller.plan([1] * 5)] == [2, 2, 1]
+
+    def test_budget_tracks_latency_target(self):
+        """Test the budget grows when fast and shrinks when slow."""
+        controller = AdaptiveBatchController(
+            target_latency_ms=100, initial_tokens=1000, memory_limit=0
+        )
+
+        controller.record(1000, 0.01)  # 10 ms: far below target
+        assert controller.token_budget == 1250
+
+        for _ in range(20):
+            controller.record(1000, 1.0)  # 1 s: far above target
+        assert controller.token_budget == controller.min_tokens
+
+    def test_memory_pressure_shrinks_budget(self):
+        """Test the budget shrinks while RSS is above the watermark."""
+        controller = AdaptiveBatchController(
+            target_latency_ms=1000, initial_tokens=4000, memory_limit=1
+        )
+
+        controller.record(1000, 0.01)
+
+        assert controller.token_budget == 3000
+
+    def test_oom_halves_budget(self):
+        """Test out-of-memory errors halve the budget."""
+        controller = AdaptiveBatchController(initial_tokens=4000, memory_limit=0)
+
+        controller.record_oom()
+
+        assert controller.token_budget == 2000
+
+    def test_helpers(self):
+        """Test token estimation and OOM detection."""
+        assert estimate_tokens("q" * 30, "d" * 3000, max_length=512) == 512
+        assert estimate_tokens("abc", "def") == 5
+        assert is_out_of_memory(RuntimeError("CUDA out of memory. Tried to allocate"))
+        assert is_out_of_memory(MemoryError())
+        assert not is_out_of_memory(ValueError("bad input"))
+
+
+class TestServiceAdaptiveBatching:
+    """Test RerankerService with an adaptive batch controller."""
+
+    def _service(self, compute_score):
+        service = RerankerService(
+            dedup_mode="off",
+            batch_controller=AdaptiveBatchController(
+                initial_tokens=10_000, memory_limit=0
+            ),
+        )
+        service._reranker = Mock(max_length=512)
+        service._reranker.compute_score.side_effect = compute_score
+        service._model_loaded = True
+        return service
+
+    def test_oom_batch_is_split_and_retried(self):
+        """Test an out-of-memory batch is retried in halves."""
+        batch_sizes = []
+
+        def compute_score(pairs, *, batch_size, **_kwargs):
+            batch_sizes.append(batch_size)
+            if batch_size > 2:
+                raise RuntimeError("out of memory")
+            return [float(len(doc)) for _, doc in pairs]
+
+        service = self._service(compute_score)
+        scores, _ = service.compute_scores("q", ["a", "bbb", "cc", "dddd"])
+
+        assert scores == [1.0, 3.0, 2.0, 4.0]
+        assert batch_sizes == [4, 2, 2]
+        assert service.batch_controller.token_budget < 10_000
+
+    def test_single_pair_oom_is_raised(self):
+        """Test an out-of-memory error on a single pair is not retried forever."""
+
+        def compute_score(*_args, **_kwargs):
+            raise RuntimeError("out of memory")
+
+        service = self._service(compute_score)
+
+        with pytest.raises(RuntimeError, match="out of memory"):
+            service.compute_scores("q", ["a", "b"])
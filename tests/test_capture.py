@@ -0,0 +1,190 @@
+"""Tests for traffic capture and replay."""
+
+import asyncio
+import gzip
+import json
+
+import pytest
+
+from bge_reranker_v2_m3_api_server.capture import (
+    CapturedRequest,
+    TrafficRecorder,
+    compare_reports,
+    read_capture,
+    replay,
+    worker_capture_path,
+)
+
+
+def _payload(query: str = "what is ai?", documents=None) -> dict:
+    return {
+        "query": query,
+        "documents": documents or ["ai is a field", "a cat"],
+        "top_k": 1,
+        "normalize": True,
+    }
+
+
+class TestTrafficRecorder:
+    """Test writing capture files."""
+
+    def test_round_trip(self, tmp_path):
+        """Test requests come back in arrival order with relative offsets."""
+        path = tmp_path / "traffic.jsonl.gz"
+        recorder = TrafficRecorder(path)
+        recorder.record(_payload("first"), arrival=100.0)
+        recorder.record(_payload("second"), arrival=100.25)
+        recorder.close()
+
+        with gzip.open(path, "rt") as f:
+            assert json.loads(f.readline())["format"] == "bge-reranker-capture"
+        requests = read_capture(path)
+        assert [r.payload["query"] for r in requests] == ["first", "second"]
+        assert [r.offset for r in requests] == [0.0, 0.25]
+        assert requests[0].payload["top_k"] == 1
+
+    def test_hash_keeps_lengths_and_repetition(self, tmp_path):
+        """Test hashed texts keep their length and equal texts stay equal."""
+        path = tmp_path / "traffic.jsonl"
+        recorder = TrafficRecorder(path, text_mode="hash")
+        documents = ["a secret document", "another one", "a secret document"]
+        recorder.record(_payload("private query", documents))
+        recorder.close()
+
+        payload = read_capture(path)[0].payload
+        hashed = payload["documents"]
+        assert [len(d) for d in hashed] == [len(d) for d in documents]
+        assert hashed[0] == hashed[2]
+        assert hashed[0] != hashed[1]
+        assert "secret" not in path.read_text()
+        assert len(payload["query"]) == len("private query")
+
+    def test_redact_keeps_lengths(self, tmp_path):
+        """Test redacted texts keep only their length."""
+        path = tmp_path / "traffic.jsonl"
+        recorder = TrafficRecorder(path, text_mode="redact")
+        recorder.record(_payload(documents=["abc", "defgh"]))
+        recorder.close()
+
+        assert read_capture(path)[0].payload["documents"] == ["x x", "x x x"]
+
+    def test_sampling_and_limit(self, tmp_path):
+        """Test seeded sampling is repeatable and max_requests caps the file."""
+
+        def sampled(**kwargs) -> int:
+            recorder = TrafficRecorder(tmp_path / "t.jsonl", seed=1, **kwargs)
+            for _ in range(200):
+                recorder.record(_payload())
+            recorder.close()
+            return len(read_capture(tmp_path / "t.jsonl"))
+
+        count = sampled(sample_rate=0.25)
+        assert 20 < count < 80
+        assert sampled(sample_rate=0.25) == count
+        assert sampled(max_requests=7) == 7
+
+    def test_invalid_settings(self, tmp_path):
+        """Test unknown text modes and sample rates are rejected."""
+        with pytest.raises(ValueError, match="text mode"):
+            TrafficRecorder(tmp_path / "t.jsonl", text_mode="encrypt")
+        with pytest.raises(ValueError, match="sample_rate"):
+            TrafficRecorder(tmp_path / "t.jsonl", sample_rate=0)
+
+    def test_truncated_file(self, tmp_path):
+        """Test a capture cut off mid-line is read up to its last entry."""
+        path = tmp_path / "traffic.jsonl"
+        recorder = TrafficRecorder(path)
+        recorder.record(_payload(), arrival=1.0)
+        recorder.close()
+        with path.open("a") as f:
+            f.write('{"ts": 2.0, "request": {"que')
+
+        assert len(read_capture(path)) == 1
+
+    def test_merges_worker_files(self, tmp_path):
+        """Test per-worker captures are merged by arrival time."""
+        paths = [worker_capture_path(tmp_path / "t.jsonl.gz", 2, pid) for pid in (7, 8)]
+        assert paths[0].name == "t.7.jsonl.gz"
+        assert worker_capture_path(tmp_path / "t.jsonl", 1, 7).name == "t.jsonl"
+
+        for path, arrivals in zip(paths, ([1.0, 3.0], [2.0]), strict=True):
+            recorder = TrafficRecorder(path)
+            for arrival in arrivals:
+                recorder.record(_payload(str(arrival)), arrival=arrival)
+            recorder.close()
+
+        requests = read_capture(paths)
+        assert [r.payload["query"] for r in requests] == ["1.0", "2.0", "3.0"]
+
+    def test_not_a_capture(self, tmp_path):
+        """Test other JSON lines files are refused."""
+        path = tmp_path / "other.jsonl"
+        path.write_text('{"id": 1}\n')
+
+        with pytest.raises(ValueError, match="not a capture file"):
+            read_capture(path)
+
+
+class TestReplay:
+    """Test replaying captured requests."""
+
+    def test_as_fast_as_possible(self):
+        """Test every request is sent and failures are counted."""
+        sent = []
+
+        async def send(payload):
+            sent.append(payload["query"])
+            if payload["query"] == "bad":
+                raise RuntimeError("boom")
+
+        requests = [
+            CapturedRequest(offset, _payload(query))
+            for offset, query in ((0.0, "a"), (5.0, "bad"), (10.0, "c"))
+        ]
+        report = asyncio.run(replay(requests, send, speed=0))
+
+        assert sent == ["a", "bad", "c"]
+        assert report["requests"] == 2
+        assert report["errors"] == 1
+        assert report["wall_seconds"] < 5
+        assert report["p50_ms"] <= report["p99_ms"] <= report["max_ms"]
+
+    def test_original_pace_is_scaled(self):
+        """Test arrival offsets are kept, divided by the speed."""
+        requests = [CapturedRequest(0.0, _payload()), CapturedRequest(0.4, _payload())]
+
+        async def send(_payload):
+            pass
+
+        report = asyncio.run(replay(requests, send, speed=4.0))
+
+        assert 0.1 <= report["wall_seconds"] < 0.3
+        assert report["max_send_lag_ms"] < 100
+
+    def test_concurrency_limit(self):
+        """Test no more than concurrency requests are in flight."""
+        in_flight = 0
+        peak = 0
+
+        async def send(_payload):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+
+        requests = [CapturedRequest(0.0, _payload()) for _ in range(20)]
+        asyncio.run(replay(requests, send, speed=0, concurrency=3))
+
+        assert peak == 3
+
+    def test_compare_reports(self):
+        """Test relative changes against a baseline report."""
+        changes = compare_reports(
+            {"p50_ms": 11.0, "p99_ms": 40.0, "requests_per_second": 90.0},
+            {"p50_ms": 10.0, "p99_ms": 50.0, "requests_per_second": 100.0},
+        )
+
+        assert changes == pytest.approx(
+            {"p50_ms": 0.1, "p99_ms": -0.2, "requests_per_second": -0.1}
+        )
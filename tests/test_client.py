@@ -0,0 +1,187 @@
+"""Tests for the async API client."""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from bge_reranker_v2_m3_api_server.client import LatencyEstimator, RerankerClient
+from bge_reranker_v2_m3_api_server.codec import (
+    JSON_MEDIA_TYPE,
+    RankedResult,
+    encode,
+    negotiate,
+)
+
+
+class FakeServer:
+    """Minimal stand-in for the API that ranks documents by length."""
+
+    def __init__(self, fail_first: int = 0, delay: float = 0.0, fail_status: int = 503):
+        self.calls: list[str] = []
+        self.fail_first = fail_first
+        self.fail_status = fail_status
+        self.delay = delay
+        self.headers: dict[str, str] = {}
+
+    @staticmethod
+    def _rank(payload):
+        documents = payload["documents"]
+        order = sorted(range(len(documents)), key=lambda i: -len(documents[i]))
+        order = order[: payload.get("top_k") or len(order)]
+        return RankedResult(
+            list(order),
+            [len(documents[i]) / 100 for i in order],
+            len(documents),
+            1.0,
+            len(set(documents)),
+        )
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        self.calls.append(f"{request.url.host}{request.url.path}")
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.fail_first:
+            self.fail_first -= 1
+            return httpx.Response(self.fail_status, headers=self.headers)
+        payload = json.loads(request.content)
+        if request.url.path == "/rerank/batch":
+            results = [self._rank(item) for item in payload["requests"]]
+        else:
+            results = [self._rank(payload)]
+        media_type = negotiate(request.headers.get("accept"))
+        assert media_type != JSON_MEDIA_TYPE
+        return httpx.Response(
+            200,
+            content=encode(results, media_type),
+            headers={"content-type": media_type, **self.headers},
+        )
+
+
+def _client(server, **kwargs):
+    return RerankerClient(
+        kwargs.pop("base_urls", "http://replica"),
+        transport=httpx.MockTransport(server.handler),
+        **kwargs,
+    )
+
+
+class TestRerankerClient:
+    """Test RerankerClient against a fake server."""
+
+    @pytest.mark.parametrize("response_format", ["binary", "compact"])
+    async def test_rerank(self, response_format):
+        """Test responses are rebuilt with local document texts."""
+        server = FakeServer()
+        async with _client(
+            server, response_format=response_format, coalesce_window_ms=0
+        ) as client:
+            response = await client.rerank("q", ["a", "ccc", "bb"], top_k=2)
+
+        assert [item.index for item in response.results] == [1, 2]
+        assert [item.document for item in response.results] == ["ccc", "bb"]
+        assert response.total_documents == 3
+        assert server.calls == ["replica/rerank"]
+
+    async def test_concurrent_calls_are_coalesced(self):
+        """Test small concurrent calls share one batch request."""
+        server = FakeServer()
+        async with _client(server, coalesce_window_ms=20) as client:
+            responses = await asyncio.gather(
+                client.rerank("q1", ["a", "bb"]),
+                client.rerank("q2", ["ccc", "d", "ee"]),
+                client.rerank("q3", ["x"]),
+            )
+
+        assert server.calls == ["replica/rerank/batch"]
+        assert [r.query for r in responses] == ["q1", "q2", "q3"]
+        assert [r.results[0].document for r in responses] == ["bb", "ccc", "x"]
+
+    async def test_degradation_header_is_kept(self):
+        """Test degradations of compact and binary responses reach the caller."""
+        server = FakeServer()
+        server.headers["x-degradation"] = "max_length=256, cache_only"
+        async with _client(server, coalesce_window_ms=20) as client:
+            responses = await asyncio.gather(
+                client.rerank("q1", ["a", "bb"]), client.rerank("q2", ["c"])
+            )
+
+        assert server.calls == ["replica/rerank/batch"]
+        assert all(
+            response.degradation == ["max_length=256", "cache_only"]
+            for response in responses
+        )
+
+    async def test_retries_on_unavailable(self):
+        """Test 503 responses are retried."""
+        server = FakeServer(fail_first=2)
+        async with _client(server, coalesce_window_ms=0, retry_backoff=0.001) as client:
+            response = await client.rerank("q", ["a"])
+
+        assert response.returned_results == 1
+        assert len(server.calls) == 3
+
+    async def test_gives_up_after_max_retries(self):
+        """Test the last error is raised once retries are exhausted."""
+        server = FakeServer(fail_first=10)
+        async with _client(
+            server, coalesce_window_ms=0, max_retries=1, retry_backoff=0.001
+        ) as client:
+            with pytest.raises(Exception, match="HTTP 503"):
+                await client.rerank("q", ["a"])
+
+        assert len(server.calls) == 2
+
+    async def test_quota_rejection_is_not_retried(self):
+        """Test a 429 without Retry-After is raised, not sent elsewhere."""
+        server = FakeServer(fail_first=1, fail_status=429)
+        async with _client(
+            server, base_urls=["http://r1", "http://r2"], coalesce_window_ms=0
+        ) as client:
+            with pytest.raises(httpx.HTTPStatusError, match="429"):
+                await client.rerank("q", ["a"])
+
+        assert len(server.calls) == 1
+
+    async def test_retry_after_is_honored_on_the_same_replica(self):
+        """Test a 429 with Retry-After is retried on the replica that sent it."""
+        server = FakeServer(fail_first=2, fail_status=429)
+        server.headers["retry-after"] = "0"
+        async with _client(
+            server, base_urls=["http://r1", "http://r2"], coalesce_window_ms=0
+        ) as client:
+            response = await client.rerank("q", ["a"])
+
+        assert response.returned_results == 1
+        assert len(server.calls) == 3
+        assert len(set(server.calls)) == 1
+
+    async def test_slow_request_is_hedged(self):
+        """Test a request slower than usual is duplicated on another replica."""
+        server = FakeServer(delay=0.2)
+        async with _client(
+            server, base_urls=["http://r1", "http://r2"], coalesce_window_ms=0
+        ) as client:
+            for replica in client._replicas:
+                replica.latency.observe(0.01)
+            await client.rerank("q", ["a"])
+
+        assert sorted(server.calls) == ["r1/rerank", "r2/rerank"]
+
+
+class TestLatencyEstimator:
+    """Test adaptive timeouts."""
+
+    def test_timeout_tracks_latency(self):
+        """Test the timeout follows observed latency within bounds."""
+        estimator = LatencyEstimator(min_timeout=0.1, max_timeout=10.0)
+        assert estimator.timeout == 10.0
+        assert estimator.hedge_delay is None
+
+        for _ in range(20):
+            estimator.observe(0.2)
+        assert 0.2 <= estimator.timeout < 0.5
+
+        estimator.backoff()
+        assert estimator.timeout > 0.4
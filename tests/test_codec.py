@@ -0,0 +1,58 @@
+"""Tests for the compact and binary response encodings."""
+
+import json
+
+import pytest
+
+from bge_reranker_v2_m3_api_server.codec import (
+    BINARY_MEDIA_TYPE,
+    COMPACT_MEDIA_TYPE,
+    JSON_MEDIA_TYPE,
+    RankedResult,
+    decode,
+    encode,
+    negotiate,
+)
+
+RESULTS = [
+    RankedResult([2, 0, 1], [0.75, 0.5, 0.25], 3, 4.5, unique_documents=3),
+    RankedResult([0], [0.125], 2, 1.0),
+]
+
+
+class TestCodec:
+    """Test encoding round trips and negotiation."""
+
+    @pytest.mark.parametrize("media_type", [BINARY_MEDIA_TYPE, COMPACT_MEDIA_TYPE])
+    def test_round_trip(self, media_type):
+        """Test results survive encoding (scores are exact binary fractions)."""
+        assert decode(media_type, encode(RESULTS, media_type)) == RESULTS
+
+    def test_binary_is_smaller_than_compact(self):
+        """Test the binary format is the most compact one."""
+        assert len(encode(RESULTS, BINARY_MEDIA_TYPE)) < len(
+            encode(RESULTS, COMPACT_MEDIA_TYPE)
+        )
+
+    def test_decode_json_response(self):
+        """Test the default JSON response decodes to the same structure."""
+        body = json.dumps(
+            {
+                "results": [{"index": 1, "score": 0.9, "document": ""}],
+                "query": "q",
+                "total_documents": 2,
+                "returned_results": 1,
+                "processing_time_ms": 3.0,
+                "unique_documents": 2,
+                "dedup_ratio": 0.0,
+            }
+        ).encode()
+
+        assert decode(JSON_MEDIA_TYPE, body) == [RankedResult([1], [0.9], 2, 3.0, 2)]
+
+    def test_negotiate(self):
+        """Test Accept header negotiation falls back to JSON."""
+        assert negotiate(BINARY_MEDIA_TYPE) == BINARY_MEDIA_TYPE
+        assert negotiate(f"{COMPACT_MEDIA_TYPE}, */*") == COMPACT_MEDIA_TYPE
+        assert negotiate("*/*") == JSON_MEDIA_TYPE
+        assert negotiate(None) == JSON_MEDIA_TYPE
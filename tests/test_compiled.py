@@ -0,0 +1,198 @@
+"""Tests for the compiled forward pass."""
+
+import threading
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+
+import pytest
+
+from bge_reranker_v2_m3_api_server import compiled
+from bge_reranker_v2_m3_api_server.compiled import CompiledForward, select_bucket
+from bge_reranker_v2_m3_api_server.service import (
+    COMPILED_MAX_FAILURES,
+    RerankerService,
+)
+
+
+class TestShapeBuckets:
+    """Test shape bucket selection."""
+
+    def test_select_bucket(self):
+        """Test the smallest bucket holding a value is picked."""
+        assert select_bucket(1, (1, 4, 16)) == 1
+        assert select_bucket(3, (1, 4, 16)) == 4
+        assert select_bucket(16, (1, 4, 16)) == 16
+        assert select_bucket(17, (1, 4, 16)) is None
+
+    def test_shapes(self):
+        """Test every batch and sequence bucket combination is compiled."""
+        forward = CompiledForward(batch_buckets=(4, 1), seq_buckets=(256, 128))
+        assert forward.shapes() == [(1, 128), (4, 128), (1, 256), (4, 256)]
+
+    def test_invalid_buckets(self):
+        """Test empty and non-positive buckets are rejected."""
+        with pytest.raises(ValueError, match="At least one"):
+            CompiledForward(batch_buckets=())
+        with pytest.raises(ValueError, match="positive"):
+            CompiledForward(seq_buckets=(0, 128))
+
+
+class TestCompiledForward:
+    """Test compilation and the fallback to eager mode."""
+
+    def test_load_failure_stays_eager(self):
+        """Test a failed compilation leaves the forward pass unloaded."""
+        forward = CompiledForward(seq_buckets=(128, 1024))
+        with patch.object(compiled, "_import_torch", side_effect=ImportError("torch")):
+            assert forward.load(Mock(), Mock(), max_length=512) is False
+
+        assert not forward.ready
+        # Buckets above max_length are dropped and max_length is added
+        assert forward.seq_buckets == (128, 512)
+        with pytest.raises(RuntimeError, match="not loaded"):
+            forward([("q", "d")], normalize=True)
+
+    def test_compiled_scores_match_model(self):
+        """Test padded, bucketed scoring returns the unpadded logits."""
+        torch = pytest.importorskip("torch")
+
+        class SumModel(torch.nn.Module):
+            def __init__(self):
+                super().__init__()
+                self.scale = torch.nn.Parameter(torch.ones(1))
+
+            def forward(self, input_ids, attention_mask, **_kwargs):
+                logits = (input_ids * attention_mask).sum(-1, keepdim=True).float()
+                return SimpleNamespace(logits=logits * self.scale)
+
+        class Tokenizer:
+            pad_token_id = 0
+
+            def __call__(self, queries, docs, max_length, **_kwargs):
+                ids = [
+                    [len(word) for word in f"{q} {d}".split()][:max_length]
+                    for q, d in zip(queries, docs, strict=True)
+                ]
+                return {"input_ids": ids}
+
+            def pad(self, features, max_length, **_kwargs):
+                rows = features["input_ids"]
+                return {
+                    "input_ids": torch.tensor(
+                        [row + [0] * (max_length - len(row)) for row in rows]
+                    ),
+                    "attention_mask": torch.tensor(
+                        [[1] * len(row) + [0] * (max_length - len(row)) for row in rows]
+                    ),
+                }
+
+        forward = CompiledForward(
+            batch_buckets=(1, 2), seq_buckets=(2, 4), backend="eager"
+        )
+        assert forward.load(SumModel(), Tokenizer(), max_length=8)
+
+        pairs = [("a", "bb"), ("ccc", "dddd eeeee ffffff"), ("g", "h i j k")]
+        scores = forward(pairs, normalize=False)
+
+        assert scores == pytest.approx([3.0, 18.0, 5.0])
+
+    def test_each_thread_has_its_own_tokenizer(self):
+        """Test concurrent calls encode and pad with per-thread copies."""
+        tokenizer = Mock()
+        copies = []
+
+        def deepcopy(_tokenizer):
+            copy = Mock(return_value={"input_ids": [[1]]})
+            copies.append(copy)
+            return copy
+
+        forward = CompiledForward(batch_buckets=(1,), seq_buckets=(4,))
+        forward._model = Mock()
+        forward._tokenizer = tokenizer
+        forward._run = Mock(return_value=[0.0])
+        with patch("copy.deepcopy", side_effect=deepcopy):
+            threads = [
+                threading.Thread(target=forward, args=([("q", "d")], False))
+                for _ in range(3)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        tokenizer.assert_not_called()
+        assert len(copies) == 3
+        assert {id(run.args[0]) for run in forward._run.call_args_list} == {
+            id(copy) for copy in copies
+        }
+
+
+class TestServiceCompiledForward:
+    """Test RerankerService use of the compiled forward pass."""
+
+    @patch("bge_reranker_v2_m3_api_server.service.FlagReranker")
+    def test_load_compiles_model(self, mock_flag_reranker):
+        """Test the service compiles the loaded model."""
+        reranker = Mock(max_length=256)
+        mock_flag_reranker.return_value = reranker
+        forward = Mock()
+
+        service = RerankerService(compiled_forward=forward)
+        service.load_model()
+
+        forward.load.assert_called_once_with(reranker.model, reranker.tokenizer, 256)
+
+    def test_uses_compiled_forward_when_ready(self):
+        """Test a ready compiled forward pass replaces compute_score."""
+        forward = Mock(ready=True, return_value=[0.9, 0.1])
+        service = RerankerService(dedup_mode="off", compiled_forward=forward)
+        service._reranker = Mock()
+        service._model_loaded = True
+
+        scores = service.compute_pair_scores([("q", "a"), ("q", "b")])
+
+        assert scores == [0.9, 0.1]
+        forward.assert_called_once_with([("q", "a"), ("q", "b")], True, None)
+        service._reranker.compute_score.assert_not_called()
+
+    def test_runtime_failure_falls_back_to_eager(self):
+        """Test failing compiled calls run eagerly and repeated ones disable it."""
+        forward = Mock(ready=True, side_effect=RuntimeError("graph break"))
+        service = RerankerService(dedup_mode="off", compiled_forward=forward)
+        service._reranker = Mock()
+        service._reranker.compute_score.return_value = [0.5, 0.4]
+        service._model_loaded = True
+
+        for _ in range(COMPILED_MAX_FAILURES - 1):
+            assert service.compute_pair_scores([("q", "a"), ("q", "b")]) == [0.5, 0.4]
+        forward.unload.assert_not_called()
+
+        service.compute_pair_scores([("q", "a"), ("q", "b")])
+        forward.unload.assert_called_once()
+
+    def test_transient_failure_keeps_compiled_forward(self):
+        """Test a success resets the count of consecutive failures."""
+        forward = Mock(ready=True)
+        service = RerankerService(dedup_mode="off", compiled_forward=forward)
+        service._reranker = Mock()
+        service._reranker.compute_score.return_value = [0.5]
+        service._model_loaded = True
+
+        for _ in range(COMPILED_MAX_FAILURES * 2):
+            forward.side_effect = RuntimeError("Already borrowed")
+            assert service.compute_pair_scores([("q", "a")]) == [0.5]
+            forward.side_effect = None
+            forward.return_value = [0.9]
+            assert service.compute_pair_scores([("q", "b")]) == [0.9]
+        forward.unload.assert_not_called()
+
+    def test_out_of_memory_is_not_swallowed(self):
+        """Test OOM errors reach the adaptive batch splitting."""
+        forward = Mock(ready=True, side_effect=RuntimeError("CUDA out of memory"))
+        service = RerankerService(dedup_mode="off", compiled_forward=forward)
+        service._reranker = Mock()
+        service._model_loaded = True
+
+        with pytest.raises(RuntimeError, match="out of memory"):
+            service.compute_pair_scores([("q", "a"), ("q", "b")])
+        forward.unload.assert_not_called()
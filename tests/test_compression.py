@@ -0,0 +1,121 @@
+"""Tests for request/response compression and body size caps."""
+
+import gzip
+import zlib
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from bge_reranker_v2_m3_api_server.compression import (
+    CompressionMiddleware,
+    InputLimits,
+    PayloadTooLargeError,
+    compress,
+    decompress,
+    negotiate_encoding,
+)
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=100,
+        limits=InputLimits(max_request_bytes=1000),
+    )
+
+    @app.post("/echo")
+    async def echo(request: Request):
+        body = await request.body()
+        return {"size": len(body), "text": body.decode() * 10}
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+class TestCodings:
+    """Test coding negotiation and round trips."""
+
+    def test_negotiate_encoding(self):
+        """Test quality values and unsupported codings."""
+        assert negotiate_encoding(None) is None
+        assert negotiate_encoding("br") is None
+        assert negotiate_encoding("gzip;q=0, deflate") == "deflate"
+        assert negotiate_encoding("*") in ("zstd", "gzip")
+
+    @pytest.mark.parametrize("encoding", ["gzip", "deflate"])
+    def test_round_trip(self, encoding):
+        """Test compressed bodies decode back to the original."""
+        body = b'{"query": "q"}' * 100
+
+        assert decompress(compress(body, encoding), encoding) == body
+
+    def test_raw_deflate(self):
+        """Test deflate bodies without a zlib header are accepted."""
+        compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+        body = compressor.compress(b"abc") + compressor.flush()
+
+        assert decompress(body, "deflate") == b"abc"
+
+    def test_decoded_size_is_capped(self):
+        """Test a small body that expands past the cap is rejected."""
+        bomb = gzip.compress(b"0" * 1_000_000)
+
+        with pytest.raises(PayloadTooLargeError):
+            decompress(bomb, "gzip", limit=1000)
+
+    def test_corrupt_body(self):
+        """Test corrupt bodies raise ValueError."""
+        with pytest.raises(ValueError, match="Invalid gzip body"):
+            decompress(b"not gzip", "gzip")
+
+
+class TestCompressionMiddleware:
+    """Test the middleware end to end."""
+
+    def test_gzip_request_and_response(self, client):
+        """Test compressed requests are decoded and responses compressed."""
+        response = client.post(
+            "/echo",
+            content=gzip.compress(b"x" * 50),
+            headers={"Content-Encoding": "gzip", "Accept-Encoding": "gzip"},
+        )
+
+        assert response.status_code == 200
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.json()["size"] == 50
+
+    def test_small_responses_are_not_compressed(self, client):
+        """Test responses below minimum_size are sent as is."""
+        response = client.post(
+            "/echo", content=b"x", headers={"Accept-Encoding": "gzip"}
+        )
+
+        assert "content-encoding" not in response.headers
+        assert response.json()["size"] == 1
+
+    def test_oversized_body_is_rejected(self, client):
+        """Test bodies above the byte cap get 413 before the endpoint runs."""
+        response = client.post("/echo", content=b"x" * 1001)
+
+        assert response.status_code == 413
+
+    def test_compression_bomb_is_rejected(self, client):
+        """Test the cap also applies to the decoded size."""
+        response = client.post(
+            "/echo",
+            content=gzip.compress(b"x" * 100_000),
+            headers={"Content-Encoding": "gzip"},
+        )
+
+        assert response.status_code == 413
+
+    def test_unsupported_encoding(self, client):
+        """Test unknown request codings get 415."""
+        response = client.post(
+            "/echo", content=b"x", headers={"Content-Encoding": "br"}
+        )
+
+        assert response.status_code == 415
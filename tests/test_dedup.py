@@ -0,0 +1,58 @@
+"""Tests for document deduplication and the score cache."""
+
+import pytest
+
+from bge_reranker_v2_m3_api_server.dedup import (
+    ScoreCache,
+    deduplicate,
+    normalize_text,
+    pair_fingerprint,
+)
+
+
+class TestDeduplicate:
+    """Test deduplicate and its modes."""
+
+    def test_normalize_text(self):
+        """Test whitespace and compatibility characters are normalized."""
+        assert normalize_text("  Ｈello\n\tworld ") == "Hello world"
+
+    def test_normalized_mode(self):
+        """Test normalized-identical documents collapse to the first copy."""
+        unique, inverse = deduplicate(["a b", "c", "a  b", "c"], "normalized")
+
+        assert unique == ["a b", "c"]
+        assert inverse == [0, 1, 0, 1]
+
+    def test_off_mode(self):
+        """Test dedup can be disabled."""
+        unique, inverse = deduplicate(["a", "a"], "off")
+
+        assert unique == ["a", "a"]
+        assert inverse == [0, 1]
+
+    def test_unknown_mode_fails(self):
+        """Test an unknown mode is rejected."""
+        with pytest.raises(ValueError, match="Unknown dedup mode"):
+            deduplicate(["a"], "fuzzy")
+
+
+class TestScoreCache:
+    """Test ScoreCache."""
+
+    def test_lru_eviction(self):
+        """Test least recently used entries are evicted first."""
+        cache = ScoreCache(max_size=2)
+        keys = [pair_fingerprint("q", doc, True, "exact") for doc in "abc"]
+
+        cache.put_many([(keys[0], 0.1), (keys[1], 0.2)])
+        assert cache.get_many([keys[0]]) == [0.1]
+        cache.put_many([(keys[2], 0.3)])
+
+        assert cache.get_many(keys) == [0.1, None, 0.3]
+
+    def test_fingerprint_depends_on_normalize(self):
+        """Test raw and normalized scores never share a cache entry."""
+        assert pair_fingerprint("q", "d", True, "exact") != pair_fingerprint(
+            "q", "d", False, "exact"
+        )
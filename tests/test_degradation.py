@@ -0,0 +1,177 @@
+"""Tests for SLO-aware degradation."""
+
+from unittest.mock import Mock
+
+import numpy as np
+import pytest
+
+from bge_reranker_v2_m3_api_server.api import (
+    _build_response,
+    _degrade,
+    _unscored_documents,
+)
+from bge_reranker_v2_m3_api_server.degradation import (
+    NO_DEGRADATION,
+    Degradation,
+    DegradationPolicy,
+)
+from bge_reranker_v2_m3_api_server.models import RerankRequest
+from bge_reranker_v2_m3_api_server.scheduler import FairScheduler
+from bge_reranker_v2_m3_api_server.service import RerankerService, ScoringStats
+
+
+def _policy(**kwargs):
+    return DegradationPolicy(
+        latency_slo_ms=100,
+        min_samples=5,
+        evaluate_interval=0,
+        **kwargs,
+    )
+
+
+class TestDegradationPolicy:
+    """Test when modes switch on and off."""
+
+    def test_no_degradation_within_slo(self):
+        """Test requests within the SLO are not degraded."""
+        policy = _policy()
+        for _ in range(10):
+            policy.record(0.01, 0.05)
+
+        assert policy.decide() == NO_DEGRADATION
+        assert not policy.decide()
+
+    def test_modes_follow_pressure_with_hysteresis(self):
+        """Test modes switch on at their threshold and off well below it."""
+        policy = _policy(max_length=128, max_documents=10)
+        for _ in range(10):
+            policy.record(0.01, 0.16)  # pressure 1.6
+
+        degradation = policy.decide()
+        assert degradation.labels() == ["max_length=128", "max_documents=10"]
+
+        policy._samples.clear()
+        for _ in range(10):
+            policy.record(0.01, 0.10)  # pressure 1.0
+        assert policy.decide().labels() == ["max_length=128"]
+
+        policy._samples.clear()
+        for _ in range(10):
+            policy.record(0.01, 0.07)  # pressure 0.7
+        assert policy.decide() == NO_DEGRADATION
+
+    def test_queue_wait_counts_against_its_own_slo(self):
+        """Test a long queue triggers degradation before latency does."""
+        policy = _policy(thresholds={"cache_only": 1.0})
+        for _ in range(10):
+            policy.record(0.06, 0.08)  # queue wait above half the SLO
+
+        assert policy.decide() == Degradation(cache_only=True)
+
+    def test_too_few_samples(self):
+        """Test a handful of slow requests does not trigger degradation."""
+        policy = _policy()
+        policy.record(1.0, 1.0)
+
+        assert policy.pressure() == 0.0
+
+    def test_unknown_mode(self):
+        """Test unknown mode names are rejected."""
+        with pytest.raises(ValueError, match="Unknown degradation modes"):
+            _policy(thresholds={"skip_model": 1.0})
+
+
+class TestDegradedScoring:
+    """Test the service side of degraded requests."""
+
+    def _service(self):
+        service = RerankerService(score_cache_size=100)
+        service._reranker = Mock()
+        service._reranker.compute_score.side_effect = lambda pairs, **_kwargs: [
+            float(len(doc)) for _, doc in pairs
+        ]
+        service._model_loaded = True
+        return service
+
+    def test_max_length_is_passed_and_not_cached(self):
+        """Test degraded scores use max_length and stay out of the cache."""
+        service = self._service()
+
+        service.compute_pair_scores([("q", "abc")], max_length=128)
+
+        _, kwargs = service._reranker.compute_score.call_args
+        assert kwargs["max_length"] == 128
+        assert len(service.score_cache) == 0
+
+    def test_cache_only_skips_the_model(self):
+        """Test cache-only scoring uses cached scores and NaN for the rest."""
+        service = self._service()
+        service.compute_pair_scores([("q", "cached")])
+        service._reranker.compute_score.reset_mock()
+        stats = ScoringStats()
+
+        scores = service.compute_pair_scores(
+            [("q", "cached"), ("q", "new")], cache_only=True, stats=stats
+        )
+
+        assert scores[0] == 6.0
+        assert np.isnan(scores[1])
+        assert not service._reranker.compute_score.called
+        assert (stats.cache_hits, stats.unscored) == (1, 1)
+
+    def test_unscored_documents_are_left_out_of_rankings(self):
+        """Test uncached documents never rank above scored ones."""
+        service = self._service()
+        service.compute_pair_scores([("q", "cached")], normalize=False)
+
+        results, _ = service.rerank(
+            "q", ["new", "cached", "other"], normalize=False, cache_only=True
+        )
+        assert [index for index, _, _ in results] == [1]
+
+        request_stats = [ScoringStats(), ScoringStats()]
+        ranked, _ = service.rerank_many(
+            [("q", ["new", "cached"], None), ("q", ["cached"], None)],
+            normalize=False,
+            cache_only=True,
+            request_stats=request_stats,
+        )
+        assert [len(results) for results in ranked] == [1, 1]
+        assert [stats.unscored for stats in request_stats] == [1, 0]
+
+    def test_dropped_documents_still_count_as_input(self):
+        """Test max_documents keeps the caller's total and reports the rest."""
+        request = RerankRequest(query="q", documents=["a", "b", "c", "d"])
+        degradation = Degradation(max_documents=2)
+
+        degraded, dropped = _degrade(request, degradation)
+        response = _build_response(
+            degraded, [(0, 0.9, "a")], 1.0, ScoringStats(), dropped
+        )
+
+        assert (len(degraded.documents), dropped) == (2, 2)
+        assert response.total_documents == 4
+        assert _unscored_documents(degradation, dropped, ScoringStats()) == 2
+        assert _unscored_documents(NO_DEGRADATION, 0, ScoringStats()) is None
+        stats = ScoringStats(unscored=1)
+        both = Degradation(max_documents=2, cache_only=True)
+        assert _unscored_documents(both, dropped, stats) == 3
+
+
+class TestSchedulerObserver:
+    """Test the scheduler reports finished jobs to the policy."""
+
+    async def test_observer_receives_wait_and_latency(self):
+        """Test each finished job is observed once."""
+        observed = []
+        scheduler = FairScheduler(
+            observer=lambda wait, latency: observed.append((wait, latency))
+        )
+        await scheduler.start()
+        try:
+            await scheduler.submit(lambda: None)
+        finally:
+            await scheduler.stop()
+
+        ((wait, latency),) = observed
+        assert 0 <= wait <= latency
@@ -0,0 +1,111 @@
+"""Tests for the document store."""
+
+import json
+
+import pytest
+
+from bge_reranker_v2_m3_api_server.docstore import DocumentStore, UnknownDocumentError
+from bge_reranker_v2_m3_api_server.models import RerankRequest
+
+
+class _WordTokenizer:
+    """Tokenizer stand-in with one token per whitespace-separated word."""
+
+    def __call__(self, texts, max_length, **_kwargs):
+        offsets = []
+        for text in texts:
+            spans, start = [], 0
+            for word in text.split():
+                start = text.index(word, start)
+                spans.append((start, start + len(word)))
+                start += len(word)
+            offsets.append(spans[:max_length])
+        return {"offset_mapping": offsets}
+
+
+class TestDocumentStore:
+    """Test uploads, eviction and the memory-mapped corpus."""
+
+    def test_put_and_get(self):
+        """Test uploaded documents are returned in request order."""
+        store = DocumentStore()
+        store.put_many([("a", "alpha"), ("b", "beta")])
+
+        assert store.get_many(["b", "a", "b"]) == ["beta", "alpha", "beta"]
+
+    def test_namespaces_are_separate(self):
+        """Test tenants only see their own uploads."""
+        store = DocumentStore()
+        store.put_many([("a", "tenant one")], namespace="one")
+
+        assert store.get_many(["a"], namespace="one") == ["tenant one"]
+        with pytest.raises(UnknownDocumentError) as error:
+            store.get_many(["a", "b"], namespace="two")
+        assert error.value.ids == ["a", "b"]
+
+    def test_lru_eviction_by_count_and_bytes(self):
+        """Test the least recently used documents are evicted first."""
+        store = DocumentStore(max_documents=2, max_bytes=10)
+        store.put_many([("a", "aaa"), ("b", "bbb")])
+        store.get_many(["a"])
+        store.put_many([("c", "ccc")])
+
+        assert store.get_many(["a", "c"]) == ["aaa", "ccc"]
+        with pytest.raises(UnknownDocumentError):
+            store.get_many(["b"])
+
+        store.put_many([("d", "dddddddd")])
+        assert store.stats()["uploaded_bytes"] <= 10
+
+    def test_pre_tokenization_truncates_long_documents(self):
+        """Test text beyond max_length tokens is dropped on upload."""
+        store = DocumentStore(tokenizer=_WordTokenizer(), max_length=3)
+        store.put_many([("long", "one two three four five"), ("short", "one two")])
+
+        assert store.get_many(["long", "short"]) == ["one two three", "one two"]
+
+    def test_delete(self):
+        """Test deleted documents are gone and counted."""
+        store = DocumentStore()
+        store.put_many([("a", "alpha")])
+
+        assert store.delete(["a", "missing"]) == 1
+        assert store.stats()["uploaded_bytes"] == 0
+
+    def test_corpus_is_memory_mapped(self, tmp_path):
+        """Test corpus documents are indexed and visible to every namespace."""
+        corpus = tmp_path / "corpus.jsonl"
+        lines = [{"id": 1, "text": "first"}, {"id": "two", "text": "第二"}]
+        corpus.write_text(
+            "\n".join(json.dumps(line, ensure_ascii=False) for line in lines) + "\n",
+            encoding="utf-8",
+        )
+        store = DocumentStore()
+
+        assert store.load_corpus(corpus) == 2
+        assert store.get_many(["two", "1"], namespace="any") == ["第二", "first"]
+        assert store.stats()["corpus_mapped_bytes"] == corpus.stat().st_size
+        store.close()
+
+    def test_invalid_corpus(self, tmp_path):
+        """Test corpus lines without the text field are rejected."""
+        corpus = tmp_path / "corpus.jsonl"
+        corpus.write_text('{"id": 1, "body": "x"}\n')
+
+        with pytest.raises(ValueError, match="without"):
+            DocumentStore().load_corpus(corpus)
+
+
+class TestDocumentIdRequests:
+    """Test rerank requests referencing stored documents."""
+
+    def test_ids_instead_of_documents(self):
+        """Test requests may send document IDs only."""
+        request = RerankRequest(query="q", document_ids=["a", "b"])
+
+        assert request.documents == []
+
+    def test_ids_and_documents_are_exclusive(self):
+        """Test requests cannot mix texts and IDs."""
+        with pytest.raises(ValueError, match="either documents or document_ids"):
+            RerankRequest(query="q", documents=["x"], document_ids=["a"])
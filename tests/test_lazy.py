@@ -0,0 +1,119 @@
+"""Tests for lazy imports and the import-time benchmark."""
+
+import json
+import subprocess
+import sys
+
+import pytest
+
+import bge_reranker_v2_m3_api_server
+from bge_reranker_v2_m3_api_server.benchmark import (
+    check_import_budget,
+    run_import_benchmark,
+)
+from bge_reranker_v2_m3_api_server.lazy import NOT_IMPORTED, resolve
+
+
+def _loaded_after(statement: str) -> set[str]:
+    """Return the modules a fresh interpreter has loaded after statement."""
+    code = f"import json, sys\n{statement}\nprint(json.dumps(list(sys.modules)))"
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    return set(json.loads(result.stdout))
+
+
+class TestLazyPackage:
+    """Test the package and entry points import without heavy dependencies."""
+
+    @pytest.mark.parametrize(
+        "statement",
+        [
+            "import bge_reranker_v2_m3_api_server",
+            "import bge_reranker_v2_m3_api_server.cli",
+            "import bge_reranker_v2_m3_api_server.scripts",
+        ],
+    )
+    def test_entry_points_stay_light(self, statement):
+        """Test importing entry points loads neither the service nor numpy."""
+        loaded = _loaded_after(statement)
+
+        assert "bge_reranker_v2_m3_api_server.service" not in loaded
+        assert not loaded & {"numpy", "httpx", "pydantic", "uvicorn", "torch"}
+
+    def test_service_does_not_import_flag_embedding(self):
+        """Test FlagEmbedding is left to load_model."""
+        loaded = _loaded_after("import bge_reranker_v2_m3_api_server.service")
+
+        assert not loaded & {"FlagEmbedding", "torch", "transformers"}
+
+    def test_exports_resolve_on_access(self):
+        """Test public names are importable from the package."""
+        from bge_reranker_v2_m3_api_server import Reranker, RerankerService
+        from bge_reranker_v2_m3_api_server.library import Reranker as LibraryReranker
+
+        assert Reranker is LibraryReranker
+        assert RerankerService.__name__ == "RerankerService"
+        assert set(bge_reranker_v2_m3_api_server.__all__) <= set(
+            dir(bge_reranker_v2_m3_api_server)
+        )
+        with pytest.raises(AttributeError, match="no attribute 'missing'"):
+            _ = bge_reranker_v2_m3_api_server.missing
+
+
+class TestResolve:
+    """Test resolving deferred imports."""
+
+    def test_imports_and_caches(self):
+        """Test the placeholder is replaced by the imported object."""
+        namespace = {"dumps": NOT_IMPORTED}
+
+        assert resolve(namespace, "dumps", "json") is json.dumps
+        assert namespace["dumps"] is json.dumps
+
+    def test_missing_module(self):
+        """Test an uninstalled module resolves to None."""
+        namespace = {"Thing": NOT_IMPORTED}
+
+        assert resolve(namespace, "Thing", "no_such_module_for_tests") is None
+
+    def test_patched_value_is_kept(self):
+        """Test a value patched over the placeholder is returned as is."""
+        sentinel = object()
+
+        assert resolve({"Thing": sentinel}, "Thing", "json") is sentinel
+
+
+class TestImportBenchmark:
+    """Test the import-time benchmark and its regression check."""
+
+    def test_measures_fresh_imports(self):
+        """Test each module is timed in a new interpreter."""
+        report = run_import_benchmark(("json", "no_such_module_for_tests"), repeats=2)
+
+        assert report[0]["module"] == "json"
+        assert report[0]["median_ms"] >= 0
+        assert report[0]["heavy_modules"] == []
+        assert "ModuleNotFoundError" in report[1]["error"]
+
+    def test_budget(self):
+        """Test slow, failing and heavy imports are reported."""
+        report = [
+            {"module": "fast", "median_ms": 5.0, "min_ms": 4.0, "heavy_modules": []},
+            {"module": "slow", "median_ms": 50.0, "min_ms": 40.0, "heavy_modules": []},
+            {
+                "module": "heavy",
+                "median_ms": 1.0,
+                "min_ms": 1.0,
+                "heavy_modules": ["torch"],
+            },
+            {"module": "broken", "error": "ImportError: boom"},
+        ]
+
+        assert check_import_budget(report[:1], max_ms=10) == []
+        assert check_import_budget(report, max_ms=10) == [
+            "slow takes 50.0 ms (budget 10 ms)",
+            "heavy imports torch",
+            "broken: ImportError: boom",
+        ]
+        assert len(check_import_budget(report)) == 2
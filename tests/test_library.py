@@ -0,0 +1,134 @@
+"""Tests for the in-process library facade."""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock
+
+import pytest
+
+from bge_reranker_v2_m3_api_server import Reranker
+from bge_reranker_v2_m3_api_server.service import RerankerService
+
+
+def _service(gate: threading.Event | None = None) -> RerankerService:
+    """Build a loaded service scoring documents by their length."""
+
+    def compute_score(pairs, normalize=True, **_kwargs):
+        if gate is not None:
+            gate.wait(5)
+        return [float(len(doc)) if normalize else -float(len(doc)) for _, doc in pairs]
+
+    service = RerankerService(dedup_mode="off", single_flight=False)
+    service._reranker = Mock()
+    service._reranker.compute_score.side_effect = compute_score
+    service._model_loaded = True
+    return service
+
+
+class TestReranker:
+    """Test the Reranker facade."""
+
+    def test_rerank(self):
+        """Test a blocking call returns the server's response model."""
+        with Reranker(service=_service()) as reranker:
+            response = reranker.rerank("q", ["aa", "a", "aaa"], top_k=2)
+
+        assert [item.index for item in response.results] == [2, 0]
+        assert response.results[0].document == "aaa"
+        assert response.total_documents == 3
+        assert response.returned_results == 2
+        assert response.unique_documents == 3
+
+    def test_return_documents(self):
+        """Test document texts can be left out."""
+        with Reranker(service=_service()) as reranker:
+            response = reranker.rerank("q", ["a"], return_documents=False)
+        assert response.results[0].document == ""
+
+    def test_loads_unloaded_service(self):
+        """Test the facade loads a service that is not loaded yet."""
+        service = Mock(spec=RerankerService)
+        service.is_model_loaded.return_value = False
+
+        reranker = Reranker(service=service)
+        reranker.close()
+
+        service.load_model.assert_called_once()
+        service.unload.assert_called_once()
+
+    def test_queued_calls_share_a_batch(self):
+        """Test calls queued while the model is busy run in one pass."""
+        gate = threading.Event()
+        service = _service(gate)
+        compute_score = service._reranker.compute_score
+        with Reranker(service=service) as reranker, ThreadPoolExecutor(4) as pool:
+            first = pool.submit(reranker.rerank, "q", ["a"])
+            while compute_score.call_count == 0:
+                time.sleep(0.001)
+            rest = [
+                pool.submit(reranker.rerank, f"q{i}", ["bb", "b"]) for i in range(3)
+            ]
+            while reranker._queue.qsize() < 3:
+                time.sleep(0.001)
+            gate.set()
+
+            assert first.result().results[0].score == 1.0
+            for future in rest:
+                assert [item.index for item in future.result().results] == [0, 1]
+
+        # One call for the first request, one shared by the other three
+        assert compute_score.call_count == 2
+        assert len(compute_score.call_args.args[0]) == 6
+
+    def test_normalize_settings_are_scored_separately(self):
+        """Test calls with different normalize settings do not share a pass."""
+        gate = threading.Event()
+        service = _service(gate)
+        with Reranker(service=service) as reranker, ThreadPoolExecutor(3) as pool:
+            blocker = pool.submit(reranker.rerank, "q", ["a"])
+            while service._reranker.compute_score.call_count == 0:
+                time.sleep(0.001)
+            normalized = pool.submit(reranker.rerank, "q", ["bb"])
+            raw = pool.submit(reranker.rerank, "q", ["bb"], normalize=False)
+            while reranker._queue.qsize() < 2:
+                time.sleep(0.001)
+            gate.set()
+
+            blocker.result()
+            assert normalized.result().results[0].score == 2.0
+            assert raw.result().results[0].score == -2.0
+
+    def test_arerank(self):
+        """Test concurrent awaitable calls."""
+
+        async def main():
+            async with Reranker(service=_service()) as reranker:
+                return await asyncio.gather(
+                    *(reranker.arerank("q", ["a" * i, "aa"]) for i in range(1, 6))
+                )
+
+        responses = asyncio.run(main())
+
+        assert [r.results[0].score for r in responses] == [2.0, 2.0, 3.0, 4.0, 5.0]
+
+    def test_errors_reach_callers(self):
+        """Test scoring errors are raised in the calling thread."""
+        service = _service()
+        service._reranker.compute_score.side_effect = RuntimeError("model failed")
+        with Reranker(service=service) as reranker:
+            with pytest.raises(RuntimeError, match="model failed"):
+                reranker.rerank("q", ["a"])
+            # The engine keeps serving after an error
+            service._reranker.compute_score.side_effect = None
+            service._reranker.compute_score.return_value = [0.5]
+            assert reranker.rerank("q", ["a"]).results[0].score == 0.5
+
+    def test_closed(self):
+        """Test calls after close are rejected."""
+        reranker = Reranker(service=_service())
+        reranker.close()
+        reranker.close()
+        with pytest.raises(RuntimeError, match="closed"):
+            reranker.rerank("q", ["a"])
@@ -0,0 +1,112 @@
+"""Tests for process memory measurements."""
+
+import tracemalloc
+
+from bge_reranker_v2_m3_api_server.memory import (
+    MemoryTracker,
+    memory_limit_bytes,
+    process_rss_bytes,
+    start_tracemalloc,
+    tracemalloc_snapshot,
+    tracemalloc_top,
+)
+from bge_reranker_v2_m3_api_server.metrics import metrics
+
+
+class TestMemory:
+    """Test RSS and container limit readers."""
+
+    def test_rss_is_positive(self):
+        """Test the RSS of the test process can be read."""
+        assert process_rss_bytes() > 0
+
+    def test_memory_limit(self, tmp_path):
+        """Test cgroup v2 and v1 limit files."""
+        v2 = tmp_path / "memory.max"
+        v1 = tmp_path / "memory.limit_in_bytes"
+
+        assert memory_limit_bytes(v2, v1) is None
+
+        v1.write_text("9223372036854771712\n")
+        assert memory_limit_bytes(v2, v1) is None
+
+        v1.write_text("4294967296\n")
+        assert memory_limit_bytes(v2, v1) == 4294967296
+
+        v2.write_text("max\n")
+        assert memory_limit_bytes(v2, v1) is None
+
+
+class TestMemoryTracker:
+    """Test batch and request accounting."""
+
+    def test_batch_peaks_keep_maximum_per_shape(self):
+        """Test peaks are grouped by batch size and padded length bucket."""
+        metrics.reset()
+        tracker = MemoryTracker(max_shapes=2, measure_batches=True)
+
+        for tokens in (100, 120, 300):
+            with tracker.measure_batch(8, tokens):
+                pass
+
+        peaks = tracker.report()["batch_peaks"]
+        assert [(peak["batch_size"], peak["tokens"]) for peak in peaks] == [
+            (8, 128),
+            (8, 512),
+        ]
+        assert {peak["source"] for peak in peaks} == {"rss_delta"}
+
+        with tracker.measure_batch(1, 10):
+            pass
+        assert len(tracker.report()["batch_peaks"]) == 2
+        # One gauge series per remembered shape
+        gauges = metrics.snapshot()["gauges"]["batch_activation_peak_bytes"]
+        assert len(gauges) == 2
+
+    def test_batches_are_not_measured_by_default(self):
+        """Test forward passes are only measured when asked for."""
+        tracker = MemoryTracker()
+        with tracker.measure_batch(8, 100):
+            pass
+
+        report = tracker.report()
+        assert report["measure_batches"] is False
+        assert report["batch_peaks"] == []
+
+    def test_in_flight_requests(self):
+        """Test in-flight payload sizes and the largest request seen."""
+        tracker = MemoryTracker()
+
+        with tracker.track_request(100), tracker.track_request(300):
+            requests = tracker.report()["requests"]
+            assert requests["in_flight"] == 2
+            assert requests["in_flight_bytes"] == 400
+            assert requests["largest_in_flight_bytes"] == 300
+
+        requests = tracker.report()["requests"]
+        assert requests["in_flight"] == 0
+        assert requests["largest_seen_bytes"] == 300
+
+
+class TestTracemalloc:
+    """Test allocation snapshots."""
+
+    def test_snapshot_round_trip(self, tmp_path):
+        """Test snapshots are only available while tracing and can be loaded."""
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        assert tracemalloc_snapshot() is None
+        assert tracemalloc_top() is None
+
+        start_tracemalloc(1)
+        try:
+            data = [bytearray(1024) for _ in range(10)]
+            assert tracemalloc_top(5)
+            snapshot = tracemalloc_snapshot()
+        finally:
+            tracemalloc.stop()
+
+        path = tmp_path / "snapshot"
+        path.write_bytes(snapshot)
+        assert tracemalloc.Snapshot.load(str(path)).traces
+        assert data
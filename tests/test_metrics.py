@@ -0,0 +1,23 @@
+"""Tests for the metrics registry."""
+
+from bge_reranker_v2_m3_api_server.metrics import MetricsRegistry
+
+
+class TestMetricsRegistry:
+    """Test MetricsRegistry."""
+
+    def test_prometheus_rendering(self):
+        """Test counters, gauges and summaries are rendered with labels."""
+        registry = MetricsRegistry()
+        registry.inc("pairs_total", 3)
+        registry.set_gauge("queue_depth", 2, tenant='a"b')
+        registry.observe("dedup_ratio", 0.5)
+        registry.observe("dedup_ratio", 0.25)
+
+        text = registry.render_prometheus()
+
+        assert "bge_reranker_pairs_total 3.0" in text
+        assert 'bge_reranker_queue_depth{tenant="a\\"b"} 2' in text
+        assert "bge_reranker_dedup_ratio_count 2" in text
+        assert "bge_reranker_dedup_ratio_sum 0.75" in text
+        assert "bge_reranker_dedup_ratio_max 0.5" in text
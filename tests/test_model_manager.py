@@ -0,0 +1,130 @@
+"""Tests for model hot-swap and shadow scoring."""
+
+from unittest.mock import Mock
+
+import pytest
+
+from bge_reranker_v2_m3_api_server.model_manager import (
+    ModelManager,
+    ReloadInProgressError,
+    compare_rankings,
+)
+from bge_reranker_v2_m3_api_server.service import RerankerService
+
+
+def _service(model_name, scores=None):
+    """Create a service whose model returns fixed scores per document."""
+    service = RerankerService(model_name=model_name)
+    service._reranker = Mock()
+    service._reranker.compute_score.side_effect = lambda pairs, **_kwargs: [
+        (scores or {}).get(document, 0.0) for _, document in pairs
+    ]
+    service._model_loaded = True
+    return service
+
+
+def _factory(created, scores=None):
+    def build(model_name, **_kwargs):
+        service = _service(model_name, scores)
+        service.load_model = Mock()
+        created.append(service)
+        return service
+
+    return build
+
+
+class TestCompareRankings:
+    """Test ranking agreement measures."""
+
+    def test_identical_rankings(self):
+        """Test identical rankings agree fully."""
+        assert compare_rankings([2, 0, 1], [2, 0, 1]) == {
+            "top1_agreement": 1.0,
+            "overlap_at_k": 1.0,
+            "spearman": 1.0,
+        }
+
+    def test_reversed_rankings(self):
+        """Test reversed rankings have a rank correlation of -1."""
+        comparison = compare_rankings([0, 1, 2, 3], [3, 2, 1, 0], k=2)
+
+        assert comparison["top1_agreement"] == 0.0
+        assert comparison["overlap_at_k"] == 0.0
+        assert comparison["spearman"] == pytest.approx(-1.0)
+
+
+class TestModelManager:
+    """Test reloads and shadow scoring."""
+
+    def test_reload_switches_service(self):
+        """Test a reload swaps in a warmed-up service and frees the old one."""
+        created = []
+        old = _service("old")
+        manager = ModelManager(old, _factory(created), warmup_pairs=2)
+
+        manager.reload("new")
+
+        (new,) = created
+        assert manager.active is new
+        assert manager.generation == 2
+        assert new._reranker.compute_score.called
+        assert not old.is_model_loaded()
+        assert manager.status()["model_name"] == "new"
+
+    def test_reload_calls_on_switch(self):
+        """Test the switch callback receives each reloaded service."""
+        switched = []
+        manager = ModelManager(
+            _service("old"),
+            _factory([]),
+            warmup_pairs=0,
+            on_switch=switched.append,
+        )
+
+        manager.reload("new")
+        manager.reload("newer")
+
+        assert [service.model_name for service in switched] == ["new", "newer"]
+
+    def test_reload_frees_old_service_with_last_lease(self):
+        """Test a leased old service is freed by its last lease, not a timeout."""
+        old = _service("old")
+        manager = ModelManager(old, _factory([]), warmup_pairs=0)
+
+        with manager.lease() as (first, _), manager.lease() as (second, generation):
+            manager.reload()
+            assert first is second is old
+            assert old.is_model_loaded()
+            assert manager.status()["retired_models"] == 1
+            # A lease keeps the generation of the service it holds
+            assert generation == 1
+            with manager.lease() as (service, generation):
+                assert service is manager.active
+                assert generation == manager.generation == 2
+        # Released together with the second lease, after the first one
+        assert not old.is_model_loaded()
+        assert manager.status()["retired_models"] == 0
+
+    def test_concurrent_reload_is_rejected(self):
+        """Test a second reload fails while one is running."""
+        manager = ModelManager(_service("old"), _factory([]), warmup_pairs=0)
+
+        with manager._reload_lock, pytest.raises(ReloadInProgressError):
+            manager.reload()
+
+    def test_shadow_scoring_records_agreement(self):
+        """Test shadowed requests are compared with the active model."""
+        scores = {"a": 1.0, "b": 2.0, "c": 3.0}
+        manager = ModelManager(
+            _service("old", scores), _factory([], scores), warmup_pairs=0
+        )
+        manager.start_shadow("candidate", fraction=1.0)
+
+        manager.rerank("q", ["a", "b", "c"])
+        manager.stop_shadow()  # waits for the pending comparison
+
+        status = manager.status()
+        assert status["shadow"] is None
+        assert manager._shadow_stats["requests"] == 1
+        assert manager._shadow_stats["top1_agreement"] == 1.0
+        assert manager._shadow_stats["spearman"] == 1.0
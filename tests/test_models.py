@@ -3,6 +3,7 @@
 import pytest
 from pydantic import ValidationError
 
+from bge_reranker_v2_m3_api_server.compression import input_limits
 from bge_reranker_v2_m3_api_server.models import (
     HealthResponse,
     RerankRequest,
@@ -62,6 +63,25 @@ class TestRerankRequest:
         with pytest.raises(ValidationError):
             RerankRequest(query="test", documents=["doc1"], top_k=0)
 
+    def test_oversized_document_fails(self, monkeypatch):
+        """Test documents above the character cap are rejected."""
+        monkeypatch.setattr(input_limits, "max_document_chars", 10)
+        with pytest.raises(ValidationError, match="Document 1 has 11 characters"):
+            RerankRequest(query="q", documents=["short", "x" * 11])
+
+    def test_oversized_request_fails(self, monkeypatch):
+        """Test requests above the total character cap are rejected."""
+        monkeypatch.setattr(input_limits, "max_request_chars", 10)
+        with pytest.raises(ValidationError, match="Request has 13 characters"):
+            RerankRequest(query="q", documents=["x" * 6, "y" * 6])
+
+    def test_document_byte_cap(self, monkeypatch):
+        """Test the byte cap counts UTF-8 bytes, not characters."""
+        monkeypatch.setattr(input_limits, "max_document_bytes", 8)
+        RerankRequest(query="q", documents=["abcdefgh"])
+        with pytest.raises(ValidationError, match="exceeds 8 bytes"):
+            RerankRequest(query="q", documents=["重排序文档"])
+
 
 class TestRerankResponse:
     """Test RerankResponse model."""
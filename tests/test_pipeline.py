@@ -0,0 +1,232 @@
+"""Tests for pipelined tokenization."""
+
+import sys
+import threading
+from unittest.mock import Mock, patch
+
+import pytest
+
+from bge_reranker_v2_m3_api_server.batching import AdaptiveBatchController
+from bge_reranker_v2_m3_api_server.pipeline import PipelinedForward
+from bge_reranker_v2_m3_api_server.service import RerankerService
+
+
+class FakePipeline(PipelinedForward):
+    """Pipeline whose tokenizer and model are plain Python."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.lock = threading.Lock()
+        self.tokenized: list[int] = []
+        self.forwarded: list[int] = []
+        self.max_ahead = 0
+
+    def _tokenize(self, pairs, max_length):
+        with self.lock:
+            self.tokenized.append(len(pairs))
+            self.max_ahead = max(
+                self.max_ahead, len(self.tokenized) - len(self.forwarded)
+            )
+        return [float(len(doc[:max_length])) for _, doc in pairs]
+
+    def _forward(self, features, normalize):
+        with self.lock:
+            self.forwarded.append(len(features))
+        return [-score if normalize else score for score in features]
+
+
+def _loaded(pipeline: PipelinedForward) -> PipelinedForward:
+    model = Mock()
+    model.parameters.return_value = iter([Mock(device="cpu")])
+    with patch.dict(sys.modules, {"torch": Mock()}):
+        assert pipeline.load(model, Mock(is_fast=True), max_length=8)
+    return pipeline
+
+
+class TestPipelinedForward:
+    """Test batch scheduling of the pipeline."""
+
+    def test_invalid_settings(self):
+        """Test non-positive sizes are rejected."""
+        with pytest.raises(ValueError, match="at least 1"):
+            PipelinedForward(depth=0)
+
+    def test_load_needs_torch_and_fast_tokenizer(self):
+        """Test the pipeline stays off without torch or a fast tokenizer."""
+        pipeline = PipelinedForward()
+        with patch.dict(sys.modules, {"torch": None}):
+            assert not pipeline.load(Mock(), Mock(is_fast=True), 512)
+        with patch.dict(sys.modules, {"torch": Mock()}):
+            assert not pipeline.load(Mock(), Mock(is_fast=False), 512)
+        assert not pipeline.ready
+        with pytest.raises(RuntimeError, match="not loaded"):
+            pipeline([("q", "d")], normalize=True)
+
+    def test_scores_in_pair_order(self):
+        """Test scores of all batches land at their pair's index."""
+        pipeline = _loaded(FakePipeline(batch_size=2))
+        pairs = [("q", "a" * n) for n in range(1, 6)]
+
+        assert pipeline(pairs, normalize=False).tolist() == [1.0, 2.0, 3.0, 4.0, 5.0]
+        assert pipeline.tokenized == [2, 2, 1]
+        assert pipeline(pairs, normalize=True, max_length=2)[-1] == -2.0
+        pipeline.unload()
+
+    def test_explicit_batches(self):
+        """Test a batch plan of arbitrary pair indices is followed."""
+        pipeline = _loaded(FakePipeline())
+        pairs = [("q", "a" * n) for n in range(1, 5)]
+
+        scores = pipeline(pairs, normalize=False, batches=[[3, 0], [2], [1]])
+
+        assert scores.tolist() == [1.0, 2.0, 3.0, 4.0]
+        assert pipeline.forwarded == [2, 1, 1]
+        pipeline.unload()
+
+    def test_tokenization_overlaps_forward(self):
+        """Test the next batch is tokenized while the model runs."""
+        next_tokenized = threading.Event()
+
+        class OverlapPipeline(FakePipeline):
+            def _tokenize(self, pairs, max_length):
+                if len(self.tokenized) == 1:
+                    next_tokenized.set()
+                return super()._tokenize(pairs, max_length)
+
+            def _forward(self, features, normalize):
+                if not self.forwarded:
+                    # Only returns True if batch 2 is tokenized meanwhile
+                    assert next_tokenized.wait(5)
+                return super()._forward(features, normalize)
+
+        pipeline = _loaded(OverlapPipeline(batch_size=1, depth=1))
+        scores = pipeline([("q", "a"), ("q", "bb")], normalize=False)
+        assert scores.tolist() == [1.0, 2.0]
+        pipeline.unload()
+
+    def test_bounded_lookahead(self):
+        """Test at most depth batches are tokenized ahead of the model."""
+        pipeline = _loaded(FakePipeline(batch_size=1, workers=4, depth=2))
+        pipeline([("q", "a")] * 20, normalize=False)
+
+        assert pipeline.max_ahead <= 3
+        pipeline.unload()
+
+    def test_each_thread_has_its_own_tokenizer(self):
+        """Test tokenizer threads encode with copies, not the shared object."""
+        tokenizer = Mock(is_fast=True)
+        copies = []
+
+        def deepcopy(_tokenizer):
+            copy = Mock(return_value={})
+            copies.append(copy)
+            return copy
+
+        pipeline = PipelinedForward(batch_size=1, workers=2)
+        model = Mock()
+        model.parameters.return_value = iter([Mock(device="cpu")])
+        pipeline._forward = Mock(return_value=[0.0])
+        with (
+            patch.dict(sys.modules, {"torch": Mock()}),
+            patch("copy.deepcopy", side_effect=deepcopy),
+        ):
+            assert pipeline.load(model, tokenizer, max_length=8)
+            pipeline([("q", "a")] * 6, normalize=False)
+        pipeline.unload()
+
+        tokenizer.assert_not_called()
+        assert 1 <= len(copies) <= 2
+        assert sum(copy.call_count for copy in copies) == 6
+
+    def test_forward_error_propagates(self):
+        """Test a failing forward pass raises and stops tokenizing."""
+
+        class FailingPipeline(FakePipeline):
+            def _forward(self, *_args):
+                raise RuntimeError("forward failed")
+
+        pipeline = _loaded(FailingPipeline(batch_size=1, depth=2))
+        with pytest.raises(RuntimeError, match="forward failed"):
+            pipeline([("q", "a")] * 10, normalize=False)
+        assert len(pipeline.tokenized) <= 3
+        pipeline.unload()
+
+
+class TestServicePipeline:
+    """Test RerankerService use of the pipeline."""
+
+    def _service(self, pipeline, **kwargs) -> RerankerService:
+        service = RerankerService(dedup_mode="off", pipeline=pipeline, **kwargs)
+        service._reranker = Mock(max_length=8)
+        service._reranker.compute_score.side_effect = lambda pairs, **_kwargs: (
+            [0.5] * len(pairs)
+        )
+        service._model_loaded = True
+        return service
+
+    def test_pipeline_replaces_compute_score(self):
+        """Test a ready pipeline scores model pairs."""
+        service = self._service(_loaded(FakePipeline(batch_size=2)))
+
+        assert service.compute_pair_scores([("q", "a"), ("q", "bb")], False) == [
+            1.0,
+            2.0,
+        ]
+        service._reranker.compute_score.assert_not_called()
+
+    def test_batch_controller_plans_batches(self):
+        """Test the adaptive batch controller sizes pipeline batches."""
+        controller = AdaptiveBatchController(max_batch_size=3)
+        pipeline = _loaded(FakePipeline(batch_size=100))
+        service = self._service(pipeline, batch_controller=controller)
+
+        service.compute_pair_scores([("q", "a")] * 7, normalize=False)
+
+        assert max(pipeline.forwarded) <= 3
+        assert sum(pipeline.forwarded) == 7
+
+    def test_compiled_forward_takes_precedence(self):
+        """Test a ready compiled forward pass is used instead."""
+        pipeline = _loaded(FakePipeline())
+        compiled = Mock(ready=True, return_value=[0.9])
+        service = self._service(pipeline, compiled_forward=compiled)
+
+        assert service.compute_pair_scores([("q", "a")]) == [0.9]
+        assert pipeline.forwarded == []
+
+    def test_failure_falls_back_to_compute_score(self):
+        """Test failures fall back per call and repeated ones disable it."""
+
+        class FailingPipeline(FakePipeline):
+            def _forward(self, *_args):
+                raise RuntimeError("bad batch")
+
+        pipeline = _loaded(FailingPipeline())
+        service = self._service(pipeline)
+
+        assert service.compute_pair_scores([("q", "a")]) == [0.5]
+        assert pipeline.ready
+        service.compute_pair_scores([("q", "b")])
+        service.compute_pair_scores([("q", "c")])
+        assert not pipeline.ready
+
+    def test_transient_failure_keeps_pipeline(self):
+        """Test a success resets the count of consecutive failures."""
+
+        class FlakyPipeline(FakePipeline):
+            fail = True
+
+            def _forward(self, features, normalize):
+                if self.fail:
+                    raise RuntimeError("Already borrowed")
+                return super()._forward(features, normalize)
+
+        pipeline = _loaded(FlakyPipeline())
+        service = self._service(pipeline)
+        for _ in range(5):
+            pipeline.fail = True
+            assert service.compute_pair_scores([("q", "a")]) == [0.5]
+            pipeline.fail = False
+            assert service.compute_pair_scores([("q", "bb")], False) == [2.0]
+
+        assert pipeline.ready
@@ -0,0 +1,83 @@
+"""Tests for array-based score post-processing."""
+
+from unittest.mock import Mock
+
+import numpy as np
+import pytest
+
+from bge_reranker_v2_m3_api_server.postprocess import (
+    rank_scores,
+    to_scores,
+    top_k_indices,
+)
+from bge_reranker_v2_m3_api_server.service import RerankerService
+
+
+class TestPostprocess:
+    """Test score conversion and ranking."""
+
+    def test_to_scores(self):
+        """Test lists, scalars and missing scores become float64 arrays."""
+        assert to_scores([0.5, None, np.float32(2.0)]).tolist() == [0.5, 0.0, 2.0]
+        assert to_scores(0.25).tolist() == [0.25]
+        assert to_scores([]).dtype == np.float64
+
+    @pytest.mark.parametrize("top_k", [None, 0, 1, 3, 7, 50, 100])
+    def test_top_k_matches_stable_sort(self, top_k):
+        """Test the top_k order equals a stable sort cut to top_k, ties included."""
+        rng = np.random.default_rng(0)
+        scores = rng.integers(0, 5, size=50).astype(np.float64)
+
+        expected = sorted(range(50), key=lambda i: -scores[i])
+        if top_k is not None:
+            expected = expected[:top_k]
+
+        assert top_k_indices(scores, top_k).tolist() == expected
+
+    def test_min_score(self):
+        """Test documents below min_score are dropped before top_k."""
+        scores = np.array([0.1, 0.9, 0.5, 0.7])
+
+        assert rank_scores(scores, min_score=0.5).tolist() == [1, 3, 2]
+        assert rank_scores(scores, top_k=2, min_score=0.5).tolist() == [1, 3]
+        assert rank_scores(scores, min_score=1.0).tolist() == []
+
+
+class TestRerankArrays:
+    """Test the array-returning service API."""
+
+    def _service(self, **kwargs) -> RerankerService:
+        service = RerankerService(dedup_mode="off", **kwargs)
+        service._reranker = Mock()
+        service._reranker.compute_score.side_effect = lambda pairs, **_kwargs: [
+            float(len(doc)) for _, doc in pairs
+        ]
+        service._model_loaded = True
+        return service
+
+    def test_rerank_arrays(self):
+        """Test indices and scores come back as arrays, best first."""
+        service = self._service()
+
+        indices, scores = service.rerank_arrays(
+            "q", ["aa", "a", "aaaa", "aaa"], top_k=3, min_score=2.0
+        )
+
+        assert isinstance(indices, np.ndarray)
+        assert indices.tolist() == [2, 3, 0]
+        assert scores.tolist() == [4.0, 3.0, 2.0]
+
+    def test_rerank_matches_arrays(self):
+        """Test rerank builds its tuples from the same ranking."""
+        service = self._service()
+        documents = ["bb", "a", "cc", "ddd"]
+
+        results, _ = service.rerank("q", documents, top_k=3)
+
+        assert results == [(3, 3.0, "ddd"), (0, 2.0, "bb"), (2, 2.0, "cc")]
+        assert all(type(score) is float for _, score, _ in results)
+
+    def test_not_loaded(self):
+        """Test the array API requires a loaded model."""
+        with pytest.raises(RuntimeError, match="not loaded"):
+            RerankerService().rerank_arrays("q", ["a"])
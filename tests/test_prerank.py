@@ -0,0 +1,87 @@
+"""Tests for embedding-based pre-ranking."""
+
+from unittest.mock import Mock
+
+import numpy as np
+import pytest
+
+from bge_reranker_v2_m3_api_server.prerank import EmbeddingPreranker, VectorCache
+from bge_reranker_v2_m3_api_server.service import RerankerService
+
+# Toy 2-d embedding: "x" words point along the first axis, "y" along the second
+_AXES = {"x": np.array([1.0, 0.0]), "y": np.array([0.0, 1.0])}
+
+
+def _encoder(calls):
+    def encode(texts):
+        calls.append(list(texts))
+        return np.stack([sum(_AXES[c] for c in text) + 1e-3 for text in texts])
+
+    return encode
+
+
+class TestEmbeddingPreranker:
+    """Test document selection and the vector cache."""
+
+    def test_selects_most_similar_documents(self):
+        """Test the top_n documents by cosine similarity are kept."""
+        preranker = EmbeddingPreranker(top_n=2, encoder=_encoder([]))
+
+        selected = preranker.select("x", ["y", "xx", "yyx", "x", "yy"])
+
+        assert selected == [1, 3]
+
+    def test_small_requests_are_not_preranked(self):
+        """Test requests with at most top_n documents are passed through."""
+        calls = []
+        preranker = EmbeddingPreranker(top_n=5, encoder=_encoder(calls))
+
+        assert preranker.select("x", ["x", "y"]) == [0, 1]
+        assert calls == []
+
+    def test_document_vectors_are_cached(self):
+        """Test repeated documents are embedded once."""
+        calls = []
+        preranker = EmbeddingPreranker(top_n=1, encoder=_encoder(calls))
+
+        preranker.select("x", ["x", "y"])
+        preranker.select("y", ["x", "y", "xy"])
+
+        # Queries share the cache, so "x" is embedded once as query and document
+        assert calls == [["x"], ["y"], ["xy"]]
+
+    def test_requires_loaded_model(self):
+        """Test embedding without a model fails clearly."""
+        with pytest.raises(RuntimeError, match="not loaded"):
+            EmbeddingPreranker().embed(["x"])
+
+    def test_vector_cache_evicts_least_recently_used(self):
+        """Test the cache keeps at most max_size vectors."""
+        cache = VectorCache(max_size=2)
+        keys = [VectorCache.key(text) for text in ("a", "b", "c")]
+        cache.put_many([(keys[0], np.zeros(2)), (keys[1], np.ones(2))])
+        cache.get_many([keys[0]])
+        cache.put_many([(keys[2], np.ones(2))])
+
+        assert [v is not None for v in cache.get_many(keys)] == [True, False, True]
+
+
+class TestServicePreranking:
+    """Test RerankerService with a pre-ranking stage."""
+
+    def test_only_selected_documents_are_cross_encoded(self):
+        """Test the cross-encoder sees only top_n documents and indices map back."""
+        service = RerankerService(
+            dedup_mode="off",
+            preranker=EmbeddingPreranker(top_n=2, encoder=_encoder([])),
+        )
+        service._reranker = Mock()
+        service._reranker.compute_score.return_value = [0.2, 0.8]
+        service._model_loaded = True
+
+        results, _ = service.rerank("x", ["y", "xx", "yy", "x"])
+
+        service._reranker.compute_score.assert_called_once_with(
+            [("x", "xx"), ("x", "x")], normalize=True
+        )
+        assert [(index, doc) for index, _, doc in results] == [(3, "x"), (1, "xx")]
@@ -0,0 +1,100 @@
+"""Tests for the stage timings and the sampling profiler."""
+
+import marshal
+import pstats
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+from bge_reranker_v2_m3_api_server.profiling import (
+    Profile,
+    ProfilerBusyError,
+    SamplingProfiler,
+    StageTimings,
+)
+from bge_reranker_v2_m3_api_server.tracing import Tracer
+
+
+def _busy_loop(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(1000))
+
+
+class TestStageTimings:
+    """Test per-request stage breakdowns."""
+
+    def test_collects_spans_of_profiled_request(self):
+        """Test stages are timed even without a configured exporter."""
+        tracer = Tracer()
+        timings = StageTimings()
+
+        with tracer.start_trace("POST /rerank", listener=timings):
+            for _ in range(2):
+                with tracer.span("rerank.inference"):
+                    time.sleep(0.001)
+            with tracer.span("rerank.sort"):
+                pass
+
+        stages = timings.timings()
+        assert list(stages) == ["rerank.inference", "rerank.sort", "POST /rerank"]
+        assert stages["rerank.inference"] >= 2
+        assert timings.server_timing(5.0).endswith("total;dur=5.0")
+
+    def test_unprofiled_request_records_nothing(self):
+        """Test spans are not created without a listener or exporter."""
+        tracer = Tracer()
+
+        with tracer.start_trace("POST /rerank") as span:
+            assert span is None
+
+
+class TestSamplingProfiler:
+    """Test stack sampling and rendering."""
+
+    @pytest.fixture
+    def profile(self):
+        stop = threading.Event()
+        thread = threading.Thread(target=_busy_loop, args=(stop,), name="busy")
+        thread.start()
+        try:
+            yield SamplingProfiler().run(0.1, interval=0.001)
+        finally:
+            stop.set()
+            thread.join()
+
+    def test_collapsed_stacks(self, profile):
+        """Test collapsed output names the thread and the sampled function."""
+        lines = profile.collapsed().splitlines()
+
+        busy = [line for line in lines if line.startswith("thread busy;")]
+        assert busy
+        assert any("_busy_loop (" in line for line in busy)
+        assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+
+    def test_pstats_output(self, profile, tmp_path):
+        """Test pstats output loads and attributes time to the sampled function."""
+        path = tmp_path / "profile.pstats"
+        path.write_bytes(profile.pstats())
+
+        stats = pstats.Stats(str(path))
+        names = {name for _, _, name in stats.stats}  # type: ignore[attr-defined]
+        assert "_busy_loop" in names
+        assert stats.total_tt > 0  # type: ignore[attr-defined]
+
+    def test_empty_profile(self):
+        """Test a profile without samples renders to empty outputs."""
+        profile = Profile(Counter(), interval=0.005)
+
+        assert profile.render("collapsed") == b""
+        assert marshal.loads(profile.render("pstats")) == {}
+        with pytest.raises(ValueError, match="Unknown profile format"):
+            profile.render("svg")
+
+    def test_one_capture_at_a_time(self):
+        """Test a second capture fails while one is running."""
+        profiler = SamplingProfiler()
+
+        with profiler._lock, pytest.raises(ProfilerBusyError):
+            profiler.run(0.01)
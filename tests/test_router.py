@@ -0,0 +1,284 @@
+"""Tests for the cache-affinity router."""
+
+import gzip
+import json
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from bge_reranker_v2_m3_api_server.metrics import metrics
+from bge_reranker_v2_m3_api_server.router import (
+    HashRing,
+    Router,
+    affinity_key,
+    create_app,
+)
+
+
+def _response(status_code: int, payload: dict | None = None) -> httpx.Response:
+    """Unread response, like the ones of a network transport."""
+
+    async def stream():
+        yield json.dumps(payload or {}).encode()
+
+    return httpx.Response(
+        status_code, content=stream(), headers={"content-type": "application/json"}
+    )
+
+
+class FakeBackends:
+    """Several API servers answering with their own host name."""
+
+    def __init__(self, hosts: list[str]):
+        self.hosts = hosts
+        self.down: set[str] = set()
+        self.status: dict[str, int] = {}
+        self.calls: list[tuple[str, str, str]] = []
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        if host in self.down:
+            raise httpx.ConnectError("connection refused", request=request)
+        if request.url.path == "/health":
+            return _response(200, {"status": "healthy"})
+        self.calls.append((host, request.method, request.url.path))
+        if host in self.status:
+            return _response(self.status[host])
+        if request.url.path == "/sessions":
+            return _response(200, {"session_id": f"session-{host}"})
+        return _response(200, {"backend": host})
+
+    def router(self, **kwargs) -> Router:
+        return Router(
+            [f"http://{host}" for host in self.hosts],
+            health_interval=0,
+            transport=httpx.MockTransport(self.handler),
+            **kwargs,
+        )
+
+
+@pytest.fixture
+def backends():
+    return FakeBackends(["b1", "b2", "b3"])
+
+
+@pytest.fixture
+def client(backends):
+    with TestClient(create_app(backends.router)) as test_client:
+        yield test_client
+
+
+def _rerank(client, query: str, documents=("a", "b")):
+    return client.post("/rerank", json={"query": query, "documents": list(documents)})
+
+
+class TestHashRing:
+    """Test key placement."""
+
+    def test_keys_spread_and_move_minimally(self):
+        """Test keys spread over nodes and removing one only moves its keys."""
+        nodes = ["http://b1", "http://b2", "http://b3"]
+        keys = [f"query {i}".encode() for i in range(3000)]
+        before = {key: HashRing(nodes).preference(key)[0] for key in keys}
+        after = {key: HashRing(nodes[:2]).preference(key)[0] for key in keys}
+
+        counts = Counter(before.values())
+        assert min(counts.values()) > 600
+        moved = [key for key in keys if before[key] != after[key]]
+        assert all(before[key] == "http://b3" for key in moved)
+
+    def test_preference_lists_every_node_once(self):
+        """Test the failover order contains each node once, owner first."""
+        ring = HashRing(["a", "b", "c"], vnodes=16)
+        preference = ring.preference(b"key")
+
+        assert sorted(preference) == ["a", "b", "c"]
+        assert HashRing(["a", "b", "c"], vnodes=16).preference(b"key") == preference
+
+
+class TestAffinityKey:
+    """Test routing keys."""
+
+    def test_query_key_ignores_formatting(self):
+        """Test queries differing only in whitespace share a key."""
+        assert affinity_key({"query": "what  is ai?"}) == affinity_key(
+            {"query": " what is ai? "}
+        )
+
+    def test_documents_key_ignores_order(self):
+        """Test the same candidate set in another order shares a key."""
+        first = affinity_key({"query": "a", "documents": ["x", "y"]}, "documents")
+        second = affinity_key({"query": "b", "documents": ["y", "x"]}, "documents")
+
+        assert first == second
+        assert first != affinity_key({"documents": ["x", "z"]}, "documents")
+
+    def test_batch_uses_first_request(self):
+        """Test batch requests are keyed by their first request."""
+        batch = {"requests": [{"query": "first"}, {"query": "second"}]}
+
+        assert affinity_key(batch) == affinity_key({"query": "first"})
+
+
+class TestRouter:
+    """Test the router application against fake backends."""
+
+    def test_same_query_same_backend(self, client, backends):
+        """Test repeated queries land on one backend and queries spread out."""
+        routed = {
+            query: {_rerank(client, query).json()["backend"] for _ in range(3)}
+            for query in (f"query {i}" for i in range(30))
+        }
+
+        assert all(len(hosts) == 1 for hosts in routed.values())
+        assert {host for hosts in routed.values() for host in hosts} == set(
+            backends.hosts
+        )
+
+    def test_compressed_body_is_routed_by_its_content(self, client):
+        """Test gzip request bodies are decoded for the key, forwarded as is."""
+        body = json.dumps({"query": "query 7", "documents": ["a", "b"]}).encode()
+        response = client.post(
+            "/rerank",
+            content=gzip.compress(body),
+            headers={"content-type": "application/json", "content-encoding": "gzip"},
+        )
+
+        assert response.json() == _rerank(client, "query 7").json()
+
+    def test_failover_to_next_backend(self, client, backends):
+        """Test a down backend's keys move to the next backend on the ring."""
+        owner = _rerank(client, "query 1").json()["backend"]
+        backends.down.add(owner)
+
+        failover = _rerank(client, "query 1").json()["backend"]
+        assert failover != owner
+        assert metrics.get("router_failovers_total", backend=f"http://{owner}") >= 1
+        health = client.get("/health").json()
+        assert health["healthy_backends"] == 2
+
+        # Down backends are skipped without being tried again
+        backends.calls.clear()
+        _rerank(client, "query 1")
+        assert [host for host, _, _ in backends.calls] == [failover]
+
+    def test_unavailable_backend_is_skipped(self, client, backends):
+        """Test 503 answers fail over and take the backend out of rotation."""
+        owner = _rerank(client, "query 2").json()["backend"]
+        backends.status[owner] = 503
+
+        assert _rerank(client, "query 2").json()["backend"] != owner
+        assert client.get("/health").json()["healthy_backends"] == 2
+
+    def test_quota_rejections_are_not_retried(self, client, backends):
+        """Test a 429 reaches the caller instead of using other quotas."""
+        owner = _rerank(client, "query 2").json()["backend"]
+        backends.status[owner] = 429
+        backends.calls.clear()
+
+        response = _rerank(client, "query 2")
+        assert response.status_code == 429
+        assert [host for host, _, _ in backends.calls] == [owner]
+
+    def test_all_backends_down(self, client, backends):
+        """Test 502 when no backend can be reached."""
+        backends.down.update(backends.hosts)
+
+        assert _rerank(client, "query").status_code == 502
+
+    def test_sessions_stick_to_their_backend(self, client):
+        """Test session requests go to the backend that opened the session."""
+        response = client.post("/sessions", json={"query": "paged query"})
+        session_id = response.json()["session_id"]
+        owner = response.headers["x-routed-to"]
+
+        response = client.post(
+            f"/sessions/{session_id}/documents", json={"documents": ["a"]}
+        )
+        assert response.headers["x-routed-to"] == owner
+        assert client.delete(f"/sessions/{session_id}").status_code == 200
+        assert client.get(f"/sessions/{session_id}").status_code == 404
+
+    def test_document_uploads_reach_every_backend(self, client, backends):
+        """Test uploads are broadcast so document_ids work on any backend."""
+        response = client.post(
+            "/documents", json={"documents": [{"id": "d", "text": "t"}]}
+        )
+
+        assert response.status_code == 200
+        assert sorted(host for host, _, _ in backends.calls) == backends.hosts
+
+    def test_partial_upload_reports_each_backend(self, client, backends):
+        """Test an upload some backends missed fails with their statuses."""
+        backends.down.add("b2")
+        response = client.post(
+            "/documents", json={"documents": [{"id": "d", "text": "t"}]}
+        )
+
+        assert response.status_code == 502
+        assert response.json()["backends"] == [
+            {"url": "http://b1", "status_code": 200},
+            {"url": "http://b2", "error": "ConnectError"},
+            {"url": "http://b3", "status_code": 200},
+        ]
+
+    def test_backend_latency_metrics(self, client):
+        """Test per-backend latency and request counts are exported."""
+        _rerank(client, "query 3")
+        text = client.get("/metrics").text
+
+        assert "router_backend_latency_seconds_count{backend=" in text
+        assert "router_backend_requests_total{backend=" in text
+
+
+class _LocalHandler(BaseHTTPRequestHandler):
+    # HTTP/1.0 closes every connection, so a stopped server refuses the next
+    # request instead of answering on a pooled connection
+    def _reply(self, payload: dict) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._reply({"status": "healthy"})
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["content-length"]))
+        self._reply({"backend": self.server.server_address[1]})
+
+    def log_message(self, *_args):
+        pass
+
+
+class TestLocalInstances:
+    """Test the router over real sockets with several local servers."""
+
+    def test_failover_between_local_servers(self):
+        """Test routing and failover across three servers on one machine."""
+        servers = [
+            ThreadingHTTPServer(("127.0.0.1", 0), _LocalHandler) for _ in range(3)
+        ]
+        for server in servers:
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+        urls = [f"http://127.0.0.1:{s.server_address[1]}" for s in servers]
+
+        try:
+            app = create_app(lambda: Router(urls, health_interval=0, timeout=5))
+            with TestClient(app) as client:
+                owner = _rerank(client, "local query").json()["backend"]
+                assert _rerank(client, "local query").json()["backend"] == owner
+
+                stopped = next(s for s in servers if s.server_address[1] == owner)
+                stopped.shutdown()
+                stopped.server_close()
+                assert _rerank(client, "local query").json()["backend"] != owner
+        finally:
+            for server in servers:
+                server.server_close()
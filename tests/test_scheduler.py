@@ -0,0 +1,217 @@
+"""Tests for the per-tenant fair scheduler."""
+
+import asyncio
+import threading
+
+import pytest
+
+from bge_reranker_v2_m3_api_server.scheduler import (
+    BATCH,
+    INTERACTIVE,
+    FairScheduler,
+    QueueFullError,
+    TokenBucket,
+    parse_mapping,
+    resolve_priority,
+    resolve_tenant,
+)
+
+
+async def _submit_while_blocked(scheduler, jobs):
+    """Hold the only worker busy, queue jobs, then release it.
+
+    Returns the order in which the queued jobs ran.
+    """
+    order: list[str] = []
+    release = threading.Event()
+
+    blocker = asyncio.create_task(scheduler.submit(release.wait, tenant="blocker"))
+    await asyncio.sleep(0.05)
+
+    tasks = []
+    for name, tenant, priority, cost in jobs:
+        tasks.append(
+            asyncio.create_task(
+                scheduler.submit(
+                    lambda name=name: order.append(name),
+                    tenant=tenant,
+                    priority=priority,
+                    cost=cost,
+                )
+            )
+        )
+        await asyncio.sleep(0)
+
+    release.set()
+    await asyncio.gather(blocker, *tasks)
+    return order
+
+
+class TestFairScheduler:
+    """Test FairScheduler dispatch order and limits."""
+
+    async def test_heavy_tenant_does_not_starve_others(self):
+        """Test a tenant that queued later still gets its fair turn."""
+        scheduler = FairScheduler()
+        await scheduler.start()
+        try:
+            order = await _submit_while_blocked(
+                scheduler,
+                [
+                    ("a1", "a", BATCH, 100),
+                    ("a2", "a", BATCH, 100),
+                    ("a3", "a", BATCH, 100),
+                    ("b1", "b", BATCH, 100),
+                ],
+            )
+        finally:
+            await scheduler.stop()
+
+        assert order == ["a1", "b1", "a2", "a3"]
+
+    async def test_weights_scale_share(self):
+        """Test a tenant with twice the weight runs twice as often."""
+        scheduler = FairScheduler(weights={"a": 2.0})
+        await scheduler.start()
+        try:
+            jobs = [(f"a{i}", "a", BATCH, 10) for i in range(4)]
+            jobs += [(f"b{i}", "b", BATCH, 10) for i in range(2)]
+            order = await _submit_while_blocked(scheduler, jobs)
+        finally:
+            await scheduler.stop()
+
+        assert order[:3].count("b0") == 1
+        assert order.index("b1") > order.index("a2")
+
+    async def test_interactive_lane_runs_first(self):
+        """Test interactive jobs overtake queued batch jobs."""
+        scheduler = FairScheduler()
+        await scheduler.start()
+        try:
+            order = await _submit_while_blocked(
+                scheduler,
+                [
+                    ("batch", "a", BATCH, 1),
+                    ("interactive", "b", INTERACTIVE, 1),
+                ],
+            )
+        finally:
+            await scheduler.stop()
+
+        assert order == ["interactive", "batch"]
+
+    async def test_errors_propagate(self):
+        """Test exceptions raised by a job reach the submitter."""
+        scheduler = FairScheduler()
+        await scheduler.start()
+
+        def fail():
+            raise ValueError("boom")
+
+        try:
+            with pytest.raises(ValueError, match="boom"):
+                await scheduler.submit(fail)
+        finally:
+            await scheduler.stop()
+
+    async def test_queue_limit(self):
+        """Test requests beyond the per-tenant queue limit are rejected."""
+        scheduler = FairScheduler(max_queue_per_tenant=1)
+        await scheduler.start()
+        release = threading.Event()
+        try:
+            running = asyncio.create_task(scheduler.submit(release.wait, tenant="a"))
+            await asyncio.sleep(0.05)
+            queued = asyncio.create_task(scheduler.submit(lambda: None, tenant="a"))
+            await asyncio.sleep(0)
+
+            with pytest.raises(QueueFullError):
+                await scheduler.submit(lambda: None, tenant="a")
+
+            release.set()
+            await asyncio.gather(running, queued)
+        finally:
+            release.set()
+            await scheduler.stop()
+
+    async def test_per_tenant_state_is_dropped(self):
+        """Test many one-off tenants leave no queues, tags or extra buckets."""
+        scheduler = FairScheduler(default_quota=1e9, max_buckets=8)
+        await scheduler.start()
+        try:
+            for i in range(100):
+                await scheduler.submit(lambda: None, tenant=f"tenant-{i}", cost=10)
+        finally:
+            await scheduler.stop()
+
+        assert not any(scheduler._queues[lane] for lane in (BATCH, INTERACTIVE))
+        assert len(scheduler._last_finish) <= 1
+        assert len(scheduler._buckets) == 8
+
+
+class TestTokenBucket:
+    """Test TokenBucket quota accounting."""
+
+    def test_bucket_delays_when_empty(self):
+        """Test jobs wait until enough tokens have been refilled."""
+        bucket = TokenBucket(rate=100)
+        now = bucket._updated
+
+        assert bucket.ready_at(100, now) == now
+        bucket.consume(100, now)
+        assert bucket.ready_at(50, now) == pytest.approx(now + 0.5)
+
+    def test_oversized_job_goes_into_debt(self):
+        """Test jobs larger than the bucket run once it is full."""
+        bucket = TokenBucket(rate=100)
+        now = bucket._updated
+
+        assert bucket.ready_at(300, now) == now
+        bucket.consume(300, now)
+        assert bucket.ready_at(100, now) == pytest.approx(now + 3.0)
+
+
+class TestTenantResolution:
+    """Test tenant and priority resolution from headers."""
+
+    def test_api_key_takes_precedence(self):
+        """Test configured API keys map to tenant names."""
+        headers = {"x-api-key": "secret", "x-tenant-id": "spoofed"}
+
+        assert resolve_tenant(headers, {"secret": "search"}) == "search"
+
+    def test_unknown_api_key_is_hashed(self):
+        """Test unknown keys never appear verbatim as a tenant name."""
+        tenant = resolve_tenant({"authorization": "Bearer secret"})
+
+        assert tenant.startswith("key-")
+        assert "secret" not in tenant
+
+    def test_header_and_default(self):
+        """Test the tenant header and the default tenant."""
+        assert resolve_tenant({"x-tenant-id": "ui"}) == "ui"
+        assert resolve_tenant({}) == "default"
+
+    def test_unknown_tenants_are_default(self):
+        """Test unconfigured header tenants and API keys share "default"."""
+        known = {"ui", "search"}
+
+        assert resolve_tenant({"x-tenant-id": "ui"}, known_tenants=known) == "ui"
+        assert resolve_tenant({"x-tenant-id": "new"}, known_tenants=known) == "default"
+        assert resolve_tenant({"x-api-key": "other"}, known_tenants=known) == "default"
+        assert (
+            resolve_tenant({"x-api-key": "k"}, {"k": "search"}, known_tenants=known)
+            == "search"
+        )
+
+    def test_priority(self):
+        """Test large requests are always sent to the batch lane."""
+        assert resolve_priority({}, 10, 100) == INTERACTIVE
+        assert resolve_priority({"x-priority": "batch"}, 10, 100) == BATCH
+        assert resolve_priority({"x-priority": "interactive"}, 500, 100) == BATCH
+
+    def test_parse_mapping(self):
+        """Test key=value configuration strings."""
+        assert parse_mapping("a=2, b=0.5,") == {"a": "2", "b": "0.5"}
+        with pytest.raises(ValueError, match="expected key=value"):
+            parse_mapping("a")
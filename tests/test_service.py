@@ -4,7 +4,7 @@ from unittest.mock import Mock, patch
 
 import pytest
 
-from bge_reranker_v2_m3_api_server.service import RerankerService
+from bge_reranker_v2_m3_api_server.service import RerankerService, ScoringStats
 
 
 class TestRerankerService:
@@ -187,3 +187,60 @@ class TestRerankerService:
         assert results[0] == (1, 1.8, "doc2")  # Highest score
         assert results[1] == (2, -0.3, "doc3")  # Middle score
         assert results[2] == (0, -2.5, "doc1")  # Lowest score
+
+    @patch("bge_reranker_v2_m3_api_server.service.FlagReranker")
+    def test_duplicate_documents_scored_once(self, mock_flag_reranker):
+        """Test duplicate documents are scored once and fanned back out."""
+        mock_reranker_instance = Mock()
+        mock_reranker_instance.compute_score.return_value = [0.2, 0.8]
+        mock_flag_reranker.return_value = mock_reranker_instance
+
+        service = RerankerService()
+        service.load_model()
+
+        stats = ScoringStats()
+        scores, _ = service.compute_scores(
+            "query", ["doc a", "doc  b", "doc a", " doc b"], stats=stats
+        )
+
+        mock_reranker_instance.compute_score.assert_called_once_with(
+            [("query", "doc a"), ("query", "doc  b")], normalize=True
+        )
+        assert scores == [0.2, 0.8, 0.2, 0.8]
+        assert stats.total_documents == 4
+        assert stats.unique_documents == 2
+        assert stats.dedup_ratio == 0.5
+
+    @patch("bge_reranker_v2_m3_api_server.service.FlagReranker")
+    def test_exact_dedup_mode_keeps_whitespace_variants(self, mock_flag_reranker):
+        """Test exact mode only collapses byte-identical documents."""
+        mock_reranker_instance = Mock()
+        mock_reranker_instance.compute_score.return_value = [0.2, 0.8]
+        mock_flag_reranker.return_value = mock_reranker_instance
+
+        service = RerankerService(dedup_mode="exact")
+        service.load_model()
+
+        scores, _ = service.compute_scores("query", ["doc", "doc ", "doc"])
+
+        assert scores == [0.2, 0.8, 0.2]
+
+    @patch("bge_reranker_v2_m3_api_server.service.FlagReranker")
+    def test_score_cache_across_requests(self, mock_flag_reranker):
+        """Test pairs scored by an earlier request are served from the cache."""
+        mock_reranker_instance = Mock()
+        mock_reranker_instance.compute_score.side_effect = [[0.9, 0.1], [0.5]]
+        mock_flag_reranker.return_value = mock_reranker_instance
+
+        service = RerankerService(score_cache_size=100)
+        service.load_model()
+
+        service.compute_scores("query", ["doc1", "doc2"])
+        stats = ScoringStats()
+        scores, _ = service.compute_scores("query", ["doc2", "doc3"], stats=stats)
+
+        mock_reranker_instance.compute_score.assert_called_with(
+            [("query", "doc3")], normalize=True
+        )
+        assert scores == [0.1, 0.5]
+        assert stats.cache_hits == 1
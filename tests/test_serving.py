@@ -0,0 +1,162 @@
+"""Tests for TCP, Unix domain socket and h2c listeners."""
+
+import json
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler
+from socketserver import UnixStreamServer
+
+import pytest
+
+from bge_reranker_v2_m3_api_server.benchmark import run_transport_benchmark
+from bge_reranker_v2_m3_api_server.client import RerankerClient
+from bge_reranker_v2_m3_api_server.serving import (
+    APP,
+    ROUTER_APP,
+    ListenerConfig,
+    hypercorn_settings,
+    remove_stale_socket,
+    uvicorn_options,
+)
+
+
+class _HealthHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = json.dumps(
+            {
+                "status": "healthy",
+                "model_loaded": True,
+                "version": "0.0.0",
+                "model_name": "fake",
+            }
+        ).encode()
+        self.send_response(200)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        return "unix"
+
+    def log_message(self, *_args):
+        pass
+
+
+class _UnixHTTPServer(UnixStreamServer):
+    daemon_threads = True
+
+
+@pytest.fixture
+def unix_server(tmp_path):
+    """An HTTP/1.1 server answering /health on a Unix domain socket."""
+    path = str(tmp_path / "reranker.sock")
+    server = _UnixHTTPServer(path, _HealthHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield path
+    server.shutdown()
+    server.server_close()
+
+
+class TestListenerConfig:
+    """Test server options built from a listener config."""
+
+    def test_uvicorn_tcp(self):
+        """Test TCP listeners bind host and port with tuned keep-alive."""
+        options = uvicorn_options(ListenerConfig(port=9000, backlog=4096))
+
+        assert options["host"] == "0.0.0.0"
+        assert options["port"] == 9000
+        assert options["backlog"] == 4096
+        assert options["timeout_keep_alive"] == 30
+        assert "uds" not in options
+
+    def test_uvicorn_uds(self):
+        """Test a socket path replaces host and port."""
+        options = uvicorn_options(ListenerConfig(uds="/run/bge.sock", workers=2))
+
+        assert options["uds"] == "/run/bge.sock"
+        assert options["workers"] == 2
+        assert "host" not in options
+        assert "port" not in options
+
+    def test_hypercorn(self):
+        """Test h2c listeners bind TCP or a socket under hypercorn."""
+        settings = hypercorn_settings(
+            ListenerConfig(http2=True, h2_max_concurrent_streams=64)
+        )
+        assert settings["application_path"] == APP
+        assert settings["bind"] == ["0.0.0.0:8000"]
+        assert settings["h2_max_concurrent_streams"] == 64
+        assert settings["loglevel"] == "INFO"
+
+        uds = hypercorn_settings(ListenerConfig(uds="/run/bge.sock", http2=True))
+        assert uds["bind"] == ["unix:/run/bge.sock"]
+
+        router = hypercorn_settings(ListenerConfig(http2=True, app=ROUTER_APP))
+        assert router["application_path"] == ROUTER_APP
+
+
+class TestRemoveStaleSocket:
+    """Test cleanup of socket files left by a previous server."""
+
+    def test_missing_path(self, tmp_path):
+        """Test a path that does not exist is left alone."""
+        remove_stale_socket(str(tmp_path / "none.sock"))
+
+    def test_stale_socket_is_removed(self, tmp_path):
+        """Test a socket nobody listens on is deleted."""
+        path = tmp_path / "stale.sock"
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.bind(str(path))
+
+        remove_stale_socket(str(path))
+
+        assert not path.exists()
+
+    def test_live_socket_is_kept(self, unix_server):
+        """Test a socket with a running server is not taken over."""
+        with pytest.raises(OSError, match="Another server"):
+            remove_stale_socket(unix_server)
+
+    def test_regular_file(self, tmp_path):
+        """Test a regular file is never deleted."""
+        path = tmp_path / "data.txt"
+        path.write_text("keep me")
+
+        with pytest.raises(OSError, match="not a socket"):
+            remove_stale_socket(str(path))
+        assert path.exists()
+
+
+class TestUnixSocketClients:
+    """Test clients talking to a server over a Unix domain socket."""
+
+    async def test_reranker_client(self, unix_server):
+        """Test RerankerClient connects through the socket."""
+        async with RerankerClient("http://localhost", uds=unix_server) as client:
+            health = await client.health()
+
+        assert health.status == "healthy"
+
+    def test_transport_benchmark(self, unix_server):
+        """Test the transport benchmark reports both connection modes."""
+        report = run_transport_benchmark(
+            [
+                {
+                    "name": "uds",
+                    "url": "http://localhost",
+                    "uds": unix_server,
+                    "h2c": False,
+                }
+            ],
+            num_requests=5,
+            warmup=1,
+        )
+
+        assert [entry["mode"] for entry in report] == ["keep-alive", "reconnect"]
+        assert all(entry["transport"] == "uds" for entry in report)
+        assert all(entry["median_ms"] > 0 for entry in report)
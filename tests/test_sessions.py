@@ -0,0 +1,95 @@
+"""Tests for incremental reranking sessions."""
+
+import numpy as np
+import pytest
+
+from bge_reranker_v2_m3_api_server.postprocess import rank_scores
+from bge_reranker_v2_m3_api_server.sessions import (
+    RerankSession,
+    SessionFullError,
+    SessionStore,
+    StaleSessionError,
+    UnknownSessionError,
+)
+
+
+class TestRerankSession:
+    """Test merging appended batches into the ranking."""
+
+    def test_merge_matches_full_sort(self):
+        """Test the merged ranking equals a stable sort of all scores."""
+        rng = np.random.default_rng(0)
+        session = RerankSession("s", "query")
+        all_scores = []
+        for size in (10, 1, 25, 7):
+            # Rounded so equal scores occur within and across batches
+            scores = np.round(rng.random(size), 1)
+            session.merge([f"doc {len(all_scores) + i}" for i in range(size)], scores)
+            all_scores.extend(scores.tolist())
+
+        expected = rank_scores(np.array(all_scores))
+        indices, scores = session.top()
+        assert indices.tolist() == expected.tolist()
+        assert scores.tolist() == np.array(all_scores)[expected].tolist()
+
+    def test_top_k_and_results(self):
+        """Test top_k cuts the ranking and indices refer to append order."""
+        session = RerankSession("s", "query")
+        assert session.merge(["a", "b"], np.array([0.2, 0.5])) == 0
+        assert session.merge(["c"], np.array([0.9])) == 2
+
+        assert session.results(2) == [(2, 0.9, "c"), (1, 0.5, "b")]
+        assert len(session) == 3
+
+
+class TestSessionStore:
+    """Test session lifetime and limits."""
+
+    def test_ttl_is_extended_by_use(self):
+        """Test a session expires ttl seconds after its last use."""
+        store = SessionStore(ttl=10)
+        session = store.open("query", now=0.0)
+
+        assert store.get(session.session_id, now=8.0) is session
+        assert store.get(session.session_id, now=17.0) is session
+        with pytest.raises(UnknownSessionError):
+            store.get(session.session_id, now=27.0)
+        assert len(store) == 0
+
+    def test_namespaces_are_separate(self):
+        """Test tenants cannot use or close each other's sessions."""
+        store = SessionStore()
+        session = store.open("query", namespace="one")
+
+        with pytest.raises(UnknownSessionError):
+            store.get(session.session_id, namespace="two")
+        assert not store.close(session.session_id, namespace="two")
+        assert store.close(session.session_id, namespace="one")
+        with pytest.raises(UnknownSessionError):
+            store.get(session.session_id, namespace="one")
+
+    def test_least_recently_used_is_dropped(self):
+        """Test a full store drops expired, then least recently used sessions."""
+        store = SessionStore(ttl=10, max_sessions=2)
+        first = store.open("first", now=0.0)
+        second = store.open("second", now=1.0)
+        store.get(first.session_id, now=2.0)
+        store.open("third", now=3.0)
+
+        assert store.get(first.session_id, now=4.0) is first
+        with pytest.raises(UnknownSessionError):
+            store.get(second.session_id, now=4.0)
+
+        assert store.expire(now=100.0) == 2
+
+    def test_check_append(self):
+        """Test the document limit and the model generation are enforced."""
+        store = SessionStore(max_documents=3)
+        session = store.open("query", generation=1)
+        session.merge(["a", "b"], np.array([0.1, 0.2]))
+
+        store.check_append(session, 1, generation=1)
+        with pytest.raises(SessionFullError):
+            store.check_append(session, 2, generation=1)
+        with pytest.raises(StaleSessionError):
+            store.check_append(session, 1, generation=2)
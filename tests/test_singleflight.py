@@ -0,0 +1,207 @@
+"""Tests for single-flight request coalescing."""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock
+
+import pytest
+
+from bge_reranker_v2_m3_api_server.metrics import metrics
+from bge_reranker_v2_m3_api_server.service import RerankerService, ScoringStats
+from bge_reranker_v2_m3_api_server.singleflight import (
+    SingleFlight,
+    request_fingerprint,
+)
+
+
+def _wait_for_pending(flight: SingleFlight) -> None:
+    """Block until a leader registered its call."""
+    for _ in range(1000):
+        if len(flight):
+            return
+        time.sleep(0.005)
+    raise AssertionError("leader did not start")
+
+
+def _wait_for_followers(scope: str, count: int) -> None:
+    """Block until count callers joined a running call."""
+    for _ in range(1000):
+        if metrics.get("single_flight_shared_total", scope=scope) >= count:
+            return
+        time.sleep(0.005)
+    raise AssertionError("followers did not join")
+
+
+class TestRequestFingerprint:
+    """Test request fingerprints."""
+
+    def test_same_request_same_key(self):
+        """Test identical requests map to the same key."""
+        a = request_fingerprint("m", "q", ["a", "b"], True, top_k=1)
+        b = request_fingerprint("m", "q", ["a", "b"], True, top_k=1)
+        assert a == b
+        assert len(a) == 16
+
+    def test_result_changing_inputs_change_key(self):
+        """Test every input that changes the result changes the key."""
+        base = request_fingerprint("m", "q", ["a", "b"], True, top_k=1)
+        assert request_fingerprint("n", "q", ["a", "b"], True, top_k=1) != base
+        assert request_fingerprint("m", "q", ["b", "a"], True, top_k=1) != base
+        assert request_fingerprint("m", "q", ["a", "b"], False, top_k=1) != base
+        assert request_fingerprint("m", "q", ["a", "b"], True, top_k=2) != base
+        assert request_fingerprint("m", "q", ["a", "b "], True, top_k=1) != base
+        # Text boundaries are part of the key
+        assert request_fingerprint("m", "qa", ["b"], True, top_k=1) != (
+            request_fingerprint("m", "q", ["ab"], True, top_k=1)
+        )
+
+
+class TestSingleFlight:
+    """Test sharing of in-flight calls."""
+
+    def test_concurrent_calls_share_one_computation(self):
+        """Test callers arriving during a call get its result."""
+        metrics.reset()
+        flight = SingleFlight("sync-test")
+        release = threading.Event()
+        fn = Mock(side_effect=lambda: release.wait(5) and "result")
+
+        with ThreadPoolExecutor(4) as pool:
+            leader = pool.submit(flight.do, b"key", fn)
+            _wait_for_pending(flight)
+            followers = [pool.submit(flight.do, b"key", fn) for _ in range(3)]
+            _wait_for_followers("sync-test", 3)
+            release.set()
+
+            assert leader.result() == ("result", False)
+            assert [f.result() for f in followers] == [("result", True)] * 3
+
+        fn.assert_called_once()
+        assert len(flight) == 0
+
+    def test_later_calls_run_again(self):
+        """Test nothing is kept once a call finishes."""
+        flight = SingleFlight()
+        fn = Mock(return_value=1)
+
+        assert flight.do(b"key", fn) == (1, False)
+        assert flight.do(b"key", fn) == (1, False)
+        assert fn.call_count == 2
+
+    def test_errors_reach_all_callers(self):
+        """Test a failing call raises in the leader and its followers."""
+        metrics.reset()
+        flight = SingleFlight("error-test")
+        release = threading.Event()
+
+        def fail():
+            release.wait(5)
+            raise ValueError("boom")
+
+        with ThreadPoolExecutor(2) as pool:
+            leader = pool.submit(flight.do, b"key", fail)
+            _wait_for_pending(flight)
+            follower = pool.submit(flight.do, b"key", fail)
+            _wait_for_followers("error-test", 1)
+            release.set()
+
+            with pytest.raises(ValueError, match="boom"):
+                leader.result()
+            with pytest.raises(ValueError, match="boom"):
+                follower.result()
+        assert len(flight) == 0
+
+    def test_async_calls_share_one_computation(self):
+        """Test coroutines awaiting the same key share one call."""
+        flight = SingleFlight()
+        calls = 0
+
+        async def compute():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return calls
+
+        async def main():
+            return await asyncio.gather(
+                *(flight.do_async(b"key", compute) for _ in range(5))
+            )
+
+        results = asyncio.run(main())
+
+        assert calls == 1
+        assert [result for result, _ in results] == [1] * 5
+        assert sum(shared for _, shared in results) == 4
+
+    def test_cancelled_leader_keeps_followers_result(self):
+        """Test cancelling the leader does not cancel its followers."""
+        flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def compute():
+            await release.wait()
+            return "result"
+
+        async def main():
+            leader = asyncio.create_task(flight.do_async(b"key", compute))
+            await asyncio.sleep(0)
+            follower = asyncio.create_task(flight.do_async(b"key", compute))
+            await asyncio.sleep(0)
+            leader.cancel()
+            await asyncio.sleep(0)
+            release.set()
+            with pytest.raises(asyncio.CancelledError):
+                await leader
+            return await follower
+
+        assert asyncio.run(main()) == ("result", True)
+        assert len(flight) == 0
+
+
+class TestServiceSingleFlight:
+    """Test RerankerService coalescing of identical rerank calls."""
+
+    def _service(self, release: threading.Event, **kwargs) -> RerankerService:
+        service = RerankerService(dedup_mode="off", **kwargs)
+        service._reranker = Mock()
+        service._reranker.compute_score.side_effect = lambda pairs, **_kwargs: (
+            release.wait(5) and [float(len(doc)) for _, doc in pairs]
+        )
+        service._model_loaded = True
+        return service
+
+    def test_identical_reranks_share_scores_and_stats(self):
+        """Test concurrent identical reranks run the model once."""
+        metrics.reset()
+        release = threading.Event()
+        service = self._service(release)
+        stats = [ScoringStats() for _ in range(3)]
+
+        with ThreadPoolExecutor(3) as pool:
+            futures = [pool.submit(service.rerank, "q", ["a", "bbb"], stats=stats[0])]
+            _wait_for_pending(service.single_flight)  # type: ignore
+            futures += [
+                pool.submit(service.rerank, "q", ["a", "bbb"], stats=s)
+                for s in stats[1:]
+            ]
+            _wait_for_followers("service", 2)
+            release.set()
+            results = [future.result()[0] for future in futures]
+
+        assert service._reranker.compute_score.call_count == 1
+        assert results == [[(1, 3.0, "bbb"), (0, 1.0, "a")]] * 3
+        assert all(s.total_documents == 2 for s in stats)
+
+    def test_disabled(self):
+        """Test single_flight=False scores every call."""
+        release = threading.Event()
+        release.set()
+        service = self._service(release, single_flight=False)
+
+        service.rerank("q", ["a"])
+        service.rerank("q", ["a"])
+
+        assert service.single_flight is None
+        assert service._reranker.compute_score.call_count == 2
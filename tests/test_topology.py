@@ -0,0 +1,94 @@
+"""Tests for CPU thread and NUMA topology controls."""
+
+import pytest
+
+from bge_reranker_v2_m3_api_server.topology import (
+    claim_worker_slot,
+    format_cpu_list,
+    numa_nodes,
+    parse_cpu_list,
+    partition_cpus,
+    resolve_thread_settings,
+)
+
+
+class TestCpuLists:
+    """Test cpulist parsing and formatting."""
+
+    def test_round_trip(self):
+        """Test ranges and single CPUs survive a round trip."""
+        cpus = parse_cpu_list("0-3, 8,10-11")
+
+        assert cpus == [0, 1, 2, 3, 8, 10, 11]
+        assert format_cpu_list(cpus) == "0-3,8,10-11"
+
+    def test_numa_nodes_from_sysfs(self, tmp_path):
+        """Test NUMA nodes are read from a sysfs-like directory."""
+        for node, cpulist in ((0, "0-3\n"), (1, "4-7\n")):
+            (tmp_path / f"node{node}").mkdir()
+            (tmp_path / f"node{node}" / "cpulist").write_text(cpulist)
+
+        assert numa_nodes(tmp_path) == {0: [0, 1, 2, 3], 1: [4, 5, 6, 7]}
+
+
+class TestPartitioning:
+    """Test dividing cores between workers."""
+
+    def test_even_split_without_numa(self):
+        """Test cores are split into contiguous blocks."""
+        assert partition_cpus(list(range(8)), 3) == [[0, 1, 2], [3, 4, 5], [6, 7]]
+
+    def test_workers_spread_over_numa_nodes(self):
+        """Test workers alternate between nodes and never straddle them."""
+        nodes = {0: [0, 1, 2, 3], 1: [4, 5, 6, 7]}
+
+        partitions = partition_cpus(list(range(8)), 4, nodes)
+
+        assert partitions == [[0, 1], [4, 5], [2, 3], [6, 7]]
+
+    def test_more_workers_than_cores(self):
+        """Test oversubscribed setups still give every worker a core."""
+        assert partition_cpus([0, 1], 3) == [[0], [1], [0]]
+
+    def test_invalid_worker_count(self):
+        """Test zero workers are rejected."""
+        with pytest.raises(ValueError, match="at least 1"):
+            partition_cpus([0], 0)
+
+
+class TestResolveThreadSettings:
+    """Test resolving per-worker settings from CLI options."""
+
+    def test_per_worker_cpu_lists_and_auto_threads(self):
+        """Test explicit per-worker CPU sets size the intra-op pool."""
+        settings = resolve_thread_settings(
+            1, 2, intra_op_threads="auto", cpu_affinity="0-3;4-9"
+        )
+
+        assert settings.cpus == [4, 5, 6, 7, 8, 9]
+        assert settings.intra_op_threads == 6
+        assert settings.inter_op_threads is None
+
+    def test_explicit_thread_counts(self):
+        """Test numeric thread counts pass straight through."""
+        settings = resolve_thread_settings(
+            0, 4, intra_op_threads="8", inter_op_threads="auto"
+        )
+
+        assert settings.intra_op_threads == 8
+        assert settings.inter_op_threads == 1
+        assert settings.cpus is None
+
+
+class TestWorkerSlots:
+    """Test worker index assignment between sibling processes."""
+
+    def test_slots_are_unique_and_reclaimed(self, tmp_path):
+        """Test live slots are skipped and dead owners are replaced."""
+        assert claim_worker_slot(3, tmp_path) == 0
+        assert claim_worker_slot(3, tmp_path) == 1
+
+        (tmp_path / "slot-0").write_text("999999999")
+
+        assert claim_worker_slot(3, tmp_path) == 2
+        assert claim_worker_slot(1, tmp_path) == 0
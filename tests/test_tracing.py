@@ -0,0 +1,142 @@
+"""Tests for request tracing."""
+
+import json
+from unittest.mock import Mock
+
+from bge_reranker_v2_m3_api_server.batching import estimate_tokens
+from bge_reranker_v2_m3_api_server.scheduler import FairScheduler
+from bge_reranker_v2_m3_api_server.service import RerankerService
+from bge_reranker_v2_m3_api_server.tracing import (
+    FileSpanExporter,
+    InMemorySpanExporter,
+    Tracer,
+    format_traceparent,
+    load_exporter,
+    parse_traceparent,
+    tracer,
+)
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+class TestTraceparent:
+    """Test W3C traceparent handling."""
+
+    def test_parse(self):
+        """Test valid and invalid headers."""
+        assert parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-01") == (
+            TRACE_ID,
+            PARENT_ID,
+            True,
+        )
+        assert parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-00")[2] is False
+        assert parse_traceparent("garbage") is None
+        assert parse_traceparent(f"00-{'0' * 32}-{PARENT_ID}-01") is None
+        assert parse_traceparent(None) is None
+
+
+class TestTracer:
+    """Test span creation and export."""
+
+    def test_disabled_tracer_records_nothing(self):
+        """Test spans are no-ops without an exporter."""
+        local = Tracer()
+        with local.start_trace("root") as root, local.span("child") as child:
+            assert root is None
+            assert child is None
+
+    def test_spans_nest_and_continue_incoming_trace(self):
+        """Test child spans share the trace of the incoming traceparent."""
+        exporter = InMemorySpanExporter()
+        local = Tracer(exporter)
+
+        with local.start_trace(
+            "root", traceparent=f"00-{TRACE_ID}-{PARENT_ID}-01"
+        ) as root:
+            with local.span("child", documents=3) as child:
+                child.set_attribute("total_tokens", 42)
+            local.record_span("queued", 1, 2, batch_id=7)
+
+        child_span, queued, root_span = exporter.spans
+        assert root_span is root
+        assert root.trace_id == TRACE_ID
+        assert root.parent_span_id == PARENT_ID
+        assert child_span.parent_span_id == root.span_id
+        assert child_span.attributes == {"documents": 3, "total_tokens": 42}
+        assert queued.attributes == {"batch_id": 7}
+        assert format_traceparent(root) == f"00-{TRACE_ID}-{root.span_id}-01"
+
+    def test_sampling(self):
+        """Test unsampled parents and a zero sample rate suppress recording."""
+        exporter = InMemorySpanExporter()
+        local = Tracer(exporter, sample_rate=0.0)
+
+        with local.start_trace("root") as span:
+            assert span is None
+        with local.start_trace(
+            "root", traceparent=f"00-{TRACE_ID}-{PARENT_ID}-00"
+        ) as span:
+            assert span is None
+        with local.start_trace(
+            "root", traceparent=f"00-{TRACE_ID}-{PARENT_ID}-01"
+        ) as span:
+            assert span is not None
+
+    def test_file_exporter(self, tmp_path):
+        """Test spans are written as OTLP-style JSON lines."""
+        path = tmp_path / "spans.jsonl"
+        local = Tracer(load_exporter(f"file:{path}"))
+        assert isinstance(local.exporter, FileSpanExporter)
+
+        with local.start_trace("root"):
+            pass
+        local.configure(None)
+
+        record = json.loads(path.read_text())
+        assert record["name"] == "root"
+        assert len(record["traceId"]) == 32
+        assert record["endTimeUnixNano"] >= record["startTimeUnixNano"]
+
+
+class TestPipelineSpans:
+    """Test spans emitted by the scheduler and the service."""
+
+    async def test_spans_follow_jobs_into_the_scheduler(self):
+        """Test queue and inference spans nest under the request span."""
+        service = RerankerService(dedup_mode="exact")
+        service._reranker = Mock()
+        service._reranker.compute_score.return_value = [0.1, 0.9]
+        service._model_loaded = True
+
+        scheduler = FairScheduler()
+        await scheduler.start()
+        exporter = InMemorySpanExporter()
+        try:
+            with tracer.start_trace("POST /rerank", listener=exporter) as root:
+                await scheduler.submit(
+                    lambda: service.rerank("q", ["a", "b", "a"]), cost=3
+                )
+        finally:
+            await scheduler.stop()
+
+        spans = {span.name: span for span in exporter.spans}
+        assert set(spans) == {
+            "POST /rerank",
+            "rerank.queue",
+            "rerank.dedup",
+            "rerank.inference",
+            "rerank.sort",
+        }
+        for name in ("rerank.queue", "rerank.dedup", "rerank.inference"):
+            assert spans[name].parent_span_id == root.span_id
+        assert spans["rerank.dedup"].attributes["unique_documents"] == 2
+        assert spans["rerank.inference"].attributes["pairs"] == 2
+        # Token counts are estimated, not tokenized a second time
+        assert spans["rerank.inference"].attributes[
+            "total_tokens"
+        ] == 2 * estimate_tokens("q", "a")
+        service._reranker.tokenizer.assert_not_called()
+        assert (
+            root.attributes["batch_id"] == spans["rerank.queue"].attributes["batch_id"]
+        )